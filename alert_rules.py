@@ -0,0 +1,59 @@
+import re
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ('critical', 'warning', 'info')
+
+# Événements qui demandent une intervention immédiate
+DEFAULT_CRITICAL_PATTERNS = [
+    r'guiding\s+(?:aborted|failed)',
+    r'park(?:ed|ing)?\b.*\bweather|weather\b.*\b(?:alert|danger)',
+    r'capture\s+(?:failed|aborted)',
+    r'exposure\s+(?:failed|aborted)',
+    r'INDI\s+server\b.*\b(?:crash|died|terminated|disconnect)',
+    r'\bdisconnected\b.*\bINDI\b|\bINDI\b.*\bdisconnected\b',
+    r'lost\s+connection',
+    r'slew(?:ing)?\s+(?:failed|aborted)',
+    r'meridian\s+flip\s+failed',
+    r'scheduler\b.*\baborted',
+]
+
+# Incidents à signaler sans urgence
+DEFAULT_WARNING_PATTERNS = [
+    r'autofocus\s+(?:failed|aborted)',
+    r'(?:solver|solving)\s+failed',
+    r'dither(?:ing)?\s+failed',
+    r'guide\s+star\s+lost|lost\s+(?:the\s+)?guide\s+star',
+    r'\btimed[\s-]*out\b',
+]
+
+class AlertClassifier:
+    """Classification des lignes en critical / warning / info
+
+    Toutes les règles sont compilées une seule fois en une expression combinée
+    (un groupe nommé par sévérité): une seule recherche par ligne, quel que soit
+    le nombre de règles.
+    """
+
+    def __init__(self, critical_patterns: Optional[List[str]] = None, warning_patterns: Optional[List[str]] = None):
+        self.critical_patterns = list(DEFAULT_CRITICAL_PATTERNS if critical_patterns is None else critical_patterns)
+        self.warning_patterns = list(DEFAULT_WARNING_PATTERNS if warning_patterns is None else warning_patterns)
+
+        groups = []
+        for severity, patterns in (('critical', self.critical_patterns), ('warning', self.warning_patterns)):
+            if patterns:
+                # Anticipation ancrée en début de ligne: chaque sévérité est cherchée sur toute la ligne
+                groups.append(f"(?=.*?(?P<{severity}>" + '|'.join(f'(?:{p})' for p in patterns) + "))")
+        # Les règles critical sont essayées en premier: elles l'emportent sur warning
+        self.pattern = re.compile('|'.join(groups), re.IGNORECASE) if groups else None
+
+    def classify(self, line: str) -> str:
+        """Sévérité d'une ligne"""
+        if self.pattern is None:
+            return 'info'
+        match = self.pattern.match(line)
+        if match is None:
+            return 'info'
+        return 'critical' if match.groupdict().get('critical') is not None else 'warning'
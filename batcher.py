@@ -0,0 +1,170 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, List, Optional
+from scheduler import Scheduler
+
+logger = logging.getLogger(__name__)
+
+class Batcher:
+    """Accumulation thread-safe d'éléments, envoyés par taille ou après un délai
+
+    Le thread d'envoi dort sur une variable de condition jusqu'à l'échéance
+    exacte du batch: aucun réveil tant qu'il n'y a rien en attente. Avec un
+    échéancier partagé (plusieurs observatoires), l'envoi est une tâche de
+    l'échéancier au lieu d'un thread: le callback doit alors rester non bloquant.
+    Les éléments sont accumulés dans une liste, ou dans le conteneur fourni par
+    `buffer_factory` (append, prepend, len et itération).
+    """
+
+    def __init__(self, flush_callback: Callable[[List[Any]], None], batch_size: int = 10,
+                 batch_timeout: float = 30.0, name: str = "batcher", buffer_factory: Callable[[], Any] = list,
+                 scheduler: Optional[Scheduler] = None):
+        self.flush_callback = flush_callback
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.buffer_factory = buffer_factory
+        self.items = buffer_factory()
+        self.deadline: Optional[float] = None
+        self.flush_requested = False
+        self.running = True
+        self.condition = threading.Condition()
+
+        self.scheduler = scheduler
+        if scheduler is not None:
+            self.thread = None
+            self.task = scheduler.add(name, self._tick, None)
+        else:
+            self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+            self.thread.start()
+
+    def __len__(self) -> int:
+        with self.condition:
+            return len(self.items)
+
+    def add(self, item: Any):
+        """Ajouter un élément; l'échéance est repoussée à chaque ajout"""
+        with self.condition:
+            self.items.append(item)
+            self.deadline = time.monotonic() + self.batch_timeout
+            if len(self.items) >= self.batch_size:
+                self.flush_requested = True
+                self._wake()
+            elif len(self.items) == 1:
+                # Le thread d'envoi dort sans échéance: le réveiller pour qu'il arme la nouvelle
+                self._wake()
+
+    def requeue(self, items: List[Any]):
+        """Remettre en tête des éléments dont l'envoi a échoué (nouvel essai à la prochaine échéance)"""
+        with self.condition:
+            if isinstance(self.items, list):
+                self.items[:0] = items
+            else:
+                self.items.prepend(items)
+            self.deadline = time.monotonic() + self.batch_timeout
+            self._wake()
+
+    def configure(self, batch_size: int, batch_timeout: float):
+        """Changer la taille et le délai des batchs sans perdre les éléments en attente"""
+        with self.condition:
+            self.batch_size = batch_size
+            self.batch_timeout = batch_timeout
+            if self.items:
+                # Échéance en cours ramenée au nouveau délai s'il est plus court
+                self.deadline = min(self.deadline, time.monotonic() + batch_timeout)
+                if len(self.items) >= batch_size:
+                    self.flush_requested = True
+            self._wake()
+
+    def flush(self):
+        """Demander un envoi immédiat des éléments en attente"""
+        with self.condition:
+            if self.items:
+                self.flush_requested = True
+                self._wake()
+
+    def _wake(self):
+        """Réveiller le thread d'envoi, ou avancer la tâche de l'échéancier (verrou tenu)"""
+        if self.scheduler is None:
+            self.condition.notify()
+        elif self.items:
+            self.scheduler.wake(self.task, 0.0 if self.flush_requested else max(0.0, self.deadline - time.monotonic()))
+
+    def _tick(self) -> Optional[float]:
+        """Tâche de l'échéancier: envoyer le batch arrivé à échéance; retourne le délai avant la prochaine"""
+        with self.condition:
+            if not self.running or not self.items:
+                return None
+            if not self.flush_requested:
+                remaining = self.deadline - time.monotonic()
+                if remaining > 0:
+                    return remaining
+            batch = self.items
+            self.items = self.buffer_factory()
+            self.deadline = None
+            self.flush_requested = False
+
+        self._flush(batch)
+        with self.condition:
+            if not self.items:
+                return None
+            return 0.0 if self.flush_requested else max(0.0, self.deadline - time.monotonic())
+
+    def _flush(self, batch):
+        if batch:
+            logger.debug(f"Envoi d'un batch de {len(batch)} élément(s)")
+            try:
+                self.flush_callback(batch)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'envoi du batch: {e}")
+
+    def _run(self):
+        """Thread d'envoi: attendre l'échéance du batch puis appeler le callback"""
+        while True:
+            with self.condition:
+                while self.running and not self.flush_requested:
+                    if not self.items:
+                        self.condition.wait()
+                        continue
+                    remaining = self.deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                stopping = not self.running
+                if stopping and not self.items:
+                    return
+                batch = self.items
+                self.items = self.buffer_factory()
+                self.deadline = None
+                self.flush_requested = False
+
+            self._flush(batch)
+            if stopping:
+                # Un seul dernier envoi: les éléments remis en tête restent en attente (take_remaining)
+                return
+
+    def take_remaining(self):
+        """Retirer les éléments restés en attente après l'arrêt (envoi échoué pendant le dernier envoi)"""
+        with self.condition:
+            batch = self.items
+            self.items = self.buffer_factory()
+            self.deadline = None
+            self.flush_requested = False
+            return batch
+
+    def stop(self, timeout: float = 10.0):
+        """Arrêter le thread après un dernier envoi des éléments restants"""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+            if self.thread is None:
+                # Tâche de l'échéancier: dernier envoi depuis l'appelant
+                Scheduler.cancel(self.task)
+                batch = self.items
+                self.items = self.buffer_factory()
+                self.deadline = None
+        if self.thread is None:
+            self._flush(batch)
+            return
+        self.thread.join(timeout=timeout)
@@ -0,0 +1,1317 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de performance pour EKOS Log Monitor
+"""
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import tempfile
+import json
+import resource
+import statistics
+import threading
+from collections import defaultdict, deque
+from typing import List, Optional
+from datetime import datetime, timedelta
+
+SAMPLE_MESSAGES = [
+    ("INFO", "org.kde.kstars.ekos.capture", '"Capturing 300.000-second Light image..."'),
+    ("INFO", "org.kde.kstars.ekos.capture", '"Received image 42 out of 120."'),
+    ("DEBG", "org.kde.kstars.ekos.guide", "Guiding deviation RA: 0.42 DE: 0.31 arcsec"),
+    ("DEBG", "org.kde.kstars.ekos.guide", "PHD2: Guide step 1532 dx=0.12 dy=-0.08"),
+    ("INFO", "org.kde.kstars.ekos.focus", '"Autofocus complete after 7 iterations. HFR 2.31"'),
+    ("WARN", "org.kde.kstars.ekos.guide", '"Guiding deviation 2.15 exceeded limit value of 2 arcsecs."'),
+    ("INFO", "org.kde.kstars.ekos.mount", '"Slewing to target coordinates RA 00:42:44 DE +41:16:09"'),
+    ("DEBG", "org.kde.kstars.indi", "INDI Server: CCD Simulator CCD_TEMPERATURE -10.00"),
+]
+
+def generate_log_line(timestamp: datetime) -> str:
+    """Générer une ligne de log au format EKOS"""
+    level, module, message = random.choice(SAMPLE_MESSAGES)
+    stamp = timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+    return f"[{stamp} CET {level} ][{module:>45}] - {message}\n"
+
+def generate_log_lines(count: int, interval_ms: int = 250) -> List[str]:
+    """Générer une liste de lignes de log synthétiques (sans saut de ligne)"""
+    timestamp = datetime(2024, 1, 15, 21, 0, 0)
+    lines = []
+    for _ in range(count):
+        timestamp += timedelta(milliseconds=interval_ms)
+        lines.append(generate_log_line(timestamp).rstrip("\n"))
+    return lines
+
+def generate_log_file(file_path: str, size_mb: float) -> int:
+    """Écrire un fichier de log synthétique de la taille demandée"""
+    target = int(size_mb * 1024 * 1024)
+    timestamp = datetime(2024, 1, 15, 21, 0, 0)
+    written = 0
+    with open(file_path, 'w', encoding='utf-8') as f:
+        while written < target:
+            block = []
+            for _ in range(1000):
+                timestamp += timedelta(milliseconds=250)
+                block.append(generate_log_line(timestamp))
+            data = "".join(block)
+            f.write(data)
+            written += len(data.encode('utf-8'))
+    return written
+
+def bench_catchup(size_mb: float):
+    """Mesurer la vitesse de rattrapage d'un arriéré depuis un checkpoint"""
+    from log_tailer import FileTailer
+    from checkpoint_store import CheckpointStore
+
+    print(f"🔍 Rattrapage d'un arriéré de {size_mb} Mo...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = os.path.join(tmp_dir, "ekos_log.txt")
+        size = generate_log_file(log_file, size_mb)
+        store = CheckpointStore(os.path.join(tmp_dir, "checkpoint.json"))
+
+        tailer = FileTailer(log_file)
+        tailer.resume_from(os.stat(log_file).st_ino, 0)
+
+        start_time = time.perf_counter()
+        lines = tailer.read_lines()
+        if lines:
+            last_line, line_end = lines[-1]
+            store.update(log_file, tailer.inode, line_end, last_line)
+        store.flush(force=True)
+        elapsed = time.perf_counter() - start_time
+
+    mb = size / (1024 * 1024)
+    print(f"  ✅ {len(lines)} lignes, {mb:.1f} Mo en {elapsed:.3f}s")
+    print(f"  📈 {mb / elapsed:.1f} Mo/s - {len(lines) / elapsed:,.0f} lignes/s")
+
+def bench_ratelimit(messages: int, limit: int, window: float):
+    """Mesurer le débit d'une rafale de messages face au rate limiting Discord"""
+    from fake_webhook import FakeWebhookServer
+    from discord_sender import DiscordSender
+
+    print(f"🔍 Rafale de {messages} messages (bucket: {limit} requêtes / {window}s)...")
+    server = FakeWebhookServer(limit=limit, window=window).start()
+    sender = DiscordSender(server.url, queue_size=messages)
+
+    start_time = time.perf_counter()
+    for i in range(messages):
+        sender.send_logs([f"Message de test {i}"])
+    sender.stop(timeout=messages * window)
+    elapsed = time.perf_counter() - start_time
+    server.stop()
+
+    delivered = len(server.received)
+    # Durée minimale imposée par le bucket: une fenêtre complète entre chaque groupe de `limit` messages
+    ideal = (math.ceil(messages / limit) - 1) * window
+    print(f"  ✅ {delivered}/{messages} messages livrés en {elapsed:.2f}s, {server.rate_limited} réponse(s) 429")
+    print(f"  📈 {delivered / elapsed:.2f} messages/s - durée minimale permise par le bucket: {ideal:.2f}s "
+          f"(efficacité {ideal / elapsed if elapsed else 1:.0%})")
+
+def bench_pack(lines_count: int, use_embeds: bool):
+    """Mesurer la densité des messages: lignes livrées par requête HTTP"""
+    from message_packer import MessagePacker
+
+    print(f"🔍 Répartition de {lines_count} lignes (embeds: {'oui' if use_embeds else 'non'})...")
+    lines = generate_log_lines(lines_count)
+
+    packer = MessagePacker(use_embeds=use_embeds)
+    start_time = time.perf_counter()
+    payloads = packer.pack(lines, "**📋 Nouveaux logs EKOS - 2024-01-15 21:00:00**\n")
+    elapsed = time.perf_counter() - start_time
+
+    characters = sum(len(line) + 1 for line in lines)
+    print(f"  ✅ {len(payloads)} requête(s) HTTP en {elapsed * 1000:.1f}ms, aucune ligne perdue")
+    print(f"  📈 {lines_count / len(payloads):.1f} lignes/requête - {characters / len(payloads):,.0f} caractères/requête")
+
+def bench_parse(lines_count: int, min_level: str):
+    """Mesurer le débit de l'étape d'analyse et de filtrage (un seul thread)"""
+    from log_parser import LogFilter
+
+    print(f"🔍 Analyse et filtrage de {lines_count} lignes (niveau minimal: {min_level})...")
+    lines = generate_log_lines(lines_count)
+
+    log_filter = LogFilter(min_level=min_level, module_deny=["org.kde.kstars.indi"],
+                           drop_patterns=[r"PHD2: Guide step"])
+    start_time = time.perf_counter()
+    for line in lines:
+        log_filter.accepts(line)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"  ✅ {log_filter.accepted} lignes transmises, {log_filter.dropped} filtrées")
+    print(f"  📈 {lines_count / elapsed:,.0f} lignes/s")
+
+def bench_dedup(log_file: Optional[str], batch_size: int, window: float):
+    """Mesurer le volume de messages économisé par la déduplication sur le rejeu d'une nuit"""
+    from deduplicator import Deduplicator
+    from log_archiver import open_log
+    from message_packer import MessagePacker
+    from log_parser import parse_line
+
+    if log_file:
+        with open_log(log_file, 'rt') as f:
+            lines = [line.strip() for line in f if line.strip()]
+        print(f"🔍 Rejeu de {log_file} ({len(lines)} lignes)...")
+    else:
+        # Nuit synthétique: rafales de répétitions typiques (déviation de guidage, erreurs INDI)
+        timestamp = datetime(2024, 1, 15, 21, 0, 0)
+        lines = []
+        for i in range(50000):
+            timestamp += timedelta(milliseconds=500)
+            line = generate_log_line(timestamp).rstrip("\n")
+            burst = 200 if i % 1000 == 0 else 1
+            lines.extend([line] * burst)
+        print(f"🔍 Rejeu d'une nuit synthétique ({len(lines)} lignes)...")
+
+    deduplicator = Deduplicator(window=window)
+    packer = MessagePacker()
+    header = "**📋 Nouveaux logs EKOS - 2024-01-15 21:00:00**\n"
+    requests_before = requests_after = lines_after = 0
+    clock = 0.0
+
+    start_time = time.perf_counter()
+    for i in range(0, len(lines), batch_size):
+        batch = lines[i:i + batch_size]
+        # Horloge simulée à partir de l'horodatage EKOS de la dernière ligne
+        stamp = parse_line(batch[-1]).timestamp
+        if stamp:
+            clock = datetime.strptime(stamp[:19], "%Y-%m-%dT%H:%M:%S").timestamp()
+        deduplicated = [line for _, line in deduplicator.process(batch, now=clock)]
+        requests_before += len(packer.pack(batch, header))
+        if deduplicated:
+            requests_after += len(packer.pack(deduplicated, header))
+        lines_after += len(deduplicated)
+    lines_after += len(deduplicator.drain())
+    elapsed = time.perf_counter() - start_time
+
+    print(f"  ✅ {len(lines)} lignes -> {lines_after} lignes ({1 - lines_after / len(lines):.1%} économisées) en {elapsed:.2f}s")
+    print(f"  📈 Requêtes HTTP: {requests_before} -> {requests_after} "
+          f"({1 - requests_after / max(requests_before, 1):.1%} économisées)")
+
+def bench_digest(log_file: Optional[str], lines_count: int, interval_min: float, batch_size: int):
+    """Coût du suivi de session par ligne et messages économisés par les résumés"""
+    from session_tracker import SessionTracker
+    from log_archiver import open_log
+
+    if log_file:
+        with open_log(log_file, 'rt') as f:
+            lines = [line.rstrip("\n") for line in f if line.strip()]
+        source = log_file
+    else:
+        lines = generate_log_lines(lines_count)
+        source = "synthétique"
+    print(f"🔍 Suivi de session sur {len(lines)} lignes ({source})...")
+
+    tracker = SessionTracker()
+    rss_start = current_rss_mb()
+    start_time = time.perf_counter()
+    for line in lines:
+        tracker.observe(line)
+    elapsed = time.perf_counter() - start_time
+    digest = tracker.digest(force=True)
+
+    # Durée couverte par le log, d'après les horodatages EKOS
+    from log_parser import parse_line
+    stamps = [parse_line(line).timestamp for line in (lines[0], lines[-1])] if lines else []
+    try:
+        night = (datetime.strptime(stamps[1][:19], "%Y-%m-%dT%H:%M:%S") - datetime.strptime(stamps[0][:19], "%Y-%m-%dT%H:%M:%S")).total_seconds()
+    except (TypeError, ValueError, IndexError):
+        night = 0.0
+
+    print(f"  ✅ {len(lines) / elapsed:,.0f} lignes/s ({elapsed / max(len(lines), 1) * 1e6:.2f} µs/ligne), "
+          f"mémoire {current_rss_mb() - rss_start:+.1f} Mo")
+    if night > 0:
+        digests = max(1, math.ceil(night / (interval_min * 60)))
+        raw_messages = math.ceil(len(lines) / batch_size)
+        print(f"  📉 {format_hours(night)} de log: {raw_messages} messages de lignes brutes (batchs de {batch_size}) "
+              f"contre {digests} résumé(s) toutes les {interval_min:g} min")
+    print("  📊 Dernier résumé:")
+    for line in digest or []:
+        print(f"     {line}")
+
+def format_hours(seconds: float) -> str:
+    return f"{int(seconds // 3600)}h{int(seconds % 3600) // 60:02d}"
+
+def bench_search(nights: int, lines_per_night: int, workers: Optional[int]):
+    """Indexation d'une archive synthétique, mise à jour incrémentale et temps de réponse des recherches"""
+    from log_search import LogSearchIndex
+
+    print(f"🔍 Archive synthétique de {nights} nuits x {lines_per_night} lignes...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = os.path.join(tmp_dir, "logs")
+        timestamp = datetime(2024, 1, 1, 21, 0, 0)
+        for night in range(nights):
+            night_dir = os.path.join(root, timestamp.strftime("%Y-%m-%d"))
+            os.makedirs(night_dir, exist_ok=True)
+            target = ("M31", "M42", "NGC 7000")[night % 3]
+            with open(os.path.join(night_dir, "log_21-00-00.txt"), 'w', encoding='utf-8') as f:
+                stamp = timestamp.strftime("%Y-%m-%dT%H:%M:%S.000")
+                f.write(f'[{stamp} CET INFO ][{"org.kde.kstars.ekos.scheduler":>45}] - "Job \'{target}\' is capturing."\n')
+                for index in range(lines_per_night):
+                    timestamp += timedelta(milliseconds=250)
+                    f.write(generate_log_line(timestamp))
+                    if index % 2000 == 0:
+                        stamp = timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+                        f.write(f'[{stamp} CET WARN ][{"org.kde.kstars.ekos.guide":>45}] - "Guiding aborted."\n')
+            timestamp = datetime.combine(timestamp.date() + timedelta(days=1), datetime.min.time()).replace(hour=21)
+
+        search_index = LogSearchIndex(os.path.join(tmp_dir, "index.sqlite"))
+        stats = search_index.update(root, workers=workers)
+        print(f"  ✅ Indexation: {stats['lines']} lignes en {stats['duration_s']:.2f}s "
+              f"({stats['lines'] / stats['duration_s']:,.0f} lignes/s), index {search_index.stats()['size_mb']} Mo")
+
+        stats = search_index.update(root, workers=workers)
+        print(f"  ♻️  Mise à jour sans changement: {stats['duration_s'] * 1000:.1f} ms ({stats['unchanged']} fichiers inchangés)")
+
+        queries = [
+            ("échecs de guidage sur M31", dict(query='guiding AND aborted', target='M31')),
+            ("échecs de guidage du dernier mois de l'archive", dict(query='"guiding aborted"', since=(timestamp - timedelta(days=30)).strftime("%Y-%m-%d"))),
+            ("warnings du module guide", dict(min_level='WARN', module='guide', limit=50)),
+            ("terme fréquent (autofocus)", dict(query='autofocus', limit=100)),
+        ]
+        for label, query in queries:
+            start_time = time.perf_counter()
+            results = search_index.search(**query)
+            print(f"  🔎 {label}: {len(results)} résultat(s) en {(time.perf_counter() - start_time) * 1000:.1f} ms")
+        search_index.close()
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Percentile par rang le plus proche"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(fraction * len(ordered))) - 1)]
+
+def current_rss_mb() -> float:
+    """RSS courant du processus (Linux), en Mo"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return 0.0
+
+def payload_lines(payload: dict) -> List[str]:
+    """Extraire les lignes de log d'un payload webhook reçu"""
+    texts = [payload.get("content", "")] + [e.get("description", "") for e in payload.get("embeds", [])]
+    return [line for text in texts for line in text.split("\n") if line and not line.startswith("**")]
+
+def bench_replay(log_file: Optional[str], speed: float, max_lines: int, batch_size: int,
+                 batch_timeout: float, discord_limits: bool, json_output: Optional[str]) -> dict:
+    """Rejouer un log EKOS dans un répertoire temporaire à travers tout le pipeline"""
+    from fake_webhook import FakeWebhookServer
+    from discord_sender import DiscordSender
+    from log_archiver import open_log
+    from log_monitor import LogMonitor
+    from log_parser import parse_line
+
+    if log_file:
+        with open_log(log_file, 'rt') as f:
+            lines = [line.strip() for line in f if line.strip()][:max_lines]
+        source = log_file
+    else:
+        lines = generate_log_lines(max_lines)
+        source = "synthétique"
+    print(f"🔍 Rejeu de {len(lines)} lignes ({source}) à la vitesse {'max' if speed <= 0 else f'x{speed:g}'}...")
+
+    # Instant cible de chaque ligne, d'après son horodatage EKOS
+    offsets = []
+    first_stamp = None
+    for line in lines:
+        stamp = parse_line(line).timestamp
+        moment = datetime.strptime(stamp[:23], "%Y-%m-%dT%H:%M:%S.%f").timestamp() if stamp and len(stamp) >= 23 else None
+        if moment is not None and first_stamp is None:
+            first_stamp = moment
+        offsets.append((moment - first_stamp) if moment is not None else (offsets[-1] if offsets else 0.0))
+
+    server = FakeWebhookServer(limit=5 if discord_limits else 100000, window=2.0 if discord_limits else 1.0).start()
+    write_times = defaultdict(deque)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        night_dir = os.path.join(tmp_dir, "2024-01-15")
+        os.makedirs(night_dir)
+        replay_file = os.path.join(night_dir, "log_21-00-00.txt")
+        open(replay_file, 'w').close()
+
+        sender = DiscordSender(server.url, queue_size=10000)
+        monitor = LogMonitor(tmp_dir, sender, batch_size=batch_size, batch_timeout=batch_timeout)
+        usage_start = resource.getrusage(resource.RUSAGE_SELF)
+        start_time = time.perf_counter()
+        monitor.start()
+
+        with open(replay_file, 'a', encoding='utf-8') as f:
+            for line, offset in zip(lines, offsets):
+                if speed > 0:
+                    delay = offset / speed - (time.perf_counter() - start_time)
+                    if delay > 0:
+                        f.flush()
+                        time.sleep(delay)
+                write_times[line].append(time.time())
+                f.write(line + "\n")
+                if speed > 0:
+                    f.flush()
+        write_done = time.perf_counter()
+
+        # Attendre la réception de toutes les lignes (ou l'expiration du délai)
+        deadline = time.time() + max(30.0, batch_timeout * 4)
+        latencies = []
+        received_lines = 0
+        seen_requests = 0
+        while time.time() < deadline:
+            with server.lock:
+                received = list(server.received[seen_requests:])
+            seen_requests += len(received)
+            for request in received:
+                for line in payload_lines(json.loads(request["body"])):
+                    if write_times[line]:
+                        latencies.append(request["time"] - write_times[line].popleft())
+                        received_lines += 1
+            if received_lines >= len(lines):
+                break
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start_time
+
+        monitor.stop()
+        sender.stop()
+        usage_end = resource.getrusage(resource.RUSAGE_SELF)
+        server.stop()
+
+    cpu = (usage_end.ru_utime - usage_start.ru_utime) + (usage_end.ru_stime - usage_start.ru_stime)
+    results = {
+        "source": source,
+        "speed": speed,
+        "lines": len(lines),
+        "lines_received": received_lines,
+        "duration_s": round(elapsed, 3),
+        "write_duration_s": round(write_done - start_time, 3),
+        "lines_per_s": round(received_lines / elapsed, 1) if elapsed else None,
+        "latency_s": {
+            "p50": percentile(latencies, 0.50),
+            "p90": percentile(latencies, 0.90),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies) if latencies else None,
+        },
+        "cpu_s": round(cpu, 3),
+        "cpu_percent": round(100 * cpu / elapsed, 1) if elapsed else None,
+        "rss_mb": round(current_rss_mb(), 1),
+        "peak_rss_mb": round(usage_end.ru_maxrss / 1024, 1),
+        "http_requests": seen_requests,
+        "http_requests_per_line": round(seen_requests / max(received_lines, 1), 4),
+        "rate_limited": server.rate_limited,
+    }
+
+    latency = results["latency_s"]
+    print(f"  ✅ {received_lines}/{len(lines)} lignes reçues en {elapsed:.2f}s ({results['lines_per_s']} lignes/s)")
+    if latencies:
+        print(f"  ⏱️  Latence écriture -> webhook: p50 {latency['p50']:.3f}s, p90 {latency['p90']:.3f}s, "
+              f"p99 {latency['p99']:.3f}s, max {latency['max']:.3f}s")
+    print(f"  🖥️  CPU {results['cpu_percent']}%, RSS {results['rss_mb']} Mo (pic {results['peak_rss_mb']} Mo)")
+    print(f"  📈 {seen_requests} requêtes HTTP, {results['http_requests_per_line']} requête/ligne")
+
+    if json_output:
+        with open(json_output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"  💾 Résultats écrits dans {json_output}")
+    return results
+
+def bench_lanes(duration: float, rate: float, critical_every: float, batch_size: int, batch_timeout: float,
+                critical_target: float, normal_target: Optional[float], json_output: Optional[str]) -> dict:
+    """Latence de chaque voie (critique / normale) sous un flux continu, avec le rate limit de Discord"""
+    from fake_webhook import FakeWebhookServer
+    from discord_sender import DiscordSender
+    from log_monitor import LogMonitor
+    from alert_rules import AlertClassifier
+
+    normal_target = normal_target if normal_target is not None else batch_timeout + 5.0
+    print(f"🔍 Flux de {rate:g} lignes/s pendant {duration:g}s, une alerte critique toutes les {critical_every:g}s "
+          f"(batch {batch_size} / {batch_timeout:g}s, rate limit Discord)...")
+
+    server = FakeWebhookServer(limit=5, window=2.0).start()
+    classifier = AlertClassifier()
+    write_times = defaultdict(deque)
+    lanes = {}
+    critical_count = 0
+    normal_count = 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        night_dir = os.path.join(tmp_dir, "2024-01-15")
+        os.makedirs(night_dir)
+        log_file = os.path.join(night_dir, "log_21-00-00.txt")
+        open(log_file, 'w').close()
+
+        sender = DiscordSender(server.url, queue_size=10000)
+        monitor = LogMonitor(tmp_dir, sender, batch_size=batch_size, batch_timeout=batch_timeout,
+                             classifier=classifier, critical_latency_target=critical_target,
+                             normal_latency_target=normal_target)
+        monitor.start()
+
+        timestamp = datetime(2024, 1, 15, 21, 0, 0)
+        start_time = time.perf_counter()
+        next_critical = critical_every
+        written = 0
+        with open(log_file, 'a', encoding='utf-8') as f:
+            while True:
+                elapsed = time.perf_counter() - start_time
+                if elapsed >= duration:
+                    break
+                timestamp += timedelta(milliseconds=1)
+                if elapsed >= next_critical:
+                    next_critical += critical_every
+                    stamp = timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+                    line = f'[{stamp} CET INFO ][{"org.kde.kstars.ekos.guide":>45}] - "Guiding aborted."'
+                    critical_count += 1
+                else:
+                    line = generate_log_line(timestamp).rstrip("\n")
+                    normal_count += 1
+                write_times[line].append(time.time())
+                f.write(line + "\n")
+                f.flush()
+                written += 1
+                delay = written / rate - (time.perf_counter() - start_time)
+                if delay > 0:
+                    time.sleep(delay)
+
+        # Attendre la réception de toutes les lignes
+        latencies = {'critical': [], 'normal': []}
+        deadline = time.time() + normal_target * 2 + 10
+        seen_requests = 0
+        while time.time() < deadline:
+            with server.lock:
+                received = list(server.received[seen_requests:])
+            seen_requests += len(received)
+            for request in received:
+                for line in payload_lines(json.loads(request["body"])):
+                    if write_times[line]:
+                        lane = 'critical' if classifier.classify(line) == 'critical' else 'normal'
+                        latencies[lane].append(request["time"] - write_times[line].popleft())
+            if sum(len(values) for values in latencies.values()) >= written:
+                break
+            time.sleep(0.05)
+
+        monitor.stop()
+        sender.stop()
+        server.stop()
+
+    all_passed = True
+    for lane, target, expected in (('critical', critical_target, critical_count), ('normal', normal_target, normal_count)):
+        values = latencies[lane]
+        p99 = percentile(values, 0.99)
+        passed = len(values) == expected and p99 is not None and p99 <= target
+        all_passed = all_passed and passed
+        lanes[lane] = {
+            "lines": expected,
+            "lines_received": len(values),
+            "target_s": target,
+            "p50": percentile(values, 0.50),
+            "p99": p99,
+            "max": max(values) if values else None,
+            "passed": passed,
+        }
+        if values:
+            print(f"  {'✅' if passed else '❌'} Voie {lane}: {len(values)}/{expected} lignes, p50 {lanes[lane]['p50']:.3f}s, "
+                  f"p99 {p99:.3f}s, max {lanes[lane]['max']:.3f}s (objectif {target:g}s)")
+        else:
+            print(f"  ❌ Voie {lane}: aucune ligne reçue sur {expected}")
+
+    results = {"duration_s": duration, "rate": rate, "lanes": lanes, "http_requests": seen_requests,
+               "rate_limited": server.rate_limited, "passed": all_passed}
+    print(f"  📈 {seen_requests} requêtes HTTP, {server.rate_limited} réponse(s) 429")
+    if json_output:
+        with open(json_output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"  💾 Résultats écrits dans {json_output}")
+    return results
+
+def bench_startup(runs: int, webhook: str, backlog_mb: float, json_output: Optional[str]) -> dict:
+    """Démarrage à froid de main.py: délai entre le lancement du processus et la première ligne suivie
+
+    Une ligne sonde est ajoutée toutes les 10 ms au log courant; la mesure s'arrête à
+    l'arrivée de la première dans le sink fichier, indépendant de l'état du webhook.
+    """
+    import signal
+    import subprocess
+    from fake_webhook import FakeWebhookServer
+    from checkpoint_store import CheckpointStore
+
+    main_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    server = None
+    if webhook == 'ok':
+        server = FakeWebhookServer().start()
+    elif webhook == 'slow':
+        server = FakeWebhookServer(latency=10.0).start()
+    if server is not None:
+        webhook_url = server.url
+    else:
+        # Port local fermé: chaque envoi échoue
+        webhook_url = "http://127.0.0.1:9/webhook"
+
+    print(f"🔍 {runs} démarrage(s) à froid de main.py (webhook {webhook}"
+          f"{f', {backlog_mb:g} Mo à rattraper' if backlog_mb else ''})...")
+    import_times, first_line_times = [], []
+    for run in range(runs):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            night_dir = os.path.join(tmp_dir, "logs", "2024-01-15")
+            os.makedirs(night_dir)
+            if backlog_mb:
+                # Fichier précédent livré jusqu'à l'offset 0: tout est à rattraper au démarrage.
+                # Lignes DEBG, écartées par le filtre du sink fichier: seule la sonde y est mesurée
+                previous_file = os.path.join(night_dir, "log_20-00-00.txt")
+                line = f"[2024-01-15T20:00:00.000 CET DEBG ][{'org.kde.kstars.ekos.guide':>45}] - Guiding deviation RA: 0.42 DE: 0.31 arcsec\n"
+                with open(previous_file, 'w', encoding='utf-8') as f:
+                    f.write(line * int(backlog_mb * 1024 * 1024 / len(line)))
+                store = CheckpointStore(os.path.join(tmp_dir, "checkpoint.json"))
+                store.update(previous_file, os.stat(previous_file).st_ino, 0)
+                store.close()
+                os.utime(previous_file, (time.time() - 60, time.time() - 60))
+            log_file = os.path.join(night_dir, "log_21-00-00.txt")
+            with open(log_file, 'w', encoding='utf-8') as f:
+                f.write(generate_log_line(datetime.now()))
+            sink_file = os.path.join(tmp_dir, "sink.jsonl")
+
+            env = dict(os.environ,
+                       DISCORD_WEBHOOK_URL=webhook_url,
+                       EKOS_LOGS_DIRECTORY=os.path.join(tmp_dir, "logs"),
+                       CHECKPOINT_FILE=os.path.join(tmp_dir, "checkpoint.json"),
+                       SPOOL_DIRECTORY=os.path.join(tmp_dir, "spool"),
+                       SINK_FILE_PATH=sink_file, SINK_FILE_BATCH_SIZE="1", SINK_FILE_BATCH_TIMEOUT="0.01",
+                       SINK_FILE_MIN_LEVEL="INFO",
+                       SINK_WEBHOOK_URL="", SINK_MQTT_HOST="", METRICS_PORT="0",
+                       CONFIG_WATCH_INTERVAL="0", ARCHIVE_COMPRESSION="", DIGEST_INTERVAL="0")
+
+            # Import seul des modules, dans un processus neuf; lancé depuis le répertoire temporaire
+            # (main crée ekos_monitor.log dans le répertoire courant dès l'import)
+            repo_dir = os.path.dirname(main_script)
+            probe_env = dict(env, PYTHONPATH=os.pathsep.join(filter(None, [repo_dir, env.get("PYTHONPATH")])))
+            probe = subprocess.run([sys.executable, "-c", "import time; t = time.perf_counter(); import main; "
+                                    "print(time.perf_counter() - t)"], cwd=tmp_dir,
+                                   env=probe_env, capture_output=True, text=True)
+            if probe.returncode == 0:
+                import_times.append(float(probe.stdout.strip().splitlines()[-1]))
+
+            start_time = time.perf_counter()
+            process = subprocess.Popen([sys.executable, main_script], cwd=tmp_dir, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            first_line = None
+            with open(log_file, 'a', encoding='utf-8') as f:
+                index = 0
+                while time.perf_counter() - start_time < 30 and process.poll() is None:
+                    stamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+                    f.write(f"[{stamp} CET INFO ][{'org.kde.kstars.ekos.capture':>45}] - startup-probe {index}\n")
+                    f.flush()
+                    index += 1
+                    time.sleep(0.01)
+                    if os.path.exists(sink_file):
+                        with open(sink_file, 'r', encoding='utf-8') as sink:
+                            if "startup-probe" in sink.read():
+                                first_line = time.perf_counter() - start_time
+                                break
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            if first_line is None:
+                print(f"  ❌ Démarrage {run + 1}: aucune ligne suivie en 30s")
+                continue
+            first_line_times.append(first_line)
+            print(f"  ⏱️  Démarrage {run + 1}: première ligne suivie après {first_line * 1000:.0f} ms")
+
+    if server is not None:
+        server.stop()
+    results = {
+        "webhook": webhook,
+        "backlog_mb": backlog_mb,
+        "import_ms": round(statistics.median(import_times) * 1000, 1) if import_times else None,
+        "first_line_ms": {
+            "median": round(statistics.median(first_line_times) * 1000, 1) if first_line_times else None,
+            "min": round(min(first_line_times) * 1000, 1) if first_line_times else None,
+            "max": round(max(first_line_times) * 1000, 1) if first_line_times else None,
+        },
+    }
+    if import_times:
+        print(f"  📦 Import des modules: {results['import_ms']} ms (médiane)")
+    if first_line_times:
+        print(f"  ✅ Lancement -> première ligne suivie: médiane {results['first_line_ms']['median']} ms "
+              f"(min {results['first_line_ms']['min']}, max {results['first_line_ms']['max']})")
+    if json_output:
+        with open(json_output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"  💾 Résultats écrits dans {json_output}")
+    return results
+
+def serve_counting_webhook(urls, lines, stop):
+    """Faux webhook lancé dans un processus à part: compte les lignes reçues dans `lines` (valeur partagée)"""
+    from fake_webhook import FakeWebhookServer
+
+    server = FakeWebhookServer(limit=100000, window=1.0).start()
+    urls.put(server.url)
+    while not stop.wait(0.2):
+        # Requêtes comptées puis oubliées
+        with server.lock:
+            received = server.received[:]
+            server.received.clear()
+        count = sum(len(payload_lines(json.loads(request["body"]))) for request in received)
+        with lines.get_lock():
+            lines.value += count
+    server.stop()
+
+def bench_outage(size_mb: float, buffer_mb: float, policy: str, recover_timeout: float,
+                 json_output: Optional[str]) -> dict:
+    """Panne du webhook pendant l'écriture de `size_mb` Mo de logs: pic de RSS, puis reprise
+
+    Sans spool, les lignes lues restent en mémoire jusqu'au retour du webhook:
+    le pic de RSS au-dessus de la mesure de départ ne doit pas dépasser la limite
+    configurée (`buffer_mb`). La mesure de départ est prise une fois le moniteur
+    démarré et requests importé (import différé au premier envoi, ~14 Mo). Le faux
+    webhook tourne dans un autre processus: ses requêtes ne comptent pas dans le RSS.
+    """
+    import multiprocessing
+    import requests  # Importé avant la mesure de départ
+    from discord_sender import DiscordSender
+    from log_monitor import LogMonitor
+    from alert_rules import AlertClassifier
+
+    print(f"🔍 Panne du webhook pendant l'écriture de {size_mb:g} Mo de logs "
+          f"(limite {buffer_mb:g} Mo, politique {policy})...")
+    # Port local fermé: chaque envoi échoue immédiatement, sans nouvelle tentative
+    sender = DiscordSender("http://127.0.0.1:9/webhook", max_retries=0, queue_size=100)
+    samples = []
+    sampling = threading.Event()
+    context = multiprocessing.get_context('spawn')
+    urls, received_lines, server_stop = context.Queue(), context.Value('q', 0), context.Event()
+    server = context.Process(target=serve_counting_webhook, args=(urls, received_lines, server_stop), daemon=True)
+    server.start()
+    server_url = urls.get(timeout=30)
+
+    def sample_rss():
+        while not sampling.wait(0.02):
+            samples.append(current_rss_mb())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        night_dir = os.path.join(tmp_dir, "2024-01-15")
+        os.makedirs(night_dir)
+        log_file = os.path.join(night_dir, "log_21-00-00.txt")
+        open(log_file, 'w').close()
+        monitor = LogMonitor(tmp_dir, sender, batch_size=100, batch_timeout=1.0, tail_mode='events',
+                             classifier=AlertClassifier(), buffer_max_bytes=int(buffer_mb * 1024 * 1024),
+                             overflow_policy=policy)
+        pool = monitor.handler.buffer_pool
+        monitor.start()
+        # Premier envoi (échoué): threads et session HTTP en place avant la mesure de départ
+        sender.send_logs(["Démarrage du benchmark de panne"])
+        time.sleep(1.0)
+        base_rss = current_rss_mb()
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+
+        # Écriture par petits blocs: l'écrivain ne compte presque pas dans le RSS mesuré
+        timestamp = datetime(2024, 1, 15, 21, 0, 0)
+        written_bytes = written_lines = 0
+        start_time = time.perf_counter()
+        with open(log_file, 'a', encoding='utf-8') as f:
+            while written_bytes < size_mb * 1024 * 1024:
+                block = []
+                for _ in range(200):
+                    timestamp += timedelta(milliseconds=250)
+                    block.append(generate_log_line(timestamp))
+                text = "".join(block)
+                f.write(text)
+                f.flush()
+                written_bytes += len(text)
+                written_lines += len(block)
+        time.sleep(5)
+        outage_peak = max(samples, default=base_rss)
+        buffered_mb = pool.used / (1024 * 1024)
+        print(f"  📝 {written_lines} lignes ({written_bytes / (1024 * 1024):.1f} Mo) écrites en "
+              f"{time.perf_counter() - start_time:.1f}s, webhook injoignable")
+        print(f"  🧠 RSS: {base_rss:.1f} Mo au départ, pic {outage_peak:.1f} Mo (+{outage_peak - base_rss:.1f} Mo), "
+              f"{buffered_mb:.1f} Mo de lignes en mémoire, {pool.dropped} rejetée(s)")
+
+        # Retour du webhook: les lignes en mémoire, puis celles restées dans le fichier
+        sender.webhook_url = server_url
+        deadline = time.time() + recover_timeout
+        while time.time() < deadline and received_lines.value + pool.dropped < written_lines:
+            time.sleep(0.2)
+        peak = max(samples, default=base_rss)
+        sampling.set()
+        monitor.stop()
+        sender.stop()
+        server_stop.set()
+        server.join(10)
+        received = received_lines.value
+
+    results = {
+        "size_mb": size_mb,
+        "buffer_mb": buffer_mb,
+        "policy": policy,
+        "lines_written": written_lines,
+        "lines_received": received,
+        "lines_dropped": pool.dropped,
+        "base_rss_mb": round(base_rss, 1),
+        "outage_peak_rss_mb": round(outage_peak, 1),
+        "peak_rss_mb": round(peak, 1),
+        "peak_rss_increase_mb": round(peak - base_rss, 1),
+        "passed": peak - base_rss <= buffer_mb and received + pool.dropped >= written_lines,
+    }
+    print(f"  {'✅' if results['passed'] else '❌'} Après la panne: {received}/{written_lines} lignes reçues, "
+          f"{pool.dropped} rejetée(s), pic de RSS +{results['peak_rss_increase_mb']} Mo (limite {buffer_mb:g} Mo)")
+    if json_output:
+        with open(json_output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"  💾 Résultats écrits dans {json_output}")
+    return results
+
+def fits_card(keyword: str, value) -> str:
+    """Carte FITS de 80 caractères"""
+    if isinstance(value, bool):
+        text = f"{'T' if value else 'F':>20}"
+    elif isinstance(value, str):
+        text = "'" + value.replace("'", "''").ljust(8) + "'"
+    else:
+        text = f"{value:>20}"
+    return f"{keyword:<8}= {text}"[:80].ljust(80)
+
+def write_synthetic_fits(file_path: str, width: int, height: int, stars: int = 300, bayer: bool = False,
+                         seed: int = 0, header: Optional[dict] = None) -> int:
+    """Écrire une pose FITS 16 bits synthétique (fond, gradient, bruit, étoiles); retourne sa taille"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    rows = np.arange(height, dtype=np.float32)[:, None]
+    image = 1000.0 + 200.0 * rows / height + rng.normal(0.0, 20.0, (height, width)).astype(np.float32)
+    # Étoiles gaussiennes, chacune ajoutée sur une vignette de 15x15 pixels
+    offsets = np.arange(-7, 8, dtype=np.float32)
+    for x, y, flux, sigma in zip(rng.integers(8, width - 8, stars), rng.integers(8, height - 8, stars),
+                                 rng.pareto(1.5, stars) * 2000.0 + 500.0, rng.uniform(1.2, 2.5, stars)):
+        psf = np.exp(-(offsets[:, None] ** 2 + offsets[None, :] ** 2) / (2 * sigma * sigma))
+        image[y - 7:y + 8, x - 7:x + 8] += flux * psf
+    if bayer:
+        # Matrice RGGB: le vert plus sensible que le rouge et le bleu
+        image[0::2, 0::2] *= 0.6
+        image[1::2, 1::2] *= 0.5
+    data = (np.clip(image, 0, 65535).astype(np.int32) - 32768).astype('>i2')
+
+    cards = [fits_card("SIMPLE", True), fits_card("BITPIX", 16), fits_card("NAXIS", 2),
+             fits_card("NAXIS1", width), fits_card("NAXIS2", height), fits_card("BZERO", 32768),
+             fits_card("BSCALE", 1)]
+    if bayer:
+        cards.append(fits_card("BAYERPAT", "RGGB"))
+    cards += [fits_card(key, value) for key, value in (header or {}).items()]
+    cards.append("END".ljust(80))
+    text = "".join(cards)
+    with open(file_path, 'wb') as f:
+        f.write(text.ljust(-(-len(text) // 2880) * 2880).encode('ascii'))
+        raw = data.tobytes()
+        f.write(raw)
+        f.write(b"\0" * (-len(raw) % 2880))
+    return os.path.getsize(file_path)
+
+def bench_thumbnails(frames: int, width: int, height: int, max_size: int, duration: float, rate: float,
+                     capture_every: float, json_output: Optional[str]) -> dict:
+    """Aperçus des poses: coût d'un rendu, puis latence des lignes avec et sans aperçus (faux webhook)"""
+    from fake_webhook import FakeWebhookServer, parse_body
+    from discord_sender import DiscordSender
+    from log_monitor import LogMonitor
+    from thumbnails import ThumbnailService, render_preview
+
+    print(f"🔍 Aperçus de {frames} poses FITS synthétiques {width}x{height} (aperçu {max_size}px)...")
+    results = {"frames": frames, "width": width, "height": height, "max_size": max_size}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        image_dir = os.path.join(tmp_dir, "images")
+        os.makedirs(image_dir)
+        paths = []
+        for index in range(frames):
+            path = os.path.join(image_dir, f"Light_M31_300s_{index + 1:04d}.fits")
+            size = write_synthetic_fits(path, width, height, bayer=index % 2 == 1, seed=index,
+                                        header={"OBJECT": "M31", "FILTER": "L", "EXPTIME": 300.0, "IMAGETYP": "Light"})
+            paths.append(path)
+        print(f"  📝 {frames} fichiers de {size / (1024 * 1024):.1f} Mo")
+
+        # Rendu seul, dans ce processus (fichier déjà en cache disque)
+        timings = []
+        for path in paths:
+            preview = render_preview(path, max_size)
+            timings.append(preview["render_s"])
+        png = preview["data"]
+        valid = png.startswith(b'\x89PNG\r\n\x1a\n')
+        results["render_s"] = {"median": round(statistics.median(timings), 3), "max": round(max(timings), 3)}
+        results["png_kb"] = round(len(png) / 1024, 1)
+        print(f"  🖼️  Rendu: médiane {results['render_s']['median'] * 1000:.0f} ms, max {results['render_s']['max'] * 1000:.0f} ms, "
+              f"PNG {results['png_kb']} Ko ({'valide' if valid else 'INVALIDE'})")
+
+        # Flux de lignes avec une pose enregistrée toutes les `capture_every` secondes
+        for enabled in (False, True):
+            for path in paths:
+                os.utime(path)  # Poses récentes, comme pendant une nuit
+            server = FakeWebhookServer(limit=100000, window=1.0).start()
+            sender = DiscordSender(server.url, queue_size=1000)
+            thumbnailer = ThumbnailService(sender.send_image, max_size=max_size, min_interval=0.0) if enabled else None
+            night_dir = os.path.join(tmp_dir, f"night-{int(enabled)}")
+            os.makedirs(night_dir)
+            log_file = os.path.join(night_dir, "log_21-00-00.txt")
+            open(log_file, 'w').close()
+            monitor = LogMonitor(night_dir, sender, batch_size=10, batch_timeout=1.0, tail_mode='events',
+                                 thumbnailer=thumbnailer)
+            monitor.start()
+
+            write_times = defaultdict(deque)
+            capture_times = {}
+            timestamp = datetime(2024, 1, 15, 21, 0, 0)
+            start_time = time.perf_counter()
+            next_capture = capture_every
+            written = 0
+            with open(log_file, 'a', encoding='utf-8') as f:
+                while time.perf_counter() - start_time < duration:
+                    timestamp += timedelta(milliseconds=250)
+                    elapsed = time.perf_counter() - start_time
+                    if elapsed >= next_capture and len(capture_times) < len(paths):
+                        path = paths[len(capture_times)]
+                        stamp = timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+                        line = f'[{stamp} CET INFO ][{"org.kde.kstars.ekos.capture":>45}] - "Image saved to {path}"'
+                        capture_times[os.path.splitext(os.path.basename(path))[0] + '.png'] = time.time()
+                        next_capture += capture_every
+                    else:
+                        line = generate_log_line(timestamp).rstrip("\n")
+                    write_times[line].append(time.time())
+                    f.write(line + "\n")
+                    f.flush()
+                    written += 1
+                    time.sleep(max(0.0, written / rate - (time.perf_counter() - start_time)))
+
+            deadline = time.time() + 30
+            while time.time() < deadline:
+                received = sum(len(payload_lines(payload)) for payload in server.payloads())
+                if received >= written and (not enabled or len(server.attachments()) >= len(capture_times)):
+                    break
+                time.sleep(0.2)
+            latencies = []
+            for request in server.received:
+                payload = parse_body(request["content_type"], request["body"])[0] or {}
+                for line in payload_lines(payload):
+                    if write_times[line]:
+                        latencies.append(request["time"] - write_times[line].popleft())
+            attachments = server.attachments()
+            monitor.stop()
+            sender.stop()
+            server.stop()
+
+            key = "with_thumbnails" if enabled else "without_thumbnails"
+            results[key] = {
+                "lines": written,
+                "lines_received": len(latencies),
+                "latency_p50_s": percentile(latencies, 0.50),
+                "latency_p99_s": percentile(latencies, 0.99),
+                "attachments": len(attachments),
+                "attachment_delay_s": [round(at - capture_times[name], 3) for at, name, _ in attachments if name in capture_times],
+            }
+            stats = results[key]
+            print(f"  {'🖼️ ' if enabled else '📄'} {'Avec' if enabled else 'Sans'} aperçus: {stats['lines_received']}/{written} lignes, "
+                  f"latence p50 {stats['latency_p50_s'] or 0:.3f}s, p99 {stats['latency_p99_s'] or 0:.3f}s"
+                  + (f", {len(attachments)}/{len(capture_times)} aperçus reçus en "
+                     f"{', '.join(f'{delay:.2f}s' for delay in stats['attachment_delay_s'])}" if enabled else ""))
+
+    if json_output:
+        with open(json_output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"  💾 Résultats écrits dans {json_output}")
+    return results
+
+def process_usage(pid: int) -> dict:
+    """Mémoire (PSS, sinon RSS), threads et temps CPU d'un processus (Linux)"""
+    usage = {"memory_mb": 0.0, "threads": 0, "cpu_s": 0.0}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    usage["threads"] = int(line.split()[1])
+                elif line.startswith('VmRSS:'):
+                    usage["memory_mb"] = int(line.split()[1]) / 1024
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    # Pages partagées entre processus comptées une seule fois au total
+                    usage["memory_mb"] = int(line.split()[1]) / 1024
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+            usage["cpu_s"] = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        pass
+    return usage
+
+def bench_profiles(count: int, duration: float, rate: float, noisy_rate: float, json_output: Optional[str]) -> dict:
+    """Plusieurs observatoires: un processus main.py par profil, puis un seul processus avec PROFILES
+
+    Chaque profil a son répertoire de logs et son faux webhook (bucket de 5 requêtes / 2s).
+    Le premier profil est bavard: ses envois sont freinés par le rate limit, la latence des
+    autres profils montre l'équité de l'envoi partagé.
+    """
+    import re
+    import signal
+    import subprocess
+    from fake_webhook import FakeWebhookServer, parse_body
+
+    main_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    names = [f"rig{index}" for index in range(count)]
+    common_env = dict(os.environ, BATCH_SIZE="20", BATCH_TIMEOUT="0.3", LANE_TARGET_NORMAL="5",
+                      SINK_FILE_PATH="", SINK_WEBHOOK_URL="", SINK_MQTT_HOST="", METRICS_PORT="0",
+                      CONFIG_WATCH_INTERVAL="0", ARCHIVE_COMPRESSION="", DIGEST_INTERVAL="0", THUMBNAILS="false", DEDUP_WINDOW="0",
+                      PROFILES="")
+    probe_pattern = re.compile(r'probe (\d+) (\d+)')
+
+    print(f"🔍 {count} observatoires: {rate:g} lignes/s chacun, {noisy_rate:g} lignes/s pour {names[0]}, {duration:g}s...")
+    results = {"profiles": count, "duration_s": duration, "rate": rate, "noisy_rate": noisy_rate}
+    for mode in ("separate", "shared"):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            servers = [FakeWebhookServer().start() for _ in names]
+            log_files = []
+            for name in names:
+                night_dir = os.path.join(tmp_dir, name, "logs", "2024-01-15")
+                os.makedirs(night_dir)
+                log_files.append(os.path.join(night_dir, "log_21-00-00.txt"))
+                with open(log_files[-1], 'w', encoding='utf-8') as f:
+                    f.write(generate_log_line(datetime.now()))
+
+            processes = []
+            if mode == "separate":
+                for name, server in zip(names, servers):
+                    env = dict(common_env, DISCORD_WEBHOOK_URL=server.url,
+                               EKOS_LOGS_DIRECTORY=os.path.join(tmp_dir, name, "logs"))
+                    processes.append(subprocess.Popen([sys.executable, main_script], cwd=os.path.join(tmp_dir, name), env=env,
+                                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            else:
+                env = dict(common_env, PROFILES=",".join(names))
+                for name, server in zip(names, servers):
+                    env[f"PROFILE_{name.upper()}_DISCORD_WEBHOOK_URL"] = server.url
+                    env[f"PROFILE_{name.upper()}_EKOS_LOGS_DIRECTORY"] = os.path.join(tmp_dir, name, "logs")
+                processes.append(subprocess.Popen([sys.executable, main_script], cwd=tmp_dir, env=env,
+                                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+
+            # Démarrage terminé: chaque webhook a reçu son message de démarrage
+            start_time = time.perf_counter()
+            while time.perf_counter() - start_time < 120 and not all(server.received for server in servers):
+                time.sleep(0.2)
+            startup_s = time.perf_counter() - start_time
+            cpu_before = sum(process_usage(process.pid)["cpu_s"] for process in processes)
+
+            # Flux de lignes: `rate` lignes/s par profil, `noisy_rate` pour le premier
+            write_times = {}
+            handles = [open(path, 'a', encoding='utf-8') for path in log_files]
+            samples = []
+            written = [0] * count
+            start_time = time.perf_counter()
+            next_sample = 0.0
+            while True:
+                elapsed = time.perf_counter() - start_time
+                if elapsed >= duration:
+                    break
+                for index, f in enumerate(handles):
+                    target = int(elapsed * (noisy_rate if index == 0 else rate))
+                    while written[index] < target:
+                        stamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+                        f.write(f"[{stamp} CET INFO ][{'org.kde.kstars.ekos.capture':>45}] - probe {index} {written[index]}\n")
+                        write_times[(index, written[index])] = time.time()
+                        written[index] += 1
+                    f.flush()
+                if elapsed >= next_sample:
+                    usages = [process_usage(process.pid) for process in processes]
+                    samples.append((sum(u["memory_mb"] for u in usages), sum(u["threads"] for u in usages)))
+                    next_sample += 1.0
+                time.sleep(0.02)
+            for f in handles:
+                f.close()
+            cpu_s = sum(process_usage(process.pid)["cpu_s"] for process in processes) - cpu_before
+
+            # Livraison des profils calmes (le profil bavard reste limité par son bucket)
+            deadline = time.time() + 30
+            while time.time() < deadline:
+                received = sum(len(server.received) for server in servers[1:])
+                time.sleep(2)
+                if sum(len(server.received) for server in servers[1:]) == received:
+                    break
+
+            for process in processes:
+                process.send_signal(signal.SIGTERM)
+            for process in processes:
+                try:
+                    process.wait(timeout=60)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+            latencies = defaultdict(list)
+            for index, server in enumerate(servers):
+                for request in server.received:
+                    payload = parse_body(request["content_type"], request["body"])[0] or {}
+                    for line in payload_lines(payload):
+                        match = probe_pattern.search(line)
+                        if match and (int(match.group(1)), int(match.group(2))) in write_times:
+                            latencies[index].append(request["time"] - write_times[(int(match.group(1)), int(match.group(2)))])
+                server.stop()
+
+            quiet = [latency for index in range(1, count) for latency in latencies[index]]
+            quiet_medians = [statistics.median(latencies[index]) for index in range(1, count) if latencies[index]]
+            results[mode] = {
+                "processes": len(processes),
+                "startup_s": round(startup_s, 2),
+                "memory_mb": round(max(memory for memory, _ in samples), 1) if samples else None,
+                "threads": max(threads for _, threads in samples) if samples else None,
+                "cpu_s": round(cpu_s, 2),
+                "quiet_lines": f"{len(quiet)}/{sum(written[1:])}",
+                "quiet_latency_p50_s": round(percentile(quiet, 0.50), 3) if quiet else None,
+                "quiet_latency_p99_s": round(percentile(quiet, 0.99), 3) if quiet else None,
+                "quiet_profile_median_spread_s": round(max(quiet_medians) - min(quiet_medians), 3) if quiet_medians else None,
+                "noisy_lines": f"{len(latencies[0])}/{written[0]}",
+            }
+            stats = results[mode]
+            print(f"  {'🧩' if mode == 'shared' else '📦'} {'Un processus partagé' if mode == 'shared' else f'{count} processus séparés'}: "
+                  f"{stats['memory_mb']} Mo, {stats['threads']} threads, {stats['cpu_s']}s CPU, démarrage {stats['startup_s']}s")
+            print(f"     Profils calmes: {stats['quiet_lines']} lignes, latence p50 {stats['quiet_latency_p50_s']}s, "
+                  f"p99 {stats['quiet_latency_p99_s']}s (écart des médianes {stats['quiet_profile_median_spread_s']}s); "
+                  f"profil bavard: {stats['noisy_lines']} lignes livrées")
+
+    if json_output:
+        with open(json_output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"  💾 Résultats écrits dans {json_output}")
+    return results
+
+def bench_tracing(duration: float, rate: float, rounds: int, json_output: Optional[str]) -> dict:
+    """Surcoût du traçage de bout en bout: pipeline complet sans puis avec traceur (faux webhook)
+
+    Le CPU du processus est mesuré sur `rounds` passes alternées de chaque mode. Le coût
+    unitaire des appels du traceur (par lecture, par batch) est mesuré à part: le
+    surcoût estimé ne dépend pas du bruit de la mesure globale.
+    """
+    from fake_webhook import FakeWebhookServer
+    from discord_sender import DiscordSender
+    from log_monitor import LogMonitor
+    from tracing import Tracer
+
+    print(f"🔍 Flux de {rate:g} lignes/s pendant {duration:g}s, {rounds} passe(s) sans puis avec traçage...")
+    results = {"duration_s": duration, "rate": rate, "rounds": rounds, "off": [], "on": []}
+    last_tracer = None
+    for _ in range(rounds):
+        for mode in ("off", "on"):
+            server = FakeWebhookServer(limit=100000, window=1.0).start()
+            tracer = None
+            if mode == "on":
+                tracer = Tracer()
+                tracer.configure(True, 1000, 0.0, tempfile.gettempdir())
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                night_dir = os.path.join(tmp_dir, "2024-01-15")
+                os.makedirs(night_dir)
+                log_file = os.path.join(night_dir, "log_21-00-00.txt")
+                open(log_file, 'w').close()
+
+                sender = DiscordSender(server.url, queue_size=10000)
+                monitor = LogMonitor(tmp_dir, sender, batch_size=20, batch_timeout=0.2, tracer=tracer)
+                monitor.start()
+
+                timestamp = datetime(2024, 1, 15, 21, 0, 0)
+                cpu_start = time.process_time()
+                start_time = time.perf_counter()
+                written = 0
+                with open(log_file, 'a', encoding='utf-8') as f:
+                    while time.perf_counter() - start_time < duration:
+                        timestamp += timedelta(milliseconds=1)
+                        f.write(generate_log_line(timestamp))
+                        f.flush()
+                        written += 1
+                        delay = written / rate - (time.perf_counter() - start_time)
+                        if delay > 0:
+                            time.sleep(delay)
+
+                deadline = time.time() + 30
+                while time.time() < deadline and sum(len(payload_lines(p)) for p in server.payloads()) < written:
+                    time.sleep(0.1)
+                cpu_s = time.process_time() - cpu_start
+                delivered = sum(len(payload_lines(p)) for p in server.payloads())
+                monitor.stop()
+                sender.stop()
+                server.stop()
+
+            results[mode].append({"cpu_s": round(cpu_s, 3), "lines": written, "delivered": delivered,
+                                  "traces": len(tracer.traces) if tracer else 0})
+            if tracer is not None:
+                last_tracer = tracer
+
+    cpu = {mode: statistics.median(run["cpu_s"] for run in results[mode]) for mode in ("off", "on")}
+    for mode in ("off", "on"):
+        runs = results[mode]
+        passes = ", ".join(f"{run['cpu_s']:.2f}" for run in runs)
+        traces = f", {runs[-1]['traces']} traces" if mode == "on" else ""
+        print(f"  {'🔬' if mode == 'on' else '⚪'} Traçage {'activé' if mode == 'on' else 'désactivé'}: "
+              f"CPU médian {cpu[mode]:.2f}s ({passes}), {runs[-1]['delivered']}/{runs[-1]['lines']} lignes livrées{traces}")
+    results["cpu_overhead_pct"] = round((cpu["on"] - cpu["off"]) / cpu["off"] * 100, 1) if cpu["off"] else None
+    print(f"  📈 Surcoût mesuré: {results['cpu_overhead_pct']}% du CPU du processus")
+
+    # Coût unitaire des appels du traceur, rapporté au CPU d'une passe sans traçage
+    tracer = Tracer()
+    tracer.configure(True, 1000, 0.0, tempfile.gettempdir())
+    read_time = time.monotonic()
+    iterations = 20000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        now = time.monotonic()
+        tracer.record_read("log.txt", 'event', now, time.time(), now)
+    read_us = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for _ in range(iterations):
+        trace = tracer.begin('normal', 'discord', 20, read_time, "log.txt")
+        for stage in ('dequeue', 'request', 'response'):
+            trace.mark(stage)
+        trace.finish(True)
+    batch_us = (time.perf_counter() - start) / iterations * 1e6
+    batches = rate * duration / 20
+    estimated_s = (rate * duration * read_us + batches * batch_us) / 1e6
+    results.update(read_us=round(read_us, 2), batch_us=round(batch_us, 2),
+                   estimated_overhead_pct=round(estimated_s / cpu["off"] * 100, 2) if cpu["off"] else None)
+    print(f"  ⏱️ Coût unitaire: {read_us:.1f} µs par lecture, {batch_us:.1f} µs par batch "
+          f"-> surcoût estimé {results['estimated_overhead_pct']}% (au pire: une lecture par ligne)")
+
+    # Rapport complet (traces et profil des threads) de la dernière passe tracée
+    if last_tracer is not None:
+        start = time.perf_counter()
+        path = last_tracer.dump("benchmark")
+        results["dump_s"] = round(time.perf_counter() - start, 2)
+        print(f"  📄 Rapport écrit en {results['dump_s']}s: {path}")
+
+    if json_output:
+        with open(json_output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"  💾 Résultats écrits dans {json_output}")
+    return results
+
+def main():
+    """Fonction principale des benchmarks"""
+    parser = argparse.ArgumentParser(description="Benchmarks EKOS Log Monitor")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    catchup = subparsers.add_parser("catchup", help="Vitesse de rattrapage depuis un checkpoint (Mo/s)")
+    catchup.add_argument("--size-mb", type=float, default=100.0, help="Taille de l'arriéré en Mo")
+
+    ratelimit = subparsers.add_parser("ratelimit", help="Débit d'une rafale face au rate limiting (faux webhook)")
+    ratelimit.add_argument("--messages", type=int, default=30, help="Nombre de messages de la rafale")
+    ratelimit.add_argument("--limit", type=int, default=5, help="Requêtes autorisées par fenêtre")
+    ratelimit.add_argument("--window", type=float, default=2.0, help="Durée de la fenêtre (secondes)")
+
+    pack = subparsers.add_parser("pack", help="Lignes livrées par requête HTTP")
+    pack.add_argument("--lines", type=int, default=10000, help="Nombre de lignes du batch")
+    pack.add_argument("--no-embeds", action="store_true", help="N'utiliser que le champ content")
+
+    parse = subparsers.add_parser("parse", help="Débit de l'analyse et du filtrage des lignes")
+    parse.add_argument("--lines", type=int, default=500000, help="Nombre de lignes analysées")
+    parse.add_argument("--min-level", default="INFO", help="Niveau minimal transmis")
+
+    dedup = subparsers.add_parser("dedup", help="Volume économisé par la déduplication (rejeu d'une nuit)")
+    dedup.add_argument("--log", help="Fichier de log EKOS réel à rejouer, compressé ou non (nuit synthétique par défaut)")
+    dedup.add_argument("--batch-size", type=int, default=10, help="Taille des batchs")
+    dedup.add_argument("--window", type=float, default=60.0, help="Fenêtre de déduplication (secondes)")
+
+    replay = subparsers.add_parser("replay", help="Rejeu d'un log à travers tout le pipeline (faux webhook)")
+    replay.add_argument("--log", help="Fichier de log EKOS enregistré, compressé ou non (lignes synthétiques par défaut)")
+    replay.add_argument("--speed", type=float, default=0.0, help="Vitesse de rejeu: 1 = temps réel, 10 = x10, 0 = maximum")
+    replay.add_argument("--max-lines", type=int, default=20000, help="Nombre max de lignes rejouées")
+    replay.add_argument("--batch-size", type=int, default=10, help="Taille des batchs")
+    replay.add_argument("--batch-timeout", type=float, default=1.0, help="Timeout des batchs (secondes)")
+    replay.add_argument("--discord-limits", action="store_true", help="Appliquer le rate limit réel de Discord (5 requêtes / 2s)")
+    replay.add_argument("--json", dest="json_output", help="Fichier JSON de résultats")
+
+    digest = subparsers.add_parser("digest", help="Coût du suivi de session et messages économisés par les résumés")
+    digest.add_argument("--log", help="Fichier de log EKOS réel, compressé ou non (lignes synthétiques par défaut)")
+    digest.add_argument("--lines", type=int, default=200000, help="Nombre de lignes synthétiques")
+    digest.add_argument("--interval", type=float, default=15.0, help="Intervalle des résumés (minutes)")
+    digest.add_argument("--batch-size", type=int, default=10, help="Taille des batchs de lignes brutes")
+
+    search = subparsers.add_parser("search", help="Indexation de l'archive et temps de réponse des recherches")
+    search.add_argument("--nights", type=int, default=30, help="Nombre de nuits de l'archive synthétique")
+    search.add_argument("--lines", type=int, default=20000, help="Lignes par nuit")
+    search.add_argument("--workers", type=int, help="Processus d'indexation (défaut: nombre de CPU)")
+
+    lanes = subparsers.add_parser("lanes", help="Latence des voies critique et normale face aux objectifs")
+    lanes.add_argument("--duration", type=float, default=20.0, help="Durée du flux (secondes)")
+    lanes.add_argument("--rate", type=float, default=20.0, help="Lignes écrites par seconde")
+    lanes.add_argument("--critical-every", type=float, default=2.0, help="Intervalle entre deux alertes critiques (secondes)")
+    lanes.add_argument("--batch-size", type=int, default=10, help="Taille des batchs")
+    lanes.add_argument("--batch-timeout", type=float, default=5.0, help="Timeout des batchs (secondes)")
+    lanes.add_argument("--critical-target", type=float, default=2.0, help="Objectif de latence de la voie critique (secondes)")
+    lanes.add_argument("--normal-target", type=float, help="Objectif de latence de la voie normale (défaut: timeout + 5s)")
+    lanes.add_argument("--json", dest="json_output", help="Fichier JSON de résultats")
+
+    startup = subparsers.add_parser("startup", help="Démarrage à froid: lancement -> première ligne suivie")
+    startup.add_argument("--runs", type=int, default=5, help="Nombre de démarrages mesurés")
+    startup.add_argument("--webhook", choices=("ok", "slow", "down"), default="slow",
+                         help="Webhook qui répond, qui répond en 10s, ou injoignable")
+    startup.add_argument("--backlog-mb", type=float, default=0.0, help="Arriéré (Mo) d'un fichier précédent à rattraper")
+    startup.add_argument("--json", dest="json_output", help="Fichier JSON de résultats")
+
+    outage = subparsers.add_parser("outage", help="Mémoire pendant une panne du webhook, puis reprise")
+    outage.add_argument("--size-mb", type=float, default=50.0, help="Logs écrits pendant la panne (Mo)")
+    outage.add_argument("--buffer-mb", type=float, default=16.0, help="Mémoire maximale des lignes en attente (Mo)")
+    outage.add_argument("--policy", choices=("pause", "drop_oldest", "drop_severity"), default="pause",
+                        help="Politique de débordement")
+    outage.add_argument("--recover-timeout", type=float, default=120.0, help="Attente max de la reprise (secondes)")
+    outage.add_argument("--json", dest="json_output", help="Fichier JSON de résultats")
+
+    thumbnails = subparsers.add_parser("thumbnails", help="Aperçus des poses FITS (synthétiques): rendu et latence des lignes")
+    thumbnails.add_argument("--frames", type=int, default=4, help="Nombre de poses FITS générées")
+    thumbnails.add_argument("--width", type=int, default=4096, help="Largeur des poses (pixels)")
+    thumbnails.add_argument("--height", type=int, default=3072, help="Hauteur des poses (pixels)")
+    thumbnails.add_argument("--max-size", type=int, default=800, help="Plus grand côté des aperçus (pixels)")
+    thumbnails.add_argument("--duration", type=float, default=15.0, help="Durée du flux de lignes (secondes)")
+    thumbnails.add_argument("--rate", type=float, default=50.0, help="Lignes écrites par seconde")
+    thumbnails.add_argument("--capture-every", type=float, default=3.0, help="Intervalle entre deux poses (secondes)")
+    thumbnails.add_argument("--json", dest="json_output", help="Fichier JSON de résultats")
+
+    profiles = subparsers.add_parser("profiles", help="Plusieurs observatoires: processus séparés ou un seul processus partagé")
+    profiles.add_argument("--count", type=int, default=20, help="Nombre de profils synthétiques")
+    profiles.add_argument("--duration", type=float, default=20.0, help="Durée du flux (secondes)")
+    profiles.add_argument("--rate", type=float, default=2.0, help="Lignes écrites par seconde et par profil")
+    profiles.add_argument("--noisy-rate", type=float, default=200.0, help="Lignes par seconde du premier profil (bavard)")
+    profiles.add_argument("--json", dest="json_output", help="Fichier JSON de résultats")
+
+    tracing = subparsers.add_parser("tracing", help="Surcoût du traçage de la latence de bout en bout")
+    tracing.add_argument("--duration", type=float, default=10.0, help="Durée de chaque passe (secondes)")
+    tracing.add_argument("--rate", type=float, default=200.0, help="Lignes écrites par seconde")
+    tracing.add_argument("--rounds", type=int, default=3, help="Passes de chaque mode (médiane)")
+    tracing.add_argument("--json", dest="json_output", help="Fichier JSON de résultats")
+
+    args = parser.parse_args()
+
+    if args.command == "catchup":
+        bench_catchup(args.size_mb)
+    elif args.command == "ratelimit":
+        bench_ratelimit(args.messages, args.limit, args.window)
+    elif args.command == "pack":
+        bench_pack(args.lines, not args.no_embeds)
+    elif args.command == "parse":
+        bench_parse(args.lines, args.min_level)
+    elif args.command == "dedup":
+        bench_dedup(args.log, args.batch_size, args.window)
+    elif args.command == "replay":
+        bench_replay(args.log, args.speed, args.max_lines, args.batch_size, args.batch_timeout,
+                     args.discord_limits, args.json_output)
+    elif args.command == "digest":
+        bench_digest(args.log, args.lines, args.interval, args.batch_size)
+    elif args.command == "search":
+        bench_search(args.nights, args.lines, args.workers)
+    elif args.command == "startup":
+        results = bench_startup(args.runs, args.webhook, args.backlog_mb, args.json_output)
+        return 0 if results["first_line_ms"]["median"] is not None else 1
+    elif args.command == "outage":
+        results = bench_outage(args.size_mb, args.buffer_mb, args.policy, args.recover_timeout, args.json_output)
+        return 0 if results["passed"] else 1
+    elif args.command == "thumbnails":
+        bench_thumbnails(args.frames, args.width, args.height, args.max_size, args.duration, args.rate,
+                         args.capture_every, args.json_output)
+    elif args.command == "profiles":
+        bench_profiles(args.count, args.duration, args.rate, args.noisy_rate, args.json_output)
+    elif args.command == "tracing":
+        bench_tracing(args.duration, args.rate, args.rounds, args.json_output)
+    elif args.command == "lanes":
+        results = bench_lanes(args.duration, args.rate, args.critical_every, args.batch_size, args.batch_timeout,
+                              args.critical_target, args.normal_target, args.json_output)
+        return 0 if results["passed"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
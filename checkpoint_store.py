@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Union
+from scheduler import ScheduledTask, Scheduler
+
+logger = logging.getLogger(__name__)
+
+def line_hash(line: str) -> str:
+    """Empreinte d'une ligne de log, utilisée pour vérifier un checkpoint"""
+    return hashlib.sha1(line.encode('utf-8', errors='ignore')).hexdigest()
+
+class CheckpointStore:
+    """Stockage sur disque de la position de lecture de chaque fichier surveillé"""
+
+    def __init__(self, checkpoint_file: str, flush_interval: float = 5.0, scheduler: Optional[Scheduler] = None):
+        self.checkpoint_file = checkpoint_file
+        self.flush_interval = flush_interval
+        self.checkpoints: Dict[str, dict] = {}
+        self.dirty = False
+        self.last_flush_time = 0.0
+        # Écriture différée: timer propre, ou tâche de l'échéancier partagé entre profils
+        self.scheduler = scheduler
+        self.flush_timer: Optional[Union[threading.Timer, ScheduledTask]] = None
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Charger les checkpoints existants"""
+        if not os.path.exists(self.checkpoint_file):
+            return
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                self.checkpoints = json.load(f)
+            logger.info(f"{len(self.checkpoints)} checkpoint(s) chargé(s) depuis {self.checkpoint_file}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Checkpoint illisible {self.checkpoint_file}, ignoré: {e}")
+            self.checkpoints = {}
+
+    def get(self, file_path: str) -> Optional[dict]:
+        """Récupérer le checkpoint d'un fichier"""
+        with self.lock:
+            checkpoint = self.checkpoints.get(file_path)
+            return dict(checkpoint) if checkpoint else None
+
+    def paths(self) -> List[str]:
+        """Lister les fichiers ayant un checkpoint"""
+        with self.lock:
+            return list(self.checkpoints)
+
+    def remove(self, file_path: str):
+        """Supprimer le checkpoint d'un fichier qui n'existe plus"""
+        with self.lock:
+            if self.checkpoints.pop(file_path, None) is not None:
+                self.dirty = True
+
+    def update(self, file_path: str, inode: int, offset: int, last_line: Optional[str] = None, rewind: bool = False) -> bool:
+        """Enregistrer une nouvelle position (écrite sur disque au prochain flush)
+
+        Pour un même inode, le checkpoint ne recule jamais: une livraison tardive
+        (alerte remise dans la voie normale) ne doit pas faire relire des lignes
+        déjà livrées. `rewind` autorise le retour en arrière d'un fichier tronqué
+        ou remplacé. Retourne False si la position est refusée.
+        """
+        with self.lock:
+            current = self.checkpoints.get(file_path)
+            if not rewind and current and current.get("inode") == inode and current.get("offset", 0) > offset:
+                logger.debug(f"Checkpoint de {file_path} non reculé: {current['offset']} -> {offset}")
+                return False
+            self.checkpoints[file_path] = {
+                "path": file_path,
+                "inode": inode,
+                "offset": offset,
+                "last_line_hash": line_hash(last_line) if last_line is not None else None,
+            }
+            self.dirty = True
+        self.flush()
+        return True
+
+    def flush(self, force: bool = False):
+        """Écrire les checkpoints de manière atomique si l'intervalle est écoulé"""
+        with self.lock:
+            if not self.dirty:
+                return
+            remaining = self.last_flush_time + self.flush_interval - time.time()
+            if not force and remaining > 0:
+                # Écriture différée: un seul timer armé, aucun réveil périodique
+                if self.flush_timer is None and self.scheduler is not None:
+                    self.flush_timer = self.scheduler.add("checkpoint-flush", self._deferred_flush, remaining)
+                elif self.flush_timer is None:
+                    self.flush_timer = threading.Timer(remaining, self._deferred_flush)
+                    self.flush_timer.daemon = True
+                    self.flush_timer.start()
+                return
+
+            tmp_file = f"{self.checkpoint_file}.tmp"
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.checkpoints, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.checkpoint_file)
+                self.dirty = False
+                self.last_flush_time = time.time()
+                logger.debug(f"Checkpoints écrits dans {self.checkpoint_file}")
+            except OSError as e:
+                logger.error(f"Erreur lors de l'écriture des checkpoints: {e}")
+
+    def _deferred_flush(self):
+        """Écriture déclenchée par le timer d'écriture différée"""
+        with self.lock:
+            self.flush_timer = None
+        self.flush()
+
+    def close(self):
+        """Écrire les derniers checkpoints et annuler l'écriture différée"""
+        with self.lock:
+            if isinstance(self.flush_timer, ScheduledTask):
+                Scheduler.cancel(self.flush_timer)
+            elif self.flush_timer is not None:
+                self.flush_timer.cancel()
+            self.flush_timer = None
+        self.flush(force=True)
@@ -1,25 +1,185 @@
 import os
-from dotenv import load_dotenv
-from typing import Optional
+import re
+import time
+import logging
+import importlib.util
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+from typing import Dict, List, Optional, Set, Tuple
+from log_parser import LEVELS
+from line_buffer import OVERFLOW_POLICIES
+
+logger = logging.getLogger(__name__)
+
+# Les variables du processus l'emportent sur le fichier .env, y compris au rechargement
+PROCESS_ENV = frozenset(os.environ)
 
 # Charger les variables d'environnement
-load_dotenv()
+ENV_FILE = find_dotenv()
+load_dotenv(ENV_FILE)
+ENV_FILE_KEYS = set(dotenv_values(ENV_FILE)) - PROCESS_ENV if ENV_FILE else set()
+
+# Paramètres appliqués sans redémarrage (SIGHUP ou modification du .env)
+RELOADABLE = frozenset({
+    'log_level', 'rate_limit_delay', 'max_retries', 'batch_size', 'batch_timeout', 'file_check_interval',
+    'max_tailed_files', 'filter_min_level', 'filter_module_allow', 'filter_module_deny', 'filter_drop_pattern',
+    'dedup_window', 'dedup_max_fingerprints', 'alert_critical_pattern', 'alert_warning_pattern',
+    'lane_target_critical', 'lane_target_normal', 'digest_interval', 'digest_only', 'config_watch_interval',
+    'buffer_max_mb', 'buffer_overflow_policy', 'thumbnail_max_size', 'thumbnail_min_interval', 'thumbnail_path_map',
+    'tracing', 'trace_buffer_size', 'trace_slow_threshold', 'trace_dump_directory',
+})
 
 class Config:
     """Configuration de l'application de surveillance des logs EKOS"""
     
-    def __init__(self):
-        self.discord_webhook_url = os.getenv('DISCORD_WEBHOOK_URL')
-        self.ekos_logs_directory = os.getenv('EKOS_LOGS_DIRECTORY')
+    def __init__(self, profile: Optional[str] = None):
+        # Profil d'observatoire: ses variables PROFILE_<NOM>_* l'emportent sur les variables globales
+        self.profile = profile
+        self.profiles = self._split_list(os.getenv('PROFILES', ''))
+        self.delivery_workers = int(os.getenv('DELIVERY_WORKERS', '4'))
+        self.discord_webhook_url = self._getenv('DISCORD_WEBHOOK_URL')
+        self.ekos_logs_directory = self._getenv('EKOS_LOGS_DIRECTORY')
         self.log_level = os.getenv('LOG_LEVEL', 'INFO')
-        self.rate_limit_delay = float(os.getenv('RATE_LIMIT_DELAY', '1.0'))
-        self.batch_size = int(os.getenv('BATCH_SIZE', '10'))
-        self.batch_timeout = float(os.getenv('BATCH_TIMEOUT', '30.0'))
-        self.file_check_interval = int(os.getenv('FILE_CHECK_INTERVAL', '60'))
-        self.max_retries = int(os.getenv('MAX_RETRIES', '3'))
+        self.rate_limit_delay = float(self._getenv('RATE_LIMIT_DELAY', '0.0'))
+        self.batch_size = int(self._getenv('BATCH_SIZE', '10'))
+        self.batch_timeout = float(self._getenv('BATCH_TIMEOUT', '30.0'))
+        self.file_check_interval = int(self._getenv('FILE_CHECK_INTERVAL', '60'))
+        self.max_retries = int(self._getenv('MAX_RETRIES', '3'))
+        self.tail_include = self._split_list(self._getenv('TAIL_INCLUDE', '*.txt'))
+        self.tail_exclude = self._split_list(self._getenv('TAIL_EXCLUDE', ''))
+        self.max_tailed_files = int(self._getenv('MAX_TAILED_FILES', '32'))
+        self.tail_mode = self._getenv('TAIL_MODE', 'auto').strip().lower()
+        self.poll_min_interval = float(self._getenv('POLL_MIN_INTERVAL', '0.25'))
+        self.poll_max_interval = float(self._getenv('POLL_MAX_INTERVAL', '2.0'))
+        self.filter_min_level = self._getenv('FILTER_MIN_LEVEL', 'DEBUG')
+        self.filter_module_allow = self._split_list(self._getenv('FILTER_MODULE_ALLOW', ''))
+        self.filter_module_deny = self._split_list(self._getenv('FILTER_MODULE_DENY', ''))
+        self.filter_drop_pattern = self._getenv('FILTER_DROP_PATTERN', '')
+        self.dedup_window = float(self._getenv('DEDUP_WINDOW', '60.0'))
+        self.dedup_max_fingerprints = int(self._getenv('DEDUP_MAX_FINGERPRINTS', '1024'))
+        self.priority_lane = self._getenv('PRIORITY_LANE', 'true').lower() in ('1', 'true', 'yes')
+        self.alert_critical_pattern = self._getenv('ALERT_CRITICAL_PATTERN', '')
+        self.alert_warning_pattern = self._getenv('ALERT_WARNING_PATTERN', '')
+        self.lane_target_critical = float(self._getenv('LANE_TARGET_CRITICAL', '2.0'))
+        self.lane_target_normal = float(self._getenv('LANE_TARGET_NORMAL', str(self.batch_timeout + 5.0)))
+        self.digest_interval = float(self._getenv('DIGEST_INTERVAL', '0'))
+        self.digest_only = self._getenv('DIGEST_ONLY', 'false').lower() in ('1', 'true', 'yes')
+        self.index_reconcile_interval = int(self._getenv('INDEX_RECONCILE_INTERVAL', '3600'))
+        self.discord_use_embeds = self._getenv('DISCORD_USE_EMBEDS', 'true').lower() in ('1', 'true', 'yes')
+        self.delivery_queue_size = int(self._getenv('DELIVERY_QUEUE_SIZE', '100'))
+        self.delivery_drop_policy = self._getenv('DELIVERY_DROP_POLICY', 'drop_oldest')
+        self.buffer_max_mb = float(self._getenv('BUFFER_MAX_MB', '16'))
+        self.buffer_overflow_policy = self._getenv('BUFFER_OVERFLOW_POLICY', 'pause').strip().lower()
+        self.checkpoint_file = self._profile_path('CHECKPOINT_FILE', 'ekos_monitor_checkpoint.json')
+        self.checkpoint_interval = float(self._getenv('CHECKPOINT_INTERVAL', '5.0'))
+        self.spool_directory = self._profile_path('SPOOL_DIRECTORY', 'ekos_monitor_spool')
+        self.spool_max_size_mb = float(self._getenv('SPOOL_MAX_SIZE_MB', '64'))
+        self.sink_file_path = self._getenv('SINK_FILE_PATH', '')
+        self.sink_webhook_url = self._getenv('SINK_WEBHOOK_URL', '')
+        self.sink_mqtt_host = self._getenv('SINK_MQTT_HOST', '')
+        self.sink_mqtt_port = int(self._getenv('SINK_MQTT_PORT', '1883'))
+        self.sink_mqtt_topic = self._getenv('SINK_MQTT_TOPIC', 'ekos/logs')
+        # Filtre et batching propres à chaque sink secondaire
+        self.sink_settings = {
+            'file': self._sink_settings('FILE', batch_size=100, batch_timeout=5.0),
+            'webhook': self._sink_settings('WEBHOOK', batch_size=20, batch_timeout=2.0),
+            'mqtt': self._sink_settings('MQTT', batch_size=10, batch_timeout=1.0),
+        }
+        self.thumbnails = self._getenv('THUMBNAILS', 'false').lower() in ('1', 'true', 'yes')
+        self.thumbnail_max_size = int(self._getenv('THUMBNAIL_MAX_SIZE', '800'))
+        self.thumbnail_min_interval = float(self._getenv('THUMBNAIL_MIN_INTERVAL', '60'))
+        self.thumbnail_workers = int(self._getenv('THUMBNAIL_WORKERS', '1'))
+        self.thumbnail_path_map = self._split_list(self._getenv('THUMBNAIL_PATH_MAP', ''))
+        self.search_index_file = self._getenv('SEARCH_INDEX_FILE', 'ekos_logs_index.sqlite')
+        self.archive_compression = self._getenv('ARCHIVE_COMPRESSION', '').strip().lower()
+        self.archive_min_age = float(self._getenv('ARCHIVE_MIN_AGE', '6'))
+        self.metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+        self.metrics_port = int(os.getenv('METRICS_PORT', '0'))
+        self.config_watch_interval = float(os.getenv('CONFIG_WATCH_INTERVAL', '5'))
+        self.tracing = os.getenv('TRACING', 'false').lower() in ('1', 'true', 'yes')
+        self.trace_buffer_size = int(os.getenv('TRACE_BUFFER_SIZE', '1000'))
+        self.trace_slow_threshold = float(os.getenv('TRACE_SLOW_THRESHOLD', '0'))
+        self.trace_dump_directory = os.getenv('TRACE_DUMP_DIRECTORY', 'ekos_monitor_traces')
+    
+    def changes(self, other: "Config") -> List[str]:
+        """Paramètres dont la valeur diffère dans `other`"""
+        return [name for name, value in vars(self).items() if getattr(other, name, None) != value]
+    
+    @staticmethod
+    def _split_list(value: str) -> List[str]:
+        """Découper une liste séparée par des virgules"""
+        return [item.strip() for item in value.split(',') if item.strip()]
+    
+    def _getenv(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Valeur d'une variable, celle du profil (PROFILE_<NOM>_<VARIABLE>) d'abord"""
+        if self.profile:
+            value = os.getenv(f'PROFILE_{self.profile.upper()}_{key}')
+            if value is not None:
+                return value
+        return os.getenv(key, default)
+    
+    def _profile_path(self, key: str, default: str) -> str:
+        """Chemin propre au profil: le chemin global suffixé par son nom, sauf s'il est redéfini"""
+        path = os.getenv(key, default)
+        if not self.profile or not path:
+            return self._getenv(key, default)
+        root, ext = os.path.splitext(path.rstrip(os.sep))
+        return self._getenv(key, f"{root}_{self.profile}{ext}")
+    
+    def profile_configs(self) -> List["Config"]:
+        """Configuration de chaque observatoire (la configuration elle-même sans PROFILES)"""
+        if not self.profiles:
+            return [self]
+        return [Config(name) for name in self.profiles]
+    
+    def _sink_settings(self, prefix: str, batch_size: int, batch_timeout: float) -> dict:
+        """Lire les paramètres SINK_<NOM>_* d'un sink secondaire"""
+        return {
+            'min_level': self._getenv(f'SINK_{prefix}_MIN_LEVEL', 'DEBUG'),
+            'batch_size': int(self._getenv(f'SINK_{prefix}_BATCH_SIZE', str(batch_size))),
+            'batch_timeout': float(self._getenv(f'SINK_{prefix}_BATCH_TIMEOUT', str(batch_timeout))),
+            'queue_size': int(self._getenv(f'SINK_{prefix}_QUEUE_SIZE', '1000')),
+        }
     
     def validate(self) -> bool:
-        """Valider la configuration"""
+        """Valider la configuration (celle de chaque profil avec PROFILES)"""
+        if not self._validate():
+            return False
+        print("✅ Configuration validée")
+        return True
+    
+    def _validate_profiles(self) -> bool:
+        """Noms des profils, puis configuration et fichiers propres à chacun"""
+        if len(set(name.lower() for name in self.profiles)) != len(self.profiles):
+            print("❌ PROFILES contient des noms en double")
+            return False
+        invalid = [name for name in self.profiles if not re.fullmatch(r'[A-Za-z0-9_]+', name)]
+        if invalid:
+            print(f"❌ Nom de profil invalide: {', '.join(invalid)} (lettres, chiffres et _ uniquement)")
+            return False
+        
+        try:
+            configs = self.profile_configs()
+        except ValueError as e:
+            print(f"❌ Valeur invalide dans un profil (variables PROFILE_<NOM>_* ou globales): {e}")
+            return False
+        for config in configs:
+            if not config._validate():
+                print(f"❌ Profil {config.profile} invalide (variables PROFILE_{config.profile.upper()}_* ou globales)")
+                return False
+        for name in ('checkpoint_file', 'spool_directory'):
+            paths = [getattr(config, name) for config in configs if getattr(config, name)]
+            if len(set(paths)) != len(paths):
+                print(f"❌ {name.upper()} doit être propre à chaque profil")
+                return False
+        return True
+    
+    def _validate(self) -> bool:
+        if self.profiles and self.profile is None:
+            if self.delivery_workers < 1:
+                print("❌ DELIVERY_WORKERS doit être supérieur à 0")
+                return False
+            return self._validate_profiles()
+        
         if not self.discord_webhook_url:
             print("❌ DISCORD_WEBHOOK_URL n'est pas configuré")
             return False
@@ -32,18 +192,255 @@ class Config:
             print(f"❌ Le répertoire {self.ekos_logs_directory} n'existe pas")
             return False
         
-        print("✅ Configuration validée")
+        if not self.tail_include:
+            print("❌ TAIL_INCLUDE doit contenir au moins un motif")
+            return False
+        
+        if self.max_tailed_files < 1:
+            print("❌ MAX_TAILED_FILES doit être supérieur à 0")
+            return False
+        
+        if self.tail_mode not in ('auto', 'events', 'polling'):
+            print(f"❌ TAIL_MODE invalide: {self.tail_mode} (auto, events ou polling)")
+            return False
+        
+        if not 0 < self.poll_min_interval <= self.poll_max_interval:
+            print("❌ POLL_MIN_INTERVAL doit être positif et inférieur ou égal à POLL_MAX_INTERVAL")
+            return False
+        
+        if logging.getLevelName(self.log_level.strip().upper()) not in (logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL):
+            print(f"❌ LOG_LEVEL invalide: {self.log_level} (DEBUG, INFO, WARNING, ERROR)")
+            return False
+        
+        if self.batch_size < 1 or self.batch_timeout <= 0:
+            print("❌ BATCH_SIZE et BATCH_TIMEOUT doivent être supérieurs à 0")
+            return False
+        
+        if self.filter_min_level.strip().upper() not in LEVELS:
+            print(f"❌ FILTER_MIN_LEVEL invalide: {self.filter_min_level} (DEBUG, INFO, WARN, CRIT, FATAL)")
+            return False
+        
+        if self.filter_drop_pattern:
+            try:
+                re.compile(self.filter_drop_pattern)
+            except re.error as e:
+                print(f"❌ FILTER_DROP_PATTERN invalide: {e}")
+                return False
+        
+        if self.dedup_window > 0 and self.dedup_max_fingerprints < 1:
+            print("❌ DEDUP_MAX_FINGERPRINTS doit être supérieur à 0")
+            return False
+        
+        for name in ('ALERT_CRITICAL_PATTERN', 'ALERT_WARNING_PATTERN'):
+            pattern = getattr(self, name.lower())
+            if pattern:
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    print(f"❌ {name} invalide: {e}")
+                    return False
+        
+        if self.lane_target_critical <= 0 or self.lane_target_normal <= 0:
+            print("❌ LANE_TARGET_CRITICAL et LANE_TARGET_NORMAL doivent être supérieurs à 0")
+            return False
+        
+        if self.digest_interval < 0:
+            print("❌ DIGEST_INTERVAL doit être positif (0 pour désactiver)")
+            return False
+        
+        if self.digest_only and self.digest_interval <= 0:
+            print("❌ DIGEST_ONLY nécessite un DIGEST_INTERVAL supérieur à 0")
+            return False
+        
+        if self.delivery_queue_size < 1:
+            print("❌ DELIVERY_QUEUE_SIZE doit être supérieur à 0")
+            return False
+        
+        if self.delivery_drop_policy not in ('drop_oldest', 'drop_newest'):
+            print(f"❌ DELIVERY_DROP_POLICY invalide: {self.delivery_drop_policy} (drop_oldest ou drop_newest)")
+            return False
+        
+        if self.buffer_max_mb <= 0:
+            print("❌ BUFFER_MAX_MB doit être supérieur à 0")
+            return False
+        
+        if self.buffer_overflow_policy not in OVERFLOW_POLICIES:
+            print(f"❌ BUFFER_OVERFLOW_POLICY invalide: {self.buffer_overflow_policy} (pause, drop_oldest ou drop_severity)")
+            return False
+        
+        for name, settings in self.sink_settings.items():
+            if settings['min_level'].strip().upper() not in LEVELS:
+                print(f"❌ SINK_{name.upper()}_MIN_LEVEL invalide: {settings['min_level']}")
+                return False
+            if settings['batch_size'] < 0 or settings['queue_size'] < 1:
+                print(f"❌ SINK_{name.upper()}_BATCH_SIZE doit être positif et SINK_{name.upper()}_QUEUE_SIZE supérieur à 0")
+                return False
+        
+        if self.spool_directory and self.spool_max_size_mb <= 0:
+            print("❌ SPOOL_MAX_SIZE_MB doit être supérieur à 0")
+            return False
+        
+        if self.thumbnails and importlib.util.find_spec('numpy') is None:
+            print("❌ THUMBNAILS nécessite le paquet numpy (pip install numpy)")
+            return False
+        
+        if self.thumbnail_max_size < 16 or self.thumbnail_min_interval < 0 or self.thumbnail_workers < 1:
+            print("❌ THUMBNAIL_MAX_SIZE doit être d'au moins 16, THUMBNAIL_MIN_INTERVAL positif et THUMBNAIL_WORKERS supérieur à 0")
+            return False
+        
+        if any('=' not in entry for entry in self.thumbnail_path_map):
+            print("❌ THUMBNAIL_PATH_MAP invalide: entrées chemin_distant=chemin_local séparées par des virgules")
+            return False
+        
+        if self.archive_compression and self.archive_compression not in ('gzip', 'zstd'):
+            print(f"❌ ARCHIVE_COMPRESSION invalide: {self.archive_compression} (gzip, zstd ou vide pour désactiver)")
+            return False
+        
+        if self.archive_compression == 'zstd' and importlib.util.find_spec('zstandard') is None:
+            print("❌ ARCHIVE_COMPRESSION=zstd nécessite le paquet zstandard (pip install zstandard)")
+            return False
+        
+        if self.archive_min_age < 0:
+            print("❌ ARCHIVE_MIN_AGE doit être positif")
+            return False
+        
+        if not 0 <= self.metrics_port <= 65535:
+            print(f"❌ METRICS_PORT invalide: {self.metrics_port} (0 pour désactiver)")
+            return False
+        
+        if self.config_watch_interval < 0:
+            print("❌ CONFIG_WATCH_INTERVAL doit être positif (0 pour désactiver)")
+            return False
+        
+        if self.trace_buffer_size < 1:
+            print("❌ TRACE_BUFFER_SIZE doit être supérieur à 0")
+            return False
+        
+        if self.trace_slow_threshold < 0:
+            print("❌ TRACE_SLOW_THRESHOLD doit être positif (0 pour désactiver)")
+            return False
+        
+        if not self.trace_dump_directory:
+            print("❌ TRACE_DUMP_DIRECTORY n'est pas configuré")
+            return False
+        
         return True
     
     def __str__(self) -> str:
-        return f"""
+        if self.profiles and self.profile is None:
+            return f"""
 Configuration:
+- Profils d'observatoire: {', '.join(self.profiles)} (observer, vérifications et {self.delivery_workers} threads d'envoi partagés)
+- Métriques: {f'http://{self.metrics_host}:{self.metrics_port}/metrics' if self.metrics_port else 'désactivées'}
+- Rechargement de la configuration: SIGHUP{f', modification de {ENV_FILE} (vérifiée toutes les {self.config_watch_interval:g}s)' if ENV_FILE and self.config_watch_interval > 0 else ''}
+- Traçage de la latence: {f"activé ({self.trace_buffer_size} traces{f', rapport au-delà de {self.trace_slow_threshold:g}s' if self.trace_slow_threshold > 0 else ''})" if self.tracing else 'désactivé'}, rapport sur SIGUSR1 dans {self.trace_dump_directory}
+""" + "".join(str(config) for config in self.profile_configs())
+        return f"""
+Configuration{f' du profil {self.profile}' if self.profile else ''}:
 - Discord Webhook: {'✅ Configuré' if self.discord_webhook_url else '❌ Non configuré'}
 - Répertoire logs EKOS: {self.ekos_logs_directory}
 - Niveau de log: {self.log_level}
-- Délai rate limit: {self.rate_limit_delay}s
+- Délai minimal entre envois: {self.rate_limit_delay}s (rate limit piloté par Discord)
 - Taille batch: {self.batch_size}
 - Timeout batch: {self.batch_timeout}s
 - Intervalle vérification fichiers: {self.file_check_interval}s
 - Max tentatives: {self.max_retries}
-""" 
\ No newline at end of file
+- Fichiers suivis: {', '.join(self.tail_include)}{' (exclus: ' + ', '.join(self.tail_exclude) + ')' if self.tail_exclude else ''}, {self.max_tailed_files} max
+- Mode de suivi: {self.tail_mode} (polling {self.poll_min_interval}s à {self.poll_max_interval}s)
+- Filtrage: niveau >= {self.filter_min_level}{', modules autorisés: ' + ', '.join(self.filter_module_allow) if self.filter_module_allow else ''}{', modules exclus: ' + ', '.join(self.filter_module_deny) if self.filter_module_deny else ''}{', motif exclu: ' + self.filter_drop_pattern if self.filter_drop_pattern else ''}
+- Déduplication: {f'fenêtre de {self.dedup_window}s, {self.dedup_max_fingerprints} empreintes max' if self.dedup_window > 0 else 'désactivée'}
+- Voie prioritaire des alertes: {f'activée (objectifs: critiques {self.lane_target_critical}s, autres {self.lane_target_normal}s)' if self.priority_lane else 'désactivée'}{', motif critique: ' + self.alert_critical_pattern if self.alert_critical_pattern else ''}{', motif warning: ' + self.alert_warning_pattern if self.alert_warning_pattern else ''}
+- Résumés de session: {f"toutes les {self.digest_interval:g} min{' (lignes brutes remplacées, alertes critiques conservées)' if self.digest_only else ''}" if self.digest_interval > 0 else 'désactivés'}
+- Réconciliation de l'index des fichiers: {self.index_reconcile_interval}s
+- Embeds Discord: {'activés' if self.discord_use_embeds else 'désactivés'}
+- File d'envoi: {self.delivery_queue_size} messages ({self.delivery_drop_policy})
+- Lignes en attente: {self.buffer_max_mb:g} Mo max ({self.buffer_overflow_policy})
+- Fichier checkpoint: {self.checkpoint_file or 'désactivé'}
+- Intervalle écriture checkpoint: {self.checkpoint_interval}s
+- Spool des envois échoués: {f'{self.spool_directory} ({self.spool_max_size_mb:g} Mo max)' if self.spool_directory else 'désactivé'}
+- Sinks secondaires: {', '.join(filter(None, [f'fichier {self.sink_file_path}' if self.sink_file_path else '', f'webhook {self.sink_webhook_url}' if self.sink_webhook_url else '', f'MQTT {self.sink_mqtt_host}:{self.sink_mqtt_port}/{self.sink_mqtt_topic}' if self.sink_mqtt_host else ''])) or 'aucun'}
+- Aperçus des poses: {f"{self.thumbnail_max_size}px max, un toutes les {self.thumbnail_min_interval:g}s au plus, {self.thumbnail_workers} processus{', chemins: ' + ', '.join(self.thumbnail_path_map) if self.thumbnail_path_map else ''}" if self.thumbnails else 'désactivés'}
+- Index de recherche de l'archive: {self.search_index_file}
+- Archivage des logs terminés: {f"{self.archive_compression}, après {self.archive_min_age:g} h d'inactivité" if self.archive_compression else 'désactivé'}
+- Métriques: {f'http://{self.metrics_host}:{self.metrics_port}/metrics' if self.metrics_port else 'désactivées'}
+- Rechargement de la configuration: SIGHUP{f', modification de {ENV_FILE} (vérifiée toutes les {self.config_watch_interval:g}s)' if ENV_FILE and self.config_watch_interval > 0 else ''}
+- Traçage de la latence: {f"activé ({self.trace_buffer_size} traces{f', rapport au-delà de {self.trace_slow_threshold:g}s' if self.trace_slow_threshold > 0 else ''})" if self.tracing else 'désactivé'}, rapport sur SIGUSR1 dans {self.trace_dump_directory}
+"""
+
+def reload_env(env_file: str = ENV_FILE) -> Tuple[Dict[str, Optional[str]], Set[str]]:
+    """Relire le fichier .env dans l'environnement du processus
+
+    Les variables retirées du fichier disparaissent; celles définies par le
+    processus lui-même restent prioritaires. Retourne l'état précédent, à passer
+    à `restore_env` si la nouvelle configuration est refusée.
+    """
+    values = {key: value for key, value in (dotenv_values(env_file) if env_file else {}).items()
+              if key not in PROCESS_ENV and value is not None}
+    removed = ENV_FILE_KEYS - set(values) - PROCESS_ENV
+    previous = ({key: os.environ.get(key) for key in removed | set(values)}, set(ENV_FILE_KEYS))
+    for key in removed:
+        os.environ.pop(key, None)
+    os.environ.update(values)
+    ENV_FILE_KEYS.clear()
+    ENV_FILE_KEYS.update(values)
+    return previous
+
+def restore_env(previous: Tuple[Dict[str, Optional[str]], Set[str]]):
+    """Remettre les variables dans l'état retourné par `reload_env`"""
+    values, keys = previous
+    for key, value in values.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    ENV_FILE_KEYS.clear()
+    ENV_FILE_KEYS.update(keys)
+
+class ConfigWatcher:
+    """Détection des modifications du fichier .env
+    
+    Un simple stat toutes les `interval` secondes, depuis la boucle principale:
+    aucun thread, et rien n'est relu sur le chemin des lignes.
+    """
+    
+    def __init__(self, env_file: str = ENV_FILE, interval: float = 5.0):
+        self.env_file = env_file
+        self.interval = interval
+        self.last_check = time.monotonic()
+        self.signature = self._signature()
+    
+    def _signature(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.env_file)
+        except (OSError, TypeError, ValueError):
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def changed(self) -> bool:
+        """Indiquer si le fichier a changé depuis le dernier chargement"""
+        if not self.env_file or self.interval <= 0:
+            return False
+        now = time.monotonic()
+        if now - self.last_check < self.interval:
+            return False
+        self.last_check = now
+        return self._signature() != self.signature
+    
+    def load(self) -> Optional[Config]:
+        """Relire et valider la configuration (None si elle est invalide)
+        
+        La configuration globale et celle de chaque profil sont construites et
+        validées ensemble; refusée, l'environnement précédent est rétabli.
+        """
+        self.signature = self._signature()
+        previous = reload_env(self.env_file)
+        try:
+            config = Config()
+            valid = config.validate()
+        except ValueError as e:
+            print(f"❌ Valeur invalide: {e}")
+            valid = False
+        if not valid:
+            restore_env(previous)
+            return None
+        return config 
\ No newline at end of file
@@ -0,0 +1,145 @@
+import re
+import time
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from log_parser import parse_line
+
+logger = logging.getLogger(__name__)
+
+# Nombres (entiers, décimaux, hexadécimaux): remplacés pour que les répétitions aient la même empreinte
+NUMBER_PATTERN = re.compile(r'0x[0-9a-fA-F]+|\d+(?:[.:]\d+)*')
+
+def fingerprint(line: str) -> str:
+    """Empreinte d'une ligne: module + message sans horodatage ni valeurs numériques"""
+    parsed = parse_line(line)
+    return f"{parsed.module or ''}|{NUMBER_PATTERN.sub('#', parsed.message)}"
+
+class _Window:
+    """Fenêtre de répétition d'une empreinte"""
+    __slots__ = ('source', 'start', 'last_seen', 'last_line', 'suppressed')
+
+    def __init__(self, source: Optional[str], start: float, line: str):
+        self.source = source
+        self.start = start
+        self.last_seen = start
+        self.last_line = line
+        self.suppressed = 0
+
+class Deduplicator:
+    """Suppression des répétitions et des rafales avec résumé comptabilisé
+
+    La première occurrence d'une ligne est transmise; les répétitions dans la
+    fenêtre sont comptées puis résumées en une seule ligne "(×N en Ts)". Les
+    empreintes récentes sont gardées dans un LRU borné: mémoire constante.
+    Les répétitions sont comptées par source (fichier d'origine): chaque ligne
+    ou résumé émis est retourné avec sa source.
+    """
+
+    def __init__(self, window: float = 60.0, max_fingerprints: int = 1024):
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self.windows: "OrderedDict[str, _Window]" = OrderedDict()  # Ordonné par début de fenêtre
+        self.lines_in = 0
+        self.lines_out = 0
+
+    @staticmethod
+    def _summary(line: str, count: int, duration: float) -> str:
+        if duration < 1:
+            return f"{line} (×{count})"
+        return f"{line} (×{count} en {duration:.0f}s)"
+
+    def _close(self, window: _Window) -> Optional[Tuple[Optional[str], str]]:
+        """Résumé (source, ligne) des répétitions supprimées d'une fenêtre (None si aucune)"""
+        if not window.suppressed:
+            return None
+        return window.source, self._summary(window.last_line, window.suppressed, window.last_seen - window.start)
+
+    def process(self, lines: List[str], now: Optional[float] = None,
+                sources: Optional[List[str]] = None) -> List[Tuple[Optional[str], str]]:
+        """Dédupliquer un batch de lignes
+
+        `sources` donne le fichier d'origine de chaque ligne (None: source unique).
+        Retourne les lignes émises, avec leur source.
+        """
+        now = time.time() if now is None else now
+        output: List[Tuple[Optional[str], str]] = []
+        counts: List[int] = []
+        in_batch = {}  # empreinte -> index dans output pour les lignes émises dans ce batch
+
+        def emit(item: Optional[Tuple[Optional[str], str]]):
+            if item is not None:
+                output.append(item)
+                counts.append(1)
+
+        for index, line in enumerate(lines):
+            source = sources[index] if sources is not None else None
+            key = (source, fingerprint(line))
+            window = self.windows.get(key)
+
+            if window is not None and now - window.start < self.window:
+                window.last_seen = now
+                index = in_batch.get(key)
+                if index is not None:
+                    counts[index] += 1
+                else:
+                    window.suppressed += 1
+                    window.last_line = line
+                continue
+
+            if window is not None:
+                # Fenêtre expirée: résumer ce qui a été supprimé puis en ouvrir une nouvelle
+                emit(self._close(window))
+                del self.windows[key]
+
+            self.windows[key] = _Window(source, now, line)
+            in_batch[key] = len(output)
+            emit((source, line))
+
+            if len(self.windows) > self.max_fingerprints:
+                _, evicted = self.windows.popitem(last=False)
+                emit(self._close(evicted))
+
+        for summary in self._expired(now):
+            emit(summary)
+
+        result = [(source, self._summary(line, count, 0)) if count > 1 else (source, line)
+                  for (source, line), count in zip(output, counts)]
+        self.lines_in += len(lines)
+        self.lines_out += len(result)
+        return result
+
+    def _expired(self, now: float) -> List[Tuple[Optional[str], str]]:
+        """Fermer les fenêtres expirées et retourner les résumés de leurs répétitions"""
+        summaries = []
+        # Les fenêtres les plus anciennes sont en tête: fermer celles qui ont expiré
+        while self.windows:
+            key, window = next(iter(self.windows.items()))
+            if now - window.start < self.window:
+                break
+            del self.windows[key]
+            summary = self._close(window)
+            if summary:
+                summaries.append(summary)
+        return summaries
+
+    def expire(self, now: Optional[float] = None) -> List[Tuple[Optional[str], str]]:
+        """Résumer les fenêtres expirées sans attendre le prochain batch (rafale suivie de silence)"""
+        summaries = self._expired(time.time() if now is None else now)
+        self.lines_out += len(summaries)
+        return summaries
+
+    def next_expiry(self, now: Optional[float] = None) -> Optional[float]:
+        """Délai avant l'expiration de la première fenêtre qui a des répétitions à résumer"""
+        now = time.time() if now is None else now
+        for window in self.windows.values():
+            if window.suppressed:
+                return max(0.0, window.start + self.window - now)
+        return None
+
+    def drain(self) -> List[Tuple[Optional[str], str]]:
+        """Résumer toutes les répétitions en attente (arrêt)"""
+        output = [summary for summary in map(self._close, self.windows.values()) if summary]
+        self.windows.clear()
+        self.lines_out += len(output)
+        return output
@@ -1,96 +1,238 @@
-import requests
+import json
 import time
 import logging
 from typing import List, Optional
 from datetime import datetime
+from rate_limiter import BucketRateLimiter
+from message_packer import CONTENT_LIMIT, MessagePacker
+from metrics import REGISTRY
+from sinks import DeliveryPool, RetryLater, Sink
 
 logger = logging.getLogger(__name__)
 
-class DiscordSender:
-    """Classe pour envoyer des messages vers Discord avec gestion du rate limiting"""
+RATE_LIMIT_WAIT = REGISTRY.histogram('ekos_rate_limit_wait_seconds', "Attente imposée par le rate limiting avant un envoi")
+SEND_LATENCY = REGISTRY.histogram('ekos_discord_send_seconds', "Durée des requêtes HTTP vers le webhook")
+RATE_LIMITED = REGISTRY.counter('ekos_discord_429_total', "Réponses 429 (rate limit) reçues")
+RETRIES = REGISTRY.counter('ekos_discord_retries_total', "Nouvelles tentatives après une erreur réseau ou un 429")
+SEND_FAILURES = REGISTRY.counter('ekos_discord_failures_total', "Payloads abandonnés après échec")
+PAYLOADS_SENT = REGISTRY.counter('ekos_discord_payloads_total', "Payloads livrés au webhook")
+
+# Envois du bucket Discord que les messages normaux laissent toujours aux alertes
+PRIORITY_RESERVE = 1
+
+class DiscordSender(Sink):
+    """Sink Discord: envoi vers un webhook avec gestion du rate limiting
     
-    def __init__(self, webhook_url: str, rate_limit_delay: float = 1.0, max_retries: int = 3):
+    Les messages sont déposés dans une file bornée et envoyés par un thread dédié,
+    de sorte que les producteurs (observer, timeout) ne bloquent jamais sur le réseau.
+    """
+    
+    def __init__(self, webhook_url: str, rate_limit_delay: float = 0.0, max_retries: int = 3,
+                 queue_size: int = 100, drop_policy: str = 'drop_oldest', use_embeds: bool = True,
+                 name: str = "discord", username: str = "EKOS Log Monitor", pool: Optional[DeliveryPool] = None,
+                 rate_limiter: Optional[BucketRateLimiter] = None):
         self.webhook_url = webhook_url
         self.rate_limit_delay = rate_limit_delay
         self.max_retries = max_retries
+        self.network_retries = 0  # Erreurs réseau consécutives (backoff exponentiel)
         self.last_send_time = 0
+        self.packer = MessagePacker(use_embeds=use_embeds)
+        self.alert_packer = MessagePacker(use_embeds=use_embeds, embed_color=0xE53E3E)
+        
+        self.username = username
+        
+        # Budget d'envoi piloté par les en-têtes X-RateLimit-* (rate_limit_delay = délai minimal optionnel),
+        # commun aux profils qui partagent le même webhook
+        self.rate_limiter = rate_limiter or BucketRateLimiter(min_delay=rate_limit_delay)
+        
+        # Session HTTP persistante (keep-alive), créée au premier envoi par le thread d'envoi
+        self.session = None
+        
+        # File d'envoi bornée et thread d'envoi dédié (ou threads partagés du pool)
+        super().__init__(name, queue_size=queue_size, drop_policy=drop_policy, pool=pool)
+    
+    def configure(self, rate_limit_delay: float, max_retries: int):
+        """Appliquer de nouveaux réglages d'envoi (rechargement de la configuration)"""
+        self.rate_limit_delay = rate_limit_delay
+        self.max_retries = max_retries
+        self.rate_limiter.min_delay = rate_limit_delay
+    
+    def ready_in(self) -> float:
+        """Délai avant le prochain envoi normal autorisé par le bucket (ou la fin du backoff réseau)"""
+        return max(self.rate_limiter.delay(PRIORITY_RESERVE), self.retry_in())
+    
+    def _deliver(self, payloads: List[dict]) -> bool:
+        """Envoyer les payloads d'un message dans l'ordre"""
+        for index, payload in enumerate(payloads):
+            # Les alertes arrivées entre-temps passent avant la suite du message
+            self._process_priority()
+            try:
+                # S'arrêter au premier échec: le batch complet sera remis en attente
+                if not self._send_payload(payload):
+                    return False
+            except RetryLater as retry:
+                # Les payloads déjà livrés ne sont pas renvoyés à la reprise
+                raise RetryLater(payloads[index:], retry.delay)
+        return True
     
     def _wait_for_rate_limit(self):
-        """Attendre le délai nécessaire pour respecter le rate limiting"""
-        current_time = time.time()
-        time_since_last_send = current_time - self.last_send_time
+        """Attendre le délai nécessaire pour respecter le rate limiting du bucket Discord
         
-        if time_since_last_send < self.rate_limit_delay:
-            sleep_time = self.rate_limit_delay - time_since_last_send
-            logger.debug(f"Attente de {sleep_time:.2f}s pour respecter le rate limiting")
-            time.sleep(sleep_time)
+        Les envois normaux laissent PRIORITY_RESERVE envoi(s) du bucket aux alertes, et
+        leur attente est interrompue dès qu'une alerte arrive: elle part d'abord.
+        """
+        if self.delivering_priority:
+            RATE_LIMIT_WAIT.observe(self.rate_limiter.acquire())
+            return
+        waited = 0.0
+        while True:
+            delay = self.rate_limiter.delay(PRIORITY_RESERVE)
+            if delay <= 0:
+                break
+            start = time.monotonic()
+            if self.priority_arrived.wait(delay):
+                self._process_priority()
+            waited += time.monotonic() - start
+        RATE_LIMIT_WAIT.observe(waited + self.rate_limiter.acquire(PRIORITY_RESERVE))
     
-    def _send_message(self, content: str, retry_count: int = 0) -> bool:
-        """Envoyer un message vers Discord avec gestion des erreurs"""
+    def _retry_after(self, response) -> Optional[float]:
+        """Extraire le délai d'attente d'une réponse 429 (corps JSON puis en-tête)"""
+        try:
+            return float(response.json().get('retry_after'))
+        except (ValueError, TypeError, AttributeError):
+            pass
         try:
+            return float(response.headers.get('Retry-After', 5))
+        except (ValueError, TypeError):
+            return None
+    
+    def _send_payload(self, payload: dict) -> bool:
+        """Envoyer un payload webhook vers Discord avec gestion des erreurs"""
+        payload = {
+            **payload,
+            "username": self.username,
+            "avatar_url": "https://www.indilib.org/images/ekos-logo.png"
+        }
+        # Pièces jointes: envoi multipart, le JSON passe dans le champ payload_json
+        files = payload.pop("files", None)
+        rate_limit_count = 0
+        if self.session is None:
+            self.session = self._session()
+        from requests.exceptions import RequestException
+        
+        while True:
             self._wait_for_rate_limit()
             
-            payload = {
-                "content": content,
-                "username": "EKOS Log Monitor",
-                "avatar_url": "https://www.indilib.org/images/ekos-logo.png"
-            }
-            
-            response = requests.post(
-                self.webhook_url,
-                json=payload,
-                timeout=10
-            )
+            # Lue après l'attente: une alerte livrée pendant celle-ci avait sa propre trace
+            trace = self.trace
+            if trace is not None:
+                trace.mark('request')
+            start_time = time.perf_counter()
+            try:
+                if files:
+                    response = self.session.post(
+                        self.webhook_url,
+                        data={"payload_json": json.dumps(payload)},
+                        files={f"files[{index}]": file for index, file in enumerate(files)},
+                        timeout=30
+                    )
+                else:
+                    response = self.session.post(
+                        self.webhook_url,
+                        json=payload,
+                        timeout=10
+                    )
+            except RequestException as e:
+                if trace is not None:
+                    trace.mark('response')
+                logger.error(f"Erreur réseau: {e}")
+                if self.network_retries < self.max_retries:
+                    delay = 2 ** self.network_retries  # Backoff exponentiel
+                    self.network_retries += 1
+                    RETRIES.inc()
+                    logger.info(f"Tentative {self.network_retries}/{self.max_retries} dans {delay}s")
+                    if self.pool is not None:
+                        # Threads partagés: le message est repris après le délai, le thread sert les autres sinks
+                        raise RetryLater(None, delay)
+                    time.sleep(delay)
+                    continue
+                self.network_retries = 0
+                SEND_FAILURES.inc()
+                return False
             
+            self.network_retries = 0
+            SEND_LATENCY.observe(time.perf_counter() - start_time)
+            if trace is not None:
+                trace.mark('response')
             self.last_send_time = time.time()
             
-            if response.status_code == 204:
+            if response.status_code == 429:
+                RATE_LIMITED.inc()
+                retry_after = self._retry_after(response)
+                self.rate_limiter.update(response.headers, response.status_code, retry_after)
+                rate_limit_count += 1
+                if rate_limit_count > self.max_retries:
+                    logger.error(f"Rate limit atteint {rate_limit_count} fois, abandon du message")
+                    SEND_FAILURES.inc()
+                    return False
+                logger.warning(f"Rate limit atteint, nouvel essai dans {retry_after}s")
+                RETRIES.inc()
+                continue
+            
+            self.rate_limiter.update(response.headers, response.status_code)
+            if response.status_code in (200, 204):
                 logger.debug("Message envoyé avec succès")
+                PAYLOADS_SENT.inc()
                 return True
-            elif response.status_code == 429:
-                # Rate limit atteint
-                retry_after = int(response.headers.get('Retry-After', 5))
-                logger.warning(f"Rate limit atteint, attente de {retry_after}s")
-                time.sleep(retry_after)
-                return self._send_message(content, retry_count)
-            else:
-                logger.error(f"Erreur lors de l'envoi: {response.status_code} - {response.text}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Erreur réseau: {e}")
-            if retry_count < self.max_retries:
-                logger.info(f"Tentative {retry_count + 1}/{self.max_retries}")
-                time.sleep(2 ** retry_count)  # Backoff exponentiel
-                return self._send_message(content, retry_count + 1)
+            
+            logger.error(f"Erreur lors de l'envoi: {response.status_code} - {response.text}")
+            SEND_FAILURES.inc()
             return False
     
-    def send_logs(self, logs: List[str]) -> bool:
-        """Envoyer une liste de logs vers Discord"""
-        if not logs:
-            return True
-        
-        # Préparer le message
+    def _prepare(self, logs: List[str]) -> List[dict]:
+        """Répartir toutes les lignes dans le minimum de payloads, sans troncature"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        content = f"**📋 Nouveaux logs EKOS - {timestamp}**\n"
-        
-        # Ajouter les logs (limiter à 1900 caractères pour éviter les limites Discord)
-        for log in logs:
-            if len(content + log + "\n") > 1900:
-                content += "...\n*[Message tronqué]*"
-                break
-            content += f"{log}\n"
+        header = f"**📋 Nouveaux logs EKOS - {timestamp}**\n"
+        return self.packer.pack(logs, header)
+    
+    def _prepare_priority(self, logs: List[str]) -> List[dict]:
+        """Message d'alerte: en-tête distinct et embeds rouges"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        header = f"**🚨 Alerte EKOS - {timestamp}**\n"
+        return self.alert_packer.pack(logs, header)
+    
+    def send_digest(self, lines: List[str]) -> bool:
+        """Envoyer un résumé de session en un seul message"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        content = f"**📊 Résumé de session EKOS - {timestamp}**\n" + "\n".join(lines)
+        return self._enqueue([{"content": content[:CONTENT_LIMIT]}], len(lines))
+    
+    def send_image(self, filename: str, data: bytes, mime: str, caption: str) -> bool:
+        """Envoyer une image en pièce jointe (aperçu d'une pose)
         
-        return self._send_message(content)
+        L'image n'est déposée que si la file a de la place: elle ne prend
+        jamais la place d'un batch de lignes.
+        """
+        if self.saturated():
+            logger.debug(f"File d'envoi pleine, aperçu ignoré: {filename}")
+            return False
+        return self._enqueue([{
+            "content": caption[:CONTENT_LIMIT],
+            "embeds": [{"image": {"url": f"attachment://{filename}"}, "color": self.packer.embed_color}],
+            "files": [(filename, data, mime)],
+        }])
     
     def send_startup_message(self) -> bool:
         """Envoyer un message de démarrage"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         content = f"🚀 **EKOS Log Monitor démarré**\n*{timestamp}*\n\nLa surveillance des logs EKOS est maintenant active."
-        return self._send_message(content)
+        return self._enqueue([{"content": content}])
     
     def send_error_message(self, error: str) -> bool:
         """Envoyer un message d'erreur"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         content = f"❌ **Erreur EKOS Log Monitor**\n*{timestamp}*\n\n```{error}```"
-        return self._send_message(content) 
\ No newline at end of file
+        return self._enqueue([{"content": content[:CONTENT_LIMIT]}])
+    
+    def _close(self):
+        self._close_session(self.session)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Faux serveur webhook Discord local, pour les tests et benchmarks hors ligne
+"""
+
+import json
+import time
+import argparse
+import threading
+import email.policy
+from email.parser import BytesParser
+from typing import List, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def parse_body(content_type: str, body: bytes) -> Tuple[Optional[dict], List[Tuple[str, bytes]]]:
+    """Payload JSON et pièces jointes (nom, contenu) d'une requête reçue, JSON ou multipart"""
+    if content_type.startswith('application/json'):
+        return json.loads(body), []
+    if not content_type.startswith('multipart/form-data'):
+        return None, []
+    message = BytesParser(policy=email.policy.HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    payload, files = None, []
+    for part in message.iter_parts():
+        if part.get_filename():
+            files.append((part.get_filename(), part.get_payload(decode=True)))
+        elif part.get_param('name', header='content-disposition') == 'payload_json':
+            payload = json.loads(part.get_payload(decode=True))
+    return payload, files
+
+class FakeWebhookServer:
+    """Serveur HTTP qui imite le rate limiting par bucket d'un webhook Discord"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, limit: int = 5, window: float = 2.0,
+                 latency: float = 0.0, bucket: str = 'fake-webhook-bucket'):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.bucket = bucket
+        self.received: List[dict] = []
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+        self.window_start = 0.0
+        self.window_count = 0
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/webhooks/0/fake"
+
+    def _consume(self) -> tuple:
+        """Consommer une requête du bucket; retourne (accepté, restant, reset_after)"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.window:
+                self.window_start = now
+                self.window_count = 0
+            reset_after = self.window - (now - self.window_start)
+            if self.window_count >= self.limit:
+                self.rate_limited += 1
+                return False, 0, reset_after
+            self.window_count += 1
+            return True, self.limit - self.window_count, reset_after
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                if server.latency:
+                    time.sleep(server.latency)
+
+                accepted, remaining, reset_after = server._consume()
+                if accepted:
+                    with server.lock:
+                        server.received.append({
+                            "time": time.time(),
+                            "content_type": self.headers.get('Content-Type', ''),
+                            "body": body,
+                        })
+                    self.send_response(204)
+                    response = b""
+                else:
+                    self.send_response(429)
+                    response = json.dumps({"message": "You are being rate limited.",
+                                           "retry_after": round(reset_after, 3),
+                                           "global": False}).encode()
+                    self.send_header('Retry-After', str(max(1, round(reset_after))))
+                    self.send_header('Content-Type', 'application/json')
+
+                self.send_header('X-RateLimit-Limit', str(server.limit))
+                self.send_header('X-RateLimit-Remaining', str(remaining))
+                self.send_header('X-RateLimit-Reset-After', f"{reset_after:.3f}")
+                self.send_header('X-RateLimit-Bucket', server.bucket)
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def payloads(self) -> List[dict]:
+        """Retourner les payloads JSON reçus (y compris ceux des envois multipart)"""
+        with self.lock:
+            received = list(self.received)
+        payloads = [parse_body(r["content_type"], r["body"])[0] for r in received]
+        return [payload for payload in payloads if payload is not None]
+
+    def attachments(self) -> List[Tuple[float, str, bytes]]:
+        """Retourner les pièces jointes reçues (heure, nom, contenu)"""
+        with self.lock:
+            received = list(self.received)
+        return [(r["time"], name, data) for r in received if r["content_type"].startswith('multipart/form-data')
+                for name, data in parse_body(r["content_type"], r["body"])[1]]
+
+    def start(self):
+        """Démarrer le serveur dans un thread"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Arrêter le serveur"""
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    """Lancer le faux webhook en avant-plan"""
+    parser = argparse.ArgumentParser(description="Faux webhook Discord local")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--limit", type=int, default=5, help="Requêtes autorisées par fenêtre")
+    parser.add_argument("--window", type=float, default=2.0, help="Durée de la fenêtre (secondes)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence simulée (secondes)")
+    args = parser.parse_args()
+
+    server = FakeWebhookServer(port=args.port, limit=args.limit, window=args.window, latency=args.latency)
+    print(f"🧪 Faux webhook Discord: {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"📊 {len(server.received)} message(s) reçu(s), {server.rate_limited} réponse(s) 429")
+
+if __name__ == "__main__":
+    main()
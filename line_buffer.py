@@ -0,0 +1,430 @@
+import time
+import logging
+import threading
+from array import array
+from collections import Counter, deque
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('pause', 'drop_oldest', 'drop_severity')
+
+# Rang de chaque sévérité: les plus basses sont rejetées en premier (drop_severity)
+SEVERITY_RANKS = {'info': 0, 'warning': 1, 'critical': 2}
+SEVERITY_NAMES = tuple(sorted(SEVERITY_RANKS, key=SEVERITY_RANKS.get))
+
+# Index d'une ligne, une colonne par champ: longueur (4), source (2), fin de ligne (8),
+# heure de lecture (8), sévérité (1)
+COLUMNS = ('lengths', 'source_ids', 'line_ends', 'read_times', 'severities')
+LINE_OVERHEAD = 23
+
+# Texte au plus par bloc de lignes (au-delà, un nouveau bloc est commencé)
+BLOCK_BYTES = 64 * 1024
+
+# Copie décodée d'une ligne confiée aux sinks: objet str (en-tête et texte), place dans
+# la liste, puis le texte une seconde fois dans le message composé
+DECODED_LINE_OVERHEAD = 57
+
+# Place libérée d'un coup lors d'un rejet (fraction de la limite), pour ne pas compacter à chaque ligne
+DROP_HEADROOM = 0.1
+
+# Intervalle minimal entre deux avertissements de rejet (secondes)
+DROP_WARNING_INTERVAL = 60.0
+
+# Mémoire rendue au système après la libération de cette fraction de la limite,
+# au plus une fois par intervalle (secondes)
+TRIM_FRACTION = 0.1
+TRIM_INTERVAL = 1.0
+
+DROPPED_LINES = {policy: REGISTRY.counter('ekos_buffer_dropped_lines_total', "Lignes rejetées faute de mémoire disponible",
+                                          {"policy": policy}) for policy in OVERFLOW_POLICIES[1:]}
+
+class LineBufferPool:
+    """Mémoire partagée par les buffers de lignes d'un moniteur
+
+    Compte les octets des lignes en attente et en cours d'envoi (tous buffers
+    confondus, avec leurs copies décodées confiées aux sinks et les lignes du spool
+    en cours de reprise) face à `limit`, applique la politique de débordement et
+    tient la table des sources (fichier, inode) référencées par les lignes. Une
+    source n'est gardée que tant qu'une ligne y fait référence: son numéro est
+    ensuite réutilisé (rotations et fichiers suivis tour à tour pendant des mois).
+    """
+
+    def __init__(self, limit: int, policy: str = 'pause', labels: Optional[Dict[str, str]] = None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Politique de débordement inconnue: {policy}")
+        self.limit = limit
+        self.policy = policy
+        self.used = 0
+        self.held = 0  # Dont copies décodées confiées aux sinks
+        self.lock = threading.Lock()
+        self.sources: List[Optional[Tuple[str, int]]] = []
+        self.source_ids: Dict[Tuple[str, int], int] = {}
+        self.source_refs: List[int] = []  # Lignes qui référencent chaque source
+        self.free_source_ids: List[int] = []
+        self.dropped = 0
+        self.last_drop_warning = 0.0
+        self.freed = 0  # Octets libérés depuis le dernier trim
+        self.last_trim = 0.0
+        REGISTRY.gauge('ekos_buffer_bytes', "Octets des lignes en attente ou en cours d'envoi", lambda: self.used, labels)
+
+    def buffer(self) -> "LineBuffer":
+        """Nouveau buffer vide rattaché au pool"""
+        return LineBuffer(self)
+
+    def available(self) -> int:
+        """Octets encore disponibles avant la limite"""
+        return self.limit - self.used
+
+    def source_id(self, file_path: str, inode: int) -> int:
+        """Numéro de la source d'une nouvelle ligne (référence comptée jusqu'à `_unref_sources`)"""
+        key = (file_path, inode)
+        with self.lock:
+            source_id = self.source_ids.get(key)
+            if source_id is None:
+                if self.free_source_ids:
+                    source_id = self.free_source_ids.pop()
+                    self.sources[source_id] = key
+                else:
+                    source_id = len(self.sources)
+                    self.sources.append(key)
+                    self.source_refs.append(0)
+                self.source_ids[key] = source_id
+            self.source_refs[source_id] += 1
+        return source_id
+
+    def _unref_sources(self, counts: Counter):
+        """Lignes retirées (livrées ou rejetées): libérer les sources qui ne sont plus référencées"""
+        with self.lock:
+            for source_id, count in counts.items():
+                self.source_refs[source_id] -= count
+                if not self.source_refs[source_id]:
+                    del self.source_ids[self.sources[source_id]]
+                    self.sources[source_id] = None
+                    self.free_source_ids.append(source_id)
+
+    def _account(self, size: int, held: int = 0):
+        with self.lock:
+            self.used += size
+            self.held += held
+            if size < 0:
+                self.freed -= size
+
+    def can_hold(self, size: int) -> bool:
+        """Une nouvelle copie décodée de `size` octets tient-elle dans la limite?
+
+        Toujours vrai quand aucune copie n'est en cours d'envoi: un arriéré avance
+        au moins d'un message à la fois, même buffer plein.
+        """
+        return self.used + size <= self.limit or self.held == 0
+
+    def reserve(self, size: int):
+        """Compter de la mémoire tenue hors des buffers (lignes du spool en cours de reprise)"""
+        self._account(size)
+
+    def release(self, size: int):
+        """Rendre la mémoire comptée par `reserve`"""
+        self._account(-size)
+
+    def trim(self):
+        """Rendre au système la mémoire libérée par les lignes livrées (glibc uniquement)
+
+        L'allocateur garde les pages libérées pour les réutiliser: après des vagues
+        de lectures, de décodages et d'envois, le RSS resterait au plus haut atteint
+        plutôt que de suivre la mémoire réellement en attente.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if self.freed < self.limit * TRIM_FRACTION or now - self.last_trim < TRIM_INTERVAL:
+                return
+            self.freed = 0
+            self.last_trim = now
+        malloc_trim()
+
+    def _record_drop(self, count: int):
+        DROPPED_LINES[self.policy].inc(count)
+        self.dropped += count
+        now = time.monotonic()
+        if now - self.last_drop_warning >= DROP_WARNING_INTERVAL:
+            self.last_drop_warning = now
+            logger.warning(f"⚠️ Mémoire des lignes en attente saturée ({self.limit / (1024 * 1024):g} Mo), "
+                           f"{self.dropped} ligne(s) rejetée(s) ({self.policy})")
+
+_malloc_trim = None
+
+def malloc_trim():
+    """Rendre au système les pages libres du tas (sans effet hors glibc)"""
+    global _malloc_trim
+    if _malloc_trim is None:
+        try:
+            import ctypes
+            _malloc_trim = ctypes.CDLL('libc.so.6').malloc_trim
+        except (OSError, AttributeError):
+            _malloc_trim = False
+    if _malloc_trim:
+        _malloc_trim(0)
+
+def decoded_size(lines: List[str]) -> int:
+    """Mémoire estimée de lignes décodées et des messages composés à partir d'elles"""
+    return sum(2 * len(line) + DECODED_LINE_OVERHEAD for line in lines)
+
+class _Block:
+    """Lignes contiguës d'un buffer: texte UTF-8 et une colonne par champ de l'index"""
+    __slots__ = ('data',) + COLUMNS
+
+    def __init__(self):
+        self.data = bytearray()
+        self.lengths = array('I')
+        self.source_ids = array('H')
+        self.line_ends = array('Q')
+        self.read_times = array('d')
+        self.severities = array('b')
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @property
+    def sealed(self) -> bool:
+        return not isinstance(self.data, bytearray)
+
+    def seal(self):
+        """Bloc complet: copie à la taille exacte de son contenu, sans la marge de croissance"""
+        self.data = bytes(self.data)
+        for name in COLUMNS:
+            setattr(self, name, getattr(self, name)[:])
+
+    def slice(self, start: int, stop: int) -> "_Block":
+        """Copie des lignes [start, stop) du bloc"""
+        block = _Block()
+        begin = sum(self.lengths[:start])
+        block.data = self.data[begin:begin + sum(self.lengths[start:stop])]
+        for name in COLUMNS:
+            setattr(block, name, getattr(self, name)[start:stop])
+        return block
+
+    def compact(self, keep: List[bool]) -> "_Block":
+        """Copie scellée du bloc réduite aux lignes conservées"""
+        block = _Block()
+        columns = [(getattr(self, name), getattr(block, name)) for name in COLUMNS]
+        start = 0
+        for index, length in enumerate(self.lengths):
+            if keep[index]:
+                block.data += self.data[start:start + length]
+                for column, target in columns:
+                    target.append(column[index])
+            start += length
+        block.seal()
+        return block
+
+class LineBuffer:
+    """Lignes en attente d'envoi, stockées en octets UTF-8 avec un index compact
+
+    Une ligne coûte sa longueur plus LINE_OVERHEAD octets, au lieu d'environ
+    350 octets d'objets Python pour un tuple (str, position, heure). Les éléments
+    ajoutés et relus sont des tuples (ligne, (fichier, inode, fin de ligne),
+    heure de lecture, sévérité): les lignes ne sont décodées qu'à la lecture,
+    au moment de composer les messages.
+
+    Les lignes sont rangées par blocs d'au plus BLOCK_BYTES octets de texte:
+    retirer ou remettre des lignes en tête (envoi par morceaux, échec d'envoi)
+    ne recopie jamais plus d'un bloc, quelle que soit la taille du buffer.
+    """
+
+    def __init__(self, pool: LineBufferPool):
+        self.pool = pool
+        self.blocks: Deque[_Block] = deque()
+        self.count = 0
+        self.size = 0  # Octets de texte
+        self.decoded = 0  # Copie décodée confiée aux sinks (comptée jusqu'à release)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        """Octets comptés dans le pool pour ce buffer"""
+        return self.size + LINE_OVERHEAD * self.count + self.decoded
+
+    @property
+    def decoded_estimate(self) -> int:
+        """Taille estimée de la copie décodée des lignes, avant décodage (voir decoded_size)"""
+        return 2 * self.size + DECODED_LINE_OVERHEAD * self.count
+
+    def __iter__(self) -> Iterator[tuple]:
+        sources = self.pool.sources
+        for block in self.blocks:
+            data = block.data
+            start = 0
+            for index, length in enumerate(block.lengths):
+                file_path, inode = sources[block.source_ids[index]]
+                yield (data[start:start + length].decode('utf-8', errors='ignore'),
+                       (file_path, inode, block.line_ends[index]),
+                       block.read_times[index], SEVERITY_NAMES[block.severities[index]])
+                start += length
+
+    def oldest(self) -> Tuple[float, str]:
+        """Heure de lecture et fichier de la ligne la plus ancienne (buffer non vide)"""
+        read_time, block = min(((min(block.read_times), block) for block in self.blocks), key=lambda item: item[0])
+        index = block.read_times.index(read_time)
+        return read_time, self.pool.sources[block.source_ids[index]][0]
+
+    def hold_decoded(self, lines: List[str]):
+        """Compter la copie décodée des lignes confiée aux sinks, jusqu'à la livraison"""
+        size = decoded_size(lines)
+        self.decoded += size
+        self.pool._account(size, size)
+
+    def append(self, item: tuple) -> bool:
+        """Ajouter une ligne; retourne False si elle est rejetée faute de place"""
+        line, (file_path, inode, line_end), read_time, severity = item
+        raw = line.encode('utf-8')
+        size = len(raw) + LINE_OVERHEAD
+        rank = SEVERITY_RANKS[severity]
+        pool = self.pool
+        if pool.policy != 'pause' and pool.used + size > pool.limit:
+            # Libérer un peu plus que nécessaire: un seul compactage pour de nombreuses lignes
+            if not self._make_room(size + int(pool.limit * DROP_HEADROOM), rank):
+                pool._record_drop(1)
+                return False
+        blocks = self.blocks
+        if not blocks or blocks[-1].sealed:
+            blocks.append(_Block())
+        block = blocks[-1]
+        block.data += raw
+        block.lengths.append(len(raw))
+        block.source_ids.append(pool.source_id(file_path, inode))
+        block.line_ends.append(line_end)
+        block.read_times.append(read_time)
+        block.severities.append(rank)
+        if len(block.data) >= BLOCK_BYTES:
+            block.seal()
+        self.count += 1
+        self.size += len(raw)
+        pool._account(size)
+        return True
+
+    def _make_room(self, size: int, rank: int) -> bool:
+        """Rejeter les lignes en attente selon la politique jusqu'à libérer `size` octets
+
+        Seules les lignes de ce buffer peuvent être rejetées (pas celles en cours
+        d'envoi). Avec drop_severity, une ligne n'est jamais rejetée au profit d'une
+        ligne de sévérité plus basse. Retourne False si la nouvelle ligne ne tient pas.
+        """
+        pool = self.pool
+        needed = pool.used + size - pool.limit
+        freed = dropped = 0
+        if pool.policy == 'drop_oldest':
+            for block in self.blocks:
+                for length in block.lengths:
+                    if freed >= needed:
+                        break
+                    freed += length + LINE_OVERHEAD
+                    dropped += 1
+                if freed >= needed:
+                    break
+            self.take(dropped).drop_references()
+        else:
+            masks = [[True] * len(block) for block in self.blocks]
+            for level in range(rank + 1):
+                for block, keep in zip(self.blocks, masks):
+                    if freed >= needed:
+                        break
+                    for index, length in enumerate(block.lengths):
+                        if freed >= needed:
+                            break
+                        if keep[index] and block.severities[index] == level:
+                            keep[index] = False
+                            freed += length + LINE_OVERHEAD
+                            dropped += 1
+            if dropped:
+                counts = Counter()
+                for block, keep in zip(self.blocks, masks):
+                    counts.update(block.source_ids[index] for index, kept in enumerate(keep) if not kept)
+                pool._unref_sources(counts)
+                self._compact(masks)
+        if dropped:
+            pool._account(-freed)
+            pool._record_drop(dropped)
+        # La nouvelle ligne entre si la place manquante (hors marge) a été libérée
+        return pool.used + size - int(pool.limit * DROP_HEADROOM) <= pool.limit
+
+    def _compact(self, masks: List[List[bool]]):
+        """Reconstruire les blocs touchés avec les seules lignes conservées"""
+        blocks: Deque[_Block] = deque()
+        for block, keep in zip(self.blocks, masks):
+            if not all(keep):
+                block = block.compact(keep)
+            if len(block):
+                blocks.append(block)
+        self.blocks = blocks
+        self.count = sum(len(block) for block in blocks)
+        self.size = sum(len(block.data) for block in blocks)
+
+    def count_within(self, max_bytes: int) -> int:
+        """Nombre de premières lignes dont le texte tient dans `max_bytes` octets (au moins une)"""
+        total = count = 0
+        for block in self.blocks:
+            for length in block.lengths:
+                total += length
+                if total > max_bytes:
+                    return max(1, count)
+                count += 1
+        return count
+
+    def take(self, count: int) -> "LineBuffer":
+        """Retirer les `count` premières lignes dans un nouveau buffer (déjà comptées)"""
+        head = LineBuffer(self.pool)
+        blocks = self.blocks
+        remaining = count
+        while remaining and blocks:
+            block = blocks[0]
+            if len(block) <= remaining:
+                head.blocks.append(blocks.popleft())
+                remaining -= len(block)
+            else:
+                # Seul le bloc coupé est recopié
+                head.blocks.append(block.slice(0, remaining))
+                blocks[0] = block.slice(remaining, len(block))
+                remaining = 0
+        head.count = count - remaining
+        head.size = sum(len(block.data) for block in head.blocks)
+        self.count -= head.count
+        self.size -= head.size
+        return head
+
+    def prepend(self, other: "LineBuffer"):
+        """Remettre en tête les lignes d'un autre buffer du même pool (déjà comptées)
+
+        Sa copie décodée, abandonnée (envoi échoué), est rendue au pool.
+        """
+        if other.decoded:
+            self.pool._account(-other.decoded, -other.decoded)
+        if other.blocks and not other.blocks[-1].sealed:
+            # Son dernier bloc ne sera plus complété
+            other.blocks[-1].seal()
+        self.blocks.extendleft(reversed(other.blocks))
+        self.count += other.count
+        self.size += other.size
+        other.clear()
+
+    def clear(self):
+        """Vider le buffer sans toucher au compte du pool"""
+        self.blocks = deque()
+        self.count = 0
+        self.size = 0
+        self.decoded = 0
+
+    def drop_references(self):
+        """Rendre les sources référencées par les lignes du buffer (sans toucher au compte des octets)"""
+        counts = Counter()
+        for block in self.blocks:
+            counts.update(block.source_ids)
+        if counts:
+            self.pool._unref_sources(counts)
+
+    def release(self):
+        """Rendre au pool la mémoire des lignes livrées (ou confiées au spool) et vider le buffer"""
+        self.drop_references()
+        self.pool._account(-self.nbytes, -self.decoded)
+        self.clear()
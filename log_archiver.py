@@ -0,0 +1,264 @@
+import io
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Callable, Optional
+from log_index import ARCHIVE_SUFFIXES, FileMatcher, LogFileIndex
+from log_parser import LEVEL_NAMES, parse_line
+from session_tracker import SessionTracker
+
+logger = logging.getLogger(__name__)
+
+# Extension de chaque format de compression
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+SUMMARY_SUFFIX = '.summary.json'
+
+# Premier passage peu après le démarrage, puis à intervalle régulier (secondes)
+ARCHIVE_START_DELAY = 60.0
+ARCHIVE_SWEEP_INTERVAL = 600.0
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+
+def is_archive(file_path: str) -> bool:
+    """Indiquer si le fichier est un log compressé"""
+    return file_path.endswith(ARCHIVE_SUFFIXES)
+
+def original_path(file_path: str) -> str:
+    """Chemin du log avant compression (log.txt.gz -> log.txt)"""
+    for suffix in ARCHIVE_SUFFIXES:
+        if file_path.endswith(suffix):
+            return file_path[:-len(suffix)]
+    return file_path
+
+def find_archive(file_path: str) -> Optional[str]:
+    """Version compressée d'un log, si elle existe"""
+    for suffix in ARCHIVE_SUFFIXES:
+        if os.path.isfile(file_path + suffix):
+            return file_path + suffix
+    return None
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("La compression zstd nécessite le paquet zstandard (pip install zstandard)")
+    return zstandard
+
+def open_log(file_path: str, mode: str = 'rb'):
+    """Ouvrir un log en lecture, compressé ou non, en flux ('rb' ou 'rt')
+
+    Les offsets d'un fichier compressé comptent les octets décompressés.
+    """
+    if file_path.endswith(COMPRESSIONS['gzip']):
+        raw = gzip.open(file_path, 'rb')
+    elif file_path.endswith(COMPRESSIONS['zstd']):
+        # Le lecteur zstd ne sait pas itérer par ligne: le tamponner
+        raw = io.BufferedReader(_zstandard().ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True))
+    else:
+        raw = open(file_path, 'rb')
+    if 'b' in mode:
+        return raw
+    return io.TextIOWrapper(raw, encoding='utf-8', errors='ignore')
+
+def read_summary(archive_path: str) -> Optional[dict]:
+    """Résumé écrit à côté d'une archive"""
+    try:
+        with open(original_path(archive_path) + SUMMARY_SUFFIX, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def uncompressed_size(file_path: str) -> int:
+    """Taille du log une fois décompressé (d'après le résumé, sinon par lecture complète)"""
+    if not is_archive(file_path):
+        return os.path.getsize(file_path)
+    summary = read_summary(file_path)
+    if summary and "original_size" in summary:
+        return summary["original_size"]
+    size = 0
+    with open_log(file_path) as f:
+        while True:
+            chunk = f.read(ARCHIVE_CHUNK_SIZE)
+            if not chunk:
+                return size
+            size += len(chunk)
+
+class LogArchiver:
+    """Compression en arrière-plan des logs terminés
+
+    Un thread de basse priorité recherche périodiquement les logs inactifs depuis
+    `min_age` secondes, les compresse en flux et écrit à côté un petit résumé JSON
+    (lignes, période, niveaux, cibles, résumé de session). Le fichier d'origine
+    n'est supprimé qu'une fois l'archive complète et synchronisée sur disque.
+
+    Les candidats sont pris dans l'index des fichiers du moniteur (`file_index`),
+    tenu à jour par watchdog: un passage ne coûte qu'une stat par log ancien
+    encore présent. Sans index partagé, l'arborescence est parcourue à chaque passage.
+    """
+
+    def __init__(self, root_directory: str, matcher: Optional[FileMatcher] = None, compression: str = 'gzip',
+                 level: Optional[int] = None, min_age: float = 6 * 3600,
+                 is_busy: Optional[Callable[[str, int], bool]] = None,
+                 on_archived: Optional[Callable[[str, str], None]] = None,
+                 file_index: Optional[LogFileIndex] = None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Compression inconnue: {compression}")
+        if compression == 'zstd':
+            _zstandard()
+        self.root_directory = root_directory
+        self.matcher = matcher or FileMatcher()
+        self.compression = compression
+        self.level = level
+        self.min_age = min_age
+        self.is_busy = is_busy
+        self.on_archived = on_archived
+        self.file_index = file_index
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="log-archiver", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout=10)
+
+    def _run(self):
+        try:
+            # Priorité minimale pour ce thread (Linux: la priorité s'applique par thread)
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError) as e:
+            logger.debug(f"Priorité du thread d'archivage inchangée: {e}")
+        if self.stop_event.wait(ARCHIVE_START_DELAY):
+            return
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Erreur lors de l'archivage des logs: {e}")
+            if self.stop_event.wait(ARCHIVE_SWEEP_INTERVAL):
+                return
+
+    def sweep(self) -> int:
+        """Archiver les logs terminés; retourne le nombre de fichiers archivés"""
+        file_index = self.file_index
+        if file_index is None:
+            file_index = LogFileIndex(self.root_directory, self.matcher)
+            file_index.rebuild()
+        now = time.time()
+        with file_index.lock:
+            candidates = sorted((mtime, file_path) for file_path, mtime in file_index.mtimes.items()
+                                if now - mtime >= self.min_age and not is_archive(file_path))
+        archived = 0
+        for _, file_path in candidates:
+            if self.stop_event.is_set():
+                break
+            # L'index peut être en retard (polling, réconciliation): date et taille réelles
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                file_index.remove(file_path)
+                continue
+            if now - st.st_mtime < self.min_age:
+                file_index.update(file_path, st.st_mtime)
+                continue
+            if self.is_busy is not None and self.is_busy(file_path, st.st_size):
+                continue
+            archive_path = self.archive_file(file_path)
+            if archive_path:
+                # Le log est remplacé par son archive (indexée si le filtre retient les archives)
+                file_index.remove(file_path)
+                file_index.update(archive_path)
+                archived += 1
+        if archived:
+            logger.info(f"{archived} fichier(s) de log archivé(s)")
+        return archived
+
+    def _open_writer(self, archive_path: str):
+        if self.compression == 'zstd':
+            compressor = _zstandard().ZstdCompressor(level=self.level or 10)
+            return compressor.stream_writer(open(archive_path, 'wb'), closefd=True)
+        return gzip.open(archive_path, 'wb', compresslevel=self.level or 6)
+
+    def archive_file(self, file_path: str) -> Optional[str]:
+        """Compresser un log et écrire son résumé; retourne le chemin de l'archive"""
+        archive_path = file_path + COMPRESSIONS[self.compression]
+        tmp_path = f"{archive_path}.tmp"
+        tracker = SessionTracker()
+        levels = Counter()
+        lines = 0
+        first_timestamp = last_timestamp = None
+        try:
+            before = os.stat(file_path)
+            with open(file_path, 'rb') as source, self._open_writer(tmp_path) as writer:
+                partial = b""
+                while True:
+                    chunk = source.read(ARCHIVE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    parts = (partial + chunk).split(b"\n")
+                    partial = parts.pop()
+                    for raw in parts:
+                        line = raw.decode('utf-8', errors='ignore').strip()
+                        if not line:
+                            continue
+                        lines += 1
+                        parsed = parse_line(line)
+                        levels[LEVEL_NAMES.get(parsed.level, str(parsed.level))] += 1
+                        if parsed.timestamp:
+                            first_timestamp = first_timestamp or parsed.timestamp
+                            last_timestamp = parsed.timestamp
+                        tracker.observe(line)
+                if partial.strip():
+                    lines += 1
+            with open(tmp_path, 'rb+') as f:
+                os.fsync(f.fileno())
+
+            after = os.stat(file_path)
+            if (after.st_size, after.st_mtime) != (before.st_size, before.st_mtime):
+                # Écrit pendant la compression: le fichier n'était pas terminé
+                os.remove(tmp_path)
+                logger.info(f"Archivage reporté, fichier modifié pendant la compression: {file_path}")
+                return None
+
+            summary = {
+                "file": os.path.basename(file_path),
+                "archive": os.path.basename(archive_path),
+                "compression": self.compression,
+                "original_size": before.st_size,
+                "compressed_size": os.path.getsize(tmp_path),
+                "lines": lines,
+                "first_timestamp": first_timestamp,
+                "last_timestamp": last_timestamp,
+                "levels": dict(levels),
+                "targets": list(tracker.job_states),
+                "digest": tracker.digest(force=True),
+            }
+            summary_path = file_path + SUMMARY_SUFFIX
+            with open(f"{summary_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            os.replace(f"{summary_path}.tmp", summary_path)
+
+            # L'archive garde la date du log: l'ordre chronologique est conservé
+            os.utime(tmp_path, (before.st_atime, before.st_mtime))
+            os.replace(tmp_path, archive_path)
+            os.remove(file_path)
+        except OSError as e:
+            logger.error(f"Erreur lors de l'archivage de {file_path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return None
+
+        ratio = summary["compressed_size"] / before.st_size if before.st_size else 0.0
+        logger.info(f"Log archivé: {archive_path} ({before.st_size / 1024 / 1024:.1f} Mo -> "
+                    f"{summary['compressed_size'] / 1024 / 1024:.1f} Mo, {ratio:.0%})")
+        if self.on_archived is not None:
+            self.on_archived(file_path, archive_path)
+        return archive_path
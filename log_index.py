@@ -0,0 +1,163 @@
+import os
+import fnmatch
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Extensions des logs archivés (compressés)
+ARCHIVE_SUFFIXES = ('.gz', '.zst')
+
+class FileMatcher:
+    """Sélection des fichiers de log par motifs glob d'inclusion et d'exclusion
+
+    Avec `archives`, les logs compressés (log.txt.gz) sont retenus d'après le nom
+    du log d'origine.
+    """
+
+    def __init__(self, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None, archives: bool = False):
+        self.include = include or ['*.txt']
+        self.exclude = exclude or []
+        self.archives = archives
+
+    @staticmethod
+    def _match(file_path: str, patterns: List[str]) -> bool:
+        name = os.path.basename(file_path)
+        return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(file_path, p) for p in patterns)
+
+    def __call__(self, file_path: str) -> bool:
+        if self.archives and file_path.endswith(ARCHIVE_SUFFIXES):
+            file_path = os.path.splitext(file_path)[0]
+        return self._match(file_path, self.include) and not self._match(file_path, self.exclude)
+
+class LogFileIndex:
+    """Index en mémoire des fichiers de log candidats, indexés par date de modification
+
+    L'index est construit une fois par un parcours `os.scandir`, puis tenu à jour
+    par les événements watchdog. Le fichier le plus récent est connu en O(1).
+    """
+
+    def __init__(self, root_directory: str, matcher: Optional[FileMatcher] = None):
+        self.root_directory = root_directory
+        self.matcher = matcher or FileMatcher()
+        self.mtimes: Dict[str, float] = {}
+        # Taille connue lors du dernier parcours: point de départ d'un fichier pas encore suivi
+        self.sizes: Dict[str, int] = {}
+        self.latest_path: Optional[str] = None
+        self.latest_mtime = float('-inf')
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.mtimes)
+
+    def _scan(self, directory: str, mtimes: Dict[str, float], sizes: Dict[str, int]):
+        """Parcourir un répertoire avec une seule stat par fichier candidat"""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif self.matcher(entry.path) and entry.is_file():
+                                st = entry.stat()
+                                mtimes[entry.path] = st.st_mtime
+                                sizes[entry.path] = st.st_size
+                        except OSError:
+                            continue
+            except OSError as e:
+                logger.debug(f"Répertoire illisible {current}: {e}")
+
+    def _recompute_latest(self):
+        """Recalculer le fichier le plus récent (uniquement après suppression de celui-ci)"""
+        if self.mtimes:
+            self.latest_path = max(self.mtimes, key=self.mtimes.get)
+            self.latest_mtime = self.mtimes[self.latest_path]
+        else:
+            self.latest_path = None
+            self.latest_mtime = float('-inf')
+
+    def rebuild(self) -> int:
+        """(Re)construire l'index par un parcours complet de l'arborescence"""
+        mtimes: Dict[str, float] = {}
+        sizes: Dict[str, int] = {}
+        self._scan(self.root_directory, mtimes, sizes)
+        with self.lock:
+            self.mtimes = mtimes
+            self.sizes = sizes
+            self._recompute_latest()
+        return len(mtimes)
+
+    def update(self, file_path: str, mtime: Optional[float] = None):
+        """Ajouter ou mettre à jour un fichier (création, modification)"""
+        if not self.matcher(file_path):
+            return
+        size = None
+        if mtime is None:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                self.remove(file_path)
+                return
+            mtime, size = st.st_mtime, st.st_size
+        with self.lock:
+            self.mtimes[file_path] = mtime
+            if size is not None:
+                self.sizes[file_path] = size
+            if mtime >= self.latest_mtime:
+                self.latest_path = file_path
+                self.latest_mtime = mtime
+            elif file_path == self.latest_path:
+                self._recompute_latest()
+
+    def remove(self, file_path: str):
+        """Retirer un fichier supprimé"""
+        with self.lock:
+            self.sizes.pop(file_path, None)
+            if self.mtimes.pop(file_path, None) is not None and file_path == self.latest_path:
+                self._recompute_latest()
+
+    def remove_tree(self, directory: str):
+        """Retirer tous les fichiers d'un répertoire supprimé"""
+        prefix = directory.rstrip(os.sep) + os.sep
+        with self.lock:
+            for file_path in [p for p in self.mtimes if p.startswith(prefix)]:
+                del self.mtimes[file_path]
+                self.sizes.pop(file_path, None)
+            if self.latest_path and self.latest_path.startswith(prefix):
+                self._recompute_latest()
+
+    def move(self, src_path: str, dest_path: str):
+        """Suivre un renommage de fichier"""
+        self.remove(src_path)
+        self.update(dest_path)
+
+    def add_tree(self, directory: str):
+        """Indexer un répertoire créé ou déplacé dans l'arborescence"""
+        mtimes: Dict[str, float] = {}
+        sizes: Dict[str, int] = {}
+        self._scan(directory, mtimes, sizes)
+        for file_path, mtime in mtimes.items():
+            self.update(file_path, mtime)
+        with self.lock:
+            self.sizes.update(sizes)
+
+    def size_hint(self, file_path: str) -> Optional[int]:
+        """Dernière taille connue d'un fichier (offset de départ pour un fichier non suivi)"""
+        with self.lock:
+            return self.sizes.get(file_path)
+
+    def set_size_hint(self, file_path: str, size: int):
+        """Mémoriser l'offset atteint quand un fichier cesse d'être suivi"""
+        with self.lock:
+            if file_path in self.mtimes:
+                self.sizes[file_path] = size
+
+    def latest(self) -> Optional[str]:
+        """Fichier le plus récent, en O(1)"""
+        with self.lock:
+            return self.latest_path
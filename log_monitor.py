@@ -2,166 +2,1011 @@ import os
 import time
 import logging
 import threading
-from typing import Optional, List
+from typing import Dict, Optional, List
+from collections import OrderedDict
 from datetime import datetime
 from watchdog.observers import Observer
+from watchdog.observers.api import BaseObserver
 from watchdog.events import FileSystemEventHandler
-from discord_sender import DiscordSender
+from sinks import Sink
+from log_tailer import FileTailer
+from checkpoint_store import CheckpointStore, line_hash
+from batcher import Batcher
+from log_index import FileMatcher, LogFileIndex
+from log_parser import LogFilter
+from deduplicator import Deduplicator
+from metrics import REGISTRY, SIZE_BUCKETS
+from spool import DiskSpool
+from poller import AdaptivePoller
+from alert_rules import SEVERITIES, AlertClassifier
+from session_tracker import SessionTracker
+from thumbnails import ThumbnailService
+from log_archiver import LogArchiver, find_archive, original_path, uncompressed_size
+from line_buffer import LineBufferPool, decoded_size
+from scheduler import Scheduler
+from tracing import Trace, Tracer
 
 logger = logging.getLogger(__name__)
 
+EVENT_READ_DELAY = REGISTRY.histogram('ekos_event_read_delay_seconds', "Délai entre l'écriture d'un fichier et la lecture de ses nouvelles lignes")
+LINES_READ = REGISTRY.counter('ekos_lines_read_total', "Lignes lues dans les fichiers de log")
+LINES_FILTERED = REGISTRY.counter('ekos_lines_filtered_total', "Lignes écartées par le filtre")
+BATCH_SIZE = REGISTRY.histogram('ekos_batch_size_lines', "Nombre de lignes par batch envoyé", SIZE_BUCKETS)
+READ_PAUSES = REGISTRY.counter('ekos_read_pauses_total', "Lectures suspendues faute de mémoire pour les lignes en attente")
+DEDUP_SUMMARIES_LOST = REGISTRY.counter('ekos_dedup_summaries_lost_total', "Résumés de répétitions perdus (spool et file d'envoi indisponibles)")
+
+ALERTS = {severity: REGISTRY.counter('ekos_lines_classified_total', "Lignes classées par sévérité", {"severity": severity})
+          for severity in SEVERITIES}
+LANE_LATENCY = {lane: REGISTRY.histogram('ekos_lane_latency_seconds', "Délai entre la lecture d'une ligne et sa livraison", labels={"lane": lane})
+                for lane in ('critical', 'normal')}
+LANE_TARGET_MISSED = {lane: REGISTRY.counter('ekos_lane_target_missed_total', "Lignes livrées au-delà de l'objectif de latence de leur voie", {"lane": lane})
+                      for lane in ('critical', 'normal')}
+
+# Délai de regroupement des alertes arrivées ensemble sur la voie prioritaire
+ALERT_COALESCE_DELAY = 0.05
+
+# Lecture suspendue (politique pause): reprise quand cette fraction de la limite est libre
+READ_RESUME_FRACTION = 0.25
+
+# Lignes décodées au plus par envoi (et au plus une part de la mémoire des lignes en
+# attente, voir _memory_slice): un arriéré est envoyé par morceaux
+MAX_BATCH_LINES = 1000
+
+# Octets lus au plus d'un coup dans un fichier (lignes décodées en mémoire en même temps),
+# et au plus 1/READ_SLICE_SHARE de la mémoire des lignes en attente. Une tranche décodée
+# occupe environ READ_SLICE_EXPANSION fois sa taille, réservés dans le pool pendant la lecture
+READ_SLICE = 1024 * 1024
+READ_SLICE_SHARE = 64
+MIN_READ_SLICE = 64 * 1024
+READ_SLICE_EXPANSION = 5
+
+# Taille des tranches lues par le rattrapage au démarrage (le verrou est relâché entre deux)
+CATCHUP_SLICE = 1024 * 1024
+
+# Reprise des envois depuis le spool: lignes et octets par message (comptés dans la
+# mémoire des lignes en attente pendant l'envoi), backoff entre deux échecs
+SPOOL_DRAIN_LINES = 200
+SPOOL_DRAIN_BYTES = 256 * 1024
+SPOOL_RETRY_MIN = 2.0
+SPOOL_RETRY_MAX = 300.0
+
+def source_tag(file_path: str) -> str:
+    """Étiquette courte identifiant le fichier d'origine d'une ligne"""
+    return os.path.splitext(os.path.basename(original_path(file_path)))[0]
+
+def tag_sources(lines: List[str], paths: List[Optional[str]]) -> List[str]:
+    """Préfixer chaque ligne par sa source quand le message mélange plusieurs fichiers"""
+    if len(set(paths)) > 1:
+        return [f"`{source_tag(path)}` {line}" if path else line for line, path in zip(lines, paths)]
+    return lines
+
 class LogFileHandler(FileSystemEventHandler):
-    """Gestionnaire d'événements pour les fichiers de logs"""
+    """Gestionnaire d'événements pour les fichiers de logs
+    
+    Plusieurs fichiers sont suivis simultanément, chacun avec son propre offset.
+    Tout est traité dans le thread de l'observer: aucun thread par fichier.
+    """
     
-    def __init__(self, discord_sender: DiscordSender, batch_size: int = 10, batch_timeout: float = 30.0):
-        self.discord_sender = discord_sender
+    def __init__(self, sink: Sink, batch_size: int = 10, batch_timeout: float = 30.0, checkpoint_store: Optional[CheckpointStore] = None, file_index: Optional[LogFileIndex] = None, matcher: Optional[FileMatcher] = None, max_tailed_files: int = 32, log_filter: Optional[LogFilter] = None, deduplicator: Optional[Deduplicator] = None, spool: Optional[DiskSpool] = None, classifier: Optional[AlertClassifier] = None, critical_latency_target: float = 2.0, normal_latency_target: Optional[float] = None, session_tracker: Optional[SessionTracker] = None, digest_interval: float = 900.0, digest_only: bool = False, buffer_max_bytes: int = 16 * 1024 * 1024, overflow_policy: str = 'pause', thumbnailer: Optional[ThumbnailService] = None, labels: Optional[Dict[str, str]] = None, scheduler: Optional[Scheduler] = None, tracer: Optional[Tracer] = None):
+        self.sink = sink
         self.batch_size = batch_size
         self.batch_timeout = batch_timeout
-        self.pending_logs = []
-        self.current_file = None
-        self.file_position = 0
-        self.last_log_time = 0
-        self.batch_timer = None
-        self.timer_lock = threading.Lock()
+        self.checkpoint_store = checkpoint_store
+        self.file_index = file_index
+        self.matcher = matcher or FileMatcher()
+        self.max_tailed_files = max_tailed_files
+        self.log_filter = log_filter
+        self.deduplicator = deduplicator
+        self.spool = spool
+        self.classifier = classifier
+        self.session_tracker = session_tracker
+        self.thumbnailer = thumbnailer
+        # Traçage de la latence de bout en bout (None: désactivé)
+        self.tracer = tracer
+        self.read_trigger = None  # (déclencheur, heure de détection) de la lecture en cours
+        self.digest_interval = digest_interval
+        # Mode résumé: seules les alertes critiques sont envoyées ligne par ligne
+        self.digest_only = digest_only and session_tracker is not None
+        # Le checkpoint ne dépasse jamais une alerte non livrée de la voie prioritaire.
+        # Par fichier: alertes en attente ((inode, fin de ligne) -> position de la ligne
+        # précédente) et position atteinte une fois toutes livrées (résumé seul: fin de
+        # la lecture; sinon: dernière ligne livrée par la voie normale)
+        self.digest_lock = threading.Lock()
+        self.held_alerts: Dict[str, "OrderedDict[tuple, Optional[tuple]]"] = {}
+        self.read_positions: Dict[str, tuple] = {}
+        self.latency_targets = {
+            'critical': critical_latency_target,
+            'normal': normal_latency_target if normal_latency_target is not None else batch_timeout + 5.0,
+        }
+        self.dedup_lock = threading.Lock()  # Le déduplicateur est partagé par les deux voies
+        # Fermeture des fenêtres de répétitions expirées quand plus aucun batch n'arrive
+        self.scheduler = scheduler
+        self.dedup_task = None  # Tâche de l'échéancier partagé
+        self.dedup_timer: Optional[threading.Timer] = None  # Sans échéancier
+        self.dedup_due = 0.0  # Échéance du timer (time.monotonic())
+        self.current_file = None  # Fichier le plus récent (fichier principal)
+        self.tailers: "OrderedDict[str, FileTailer]" = OrderedDict()  # Ordre LRU
+        self.tailers_lock = threading.RLock()
+        self.last_event_time = time.monotonic()  # Dernier événement watchdog reçu
         self.running = True
         
-        # Démarrer le thread de surveillance du timeout
-        self.timeout_thread = threading.Thread(target=self._timeout_monitor, daemon=True)
-        self.timeout_thread.start()
+        # Lignes en attente stockées en octets compacts, mémoire bornée pour les deux voies
+        self.buffer_pool = LineBufferPool(buffer_max_bytes, overflow_policy, labels)
+        self.reading_paused = False
+        
+        # Batching événementiel: envoi à l'échéance exacte, aucun réveil au repos
+        self.batcher = Batcher(self._send_pending_logs, batch_size, batch_timeout, name="log-batcher",
+                               buffer_factory=self.buffer_pool.buffer, scheduler=scheduler)
+        REGISTRY.gauge('ekos_pending_logs', "Lignes en attente dans le batch courant", lambda: len(self.batcher), labels)
+        
+        # Voie prioritaire: les lignes critiques partent sans attendre l'échéance du batch
+        self.alert_batcher = None
+        if classifier is not None:
+            # Thread propre même avec un échéancier partagé: une tâche lente d'un autre profil
+            # (réconciliation de l'index) ne retarde jamais les alertes
+            self.alert_batcher = Batcher(self._send_alerts, batch_size, ALERT_COALESCE_DELAY, name="alert-batcher",
+                                         buffer_factory=self.buffer_pool.buffer)
+        
+        # Les envois échoués passent par le spool, vidé par un thread dédié
+        self.spool_wakeup = threading.Event()
+        self.spool_stop = threading.Event()
+        self.spool_thread = None
+        if spool is not None:
+            self.spool_thread = threading.Thread(target=self._drain_spool, name="spool-drain", daemon=True)
+            self.spool_thread.start()
+            if not spool.empty():
+                self.spool_wakeup.set()
+        
+        # Résumés de session périodiques
+        self.digest_stop = threading.Event()
+        self.digest_thread = None
+        if session_tracker is not None:
+            self.digest_thread = threading.Thread(target=self._digest_loop, name="session-digest", daemon=True)
+            self.digest_thread.start()
+    
+    def _add_log_to_batch(self, tailer: FileTailer, log_line: str, line_end: int, severity: str = 'info'):
+        """Ajouter un log au batch de sa voie (l'envoi est déclenché par le batcher)"""
+        position = (tailer.file_path, tailer.inode, line_end)
+        batcher = self.alert_batcher if severity == 'critical' else self.batcher
+        batcher.add((log_line, position, time.monotonic(), severity))
     
-    def _timeout_monitor(self):
-        """Thread de surveillance du timeout de batch"""
-        while self.running:
+    def on_created(self, event):
+        """Appelé quand un nouveau fichier est créé"""
+        self.last_event_time = time.monotonic()
+        if event.is_directory:
+            if self.file_index:
+                self.file_index.add_tree(event.src_path)
+            return
+        self._handle_created(event.src_path)
+    
+    def _handle_created(self, file_path: str):
+        """Suivre un nouveau fichier (événement watchdog ou détection par polling)"""
+        if self.matcher(file_path):
+            if self.file_index:
+                self.file_index.update(file_path)
+            logger.info(f"Nouveau fichier de log détecté: {file_path}")
+            # Un fichier neuf n'a pas d'historique: le lire depuis le début
+            self._track_file(file_path, from_start=True)
+            self.current_file = file_path
+    
+    def on_moved(self, event):
+        """Appelé quand un fichier ou un répertoire est renommé"""
+        if not event.is_directory:
+            self._untrack_file(event.src_path)
+        if not self.file_index:
+            return
+        if event.is_directory:
+            self.file_index.remove_tree(event.src_path)
+            self.file_index.add_tree(event.dest_path)
+        else:
+            self.file_index.move(event.src_path, event.dest_path)
+    
+    def on_deleted(self, event):
+        """Appelé quand un fichier ou un répertoire est supprimé"""
+        if not event.is_directory:
+            self._untrack_file(event.src_path)
+        if not self.file_index:
+            return
+        if event.is_directory:
+            self.file_index.remove_tree(event.src_path)
+        else:
+            self.file_index.remove(event.src_path)
+    
+    def on_modified(self, event):
+        """Appelé quand un fichier est modifié"""
+        self.last_event_time = time.monotonic()
+        if not event.is_directory:
+            self._handle_modified(event.src_path, 'event', self.last_event_time)
+    
+    def _handle_modified(self, file_path: str, trigger: str = 'poll', detected: Optional[float] = None):
+        """Lire les lignes ajoutées à un fichier (événement watchdog ou détection par polling)"""
+        if self.matcher(file_path):
+            if detected is None:
+                detected = time.monotonic()
+            if self.file_index:
+                # L'heure de l'événement tient lieu de mtime: pas de stat supplémentaire
+                self.file_index.update(file_path, time.time())
+            with self.tailers_lock:
+                self.read_trigger = (trigger, detected)
+                if file_path not in self.tailers:
+                    # Fichier actif non suivi: le suivre à partir de son checkpoint, ou de la
+                    # taille connue avant cette modification, pour ne rien manquer
+                    offset_hint = self.file_index.size_hint(file_path) if self.file_index else None
+                    self._track_file(file_path, resume=True, offset_hint=offset_hint)
+                else:
+                    self.tailers.move_to_end(file_path)
+                    if self._read_new_lines(file_path):
+                        tailer = self.tailers.get(file_path)
+                        if tailer is not None and tailer.mtime is not None:
+                            EVENT_READ_DELAY.observe(max(0.0, time.time() - tailer.mtime))
+                self.read_trigger = None
+    
+    def _switch_to_new_file(self, file_path: str, resume: bool = False):
+        """Basculer le fichier principal vers un nouveau fichier de log"""
+        self.current_file = file_path
+        self._track_file(file_path, resume=resume)
+    
+    def _track_file(self, file_path: str, resume: bool = False, from_start: bool = False, offset_hint: Optional[int] = None, read: bool = True) -> Optional[FileTailer]:
+        """Commencer à suivre un fichier (sans arrêter le suivi des autres)
+        
+        Retourne le nouveau tailer (None si le fichier était déjà suivi). Sans `read`,
+        le tailer est seulement positionné: l'arriéré reste à lire.
+        """
+        with self.tailers_lock:
+            if file_path in self.tailers:
+                self.tailers.move_to_end(file_path)
+                return None
+            
+            tailer = FileTailer(file_path)
+            self.tailers[file_path] = tailer
+            logger.info(f"Surveillance du fichier: {file_path} ({len(self.tailers)} fichier(s) suivi(s))")
+            self._evict_idle_tailers()
+            
             try:
-                with self.timer_lock:
-                    if self.pending_logs and self.last_log_time > 0:
-                        time_since_last_log = time.time() - self.last_log_time
-                        if time_since_last_log >= self.batch_timeout:
-                            logger.debug(f"Timeout de batch atteint ({self.batch_timeout}s), envoi des {len(self.pending_logs)} logs")
-                            self._send_pending_logs()
-                            self.last_log_time = 0  # Reset timer
-                
-                time.sleep(1)  # Vérifier toutes les secondes
+                if resume and self._resume_from_checkpoint(file_path, read=read):
+                    return tailer
+                if from_start or offset_hint is not None:
+                    tailer.resume_from(os.stat(file_path).st_ino, 0 if from_start else offset_hint)
+                    if read:
+                        self._read_new_lines(file_path)
+                    return tailer
                 
+                # Se positionner en fin de fichier pour éviter d'envoyer l'historique
+                tailer.seek_to_end()
+                self._commit_checkpoint(file_path, tailer.inode, tailer.offset,
+                                        tailer.line_before(tailer.offset))
+                logger.info(f"Position initiale: {tailer.offset} octets")
             except Exception as e:
-                logger.error(f"Erreur dans le thread de timeout: {e}")
-                time.sleep(5)  # Attendre un peu en cas d'erreur
+                logger.error(f"Erreur lors de la lecture du fichier {file_path}: {e}")
+            return tailer
+    
+    def catch_up(self, tailer: FileTailer, stop_event: Optional[threading.Event] = None):
+        """Rattraper par tranches l'arriéré d'un fichier suivi (positionné avec `read=False`)
+        
+        Le verrou des fichiers suivis est relâché entre deux tranches: le suivi des
+        autres fichiers continue pendant un long rattrapage.
+        """
+        file_path = tailer.file_path
+        start_offset = tailer.offset
+        start_time = time.perf_counter()
+        while stop_event is None or not stop_event.is_set():
+            with self.tailers_lock:
+                if self.tailers.get(file_path) is not tailer:
+                    break  # Retiré du suivi entre-temps
+                offset = tailer.offset
+                self._read_new_lines(file_path, max_bytes=CATCHUP_SLICE)
+                if tailer.offset == offset:
+                    break
+        caught_up = tailer.offset - start_offset
+        if self.reading_paused:
+            # La suite sera lue à la reprise de la lecture
+            logger.info(f"Rattrapage suspendu pour {file_path} (mémoire pleine) après {caught_up / (1024 * 1024):.2f} Mo")
+        elif caught_up:
+            elapsed = time.perf_counter() - start_time
+            rate = caught_up / (1024 * 1024) / elapsed if elapsed > 0 else float('inf')
+            logger.info(f"Rattrapage terminé pour {file_path}: {caught_up / (1024 * 1024):.2f} Mo en {elapsed:.2f}s ({rate:.1f} Mo/s)")
+    
+    def _untrack_file(self, file_path: str):
+        """Arrêter de suivre un fichier supprimé ou renommé"""
+        with self.tailers_lock:
+            if self.tailers.pop(file_path, None) is not None:
+                logger.info(f"Fin du suivi du fichier: {file_path}")
+        with self.digest_lock:
+            self.held_alerts.pop(file_path, None)
+            self.read_positions.pop(file_path, None)
+    
+    def is_file_busy(self, file_path: str, size: int) -> bool:
+        """Un fichier ne peut pas être archivé tant qu'il est courant ou pas entièrement livré"""
+        if file_path == self.current_file:
+            return True
+        with self.tailers_lock:
+            tailer = self.tailers.get(file_path)
+            if tailer is not None and tailer.line_offset < size:
+                return True
+        if self.checkpoint_store:
+            checkpoint = self.checkpoint_store.get(file_path)
+            if checkpoint and checkpoint["offset"] < size:
+                return True
+        return False
     
-    def _reset_batch_timer(self):
-        """Réinitialiser le timer de batch"""
-        with self.timer_lock:
-            self.last_log_time = time.time()
+    def on_file_archived(self, file_path: str, archive_path: str):
+        """Appelé par l'archiveur une fois le fichier remplacé par son archive"""
+        self._untrack_file(file_path)
+        if self.checkpoint_store:
+            self.checkpoint_store.remove(file_path)
     
-    def _add_log_to_batch(self, log_line: str):
-        """Ajouter un log au batch et gérer l'envoi"""
-        self.pending_logs.append(log_line)
-        self._reset_batch_timer()  # Réinitialiser le timer
+    def _evict_idle_tailers(self):
+        """Limiter le nombre de fichiers suivis en retirant les moins récemment actifs"""
+        while len(self.tailers) > self.max_tailed_files:
+            file_path = next(iter(self.tailers))
+            if file_path == self.current_file:
+                self.tailers.move_to_end(file_path)
+                continue
+            # Lire ce qui reste avant d'abandonner le fichier
+            self._read_new_lines(file_path)
+            tailer = self.tailers.pop(file_path, None)
+            if tailer is None:
+                continue  # Archive relue jusqu'au bout, déjà retirée du suivi
+            if self.file_index:
+                self.file_index.set_size_hint(file_path, tailer.line_offset)
+            logger.info(f"Fichier inactif retiré du suivi: {file_path}")
+    
+    def _resume_from_checkpoint(self, file_path: str, read: bool = True) -> bool:
+        """Reprendre la lecture depuis le checkpoint et rattraper le retard (sans `read`: se positionner seulement)"""
+        tailer = self.tailers[file_path]
+        checkpoint = self.checkpoint_store.get(file_path) if self.checkpoint_store else None
+        if not checkpoint:
+            return False
+        
+        st = os.stat(file_path)
+        offset = checkpoint["offset"]
+        if st.st_ino != checkpoint["inode"] or st.st_size < offset:
+            logger.warning(f"Checkpoint obsolète pour {file_path}, ignoré")
+            return False
+        
+        expected_hash = checkpoint.get("last_line_hash")
+        if expected_hash and line_hash(tailer.line_before(offset) or "") != expected_hash:
+            logger.warning(f"Checkpoint incohérent pour {file_path} (dernière ligne différente), ignoré")
+            return False
+        
+        tailer.resume_from(st.st_ino, offset)
+        backlog = st.st_size - offset
+        logger.info(f"Reprise depuis le checkpoint: offset {offset}, {backlog} octets à rattraper")
+        if not read:
+            return True
         
-        # Envoyer si le batch est plein
-        if len(self.pending_logs) >= self.batch_size:
-            logger.debug(f"Batch plein ({self.batch_size} logs), envoi immédiat")
-            self._send_pending_logs()
-            self.last_log_time = 0  # Reset timer après envoi
+        start_time = time.perf_counter()
+        self._read_new_lines(file_path)
+        elapsed = time.perf_counter() - start_time
+        if backlog:
+            rate = backlog / (1024 * 1024) / elapsed if elapsed > 0 else float('inf')
+            logger.info(f"Rattrapage terminé: {backlog / (1024 * 1024):.2f} Mo en {elapsed:.2f}s ({rate:.1f} Mo/s)")
+        return True
     
-    def on_created(self, event):
-        """Appelé quand un nouveau fichier est créé"""
-        if not event.is_directory and event.src_path.endswith('.txt'):
-            logger.info(f"Nouveau fichier de log détecté: {event.src_path}")
-            self._switch_to_new_file(event.src_path)
+    def _commit_checkpoint(self, file_path: str, inode: Optional[int], offset: int, last_line: Optional[str]):
+        """Mémoriser la position de la dernière ligne livrée"""
+        if self.checkpoint_store and inode is not None:
+            self.checkpoint_store.update(file_path, inode, offset, last_line)
     
-    def on_modified(self, event):
-        """Appelé quand un fichier est modifié"""
-        if not event.is_directory and event.src_path.endswith('.txt'):
-            if event.src_path == self.current_file:
-                self._read_new_lines(event.src_path)
+    def _hold_checkpoint(self, tailer: FileTailer, line_end: int, previous: Optional[tuple]):
+        """Retenir le checkpoint avant une alerte tant qu'elle n'est pas livrée
+        
+        `previous` est la ligne qui la précède dans la tranche lue (None: la position
+        atteinte avant cette tranche).
+        """
+        with self.digest_lock:
+            held = self.held_alerts.setdefault(tailer.file_path, OrderedDict())
+            if previous is not None:
+                position = (tailer.inode,) + previous
+            else:
+                position = self.read_positions.get(tailer.file_path)
+            held[(tailer.inode, line_end)] = position
     
-    def _switch_to_new_file(self, file_path: str):
-        """Basculer vers un nouveau fichier de log"""
-        self.current_file = file_path
-        self.file_position = 0
-        logger.info(f"Surveillance du fichier: {file_path}")
+    def _advance_read_position(self, tailer: FileTailer, line_end: int, line: str):
+        """Résumé seul: avancer le checkpoint à la fin de la lecture, ou avant la première alerte en attente"""
+        position = (tailer.inode, line_end, line)
+        with self.digest_lock:
+            self.read_positions[tailer.file_path] = position
+            position = self._checkpoint_position(tailer.file_path)
+            if position is not None:
+                self._commit_checkpoint(tailer.file_path, *position)
+    
+    def _checkpoint_position(self, file_path: str) -> Optional[tuple]:
+        """Position du checkpoint sans dépasser la première alerte non livrée (verrou tenu)"""
+        position = self.read_positions.get(file_path)
+        held = self.held_alerts.get(file_path)
+        if not held:
+            return position
+        before = next(iter(held.values()))
+        if self.digest_only:
+            # Rien d'autre en attente: juste avant la première alerte non livrée
+            return before
+        if before is None or position is None:
+            return None
+        if before[0] == position[0] and position[1] <= before[1]:
+            return position  # Des lignes normales antérieures à l'alerte attendent encore
+        return before
+    
+    def _release_held_alerts(self, batch: List[tuple], delivered: Optional[Dict[str, tuple]] = None):
+        """Alertes livrées ou dans le spool, le checkpoint avance jusqu'à la suivante
         
-        # Lire les dernières lignes du fichier pour éviter d'envoyer l'historique
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-                self.file_position = len(lines)
-                logger.info(f"Position initiale: {self.file_position} lignes")
-        except Exception as e:
-            logger.error(f"Erreur lors de la lecture du fichier {file_path}: {e}")
+        `delivered`: dernière ligne de chaque fichier livrée par la voie normale. Une
+        alerte rejetée par la mémoire bornée n'est jamais libérée: le checkpoint reste
+        avant elle et elle sera relue au prochain démarrage.
+        """
+        with self.digest_lock:
+            released = set()
+            for _, (file_path, inode, line_end), _, _ in batch:
+                held = self.held_alerts.get(file_path)
+                if held is not None and held.pop((inode, line_end), False) is not False:
+                    released.add(file_path)
+            if delivered:
+                for file_path, position in delivered.items():
+                    current = self.read_positions.get(file_path)
+                    # Livraison tardive d'une alerte remise en tête: la position ne recule pas
+                    if current is None or current[0] != position[0] or current[1] < position[1]:
+                        self.read_positions[file_path] = position
+                released.update(delivered)
+            for file_path in released:
+                position = self._checkpoint_position(file_path)
+                if position is not None:
+                    self._commit_checkpoint(file_path, *position)
+    
+    def _rewind_checkpoint(self, tailer: FileTailer):
+        """Fichier tronqué ou remplacé: le checkpoint repart du début, l'ancien contenu est oublié"""
+        with self.digest_lock:
+            self.held_alerts.pop(tailer.file_path, None)
+            self.read_positions.pop(tailer.file_path, None)
+        if self.checkpoint_store and tailer.inode is not None:
+            self.checkpoint_store.update(tailer.file_path, tailer.inode, 0, None, rewind=True)
+    
+    def _read_new_lines(self, file_path: str, max_bytes: Optional[int] = None) -> int:
+        """Lire les nouvelles lignes ajoutées au fichier; retourne le nombre de lignes lues
+        
+        La lecture se fait par tranches de READ_SLICE: un gros ajout n'est jamais
+        décodé d'un seul bloc en mémoire.
+        """
+        tailer = self.tailers.get(file_path)
+        if tailer is None:
+            return 0
+        start_offset = tailer.offset
+        count = 0
+        pool = self.buffer_pool
+        read_slice = self._memory_slice()
+        while max_bytes is None or tailer.offset - start_offset < max_bytes:
+            offset = tailer.offset
+            slice_bytes = read_slice if max_bytes is None else min(read_slice, max_bytes - (offset - start_offset))
+            if pool.policy == 'pause':
+                # Mémoire pleine: les lignes restent dans le fichier, l'offset ne bouge pas
+                available = pool.available() // (READ_SLICE_EXPANSION + 1)
+                if available <= 0:
+                    self._pause_reading()
+                    break
+                slice_bytes = min(slice_bytes, available)
+            # Tranche décodée comptée le temps de répartir ses lignes (qui sont comptées à leur tour)
+            decoded = slice_bytes * READ_SLICE_EXPANSION
+            pool.reserve(decoded)
+            try:
+                count += self._read_slice(tailer, slice_bytes)
+            finally:
+                pool.release(decoded)
+            if tailer.offset < offset:
+                # Rotation ou troncature: la lecture est repartie du début du fichier
+                start_offset = offset = 0
+            if tailer.offset - offset < slice_bytes:
+                break  # Fin du fichier atteinte
+        if tailer.exhausted:
+            self._drop_exhausted_archive(tailer)
+        return count
+    
+    def _drop_exhausted_archive(self, tailer: FileTailer):
+        """Une archive relue jusqu'au bout ne grandit plus: la retirer du suivi"""
+        with self.tailers_lock:
+            if self.tailers.get(tailer.file_path) is tailer:
+                del self.tailers[tailer.file_path]
+                logger.info(f"Archive entièrement relue, retirée du suivi: {tailer.file_path}")
     
-    def _read_new_lines(self, file_path: str):
-        """Lire les nouvelles lignes ajoutées au fichier"""
+    def _memory_slice(self) -> int:
+        """Octets lus, envoyés ou repris du spool d'un coup: une part de la mémoire des lignes en attente"""
+        return min(READ_SLICE, max(MIN_READ_SLICE, self.buffer_pool.limit // READ_SLICE_SHARE))
+    
+    def _read_slice(self, tailer: FileTailer, max_bytes: int) -> int:
+        """Lire au plus `max_bytes` octets et répartir les lignes entre les voies"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-                
-                if len(lines) > self.file_position:
-                    new_lines = lines[self.file_position:]
-                    self.file_position = len(lines)
-                    
-                    # Traiter les nouvelles lignes
-                    for line in new_lines:
-                        line = line.strip()
-                        if line:  # Ignorer les lignes vides
-                            self._add_log_to_batch(line)
+            # Seuls les octets ajoutés depuis le dernier offset sont lus
+            log_filter = self.log_filter
+            classifier = self.classifier
+            tracker = self.session_tracker
+            thumbnailer = self.thumbnailer
+            digest_only = self.digest_only
+            tracer = self.tracer
+            read_start = time.monotonic() if tracer is not None else 0.0
+            resets = tailer.resets
+            lines = tailer.read_lines(max_bytes)
+            filtered = 0
+            if tailer.resets != resets:
+                self._rewind_checkpoint(tailer)
+            previous = None  # Ligne précédente de la tranche (position juste avant une alerte)
+            for line, line_end in lines:
+                # Le suivi de session et les aperçus voient toutes les lignes, filtrées ou non
+                if tracker is not None:
+                    tracker.observe(line)
+                if thumbnailer is not None:
+                    thumbnailer.observe(line)
+                if digest_only:
+                    if classifier is not None and classifier.classify(line) == 'critical':
+                        ALERTS['critical'].inc()
+                        self._hold_checkpoint(tailer, line_end, previous)
+                        self._add_log_to_batch(tailer, line, line_end, 'critical')
+                    previous = (line_end, line)
+                    continue
+                # Les lignes filtrées n'atteignent jamais le batch
+                if log_filter is None or log_filter.accepts(line):
+                    if classifier is None:
+                        self._add_log_to_batch(tailer, line, line_end)
+                        continue
+                    severity = classifier.classify(line)
+                    ALERTS[severity].inc()
+                    if severity == 'critical':
+                        self._hold_checkpoint(tailer, line_end, previous)
+                    self._add_log_to_batch(tailer, line, line_end, severity)
+                else:
+                    filtered += 1
+                previous = (line_end, line)
+            LINES_READ.inc(len(lines))
+            if tracer is not None and lines:
+                if self.read_trigger is not None:
+                    trigger, detected = self.read_trigger
+                    tracer.record_read(tailer.file_path, trigger, detected, tailer.mtime, read_start)
+                else:
+                    # Rattrapage ou reprise: la date du fichier ne dit rien des lignes anciennes
+                    tracer.record_read(tailer.file_path, 'catchup', read_start, None, read_start)
+            if digest_only and lines:
+                line, line_end = lines[-1]
+                self._advance_read_position(tailer, line_end, line)
+            if filtered:
+                LINES_FILTERED.inc(filtered)
+            return len(lines)
                         
         except Exception as e:
-            logger.error(f"Erreur lors de la lecture du fichier {file_path}: {e}")
-    
-    def _send_pending_logs(self):
-        """Envoyer les logs en attente vers Discord"""
-        if self.pending_logs:
-            logger.info(f"Envoi de {len(self.pending_logs)} logs vers Discord")
-            if self.discord_sender.send_logs(self.pending_logs):
-                self.pending_logs = []
+            logger.error(f"Erreur lors de la lecture du fichier {tailer.file_path}: {e}")
+            return 0
+    
+    def _batch_lines(self, batch: List[tuple]) -> List[str]:
+        """Texte des lignes d'un batch, étiquetées par source et dédupliquées"""
+        # Les lignes ne sont décodées qu'ici, une seule fois par batch (sans tuple par ligne)
+        lines = []
+        paths = []
+        for line, position, _, _ in batch:
+            lines.append(line)
+            paths.append(position[0])
+        
+        if self.deduplicator:
+            # Empreinte de la ligne brute, répétitions comptées par fichier
+            with self.dedup_lock:
+                emitted = self.deduplicator.process(lines, sources=paths)
+                self._schedule_dedup_expiry()
+            paths = [path for path, _ in emitted]
+            lines = [line for _, line in emitted]
+        # Plusieurs fichiers dans le même message: préfixer chaque ligne par sa source
+        return tag_sources(lines, paths)
+    
+    def _schedule_dedup_expiry(self):
+        """Programmer la fermeture de la prochaine fenêtre à résumer (verrou du déduplicateur tenu)"""
+        delay = self.deduplicator.next_expiry() if self.deduplicator else None
+        if delay is None or not self.running:
+            return
+        if self.scheduler is not None:
+            if self.dedup_task is None:
+                self.dedup_task = self.scheduler.add("dedup-expiry", self._expire_dedup, delay)
+            else:
+                self.scheduler.wake(self.dedup_task, delay)
+            return
+        due = time.monotonic() + delay
+        if self.dedup_timer is not None:
+            if self.dedup_due <= due:
+                return
+            self.dedup_timer.cancel()
+        self.dedup_timer = threading.Timer(delay, self._on_dedup_timer)
+        self.dedup_timer.daemon = True
+        self.dedup_timer.start()
+        self.dedup_due = due
+    
+    def _expire_dedup(self) -> Optional[float]:
+        """Résumer les rafales dont la fenêtre a expiré; retourne le délai avant la suivante"""
+        with self.dedup_lock:
+            if not self.deduplicator or not self.running:
+                return None
+            summaries = self.deduplicator.expire()
+            delay = self.deduplicator.next_expiry()
+        self._send_dedup_summaries(summaries)
+        return delay
+    
+    def _on_dedup_timer(self):
+        with self.dedup_lock:
+            self.dedup_timer = None
+        self._expire_dedup()
+        with self.dedup_lock:
+            self._schedule_dedup_expiry()
+    
+    def _observe_latency(self, batch: List[tuple], lane: str):
+        """Mesurer le délai lecture -> livraison de chaque ligne par rapport à l'objectif de la voie"""
+        now = time.monotonic()
+        histogram, target = LANE_LATENCY[lane], self.latency_targets[lane]
+        missed = 0
+        for _, _, read_time, _ in batch:
+            latency = now - read_time
+            histogram.observe(latency)
+            if latency > target:
+                missed += 1
+        if missed:
+            LANE_TARGET_MISSED[lane].inc(missed)
+    
+    def _trace(self, lane: str, batch) -> Trace:
+        """Commencer la trace d'un batch au moment de son envoi"""
+        read_time, file_path = batch.oldest()
+        return self.tracer.begin(lane, self.sink.primary.name, len(batch), read_time, file_path)
+    
+    def _send_alerts(self, batch: List[tuple]):
+        """Envoyer immédiatement les lignes critiques (appelé par le batcher de la voie prioritaire)"""
+        logger.info(f"Envoi prioritaire de {len(batch)} alerte(s)")
+        lines = self._batch_lines(batch)
+        if not lines:
+            # Uniquement des répétitions: rien à envoyer, mais les alertes sont traitées
+            self._on_alerts_delivered(batch, True)
+            return
+        trace = self._trace('critical', batch) if self.tracer is not None else None
+        batch.hold_decoded(lines)
+        if not self.sink.send_logs(lines, lambda success: self._on_alerts_delivered(batch, success), priority=True, trace=trace):
+            self._on_alerts_delivered(batch, False)
+    
+    def _on_alerts_delivered(self, batch: List[tuple], success: bool):
+        """Les alertes livrées ne retiennent plus le checkpoint, qui ne les dépasse que
+        lorsque les lignes plus anciennes de la voie normale sont livrées à leur tour"""
+        if success:
+            self._observe_latency(batch, 'critical')
+            self._release_held_alerts(batch)
+            self._release(batch)
+            return
+        # Échec: confier les alertes à la voie normale (nouvel essai, spool, checkpoint)
+        logger.error("Échec de l'envoi prioritaire, alertes remises dans la voie normale")
+        self.batcher.requeue(batch)
+    
+    def _send_pending_logs(self, batch: List[tuple]):
+        """Mettre en file un batch de logs vers les sinks (appelé par le batcher)"""
+        if self.sink.saturated():
+            # Contre-pression: la file d'envoi est pleine, les lignes attendent dans le
+            # buffer (borné: la lecture est suspendue ou des lignes sont rejetées)
+            self.batcher.requeue(batch)
+            return
+        count = min(MAX_BATCH_LINES, batch.count_within(self._memory_slice()))
+        if len(batch) > count:
+            # Arriéré (panne, rattrapage): la suite repasse en tête et part après ce morceau
+            rest = batch
+            batch = rest.take(count)
+            self.batcher.requeue(rest)
+        if not self.buffer_pool.can_hold(batch.decoded_estimate):
+            # Mémoire pleine: le morceau attend en tête la livraison des messages déjà en file
+            self.batcher.requeue(batch)
+            return
+        logger.info(f"Envoi de {len(batch)} logs vers Discord")
+        BATCH_SIZE.observe(len(batch))
+        lines = self._batch_lines(batch)
+        if not lines:
+            # Uniquement des répétitions: rien à envoyer, mais les lignes sont traitées
+            self._on_batch_delivered(batch, lines, True)
+            return
+        if self.spool is not None and not self.spool.empty():
+            # Des lignes plus anciennes attendent dans le spool: conserver l'ordre
+            self._spool_batch(batch, lines)
+            return
+        trace = self._trace('normal', batch) if self.tracer is not None else None
+        # Les messages en file restent comptés dans la mémoire bornée jusqu'à leur livraison
+        batch.hold_decoded(lines)
+        if not self.sink.send_logs(lines, lambda success: self._on_batch_delivered(batch, lines, success), trace=trace):
+            logger.error("Échec de la mise en file des logs vers Discord")
+            self._on_batch_delivered(batch, lines, False)
+    
+    def _on_batch_delivered(self, batch: List[tuple], lines: List[str], success: bool):
+        """Appelé depuis le thread d'envoi une fois le batch traité"""
+        if not success:
+            if self.spool is not None:
+                logger.error("Échec de l'envoi des logs vers Discord, mise en spool")
+                self._spool_batch(batch, lines)
             else:
-                logger.error("Échec de l'envoi des logs vers Discord")
+                logger.error("Échec de l'envoi des logs vers Discord, remise en attente")
+                self.batcher.requeue(batch)
+                # Copie décodée abandonnée: sa mémoire peut revenir au système
+                self.buffer_pool.trim()
+            return
+        if lines:
+            self._observe_latency(batch, 'normal')
+        self._commit_batch(batch)
+        self._release(batch)
+        if len(self.batcher) >= self.batch_size:
+            # Arriéré en attente: l'envoyer sans attendre l'échéance
+            self.batcher.flush()
+    
+    def _commit_batch(self, batch: List[tuple]):
+        """Faire avancer le checkpoint jusqu'à la dernière ligne de chaque fichier du batch,
+        sans dépasser une alerte encore en cours d'envoi dans la voie prioritaire"""
+        if self.digest_only:
+            # Voie normale en résumé seul: uniquement des alertes dont l'envoi prioritaire a échoué
+            self._release_held_alerts(batch)
+            return
+        last_positions = {}
+        for line, (file_path, inode, line_end), _, _ in batch:
+            last = last_positions.get(file_path)
+            # Une alerte remise en tête peut être plus récente que les lignes qui la suivent
+            if last is None or last[0] != inode or last[1] < line_end:
+                last_positions[file_path] = (inode, line_end, line)
+        self._release_held_alerts(batch, last_positions)
+    
+    def _spool_batch(self, batch: List[tuple], lines: List[str]):
+        """Écrire un batch dans le spool; une fois sur disque, ses lignes sont acquises"""
+        if not self.spool.append(lines):
+            # Spool inutilisable (disque plein...): garder le batch en mémoire
+            self.batcher.requeue(batch)
+            return
+        # Le checkpoint peut avancer: le spool sera relu après un redémarrage
+        self._commit_batch(batch)
+        self._release(batch)
+        self.spool_wakeup.set()
+    
+    def _release(self, batch):
+        """Libérer la mémoire d'un batch traité, et reprendre la lecture si elle était suspendue"""
+        batch.release()
+        self._resume_if_available()
+    
+    def _resume_if_available(self):
+        pool = self.buffer_pool
+        pool.trim()
+        if self.reading_paused and pool.available() >= pool.limit * READ_RESUME_FRACTION:
+            self._resume_reading()
+    
+    def _pause_reading(self):
+        if not self.reading_paused:
+            self.reading_paused = True
+            READ_PAUSES.inc()
+            logger.warning(f"⚠️ Mémoire des lignes en attente pleine ({self.buffer_pool.limit / (1024 * 1024):g} Mo), "
+                           "lecture suspendue jusqu'à la livraison des lignes déjà lues")
+    
+    def _resume_reading(self):
+        """Relire les fichiers suivis là où la lecture s'était arrêtée
+        
+        Appelé par le thread qui vient de libérer la mémoire (livraison ou spool):
+        aucun événement ne signalera les lignes restées dans des fichiers inactifs.
+        """
+        with self.tailers_lock:
+            if not self.reading_paused or not self.running:
+                return
+            self.reading_paused = False
+            logger.info("Mémoire disponible, reprise de la lecture des fichiers")
+            for file_path in list(self.tailers):
+                self._read_new_lines(file_path)
+                if self.reading_paused:
+                    break
+    
+    def _deliver_and_wait(self, lines: List[str]) -> bool:
+        """Envoyer des lignes du spool et attendre le résultat de la livraison"""
+        done = threading.Event()
+        result = []
+        
+        def on_delivered(success: bool):
+            result.append(success)
+            done.set()
+        
+        # Seul le sink principal est concerné: les autres ont déjà reçu ces lignes
+        if not self.sink.primary.send_logs(lines, on_delivered):
+            return False
+        # Un message rejeté par la file n'a jamais de callback: abandonner l'attente à l'arrêt
+        while not done.wait(1.0):
+            if self.spool_stop.is_set() and not self.sink.running:
+                return False
+        return result[0]
+    
+    def _drain_spool(self):
+        """Thread de reprise: livrer le spool en messages denses, avec backoff exponentiel"""
+        backoff = SPOOL_RETRY_MIN
+        while not self.spool_stop.is_set():
+            if self.spool.empty():
+                self.spool_wakeup.wait()
+                self.spool_wakeup.clear()
+                continue
+            
+            pool = self.buffer_pool
+            lines, cursor = self.spool.peek(SPOOL_DRAIN_LINES, min(SPOOL_DRAIN_BYTES, self._memory_slice()))
+            if not lines:
+                self.spool_wakeup.clear()
+                continue
+            size = decoded_size(lines)
+            pool.reserve(size)
+            try:
+                delivered = self._deliver_and_wait(lines)
+            finally:
+                pool.release(size)
+                self._resume_if_available()
+            if delivered:
+                self.spool.ack(cursor)
+                if backoff > SPOOL_RETRY_MIN:
+                    logger.info("Connexion rétablie, reprise de l'envoi du spool")
+                backoff = SPOOL_RETRY_MIN
+                continue
+            
+            logger.warning(f"Envoi du spool impossible, nouvel essai dans {backoff:.0f}s "
+                           f"({self.spool.pending_bytes()} octets en attente)")
+            if self.spool_stop.wait(backoff):
+                return
+            backoff = min(backoff * 2, SPOOL_RETRY_MAX)
+    
+    def _digest_loop(self):
+        """Thread des résumés: publier l'état de la session toutes les `digest_interval` secondes"""
+        while not self.digest_stop.wait(self.digest_interval):
+            self._send_digest()
+    
+    def _send_digest(self):
+        try:
+            lines = self.session_tracker.digest()
+            if lines:
+                logger.info(f"Envoi du résumé de session ({len(lines)} lignes)")
+                self.sink.send_digest(lines)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'envoi du résumé de session: {e}")
+    
+    def _send_dedup_summaries(self, summaries: List[tuple]):
+        """Envoyer les résumés (source, ligne) des rafales en cours (derrière le spool s'il n'est pas vide)"""
+        if not summaries:
+            return
+        summaries = tag_sources([line for _, line in summaries], [path for path, _ in summaries])
+        if self.spool is not None and not self.spool.empty():
+            if self.spool.append(summaries):
+                self.spool_wakeup.set()
+                return
+            logger.error("Échec de l'écriture des résumés de répétitions dans le spool, envoi direct")
+        if not self.sink.send_logs(summaries):
+            logger.error(f"Échec de la mise en file de {len(summaries)} résumé(s) de répétitions, perdus")
+            DEDUP_SUMMARIES_LOST.inc(len(summaries))
+    
+    def reconfigure(self, batch_size: int, batch_timeout: float, log_filter: Optional[LogFilter], deduplicator: Optional[Deduplicator], classifier: Optional[AlertClassifier], critical_latency_target: float, normal_latency_target: Optional[float], max_tailed_files: int, digest_interval: float, digest_only: bool, buffer_max_bytes: int, overflow_policy: str):
+        """Appliquer une nouvelle configuration sans perdre les lignes en attente
+        
+        Tout est remplacé sous le verrou des fichiers suivis: une lecture en cours se
+        termine avec les anciens réglages, la suivante voit tous les nouveaux.
+        """
+        summaries = []
+        with self.tailers_lock:
+            self.batch_size = batch_size
+            self.batch_timeout = batch_timeout
+            self.batcher.configure(batch_size, batch_timeout)
+            if self.alert_batcher is not None:
+                self.alert_batcher.batch_size = batch_size
+                if classifier is not None:
+                    self.classifier = classifier
+            self.log_filter = log_filter
+            self.latency_targets = {
+                'critical': critical_latency_target,
+                'normal': normal_latency_target if normal_latency_target is not None else batch_timeout + 5.0,
+            }
+            self.max_tailed_files = max_tailed_files
+            self._evict_idle_tailers()
+            self.digest_interval = digest_interval
+            digest_only = digest_only and self.session_tracker is not None
+            if self.digest_only != digest_only:
+                # Les alertes en attente retiennent toujours le checkpoint; la position
+                # atteinte change de sens (fin de la lecture / livraison de la voie normale)
+                with self.digest_lock:
+                    self.read_positions.clear()
+            self.digest_only = digest_only
+            self.buffer_pool.limit = buffer_max_bytes
+            self.buffer_pool.policy = overflow_policy
+            if self.reading_paused and overflow_policy != 'pause':
+                self.reading_paused = False
+            if deduplicator is not self.deduplicator:
+                # Les rafales en cours sont résumées avant de changer de fenêtre
+                with self.dedup_lock:
+                    if self.deduplicator:
+                        summaries = self.deduplicator.drain()
+                    self.deduplicator = deduplicator
+        self._send_dedup_summaries(summaries)
+        if self.reading_paused and self.buffer_pool.available() > 0:
+            self._resume_reading()
     
     def stop(self):
         """Arrêter le handler et envoyer les logs restants"""
         self.running = False
-        if self.pending_logs:
-            logger.info(f"Arrêt - envoi des {len(self.pending_logs)} logs restants")
-            self._send_pending_logs()
+        with self.dedup_lock:
+            Scheduler.cancel(self.dedup_task)
+            if self.dedup_timer is not None:
+                self.dedup_timer.cancel()
+        if self.digest_thread is not None:
+            # Dernier résumé de la période en cours
+            self.digest_stop.set()
+            self.digest_thread.join(timeout=5)
+            self._send_digest()
+        pending = len(self.batcher)
+        if pending:
+            logger.info(f"Arrêt - envoi des {pending} logs restants")
+        if self.alert_batcher is not None:
+            self.alert_batcher.stop()
+        self.batcher.stop()
+        self._keep_unsent(self.batcher.take_remaining())
+        if self.thumbnailer is not None:
+            self.thumbnailer.stop()
+        if self.deduplicator:
+            with self.dedup_lock:
+                summaries = self.deduplicator.drain()
+            self._send_dedup_summaries(summaries)
+        if self.spool_thread is not None:
+            # Le reste du spool sera livré au prochain démarrage
+            self.spool_stop.set()
+            self.spool_wakeup.set()
+            self.spool_thread.join(timeout=5)
+            self.spool.close()
+        if self.checkpoint_store:
+            self.checkpoint_store.flush(force=True)
+
+    def _keep_unsent(self, batch):
+        """Lignes dont le dernier envoi a échoué à l'arrêt: dans le spool, sinon relues au prochain démarrage"""
+        if not len(batch):
+            return
+        if self.spool is not None:
+            logger.warning(f"Arrêt - {len(batch)} logs non envoyés, mis en spool")
+            self._spool_batch(batch, self._batch_lines(batch))
+            return
+        # Le checkpoint n'a pas dépassé ces lignes: elles seront relues depuis le fichier
+        logger.warning(f"Arrêt - {len(batch)} logs non envoyés, relus au prochain démarrage")
+        batch.release()
 
 class LogMonitor:
     """Moniteur principal pour surveiller les logs EKOS"""
     
-    def __init__(self, logs_directory: str, discord_sender: DiscordSender, batch_size: int = 10, batch_timeout: float = 30.0, file_check_interval: int = 60):
+    def __init__(self, logs_directory: str, sink: Sink, batch_size: int = 10, batch_timeout: float = 30.0, file_check_interval: int = 60, checkpoint_store: Optional[CheckpointStore] = None, index_reconcile_interval: int = 3600, matcher: Optional[FileMatcher] = None, max_tailed_files: int = 32, log_filter: Optional[LogFilter] = None, deduplicator: Optional[Deduplicator] = None, spool: Optional[DiskSpool] = None, tail_mode: str = 'auto', poll_min_interval: float = 0.25, poll_max_interval: float = 2.0, classifier: Optional[AlertClassifier] = None, critical_latency_target: float = 2.0, normal_latency_target: Optional[float] = None, session_tracker: Optional[SessionTracker] = None, digest_interval: float = 900.0, digest_only: bool = False, archive_compression: Optional[str] = None, archive_min_age: float = 6 * 3600, buffer_max_bytes: int = 16 * 1024 * 1024, overflow_policy: str = 'pause', thumbnailer: Optional[ThumbnailService] = None, observer: Optional[BaseObserver] = None, scheduler: Optional[Scheduler] = None, profile: Optional[str] = None, tracer: Optional[Tracer] = None):
         self.logs_directory = logs_directory
-        self.discord_sender = discord_sender
+        self.sink = sink
         self.batch_size = batch_size
         self.batch_timeout = batch_timeout
         self.file_check_interval = file_check_interval
-        self.observer = Observer()
-        self.handler = LogFileHandler(discord_sender, batch_size, batch_timeout)
+        self.checkpoint_store = checkpoint_store
+        self.index_reconcile_interval = index_reconcile_interval
+        self.matcher = matcher or FileMatcher()
+        self.file_index = LogFileIndex(logs_directory, self.matcher)
+        # Observer et échéancier partagés entre profils (multi-observatoires), sinon propres au moniteur
+        self.profile = profile
+        self.shared_observer = observer is not None
+        self.observer = observer or Observer()
+        self.watch = None
+        self.scheduler = scheduler
+        self.file_check_task = None
+        self.handler = LogFileHandler(sink, batch_size, batch_timeout, checkpoint_store, self.file_index, self.matcher, max_tailed_files, log_filter, deduplicator, spool, classifier, critical_latency_target, normal_latency_target, session_tracker, digest_interval, digest_only, buffer_max_bytes, overflow_policy, thumbnailer, {"profile": profile} if profile else None, scheduler, tracer)
         self.running = False
-        self.last_file_check = 0
+        self.stop_event = threading.Event()
+        
+        # Repli par polling pour les répertoires réseau (NFS/SMB) où inotify ne livre rien
+        self.poller = AdaptivePoller(self.handler, logs_directory, tail_mode, poll_min_interval, poll_max_interval)
         
-        # Thread pour vérifier périodiquement le fichier le plus récent
-        self.file_check_thread = threading.Thread(target=self._periodic_file_check, daemon=True)
+        # Compression en arrière-plan des logs terminés
+        self.archiver = None
+        if archive_compression:
+            self.archiver = LogArchiver(logs_directory, self.matcher, archive_compression, min_age=archive_min_age,
+                                        is_busy=self.handler.is_file_busy, on_archived=self.handler.on_file_archived,
+                                        file_index=self.file_index)
+        
+        # Thread pour vérifier périodiquement le fichier le plus récent (tâche de l'échéancier s'il est partagé)
+        self.last_reconcile = time.time()
+        self.file_check_thread = threading.Thread(target=self._periodic_file_check, name="file-check", daemon=True)
+        self.catch_up_thread = None
     
     def _find_latest_log_file_recursive(self) -> Optional[str]:
-        """Trouver le fichier de log le plus récent dans tous les sous-répertoires"""
+        """Reconstruire l'index par un parcours complet et retourner le fichier le plus récent"""
         try:
-            log_files = []
-            
-            # Parcourir récursivement tous les sous-répertoires
-            for root, dirs, files in os.walk(self.logs_directory):
-                for file in files:
-                    if file.endswith('.txt'):
-                        file_path = os.path.join(root, file)
-                        if os.path.isfile(file_path):
-                            log_files.append(file_path)
+            count = self.file_index.rebuild()
+            latest_file = self.file_index.latest()
             
-            if not log_files:
+            if not latest_file:
                 logger.warning("Aucun fichier de log trouvé dans le répertoire et ses sous-répertoires")
                 return None
             
-            # Trier par date de modification (le plus récent en premier)
-            latest_file = max(log_files, key=os.path.getmtime)
-            logger.info(f"Fichier de log le plus récent: {latest_file}")
+            logger.info(f"Fichier de log le plus récent: {latest_file} ({count} fichiers indexés)")
             return latest_file
             
         except Exception as e:
@@ -170,24 +1015,29 @@ class LogMonitor:
     
     def _periodic_file_check(self):
         """Vérifier périodiquement s'il y a un fichier de log plus récent"""
-        while self.running:
-            try:
-                current_time = time.time()
-                
-                # Vérifier selon l'intervalle configuré
-                if current_time - self.last_file_check >= self.file_check_interval:
-                    self.last_file_check = current_time
-                    
-                    latest_file = self._find_latest_log_file_recursive()
-                    if latest_file and latest_file != self.handler.current_file:
-                        logger.info(f"Nouveau fichier de log détecté lors de la vérification périodique: {latest_file}")
-                        self.handler._switch_to_new_file(latest_file)
-                
-                time.sleep(10)  # Vérifier toutes les 10 secondes
-                
-            except Exception as e:
-                logger.error(f"Erreur lors de la vérification périodique: {e}")
-                time.sleep(30)  # Attendre plus longtemps en cas d'erreur
+        while not self.stop_event.wait(self.file_check_interval):
+            self.check_files()
+    
+    def check_files(self) -> Optional[float]:
+        """Une vérification du fichier le plus récent; retourne le délai avant la suivante"""
+        if self.stop_event.is_set():
+            return None
+        # L'index est tenu à jour par watchdog: la vérification est en O(1),
+        # le parcours complet n'est qu'une réconciliation de secours
+        try:
+            if time.time() - self.last_reconcile >= self.index_reconcile_interval:
+                self.last_reconcile = time.time()
+                logger.debug("Réconciliation de l'index des fichiers de log")
+                self.file_index.rebuild()
+            
+            latest_file = self.file_index.latest()
+            if latest_file and latest_file != self.handler.current_file:
+                logger.info(f"Nouveau fichier de log détecté lors de la vérification périodique: {latest_file}")
+                self.handler._switch_to_new_file(latest_file)
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la vérification périodique: {e}")
+        return self.file_check_interval
     
     def start(self):
         """Démarrer la surveillance des logs"""
@@ -197,29 +1047,108 @@ class LogMonitor:
         
         # Trouver le fichier de log le plus récent
         latest_file = self._find_latest_log_file_recursive()
+        
+        # Les fichiers sont seulement positionnés ici (checkpoint ou fin de fichier):
+        # leur arriéré est lu en arrière-plan, le fichier courant d'abord, pendant
+        # que le suivi des nouvelles lignes a déjà commencé
+        backlog = []
         if latest_file:
-            self.handler._switch_to_new_file(latest_file)
+            self.handler.current_file = latest_file
+            backlog.append(self.handler._track_file(latest_file, resume=True, read=False))
+        
+        if self.checkpoint_store:
+            for file_path in self.checkpoint_store.paths():
+                if not os.path.isfile(file_path):
+                    checkpoint = self.checkpoint_store.get(file_path)
+                    self.checkpoint_store.remove(file_path)
+                    archive_path = find_archive(file_path)
+                    if archive_path and checkpoint and checkpoint["offset"] < uncompressed_size(archive_path):
+                        # Archivé avant d'avoir été entièrement livré: rattraper depuis l'archive
+                        logger.info(f"Fichier archivé depuis l'arrêt, rattrapage depuis {archive_path}")
+                        backlog.append(self.handler._track_file(archive_path, offset_hint=checkpoint["offset"], read=False))
+                elif file_path != latest_file and self.matcher(file_path):
+                    backlog.append(self.handler._track_file(file_path, resume=True, read=False))
         
         # Configurer l'observateur pour surveiller récursivement
-        self.observer.schedule(self.handler, self.logs_directory, recursive=True)
-        self.observer.start()
+        self.watch = self.observer.schedule(self.handler, self.logs_directory, recursive=True)
+        if not self.shared_observer:
+            self.observer.start()
+        self.poller.start(self.scheduler)
+        if self.archiver is not None:
+            self.archiver.start()
         self.running = True
         
-        # Démarrer le thread de vérification périodique
-        self.file_check_thread.start()
+        # Démarrer la vérification périodique
+        if self.scheduler is not None:
+            self.file_check_task = self.scheduler.add("file-check", self.check_files, self.file_check_interval)
+        else:
+            self.file_check_thread.start()
         
-        # Envoyer le message de démarrage
-        self.discord_sender.send_startup_message()
+        # Rattrapage des lignes écrites pendant l'arrêt
+        self.catch_up_thread = threading.Thread(target=self._catch_up, args=([t for t in backlog if t is not None],),
+                                                name="catch-up", daemon=True)
+        self.catch_up_thread.start()
+        
+        # Message de démarrage déposé dans la file d'envoi (jamais bloquant)
+        self.sink.send_startup_message()
         
         logger.info(f"Surveillance démarrée pour le répertoire: {self.logs_directory} (récursif)")
     
+    def _catch_up(self, tailers: List[FileTailer]):
+        """Thread de rattrapage: lire l'arriéré de chaque fichier repris au démarrage"""
+        for tailer in tailers:
+            if self.stop_event.is_set():
+                return
+            try:
+                self.handler.catch_up(tailer, self.stop_event)
+            except Exception as e:
+                logger.error(f"Erreur lors du rattrapage de {tailer.file_path}: {e}")
+    
+    def restart_observer(self, observer: Optional[BaseObserver] = None):
+        """Remplacer l'observer arrêté (un thread ne redémarre pas) et relire les fichiers suivis
+        
+        Un observer partagé est recréé et démarré par l'appelant, puis passé à chaque profil.
+        """
+        self.observer = observer or Observer()
+        self.watch = self.observer.schedule(self.handler, self.logs_directory, recursive=True)
+        if observer is None:
+            self.observer.start()
+
+        # Les écritures survenues pendant la panne n'ont produit aucun événement
+        self.file_index.rebuild()
+        with self.handler.tailers_lock:
+            paths = list(self.handler.tailers)
+        for file_path in paths:
+            self.handler._handle_modified(file_path, 'check')
+
+    def reconfigure(self, file_check_interval: int, **handler_settings):
+        """Appliquer une nouvelle configuration à la surveillance en cours (voir LogFileHandler.reconfigure)"""
+        self.file_check_interval = file_check_interval
+        self.handler.reconfigure(**handler_settings)
+        logger.info("Nouvelle configuration appliquée à la surveillance")
+    
     def stop(self):
         """Arrêter la surveillance des logs"""
         if not self.running:
             return
         
-        self.observer.stop()
-        self.observer.join()
+        self.stop_event.set()
+        if self.archiver is not None:
+            self.archiver.stop()
+        self.poller.stop()
+        Scheduler.cancel(self.file_check_task)
+        if self.shared_observer:
+            # Les autres profils restent surveillés
+            try:
+                self.observer.unschedule(self.watch)
+            except KeyError:
+                pass
+        else:
+            self.observer.stop()
+            self.observer.join()
+        if self.catch_up_thread is not None:
+            # Le rattrapage s'interrompt à la fin de la tranche en cours
+            self.catch_up_thread.join(timeout=10)
         self.running = False
         
         # Arrêter le handler et envoyer les logs restants
@@ -0,0 +1,99 @@
+import re
+import logging
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Format des logs KStars/EKOS:
+# [2024-01-15T21:05:32.541 CET INFO ][     org.kde.kstars.ekos.capture] - "Capturing 300.000-second Light image..."
+LINE_PATTERN = re.compile(
+    r'\[(?P<timestamp>\d{4}-\d\d-\d\dT[\d:.]+)(?: [^\]\s]+)? (?P<level>[A-Z]+) *\]'
+    r'(?:\[ *(?P<module>[^\]]*?) *\])?(?: - )?(?P<message>.*)'
+)
+
+# Niveaux Qt utilisés par KStars (abrégés) et noms usuels
+LEVELS = {
+    'DEBG': 10, 'DEBUG': 10,
+    'INFO': 20,
+    'WARN': 30, 'WARNING': 30,
+    'CRIT': 40, 'CRITICAL': 40, 'ERROR': 40,
+    'FATL': 50, 'FATAL': 50,
+}
+
+# Nom canonique de chaque niveau (sorties structurées)
+LEVEL_NAMES = {10: 'DEBUG', 20: 'INFO', 30: 'WARN', 40: 'CRIT', 50: 'FATAL'}
+
+# Les lignes hors format (suite d'un message multi-ligne, sortie brute) sont traitées comme INFO
+DEFAULT_LEVEL = LEVELS['INFO']
+
+class ParsedLine(NamedTuple):
+    """Ligne de log EKOS découpée en champs"""
+    timestamp: Optional[str]
+    level: int
+    module: Optional[str]
+    message: str
+    raw: str
+
+def parse_line(line: str) -> ParsedLine:
+    """Extraire horodatage, niveau et module d'une ligne de log EKOS"""
+    match = LINE_PATTERN.match(line)
+    if match is None:
+        return ParsedLine(None, DEFAULT_LEVEL, None, line, line)
+    return ParsedLine(
+        match.group('timestamp'),
+        LEVELS.get(match.group('level'), DEFAULT_LEVEL),
+        match.group('module'),
+        match.group('message'),
+        line,
+    )
+
+def level_value(name: str) -> int:
+    """Convertir un nom de niveau (DEBUG, INFO, WARN...) en valeur numérique"""
+    try:
+        return LEVELS[name.strip().upper()]
+    except KeyError:
+        raise ValueError(f"Niveau de log inconnu: {name}")
+
+class LogFilter:
+    """Filtrage des lignes selon le niveau, le module et des expressions régulières
+
+    Les règles sont compilées une seule fois; sans règle, aucune ligne n'est analysée.
+    """
+
+    def __init__(self, min_level: str = 'DEBUG', module_allow: Optional[List[str]] = None,
+                 module_deny: Optional[List[str]] = None, drop_patterns: Optional[List[str]] = None):
+        self.min_level = level_value(min_level)
+        self.module_allow = tuple(module_allow or ())
+        self.module_deny = tuple(module_deny or ())
+        # Une seule expression combinée: une passe par ligne quel que soit le nombre de motifs
+        self.drop_pattern = re.compile('|'.join(f'(?:{p})' for p in drop_patterns)) if drop_patterns else None
+        self.passthrough = (self.min_level <= LEVELS['DEBUG'] and not self.module_allow
+                            and not self.module_deny and self.drop_pattern is None)
+        self.accepted = 0
+        self.dropped = 0
+
+    def accepts(self, line: str) -> bool:
+        """Indiquer si la ligne doit être transmise"""
+        if self.passthrough:
+            self.accepted += 1
+            return True
+        if self.accepts_parsed(parse_line(line)):
+            self.accepted += 1
+            return True
+        self.dropped += 1
+        return False
+
+    def accepts_parsed(self, parsed: ParsedLine) -> bool:
+        """Appliquer les règles à une ligne déjà analysée"""
+        if parsed.level < self.min_level:
+            return False
+        module = parsed.module
+        if module is not None:
+            # Les modules sont comparés par préfixe (org.kde.kstars.ekos couvre tous les modules Ekos)
+            if self.module_allow and not module.startswith(self.module_allow):
+                return False
+            if self.module_deny and module.startswith(self.module_deny):
+                return False
+        if self.drop_pattern is not None and self.drop_pattern.search(parsed.raw):
+            return False
+        return True
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Index et recherche dans l'archive des logs EKOS
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from log_index import FileMatcher, LogFileIndex
+from log_archiver import is_archive, open_log, original_path, uncompressed_size
+from log_parser import LEVEL_NAMES, parse_line, level_value
+from log_tailer import HEAD_SIGNATURE_SIZE
+from session_tracker import JOB_PATTERN, TERMINAL_JOB_STATES
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    head BLOB,
+    lines INTEGER NOT NULL,
+    timestamp TEXT,
+    target TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    line_no INTEGER NOT NULL,
+    timestamp TEXT,
+    level INTEGER NOT NULL,
+    module TEXT,
+    target TEXT,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_file ON entries(file_id);
+CREATE INDEX IF NOT EXISTS entries_timestamp ON entries(timestamp);
+CREATE INDEX IF NOT EXISTS entries_target ON entries(target, timestamp);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    message, content='entries', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts(rowid, message) VALUES (new.id, new.message);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, message) VALUES ('delete', old.id, old.message);
+END;
+"""
+
+# Lignes écrites par lot dans la base temporaire d'un worker
+WRITE_CHUNK = 5000
+
+JOB_REGEX = re.compile(JOB_PATTERN)
+
+class SearchResult(NamedTuple):
+    """Ligne trouvée dans l'archive"""
+    path: str
+    line_no: int
+    timestamp: Optional[str]
+    level: int
+    module: Optional[str]
+    target: Optional[str]
+    message: str
+
+def _index_file(task: Tuple[str, int, int, Optional[str], Optional[str], str]) -> dict:
+    """Worker: analyser un fichier en flux à partir d'un offset, vers une base temporaire
+
+    Seules les lignes complètes sont indexées: une ligne en cours d'écriture sera
+    reprise à la mise à jour suivante.
+    """
+    path, offset, line_no, timestamp, target, part_path = task
+    part = sqlite3.connect(part_path)
+    part.execute("PRAGMA journal_mode=OFF")
+    part.execute("PRAGMA synchronous=OFF")
+    part.execute("CREATE TABLE rows (line_no INTEGER, timestamp TEXT, level INTEGER, module TEXT, target TEXT, message TEXT)")
+    rows = []
+    with open_log(path) as f:
+        if offset:
+            f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            offset += len(raw)
+            line = raw.decode('utf-8', errors='ignore').rstrip("\r\n")
+            if not line.strip():
+                continue
+            line_no += 1
+            parsed = parse_line(line)
+            # Les lignes sans horodatage (suite d'un message) héritent de la précédente
+            timestamp = parsed.timestamp or timestamp
+            line_target = target
+            if "Job '" in line:
+                match = JOB_REGEX.search(line)
+                if match is not None:
+                    line_target = match.group('job_name')
+                    target = None if match.group('job_state') in TERMINAL_JOB_STATES else line_target
+            rows.append((line_no, timestamp, parsed.level, parsed.module, line_target, parsed.message))
+            if len(rows) >= WRITE_CHUNK:
+                part.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?, ?)", rows)
+                rows.clear()
+    if rows:
+        part.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?, ?)", rows)
+    part.commit()
+    part.close()
+    return {"path": path, "part": part_path, "offset": offset, "line_no": line_no,
+            "timestamp": timestamp, "target": target}
+
+def parse_time(value: str, end: bool = False) -> str:
+    """Convertir une date (2024-01-15, 2024-01-15T21:00) ou une durée relative (30d, 12h, 2w) en horodatage EKOS"""
+    match = re.fullmatch(r'(\d+)\s*([mhdw])', value.strip())
+    if match:
+        unit = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}[match.group(2)]
+        moment = datetime.now() - timedelta(**{unit: int(match.group(1))})
+        return moment.strftime("%Y-%m-%dT%H:%M:%S.000")
+    try:
+        moment = datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f"Date invalide: {value} (AAAA-MM-JJ[THH:MM] ou durée relative: 30d, 12h, 2w)")
+    if end and len(value.strip()) == 10:
+        # Une date de fin seule couvre toute la journée
+        moment += timedelta(days=1)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000")
+
+class LogSearchIndex:
+    """Index plein texte incrémental (SQLite FTS5) de l'archive des logs EKOS
+
+    Chaque fichier est repéré par sa date de modification et sa taille: seuls les
+    fichiers nouveaux ou modifiés sont relus, et un fichier qui a seulement grandi
+    est repris à partir de la fin déjà indexée. Un log compressé par l'archivage
+    garde ses lignes indexées: seul son chemin est mis à jour. Les fichiers sont analysés en
+    parallèle par un pool de processus, chacun en flux vers une base temporaire;
+    le processus principal, seul écrivain de l'index, les fusionne au fil de l'eau.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _known_files(self) -> Dict[str, tuple]:
+        return {row[1]: row for row in self.db.execute(
+            "SELECT id, path, mtime, size, head, lines, timestamp, target FROM files")}
+
+    @staticmethod
+    def _read_head(path: str) -> bytes:
+        with open_log(path) as f:
+            return f.read(HEAD_SIGNATURE_SIZE)
+
+    def update(self, root_directory: str, matcher: Optional[FileMatcher] = None, workers: Optional[int] = None) -> dict:
+        """Indexer les fichiers nouveaux ou modifiés; retourne les statistiques de la mise à jour"""
+        start_time = time.perf_counter()
+        file_index = LogFileIndex(root_directory, matcher or FileMatcher(archives=True))
+        file_index.rebuild()
+        known = self._known_files()
+
+        stats = {"files": len(file_index.mtimes), "indexed": 0, "appended": 0, "unchanged": 0, "archived": 0, "removed": 0, "lines": 0}
+        tmp_dir = tempfile.mkdtemp(prefix="ekos-index-")
+        tasks = []
+        for path, mtime in file_index.mtimes.items():
+            size = file_index.sizes.get(path, 0)
+            row = known.get(path)
+            if is_archive(path):
+                # Les offsets d'une archive comptent les octets décompressés (taille lue dans son résumé)
+                try:
+                    size = uncompressed_size(path)
+                except (OSError, RuntimeError) as e:
+                    logger.warning(f"Archive illisible {path}: {e}")
+                    continue
+                source = known.get(original_path(path))
+                if row is None and source is not None and original_path(path) not in file_index.mtimes and source[3] == size:
+                    # Log compressé depuis la dernière mise à jour, déjà entièrement indexé
+                    self.db.execute("UPDATE files SET path = ?, mtime = ? WHERE id = ?", (path, mtime, source[0]))
+                    del known[original_path(path)]
+                    stats["archived"] += 1
+                    continue
+            if row is not None and row[2] == mtime and row[3] == size:
+                stats["unchanged"] += 1
+                continue
+            part_path = os.path.join(tmp_dir, f"{len(tasks)}.sqlite")
+            try:
+                head = self._read_head(path)
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"Fichier illisible {path}: {e}")
+                continue
+            if row is not None and size >= row[3] and row[4] and head.startswith(row[4]):
+                # Fichier seulement agrandi: reprendre à la fin déjà indexée
+                tasks.append(((path, row[3], row[5], row[6], row[7], part_path), mtime, head, row[0]))
+                stats["appended"] += 1
+            else:
+                if row is not None:
+                    self.db.execute("DELETE FROM entries WHERE file_id = ?", (row[0],))
+                    self.db.execute("DELETE FROM files WHERE id = ?", (row[0],))
+                tasks.append(((path, 0, 0, None, None, part_path), mtime, head, None))
+                stats["indexed"] += 1
+
+        # Fichiers disparus de l'archive
+        for path, row in known.items():
+            if path not in file_index.mtimes:
+                self.db.execute("DELETE FROM entries WHERE file_id = ?", (row[0],))
+                self.db.execute("DELETE FROM files WHERE id = ?", (row[0],))
+                stats["removed"] += 1
+        self.db.commit()
+
+        if tasks:
+            pending = {task[0][0]: task for task in tasks}
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_index_file, task[0]) for task in tasks]
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Erreur lors de l'indexation: {e}")
+                        continue
+                    stats["lines"] += self._merge(result, *pending[result["path"]][1:])
+        try:
+            os.rmdir(tmp_dir)
+        except OSError:
+            pass
+
+        stats["duration_s"] = round(time.perf_counter() - start_time, 3)
+        return stats
+
+    def _merge(self, result: dict, mtime: float, head: bytes, file_id: Optional[int]) -> int:
+        """Fusionner la base temporaire d'un worker dans l'index (une transaction par fichier)"""
+        db = self.db
+        with db:
+            if file_id is None:
+                file_id = db.execute("INSERT INTO files (path, mtime, size, head, lines) VALUES (?, ?, ?, ?, 0)",
+                                     (result["path"], mtime, result["offset"], head)).lastrowid
+            # La taille retenue est la fin de la dernière ligne complète indexée: une ligne
+            # incomplète, ou écrite depuis, sera reprise à la prochaine mise à jour
+            db.execute("UPDATE files SET mtime = ?, size = ?, head = ?, lines = ?, timestamp = ?, target = ? WHERE id = ?",
+                       (mtime, result["offset"], head,
+                        result["line_no"], result["timestamp"], result["target"], file_id))
+        db.execute("ATTACH DATABASE ? AS part", (result["part"],))
+        try:
+            with db:
+                count = db.execute(
+                    "INSERT INTO entries (file_id, line_no, timestamp, level, module, target, message) "
+                    "SELECT ?, line_no, timestamp, level, module, target, message FROM part.rows", (file_id,)
+                ).rowcount
+        finally:
+            db.execute("DETACH DATABASE part")
+            os.remove(result["part"])
+        return count
+
+    def search(self, query: Optional[str] = None, target: Optional[str] = None, since: Optional[str] = None,
+               until: Optional[str] = None, min_level: Optional[str] = None, module: Optional[str] = None,
+               limit: int = 100) -> List[SearchResult]:
+        """Rechercher des lignes (syntaxe FTS5: `guiding AND abort*`, `"lost connection"`), les plus récentes d'abord"""
+        conditions, params = [], []
+        if query:
+            # CROSS JOIN impose l'ordre: partir des lignes trouvées par l'index plein texte
+            source = "entries_fts CROSS JOIN entries e ON e.id = entries_fts.rowid"
+            conditions.append("entries_fts MATCH ?")
+            params.append(query)
+        else:
+            source = "entries e"
+        if target:
+            conditions.append("e.target = ?")
+            params.append(target)
+        if since:
+            conditions.append("e.timestamp >= ?")
+            params.append(parse_time(since))
+        if until:
+            conditions.append("e.timestamp < ?")
+            params.append(parse_time(until, end=True))
+        if min_level:
+            conditions.append("e.level >= ?")
+            params.append(level_value(min_level))
+        if module:
+            conditions.append("e.module LIKE ?")
+            params.append(f"%{module}%")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit)
+        rows = self.db.execute(
+            f"SELECT f.path, e.line_no, e.timestamp, e.level, e.module, e.target, e.message "
+            f"FROM {source} JOIN files f ON f.id = e.file_id {where} "
+            f"ORDER BY e.timestamp DESC LIMIT ?", params
+        ).fetchall()
+        return [SearchResult(*row) for row in rows]
+
+    def stats(self) -> dict:
+        files, lines = self.db.execute("SELECT COUNT(*), COALESCE(SUM(lines), 0) FROM files").fetchone()
+        return {"files": files, "lines": lines, "size_mb": round(os.path.getsize(self.db_path) / 1024 / 1024, 1)}
+
+def format_result(result: SearchResult) -> str:
+    target = f" [{result.target}]" if result.target else ""
+    return (f"{result.timestamp or '-'} {LEVEL_NAMES.get(result.level, result.level):5}{target} "
+            f"{os.path.basename(result.path)}:{result.line_no} {result.module or ''} {result.message}")
+
+def main():
+    """Interface en ligne de commande: index et search"""
+    from config import Config
+    config = Config()
+
+    parser = argparse.ArgumentParser(description="Index et recherche dans l'archive des logs EKOS")
+    parser.add_argument("--db", default=config.search_index_file, help="Fichier de l'index (SEARCH_INDEX_FILE)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index = subparsers.add_parser("index", help="Indexer les fichiers nouveaux ou modifiés")
+    index.add_argument("--root", default=config.ekos_logs_directory, help="Répertoire des logs (EKOS_LOGS_DIRECTORY)")
+    index.add_argument("--workers", type=int, help="Processus d'indexation (défaut: nombre de CPU)")
+
+    search = subparsers.add_parser("search", help="Rechercher dans l'index")
+    search.add_argument("query", nargs="?", help="Recherche plein texte (syntaxe FTS5)")
+    search.add_argument("--target", help="Cible (job du scheduler), ex: M31")
+    search.add_argument("--since", help="Depuis: 2024-01-15, 2024-01-15T21:00 ou 30d, 12h, 2w")
+    search.add_argument("--until", help="Jusqu'à (même format)")
+    search.add_argument("--level", help="Niveau minimal (INFO, WARN, CRIT...)")
+    search.add_argument("--module", help="Module (sous-chaîne), ex: guide")
+    search.add_argument("--limit", type=int, default=100, help="Nombre max de résultats")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    search_index = LogSearchIndex(args.db)
+    try:
+        if args.command == "index":
+            if not args.root or not os.path.isdir(args.root):
+                print(f"❌ Répertoire des logs introuvable: {args.root}")
+                return 1
+            print(f"🔍 Indexation de {args.root}...")
+            stats = search_index.update(args.root, FileMatcher(config.tail_include, config.tail_exclude, archives=True), args.workers)
+            totals = search_index.stats()
+            print(f"✅ {stats['indexed']} fichier(s) indexé(s), {stats['appended']} complété(s), "
+                  f"{stats['unchanged']} inchangé(s), {stats['archived']} archivé(s), {stats['removed']} retiré(s): "
+                  f"{stats['lines']} lignes en {stats['duration_s']}s")
+            print(f"📚 Index: {totals['files']} fichiers, {totals['lines']} lignes, {totals['size_mb']} Mo")
+        else:
+            start_time = time.perf_counter()
+            try:
+                results = search_index.search(args.query, args.target, args.since, args.until,
+                                              args.level, args.module, args.limit)
+            except (ValueError, sqlite3.OperationalError) as e:
+                print(f"❌ Recherche invalide: {e}")
+                return 1
+            elapsed = (time.perf_counter() - start_time) * 1000
+            for result in results:
+                print(format_result(result))
+            print(f"🔎 {len(results)} résultat(s) en {elapsed:.1f} ms")
+    finally:
+        search_index.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import os
+import logging
+from typing import List, Optional, Tuple
+from log_archiver import is_archive, open_log, uncompressed_size
+
+logger = logging.getLogger(__name__)
+
+HEAD_SIGNATURE_SIZE = 64
+
+class FileTailer:
+    """Lecture incrémentale d'un fichier de log à partir d'un offset en octets
+
+    Un log archivé (compressé) est lu en flux de manière transparente: ses offsets
+    comptent les octets décompressés, et il est lu une seule fois jusqu'au bout.
+    """
+
+    def __init__(self, file_path: str, offset: int = 0, chunk_size: int = 1024 * 1024):
+        self.file_path = file_path
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.inode = None
+        self.partial = b""
+        # Premiers octets du fichier, pour détecter un remplacement qui réutilise l'inode
+        self.head = b""
+        self.mtime: Optional[float] = None  # Date de modification lors de la dernière lecture
+        self.archive = is_archive(file_path)
+        self.exhausted = False  # Archive lue jusqu'au bout: elle ne grandit plus
+        self.resets = 0  # Nombre de retours au début du fichier (rotation, troncature, remplacement)
+
+    def _open(self):
+        return open_log(self.file_path) if self.archive else open(self.file_path, 'rb')
+
+    @property
+    def line_offset(self) -> int:
+        """Offset de la fin de la dernière ligne complète lue"""
+        return self.offset - len(self.partial)
+
+    def seek_to_end(self):
+        """Se positionner à la fin du fichier pour ignorer l'historique"""
+        st = os.stat(self.file_path)
+        self.inode = st.st_ino
+        self.offset = uncompressed_size(self.file_path) if self.archive else st.st_size
+        self.exhausted = self.archive
+        self.partial = b""
+        with self._open() as f:
+            self.head = f.read(HEAD_SIGNATURE_SIZE)
+
+    def resume_from(self, inode: int, offset: int):
+        """Reprendre la lecture à un offset mémorisé (checkpoint)"""
+        self.inode = inode
+        self.offset = offset
+        self.exhausted = False
+        self.partial = b""
+        with self._open() as f:
+            self.head = f.read(HEAD_SIGNATURE_SIZE)
+
+    def _reset(self, reason: str):
+        """Repartir du début du fichier (rotation ou troncature)"""
+        logger.info(f"{reason} détectée pour {self.file_path}, lecture depuis le début")
+        self.offset = 0
+        self.partial = b""
+        self.head = b""
+        self.exhausted = False
+        self.resets += 1
+
+    def line_before(self, offset: int, max_length: int = 1024 * 1024) -> Optional[str]:
+        """Retourner la ligne complète qui se termine juste avant l'offset donné"""
+        if offset <= 0:
+            return None
+        if self.archive:
+            # Flux compressé: pas de retour en arrière, une seule lecture vers l'avant
+            with self._open() as f:
+                f.seek(max(0, offset - 65536))
+                data = f.read(offset - max(0, offset - 65536))
+            if not data.endswith(b"\n"):
+                return None
+            return data[:-1].rsplit(b"\n", 1)[-1].decode('utf-8', errors='ignore').strip()
+        with open(self.file_path, 'rb') as f:
+            data = b""
+            start = offset
+            # Remonter par blocs jusqu'au saut de ligne précédent
+            while start > 0 and len(data) < max_length:
+                size = min(4096, start)
+                start -= size
+                f.seek(start)
+                data = f.read(size) + data
+                if data.count(b"\n") >= 2 or (start == 0 and data):
+                    break
+        if not data.endswith(b"\n"):
+            return None
+        return data[:-1].rsplit(b"\n", 1)[-1].decode('utf-8', errors='ignore').strip()
+
+    def read_lines(self, max_bytes: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Lire uniquement les octets ajoutés depuis le dernier appel
+
+        Retourne les lignes complètes avec l'offset de fin de chacune. Avec
+        `max_bytes`, au plus autant d'octets sont lus: la suite est lue à l'appel
+        suivant.
+        """
+        try:
+            st = os.stat(self.file_path)
+        except FileNotFoundError:
+            return []
+        self.mtime = st.st_mtime
+
+        if self.inode is not None and st.st_ino != self.inode:
+            self._reset("Rotation")
+        elif self.archive:
+            if self.exhausted:
+                return []
+        elif st.st_size < self.offset:
+            self._reset("Troncature")
+        self.inode = st.st_ino
+
+        if not self.archive and st.st_size == self.offset:
+            return []
+
+        lines = []
+        eof = False
+        with self._open() as f:
+            if self.head:
+                head = f.read(len(self.head))
+                if head != self.head:
+                    self._reset("Remplacement")
+            if len(self.head) < HEAD_SIGNATURE_SIZE:
+                f.seek(0)
+                self.head = f.read(HEAD_SIGNATURE_SIZE)
+
+            f.seek(self.offset)
+            read = 0
+            while max_bytes is None or read < max_bytes:
+                chunk = f.read(self.chunk_size if max_bytes is None else min(self.chunk_size, max_bytes - read))
+                if not chunk:
+                    eof = True
+                    break
+                read += len(chunk)
+
+                line_end = self.offset - len(self.partial)
+                parts = (self.partial + chunk).split(b"\n")
+                self.offset += len(chunk)
+                # Le dernier élément est une ligne incomplète (ou vide) à conserver
+                self.partial = parts.pop()
+                for raw in parts:
+                    line_end += len(raw) + 1
+                    line = raw.decode('utf-8', errors='ignore').strip()
+                    if line:  # Ignorer les lignes vides
+                        lines.append((line, line_end))
+
+        if self.archive and eof:
+            self.exhausted = True
+        return lines
+
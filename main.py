@@ -6,10 +6,26 @@ EKOS Log Monitor - Surveillance des logs EKOS vers Discord
 import sys
 import signal
 import logging
-import time
-from config import Config
+import threading
+from typing import Dict, List, Optional
+from watchdog.observers import Observer
+from config import RELOADABLE, Config, ConfigWatcher
 from discord_sender import DiscordSender
 from log_monitor import LogMonitor
+from checkpoint_store import CheckpointStore
+from log_index import FileMatcher
+from log_parser import LogFilter
+from deduplicator import Deduplicator
+from session_tracker import SessionTracker
+from alert_rules import DEFAULT_CRITICAL_PATTERNS, DEFAULT_WARNING_PATTERNS, AlertClassifier
+from metrics import MetricsServer
+from spool import DiskSpool
+from sinks import DeliveryPool, JsonLinesFileSink, MqttSink, SinkDispatcher, WebhookSink
+from rate_limiter import BucketRateLimiter
+from scheduler import Scheduler
+from supervisor import Supervisor
+from thumbnails import ThumbnailService
+from tracing import Tracer
 
 # Configuration du logging
 logging.basicConfig(
@@ -23,24 +39,223 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+class Observatory:
+    """Composants propres à un profil d'observatoire: sinks, checkpoints, spool et moniteur"""
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.name = config.profile
+        self.discord_sender = None
+        self.sink = None
+        self.checkpoint_store = None
+        self.log_monitor = None
+    
+    @property
+    def prefix(self) -> str:
+        """Préfixe des noms de threads et de sinks du profil (vide sans profils)"""
+        return f"{self.name}-" if self.name else ""
+    
+    def stop(self):
+        if self.log_monitor:
+            self.log_monitor.stop()
+        
+        # Vider les files d'envoi après le flush des derniers logs
+        if self.sink:
+            self.sink.stop()
+        
+        # Les dernières livraisons ont fait avancer les checkpoints
+        if self.checkpoint_store:
+            self.checkpoint_store.close()
+
 class EKOSMonitor:
-    """Application principale de surveillance des logs EKOS"""
+    """Application principale de surveillance des logs EKOS
+    
+    Avec PROFILES, un seul processus surveille plusieurs observatoires: chacun a
+    ses sinks, ses filtres et ses checkpoints, mais l'observer watchdog,
+    l'échéancier des vérifications périodiques et les threads d'envoi HTTP
+    sont partagés.
+    """
     
     def __init__(self):
         self.config = Config()
-        self.discord_sender = None
-        self.log_monitor = None
+        self.observatories: List[Observatory] = []
+        self.observer = None
+        self.scheduler = None
+        self.delivery_pool = None
+        self.rate_limiters: Dict[str, BucketRateLimiter] = {}  # Un bucket par webhook Discord
+        self.metrics_server = None
+        self.tracer = None
+        self.config_watcher = None
+        self.supervisor = Supervisor().install()
+        self.reload_requested = threading.Event()
+        self.dump_requested = threading.Event()
         self.running = False
         
         # Configuration des signaux pour l'arrêt propre
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
+        # SIGHUP: recharger la configuration (traité par la boucle principale)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._reload_signal_handler)
+        # SIGUSR1: écrire un rapport de traçage (traces les plus lentes, profil des threads)
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self._dump_signal_handler)
     
     def _signal_handler(self, signum, frame):
         """Gestionnaire de signaux pour l'arrêt propre"""
         logger.info(f"Signal {signum} reçu, arrêt en cours...")
         self.stop()
     
+    def _reload_signal_handler(self, signum, frame):
+        """Gestionnaire de SIGHUP: demander le rechargement de la configuration"""
+        self.reload_requested.set()
+    
+    def _dump_signal_handler(self, signum, frame):
+        """Gestionnaire de SIGUSR1: demander un rapport de traçage (écrit hors du gestionnaire)"""
+        self.dump_requested.set()
+    
+    def _sink_options(self, observatory: Observatory, name: str) -> dict:
+        """Options communes d'un sink secondaire (nom, filtre, batching, file)"""
+        settings = observatory.config.sink_settings[name]
+        return {
+            "name": f"{name}-{observatory.name}" if observatory.name else name,
+            "log_filter": LogFilter(min_level=settings['min_level']),
+            "batch_size": settings['batch_size'],
+            "batch_timeout": settings['batch_timeout'],
+            "queue_size": settings['queue_size'],
+            "pool": self.delivery_pool,
+        }
+    
+    @staticmethod
+    def _log_filter(config: Config) -> LogFilter:
+        return LogFilter(
+            min_level=config.filter_min_level,
+            module_allow=config.filter_module_allow,
+            module_deny=config.filter_module_deny,
+            drop_patterns=[config.filter_drop_pattern] if config.filter_drop_pattern else None
+        )
+    
+    @staticmethod
+    def _deduplicator(config: Config) -> Optional[Deduplicator]:
+        if config.dedup_window <= 0:
+            return None
+        return Deduplicator(window=config.dedup_window, max_fingerprints=config.dedup_max_fingerprints)
+    
+    @staticmethod
+    def _classifier(config: Config) -> Optional[AlertClassifier]:
+        if not config.priority_lane:
+            return None
+        return AlertClassifier(
+            critical_patterns=DEFAULT_CRITICAL_PATTERNS + ([config.alert_critical_pattern] if config.alert_critical_pattern else []),
+            warning_patterns=DEFAULT_WARNING_PATTERNS + ([config.alert_warning_pattern] if config.alert_warning_pattern else [])
+        )
+    
+    def _rate_limiter(self, config: Config) -> BucketRateLimiter:
+        """Budget d'envoi du webhook, commun aux profils qui publient sur le même salon"""
+        limiter = self.rate_limiters.get(config.discord_webhook_url)
+        if limiter is None:
+            limiter = self.rate_limiters[config.discord_webhook_url] = BucketRateLimiter(min_delay=config.rate_limit_delay)
+        return limiter
+    
+    def _build_observatory(self, config: Config) -> Optional[Observatory]:
+        """Créer les composants d'un profil (None si un sink ne peut pas être initialisé)"""
+        observatory = Observatory(config)
+        
+        # Initialiser le sender Discord
+        observatory.discord_sender = DiscordSender(
+            webhook_url=config.discord_webhook_url,
+            rate_limit_delay=config.rate_limit_delay,
+            max_retries=config.max_retries,
+            queue_size=config.delivery_queue_size,
+            drop_policy=config.delivery_drop_policy,
+            use_embeds=config.discord_use_embeds,
+            name=f"discord-{observatory.name}" if observatory.name else "discord",
+            username=f"EKOS Log Monitor - {observatory.name}" if observatory.name else "EKOS Log Monitor",
+            pool=self.delivery_pool,
+            rate_limiter=self._rate_limiter(config)
+        )
+        
+        # Sinks secondaires: chacun avec sa file, son filtre et son batching
+        secondary_sinks = []
+        try:
+            if config.sink_file_path:
+                secondary_sinks.append(JsonLinesFileSink(config.sink_file_path, **self._sink_options(observatory, 'file')))
+            if config.sink_webhook_url:
+                secondary_sinks.append(WebhookSink(config.sink_webhook_url, **self._sink_options(observatory, 'webhook')))
+            if config.sink_mqtt_host:
+                secondary_sinks.append(MqttSink(config.sink_mqtt_host, config.sink_mqtt_port,
+                                                config.sink_mqtt_topic, **self._sink_options(observatory, 'mqtt')))
+        except (OSError, RuntimeError) as e:
+            logger.error(f"❌ Impossible d'initialiser un sink{f' du profil {observatory.name}' if observatory.name else ''}: {e}")
+            for sink in [observatory.discord_sender] + secondary_sinks:
+                sink.stop()
+            return None
+        observatory.sink = SinkDispatcher(observatory.discord_sender, secondary_sinks)
+        
+        # Initialiser le stockage des checkpoints (reprise après redémarrage)
+        if config.checkpoint_file:
+            observatory.checkpoint_store = CheckpointStore(
+                checkpoint_file=config.checkpoint_file,
+                flush_interval=config.checkpoint_interval,
+                scheduler=self.scheduler
+            )
+        
+        # Spool sur disque des envois échoués (coupure réseau, redémarrage)
+        labels = {"profile": observatory.name} if observatory.name else None
+        spool = None
+        if config.spool_directory:
+            spool = DiskSpool(
+                directory=config.spool_directory,
+                max_size=int(config.spool_max_size_mb * 1024 * 1024),
+                labels=labels
+            )
+        
+        # Aperçus des poses citées par les logs, joints aux messages Discord
+        thumbnailer = None
+        if config.thumbnails:
+            thumbnailer = ThumbnailService(
+                send=observatory.discord_sender.send_image,
+                max_size=config.thumbnail_max_size,
+                min_interval=config.thumbnail_min_interval,
+                workers=config.thumbnail_workers,
+                path_map=config.thumbnail_path_map
+            )
+        
+        # Initialiser le moniteur de logs
+        observatory.log_monitor = LogMonitor(
+            logs_directory=config.ekos_logs_directory,
+            sink=observatory.sink,
+            batch_size=config.batch_size,
+            batch_timeout=config.batch_timeout,
+            file_check_interval=config.file_check_interval,
+            index_reconcile_interval=config.index_reconcile_interval,
+            matcher=FileMatcher(config.tail_include, config.tail_exclude),
+            max_tailed_files=config.max_tailed_files,
+            tail_mode=config.tail_mode,
+            poll_min_interval=config.poll_min_interval,
+            poll_max_interval=config.poll_max_interval,
+            log_filter=self._log_filter(config),
+            deduplicator=self._deduplicator(config),
+            classifier=self._classifier(config),
+            critical_latency_target=config.lane_target_critical,
+            normal_latency_target=config.lane_target_normal,
+            session_tracker=SessionTracker() if config.digest_interval > 0 else None,
+            digest_interval=config.digest_interval * 60,
+            digest_only=config.digest_only,
+            archive_compression=config.archive_compression or None,
+            archive_min_age=config.archive_min_age * 3600,
+            checkpoint_store=observatory.checkpoint_store,
+            spool=spool,
+            buffer_max_bytes=int(config.buffer_max_mb * 1024 * 1024),
+            overflow_policy=config.buffer_overflow_policy,
+            thumbnailer=thumbnailer,
+            observer=self.observer,
+            scheduler=self.scheduler,
+            profile=observatory.name,
+            tracer=self.tracer if self.config.tracing else None
+        )
+        return observatory
+    
     def initialize(self) -> bool:
         """Initialiser l'application"""
         logger.info("🚀 Initialisation de EKOS Log Monitor")
@@ -51,27 +266,170 @@ class EKOSMonitor:
             return False
         
         # Afficher la configuration
+        logging.getLogger().setLevel(self.config.log_level.strip().upper())
         logger.info(self.config)
+        self.config_watcher = ConfigWatcher(interval=self.config.config_watch_interval)
         
-        # Initialiser le sender Discord
-        self.discord_sender = DiscordSender(
-            webhook_url=self.config.discord_webhook_url,
-            rate_limit_delay=self.config.rate_limit_delay,
-            max_retries=self.config.max_retries
-        )
+        # Traceur commun à tous les profils; sans TRACING, il ne sert qu'au profil des threads (SIGUSR1)
+        self.tracer = Tracer()
+        self.tracer.configure(self.config.tracing, self.config.trace_buffer_size,
+                              self.config.trace_slow_threshold, self.config.trace_dump_directory)
         
-        # Initialiser le moniteur de logs
-        self.log_monitor = LogMonitor(
-            logs_directory=self.config.ekos_logs_directory,
-            discord_sender=self.discord_sender,
-            batch_size=self.config.batch_size,
-            batch_timeout=self.config.batch_timeout,
-            file_check_interval=self.config.file_check_interval
-        )
+        # Observer, échéancier et threads d'envoi communs à tous les profils
+        self.observer = Observer()
+        self.scheduler = Scheduler()
+        if self.config.profiles:
+            self.delivery_pool = DeliveryPool(workers=self.config.delivery_workers)
+        
+        for config in self.config.profile_configs():
+            observatory = self._build_observatory(config)
+            if observatory is None:
+                for built in self.observatories:
+                    built.stop()
+                if self.delivery_pool is not None:
+                    self.delivery_pool.stop()
+                return False
+            self.observatories.append(observatory)
+        
+        # Exposer les métriques du pipeline (format Prometheus)
+        if self.config.metrics_port:
+            try:
+                self.metrics_server = MetricsServer(
+                    host=self.config.metrics_host,
+                    port=self.config.metrics_port
+                ).start()
+            except OSError as e:
+                logger.error(f"❌ Impossible de démarrer le serveur de métriques: {e}")
+        
+        logger.info(f"✅ Initialisation terminée{f' ({len(self.observatories)} profils)' if self.config.profiles else ''}")
+        return True
+    
+    def reload_config(self) -> bool:
+        """Relire la configuration et appliquer les changements sans redémarrer
+        
+        La nouvelle configuration est validée en entier avant d'être appliquée:
+        invalide, elle est ignorée et la configuration en cours reste active.
+        """
+        logger.info("🔁 Rechargement de la configuration...")
+        config = self.config_watcher.load()
+        if config is None:
+            logger.error("❌ Configuration invalide, la configuration en cours est conservée")
+            return False
+        
+        # Ajouter ou retirer un profil recrée l'observer, l'échéancier et le pool d'envoi
+        restart_required = [name for name in ('profiles', 'delivery_workers') if getattr(config, name) != getattr(self.config, name)]
+        if restart_required:
+            logger.warning(f"⚠️ Redémarrage nécessaire pour appliquer: {', '.join(name.upper() for name in restart_required)}")
+            for name in restart_required:
+                setattr(config, name, getattr(self.config, name))
+        
+        logging.getLogger().setLevel(config.log_level.strip().upper())
+        self.config_watcher.interval = config.config_watch_interval
+        self.tracer.configure(config.tracing, config.trace_buffer_size, config.trace_slow_threshold, config.trace_dump_directory)
+        for observatory in self.observatories:
+            observatory.log_monitor.handler.tracer = self.tracer if config.tracing else None
         
-        logger.info("✅ Initialisation terminée")
+        changed = False
+        for observatory in self.observatories:
+            try:
+                profile_config = Config(observatory.name) if observatory.name else config
+            except ValueError as e:
+                logger.error(f"❌ Valeur invalide pour le profil {observatory.name}: {e}, sa configuration en cours est conservée")
+                continue
+            if observatory.name and not profile_config.validate():
+                logger.error(f"❌ Configuration du profil {observatory.name} invalide, sa configuration en cours est conservée")
+                continue
+            changed = self._reload_observatory(observatory, profile_config) or changed
+        if not changed:
+            logger.info("Configuration inchangée")
+        self.config = config
         return True
     
+    def _reload_observatory(self, observatory: Observatory, config: Config) -> bool:
+        """Appliquer la nouvelle configuration d'un profil; retourne False si elle est inchangée"""
+        label = f" (profil {observatory.name})" if observatory.name else ""
+        changes = observatory.config.changes(config)
+        if not changes:
+            return False
+        
+        # Changements qui demandent de recréer des composants: appliqués au prochain démarrage
+        restart_required = [name for name in changes if name not in RELOADABLE]
+        if config.priority_lane != observatory.config.priority_lane:
+            restart_required.append('priority_lane')
+        if (config.digest_interval > 0) != (observatory.config.digest_interval > 0):
+            restart_required.append('digest_interval')
+        if restart_required:
+            logger.warning(f"⚠️ Redémarrage nécessaire pour appliquer{label}: {', '.join(sorted(set(name.upper() for name in restart_required)))}")
+        
+        applied = [name.upper() for name in changes if name in RELOADABLE and name not in restart_required]
+        # Les valeurs non appliquées restent celles en cours jusqu'au redémarrage
+        for name in restart_required:
+            setattr(config, name, getattr(observatory.config, name))
+        if not applied:
+            return True
+        
+        handler = observatory.log_monitor.handler
+        dedup_changed = any(name in changes for name in ('dedup_window', 'dedup_max_fingerprints'))
+        observatory.discord_sender.configure(config.rate_limit_delay, config.max_retries)
+        observatory.log_monitor.reconfigure(
+            file_check_interval=config.file_check_interval,
+            batch_size=config.batch_size,
+            batch_timeout=config.batch_timeout,
+            log_filter=self._log_filter(config),
+            deduplicator=self._deduplicator(config) if dedup_changed else handler.deduplicator,
+            classifier=self._classifier(config),
+            critical_latency_target=config.lane_target_critical,
+            normal_latency_target=config.lane_target_normal,
+            max_tailed_files=config.max_tailed_files,
+            digest_interval=config.digest_interval * 60 if config.digest_interval > 0 else handler.digest_interval,
+            digest_only=config.digest_only,
+            buffer_max_bytes=int(config.buffer_max_mb * 1024 * 1024),
+            overflow_policy=config.buffer_overflow_policy
+        )
+        if handler.thumbnailer is not None:
+            handler.thumbnailer.configure(config.thumbnail_max_size, config.thumbnail_min_interval, config.thumbnail_path_map)
+        observatory.config = config
+        logger.info(f"✅ Configuration rechargée{label}: {', '.join(sorted(applied))}")
+        return True
+    
+    def _restart_observer(self):
+        """Remplacer l'observer partagé arrêté et y replacer les répertoires de chaque profil"""
+        self.observer = Observer()
+        self.observer.start()
+        for observatory in self.observatories:
+            observatory.log_monitor.restart_observer(self.observer)
+    
+    def _supervise(self):
+        """Placer les threads de travail sous la surveillance du superviseur"""
+        self.supervisor.watch('observer', lambda: self.observer.is_alive(), self._restart_observer)
+        self.supervisor.watch_thread('scheduler', self.scheduler, 'thread', self.scheduler._run)
+        if self.delivery_pool is not None:
+            for index in range(self.delivery_pool.workers):
+                self.supervisor.watch(f'delivery-{index}', lambda index=index: self.delivery_pool.threads[index].is_alive(),
+                                      lambda index=index: self.delivery_pool.restart(index))
+        
+        for observatory in self.observatories:
+            monitor = observatory.log_monitor
+            handler = monitor.handler
+            prefix = observatory.prefix
+            if monitor.archiver is not None:
+                self.supervisor.watch_thread(f'{prefix}log-archiver', monitor.archiver, 'thread', monitor.archiver._run)
+            
+            if handler.batcher.thread is not None:
+                self.supervisor.watch_thread(f'{prefix}log-batcher', handler.batcher, 'thread', handler.batcher._run)
+            if handler.alert_batcher is not None:
+                self.supervisor.watch_thread(f'{prefix}alert-batcher', handler.alert_batcher, 'thread', handler.alert_batcher._run)
+            if handler.spool_thread is not None:
+                self.supervisor.watch_thread(f'{prefix}spool-drain', handler, 'spool_thread', handler._drain_spool)
+            if handler.digest_thread is not None:
+                self.supervisor.watch_thread(f'{prefix}session-digest', handler, 'digest_thread', handler._digest_loop)
+            
+            for sink in observatory.sink.sinks:
+                if sink.worker_thread is not None:
+                    self.supervisor.watch_thread(f'{sink.name}-sink', sink, 'worker_thread', sink._delivery_worker)
+                if sink.batcher is not None:
+                    self.supervisor.watch_thread(f'{sink.name}-batcher', sink.batcher, 'thread', sink.batcher._run)
+    
     def start(self):
         """Démarrer l'application"""
         if not self.initialize():
@@ -80,21 +438,35 @@ class EKOSMonitor:
         
         try:
             logger.info("🔄 Démarrage de la surveillance...")
-            self.log_monitor.start()
+            self.observer.start()
+            self.scheduler.start()
+            for observatory in self.observatories:
+                observatory.log_monitor.start()
+            self._supervise()
             self.running = True
             
             logger.info("✅ Surveillance active - Appuyez sur Ctrl+C pour arrêter")
             
-            # Boucle principale
+            # Boucle principale: rechargement sur SIGHUP ou modification du .env,
+            # redémarrage des threads arrêtés
             while self.running:
-                time.sleep(1)
+                if self.reload_requested.wait(1) or self.config_watcher.changed():
+                    self.reload_requested.clear()
+                    if self.running:
+                        self.reload_config()
+                if self.dump_requested.is_set():
+                    self.dump_requested.clear()
+                    self.tracer.dump_async("SIGUSR1")
+                if self.running:
+                    self.supervisor.check()
                 
         except KeyboardInterrupt:
             logger.info("⚠️ Interruption clavier détectée")
         except Exception as e:
             logger.error(f"❌ Erreur inattendue: {e}")
-            if self.discord_sender:
-                self.discord_sender.send_error_message(str(e))
+            for observatory in self.observatories:
+                if observatory.sink:
+                    observatory.sink.send_error_message(str(e))
         finally:
             self.stop()
     
@@ -105,9 +477,22 @@ class EKOSMonitor:
         
         logger.info("🛑 Arrêt de l'application...")
         self.running = False
+        self.supervisor.stop()
         
-        if self.log_monitor:
-            self.log_monitor.stop()
+        for observatory in self.observatories:
+            observatory.stop()
+        
+        # Composants partagés, une fois tous les profils arrêtés
+        if self.observer is not None and self.observer.is_alive():
+            self.observer.stop()
+            self.observer.join()
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        if self.delivery_pool is not None:
+            self.delivery_pool.stop()
+        
+        if self.metrics_server:
+            self.metrics_server.stop()
         
         logger.info("✅ Application arrêtée")
 
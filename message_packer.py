@@ -0,0 +1,91 @@
+from typing import Iterator, List, Tuple
+
+# Limites des webhooks Discord
+CONTENT_LIMIT = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_TOTAL_LIMIT = 6000
+MAX_EMBEDS = 10
+
+class MessagePacker:
+    """Répartition sans perte d'un batch de lignes en payloads webhook Discord
+
+    Chaque payload est rempli au maximum: d'abord le champ `content`, puis
+    (si activé) des embeds jusqu'à la limite totale de Discord. Les lignes
+    trop longues sont découpées plutôt que tronquées.
+    """
+
+    def __init__(self, use_embeds: bool = True, content_limit: int = CONTENT_LIMIT,
+                 embed_limit: int = EMBED_DESCRIPTION_LIMIT, embed_total_limit: int = EMBED_TOTAL_LIMIT,
+                 max_embeds: int = MAX_EMBEDS, embed_color: int = 0x2B6CB0):
+        self.use_embeds = use_embeds
+        self.content_limit = content_limit
+        self.embed_limit = embed_limit
+        self.embed_total_limit = embed_total_limit
+        self.max_embeds = max_embeds
+        self.embed_color = embed_color
+
+    def _slots(self, header_length: int) -> Iterator[Tuple[int, str, int]]:
+        """Générer les emplacements (payload, type, capacité) dans l'ordre de remplissage"""
+        payload_index = 0
+        while True:
+            # Le header n'occupe que le contenu du premier message
+            yield payload_index, "content", self.content_limit - (header_length if payload_index == 0 else 0)
+            if self.use_embeds:
+                remaining = self.embed_total_limit
+                for _ in range(self.max_embeds):
+                    if remaining <= 0:
+                        break
+                    capacity = min(self.embed_limit, remaining)
+                    yield payload_index, "embed", capacity
+                    remaining -= capacity
+            payload_index += 1
+
+    def pack(self, lines: List[str], header: str = "") -> List[dict]:
+        """Répartir les lignes dans le plus petit nombre de payloads possible"""
+        slots = self._slots(len(header))
+        segments = []  # (payload, type, morceaux de texte)
+        payload_index, kind, capacity = next(slots)
+        parts: List[str] = [header] if header else []
+        used = len(header)
+
+        for line in lines:
+            pending = line
+            while True:
+                needed = len(pending) + 1  # ligne + "\n"
+                if used + needed <= capacity:
+                    parts.append(pending)
+                    parts.append("\n")
+                    used += needed
+                    break
+
+                if needed > capacity or not parts:
+                    # Ligne plus longue que l'emplacement: la découper sans rien perdre
+                    free = capacity - used
+                    if free > 1:
+                        parts.append(pending[:free - 1])
+                        parts.append("\n")
+                        pending = pending[free - 1:]
+
+                # Passer à l'emplacement suivant
+                segments.append((payload_index, kind, parts))
+                payload_index, kind, capacity = next(slots)
+                parts, used = [], 0
+
+        if parts:
+            segments.append((payload_index, kind, parts))
+
+        payloads: List[dict] = []
+        for index, kind, segment_parts in segments:
+            text = "".join(segment_parts).rstrip("\n")
+            if not text:
+                continue
+            while index >= len(payloads):
+                payloads.append({})
+            if kind == "content":
+                payloads[index]["content"] = text
+            else:
+                payloads[index].setdefault("embeds", []).append({
+                    "description": text,
+                    "color": self.embed_color,
+                })
+        return [payload for payload in payloads if payload]
@@ -0,0 +1,183 @@
+import bisect
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bornes par défaut des histogrammes de durée (secondes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+def format_labels(labels: Optional[Dict[str, str]]) -> str:
+    """Étiquettes au format Prometheus: {sink="discord"}"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+class Counter:
+    """Compteur monotone
+
+    Les métriques sont écrites sans verrou depuis le chemin critique: une addition
+    d'entier. Chaque métrique n'a en pratique qu'un thread écrivain (observer,
+    batcher ou thread d'envoi); un incrément perdu lors d'une rare écriture
+    concurrente est toléré.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = format_labels(labels)
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self.labels} {self.value}"]
+
+class Gauge:
+    """Valeur instantanée, lue à la demande par une fonction (profondeur de file...)"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float],
+                 labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = format_labels(labels)
+        self.function = function
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.function()
+        except Exception as e:
+            logger.debug(f"Lecture de la jauge {self.name} impossible: {e}")
+            return []
+        return [f"{self.name}{self.labels} {value}"]
+
+class Histogram:
+    """Histogramme à intervalles fixés à l'avance: une recherche dichotomique par observation"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = format_labels(labels)
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1)  # Dernier intervalle: +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self) -> List[str]:
+        # Le format Prometheus attend des intervalles cumulés
+        counts = list(self.counts)
+        prefix = self.labels[1:-1] + "," if self.labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+        lines.append(f"{self.name}_sum{self.labels} {self.sum:.6f}")
+        lines.append(f"{self.name}_count{self.labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées au format texte Prometheus"""
+
+    def __init__(self):
+        self.metrics: Dict[Tuple[str, str], object] = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        key = (metric.name, getattr(metric, 'labels', ""))
+        with self.lock:
+            existing = self.metrics.get(key)
+            if existing is not None and not isinstance(metric, Gauge):
+                return existing
+            # Une jauge ré-enregistrée pointe vers la nouvelle instance qui la fournit
+            self.metrics[key] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                  labels: Optional[Dict[str, str]] = None) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, labels))
+
+    def gauge(self, name: str, documentation: str, function: Callable[[], float],
+              labels: Optional[Dict[str, str]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, function, labels))
+
+    def render(self) -> str:
+        """Produire l'exposition texte de toutes les métriques"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        # Les séries d'une même métrique (étiquettes différentes) partagent HELP et TYPE
+        families: Dict[str, list] = {}
+        for metric in metrics:
+            families.setdefault(metric.name, []).append(metric)
+        lines = []
+        for name, family in families.items():
+            lines.append(f"# HELP {name} {family[0].documentation}")
+            lines.append(f"# TYPE {name} {family[0].kind}")
+            for metric in family:
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+# Registre du processus: les modules y déclarent leurs métriques à l'import
+REGISTRY = MetricsRegistry()
+
+class MetricsServer:
+    """Serveur HTTP local exposant les métriques sur /metrics"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = "127.0.0.1", port: int = 9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> "MetricsServer":
+        # Importé seulement si les métriques sont activées (http.server pèse au démarrage)
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        logger.info(f"Métriques exposées sur http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
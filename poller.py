@@ -0,0 +1,250 @@
+import os
+import time
+import logging
+import threading
+from typing import Dict, Optional, Set
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+TAIL_MODES = ('auto', 'events', 'polling')
+
+# Systèmes de fichiers réseau sur lesquels inotify ne voit pas les écritures distantes
+NETWORK_FILESYSTEMS = {
+    'nfs', 'nfs4', 'cifs', 'smb', 'smb3', 'smbfs', 'afs', '9p', 'ceph', 'glusterfs',
+    'fuse.sshfs', 'fuse.rclone', 'fuse.smbnetfs', 'davfs', 'fuse.davfs2',
+}
+
+# Nombre de vérifications sans changement avant d'espacer le polling d'un fichier
+QUIET_POLLS = 10
+
+# Délai laissé à un événement watchdog avant de conclure qu'il n'arrivera pas (secondes)
+PROBE_CONFIRM_DELAY = 1.0
+
+POLL_STATS = REGISTRY.counter('ekos_poll_stats_total', "Appels stat effectués par le polling")
+
+def filesystem_type(path: str) -> Optional[str]:
+    """Type du système de fichiers contenant le chemin (Linux, via /proc/mounts)"""
+    try:
+        path = os.path.realpath(path)
+        best_mount, best_type = "", None
+        with open('/proc/mounts', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, fields[2]
+        return best_type
+    except OSError:
+        return None
+
+class _FileState:
+    """Échéancier de polling d'un fichier suivi"""
+    __slots__ = ('interval', 'next_due', 'quiet_polls')
+
+    def __init__(self, interval: float, now: float):
+        self.interval = interval
+        self.next_due = now
+        self.quiet_polls = 0
+
+class AdaptivePoller:
+    """Détection des écritures par stat, pour les répertoires où inotify ne livre rien
+
+    Seuls les fichiers suivis (et les répertoires où de nouveaux fichiers peuvent
+    apparaître) sont vérifiés, jamais l'arborescence entière. L'intervalle d'un
+    fichier reste à `min_interval` tant qu'il grossit, puis s'allonge
+    progressivement jusqu'à `max_interval` quand il se tait.
+
+    En mode `auto`, le poller commence en simple sonde: si un fichier suivi grossit
+    sans qu'aucun événement watchdog n'arrive, il bascule en mode polling.
+    """
+
+    def __init__(self, handler, root_directory: str, mode: str = 'auto',
+                 min_interval: float = 0.25, max_interval: float = 2.0, probe_interval: float = 10.0):
+        if mode not in TAIL_MODES:
+            raise ValueError(f"Mode de suivi inconnu: {mode}")
+        self.handler = handler
+        self.root_directory = root_directory
+        self.mode = mode
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.probe_interval = probe_interval
+        self.polling = mode == 'polling'
+        self.files: Dict[str, _FileState] = {}
+        # Répertoires surveillés: mtime et fichiers déjà connus
+        self.directories: Dict[str, float] = {}
+        self.known_entries: Dict[str, Set[str]] = {}
+        self.last_directory_poll = 0.0
+        self.suspect: Optional[str] = None  # Fichier qui a grossi sans événement, à confirmer
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="tail-poller", daemon=True)
+        self.task = None  # Tâche de l'échéancier partagé, à la place du thread
+
+        if mode == 'auto':
+            fs_type = filesystem_type(root_directory)
+            if fs_type in NETWORK_FILESYSTEMS:
+                logger.info(f"Répertoire sur {fs_type}: suivi des fichiers par polling")
+                self.polling = True
+
+    def start(self, scheduler=None):
+        """Démarrer le polling: thread dédié, ou tâche de l'échéancier partagé entre profils"""
+        if self.mode == 'events':
+            return
+        if scheduler is not None:
+            self.thread = None
+            self.task = scheduler.add("tail-poller", self.tick)
+        else:
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.task is not None:
+            self.task.cancelled = True
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(timeout=5)
+
+    def _stat(self, path: str) -> Optional[os.stat_result]:
+        POLL_STATS.inc()
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def _has_unread_data(self, file_path: str, st: os.stat_result) -> bool:
+        tailer = self.handler.tailers.get(file_path)
+        if tailer is None or tailer.archive:
+            # Une archive ne grandit pas (et son offset compte des octets décompressés)
+            return False
+        return st.st_ino != tailer.inode or st.st_size != tailer.offset
+
+    def _probe(self) -> float:
+        """Mode événementiel: vérifier que watchdog livre bien les écritures; retourne le délai avant la suite"""
+        if self.suspect is not None:
+            # Deuxième passage: l'événement a eu le temps d'arriver
+            file_path, self.suspect = self.suspect, None
+            st = self._stat(file_path)
+            idle = time.monotonic() - self.handler.last_event_time
+            if st is not None and idle >= self.probe_interval and self._has_unread_data(file_path, st):
+                logger.warning(f"Aucun événement reçu depuis {idle:.0f}s alors que {file_path} a grossi: "
+                               f"bascule en mode polling (système de fichiers réseau ?)")
+                self.polling = True
+                self.handler._handle_modified(file_path)
+            return self.probe_interval
+
+        if time.monotonic() - self.handler.last_event_time < self.probe_interval:
+            return self.probe_interval
+        with self.handler.tailers_lock:
+            paths = list(self.handler.tailers)
+        for file_path in paths:
+            st = self._stat(file_path)
+            if st is None or not self._has_unread_data(file_path, st):
+                continue
+            # Laisser à l'événement le temps d'arriver avant de conclure
+            self.suspect = file_path
+            return PROBE_CONFIRM_DELAY
+        return self.probe_interval
+
+    def _poll_files(self, now: float):
+        """Vérifier les fichiers suivis arrivés à échéance"""
+        with self.handler.tailers_lock:
+            paths = list(self.handler.tailers)
+        for file_path in list(self.files):
+            if file_path not in self.handler.tailers:
+                del self.files[file_path]
+        for file_path in paths:
+            state = self.files.get(file_path)
+            if state is None:
+                state = self.files[file_path] = _FileState(self.min_interval, now)
+            if state.next_due > now:
+                continue
+            st = self._stat(file_path)
+            if st is not None and self._has_unread_data(file_path, st):
+                self.handler._handle_modified(file_path)
+                state.interval = self.min_interval
+                state.quiet_polls = 0
+            else:
+                state.quiet_polls += 1
+                if state.quiet_polls >= QUIET_POLLS:
+                    state.interval = min(state.interval * 1.5, self.max_interval)
+            state.next_due = now + state.interval
+
+    def _scan_directory(self, directory: str, notify: bool):
+        """Lister un répertoire et signaler les fichiers et sous-répertoires apparus"""
+        try:
+            with os.scandir(directory) as entries:
+                entries = [(entry.path, entry.is_dir(follow_symlinks=False)) for entry in entries]
+        except OSError:
+            return
+        known = self.known_entries.setdefault(directory, set())
+        for path, is_dir in entries:
+            if path in known:
+                continue
+            known.add(path)
+            if is_dir:
+                # Nouveau répertoire (nouvelle nuit): le surveiller lui aussi
+                st = self._stat(path)
+                self.directories[path] = st.st_mtime if st else 0.0
+                self._scan_directory(path, notify)
+            elif notify:
+                self.handler._handle_created(path)
+
+    def _poll_directories(self):
+        """Détecter les nouveaux fichiers dans la racine et le répertoire du fichier courant"""
+        watched = {self.root_directory}
+        if self.handler.current_file:
+            watched.add(os.path.dirname(self.handler.current_file))
+        for directory in watched:
+            if directory not in self.directories:
+                st = self._stat(directory)
+                self.directories[directory] = st.st_mtime if st else 0.0
+                # Premier passage: mémoriser l'existant sans rien signaler
+                try:
+                    with os.scandir(directory) as entries:
+                        self.known_entries[directory] = {entry.path for entry in entries}
+                except OSError:
+                    self.known_entries[directory] = set()
+
+        for directory, mtime in list(self.directories.items()):
+            st = self._stat(directory)
+            if st is None:
+                del self.directories[directory]
+                self.known_entries.pop(directory, None)
+                continue
+            if st.st_mtime != mtime:
+                self.directories[directory] = st.st_mtime
+                self._scan_directory(directory, notify=True)
+            elif directory not in watched and directory != self.root_directory:
+                # Ancien répertoire inactif: ne plus le surveiller
+                if time.time() - st.st_mtime > 3600:
+                    del self.directories[directory]
+                    self.known_entries.pop(directory, None)
+
+    def tick(self) -> Optional[float]:
+        """Un passage de polling; retourne le délai avant le suivant, jamais plus de max_interval"""
+        if self.stop_event.is_set():
+            return None
+        try:
+            if not self.polling:
+                delay = self._probe()
+                return 0.0 if self.polling else delay
+
+            now = time.monotonic()
+            self._poll_files(now)
+            if now - self.last_directory_poll >= self.max_interval:
+                self.last_directory_poll = now
+                self._poll_directories()
+
+            next_due = min((state.next_due for state in self.files.values()), default=now + self.max_interval)
+            next_due = min(next_due, self.last_directory_poll + self.max_interval)
+            return max(0.05, next_due - time.monotonic())
+        except Exception as e:
+            logger.error(f"Erreur lors du polling des fichiers: {e}")
+            return self.max_interval
+
+    def _run(self):
+        """Boucle de polling du thread dédié"""
+        delay = 0.0
+        while delay is not None and not self.stop_event.wait(delay):
+            delay = self.tick()
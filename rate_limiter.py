@@ -0,0 +1,89 @@
+import time
+import logging
+import threading
+from typing import Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+class BucketRateLimiter:
+    """Rate limiting piloté par les en-têtes X-RateLimit-* renvoyés par Discord
+
+    Les envois partent sans attente tant que le bucket a du budget, puis
+    attendent exactement le temps indiqué par Discord pour sa réinitialisation.
+    """
+
+    def __init__(self, min_delay: float = 0.0):
+        self.min_delay = min_delay
+        self.bucket: Optional[str] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.global_reset_at = 0.0
+        self.last_send_time = 0.0
+        self.lock = threading.Lock()
+
+    def delay(self, reserve: int = 0) -> float:
+        """Temps à attendre avant le prochain envoi
+
+        `reserve` envois du bucket restent disponibles pour les envois prioritaires.
+        """
+        now = time.monotonic()
+        with self.lock:
+            delay = max(0.0, self.global_reset_at - now)
+            if self.remaining is not None and self.remaining <= reserve:
+                delay = max(delay, self.reset_at - now)
+            if self.min_delay:
+                delay = max(delay, self.last_send_time + self.min_delay - now)
+            return delay
+
+    def acquire(self, reserve: int = 0) -> float:
+        """Attendre si nécessaire puis réserver un envoi; retourne le temps attendu"""
+        waited = 0.0
+        while True:
+            delay = self.delay(reserve)
+            if delay <= 0:
+                break
+            logger.debug(f"Attente de {delay:.2f}s pour respecter le rate limiting")
+            time.sleep(delay)
+            waited += delay
+
+        with self.lock:
+            self.last_send_time = time.monotonic()
+            if self.remaining is not None:
+                if self.remaining <= 0 and self.last_send_time >= self.reset_at:
+                    # Le bucket s'est réinitialisé sans que l'on connaisse encore sa limite
+                    self.remaining = None
+                else:
+                    self.remaining -= 1
+        return waited
+
+    def update(self, headers: Mapping[str, str], status_code: int, retry_after: Optional[float] = None):
+        """Mettre à jour l'état du bucket à partir d'une réponse Discord"""
+        now = time.monotonic()
+        with self.lock:
+            bucket = headers.get('X-RateLimit-Bucket')
+            if bucket and bucket != self.bucket:
+                if self.bucket is not None:
+                    logger.debug(f"Changement de bucket: {self.bucket} -> {bucket}")
+                self.bucket = bucket
+
+            remaining = headers.get('X-RateLimit-Remaining')
+            reset_after = headers.get('X-RateLimit-Reset-After')
+            try:
+                if remaining is not None:
+                    self.remaining = int(remaining)
+                if reset_after is not None:
+                    self.reset_at = now + float(reset_after)
+            except ValueError:
+                logger.warning(f"En-têtes de rate limit invalides: {remaining!r}, {reset_after!r}")
+
+            if status_code == 429:
+                if retry_after is None:
+                    try:
+                        retry_after = float(headers.get('Retry-After', 5))
+                    except ValueError:
+                        retry_after = 5.0
+                if headers.get('X-RateLimit-Global', '').lower() == 'true':
+                    self.global_reset_at = now + retry_after
+                else:
+                    self.remaining = 0
+                    self.reset_at = max(self.reset_at, now + retry_after)
@@ -0,0 +1,105 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Délai avant un nouveau passage d'une tâche qui a levé une exception (secondes)
+SCHEDULER_ERROR_DELAY = 5.0
+
+class ScheduledTask:
+    """Tâche de l'échéancier: `tick()` retourne le délai avant son prochain passage (None pour attendre un réveil)"""
+    __slots__ = ('name', 'tick', 'cancelled', 'due')
+
+    def __init__(self, name: str, tick: Callable[[], Optional[float]]):
+        self.name = name
+        self.tick = tick
+        self.cancelled = False
+        self.due: Optional[float] = None  # Prochaine échéance (None: en cours ou en attente d'un réveil)
+
+class Scheduler:
+    """Un seul thread pour les tâches périodiques et les échéances de tous les observatoires
+
+    Vérification du fichier le plus récent, polling des répertoires réseau, échéances
+    des batchs et écriture différée des checkpoints de chaque profil passent par un
+    échéancier commun au lieu d'un thread (endormi la plupart du temps) par profil
+    et par tâche. Les tâches doivent rester courtes: une tâche lente retarde les
+    suivantes.
+    """
+
+    def __init__(self):
+        self.tasks: List[tuple] = []  # Tas de (échéance, ordre, tâche); entrées périmées ignorées
+        self.order = itertools.count()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def add(self, name: str, tick: Callable[[], Optional[float]], delay: Optional[float] = 0.0) -> ScheduledTask:
+        """Programmer une tâche, premier passage dans `delay` secondes (None: au premier réveil)"""
+        task = ScheduledTask(name, tick)
+        if delay is not None:
+            self.wake(task, delay)
+        return task
+
+    def wake(self, task: ScheduledTask, delay: float = 0.0):
+        """Avancer le prochain passage d'une tâche à dans `delay` secondes au plus tard"""
+        with self.condition:
+            self._push(task, time.monotonic() + delay)
+
+    def _push(self, task: ScheduledTask, due: float):
+        """Programmer la tâche si l'échéance est plus proche que la sienne (verrou tenu)"""
+        if task.cancelled or (task.due is not None and task.due <= due):
+            return
+        task.due = due
+        heapq.heappush(self.tasks, (due, next(self.order), task))
+        self.condition.notify()
+
+    @staticmethod
+    def cancel(task: Optional[ScheduledTask]):
+        """Annuler une tâche (retirée à sa prochaine échéance)"""
+        if task is not None:
+            task.cancelled = True
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.stopped:
+                        return
+                    if self.tasks:
+                        due, _, task = self.tasks[0]
+                        if task.cancelled or task.due != due:
+                            heapq.heappop(self.tasks)
+                            continue
+                        wait = due - time.monotonic()
+                        if wait <= 0:
+                            heapq.heappop(self.tasks)
+                            task.due = None
+                            break
+                    else:
+                        wait = None
+                    self.condition.wait(wait)
+
+            try:
+                delay = task.tick()
+            except Exception as e:
+                logger.error(f"Erreur dans la tâche périodique {task.name}: {e}")
+                delay = SCHEDULER_ERROR_DELAY
+            if delay is not None:
+                # Un réveil pendant le passage a pu programmer une échéance plus proche
+                with self.condition:
+                    self._push(task, time.monotonic() + delay)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if self.thread.is_alive():
+            self.thread.join(timeout=5)
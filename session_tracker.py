@@ -0,0 +1,221 @@
+import re
+import math
+import time
+import logging
+import threading
+from collections import deque
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Transitions des jobs du scheduler: "Job 'M31' is capturing."
+JOB_PATTERN = r"Job '(?P<job_name>[^']+)' (?:is )?(?P<job_state>selected|slewing|tracking|focusing|aligning|guiding|capturing|complete|completed|aborted|idle|evaluating|scheduled|invalid)"
+
+# États après lesquels le job n'est plus la cible en cours
+TERMINAL_JOB_STATES = ('complete', 'completed', 'aborted', 'idle', 'invalid')
+
+# Événements de session reconnus dans les messages EKOS:
+# (événement, mots-clés présents dans la ligne, expression complète)
+SESSION_EVENTS = [
+    ('exposure', r'Capturing', r'Capturing (?P<exposure_seconds>\d+(?:\.\d+)?)-second (?P<exposure_type>\w+) image'),
+    ('frame', r'Received image', r'Received image (?P<frame_index>\d+) out of (?P<frame_total>\d+)'),
+    ('job', r"Job '", JOB_PATTERN),
+    ('rms', r'RMS', r'RMS\b[^0-9]{0,20}(?P<rms_value>\d+(?:\.\d+)?)'),
+    ('deviation', r'deviation RA', r'deviation RA:\s*(?P<deviation_ra>-?\d+(?:\.\d+)?)\s*DE:\s*(?P<deviation_de>-?\d+(?:\.\d+)?)'),
+    ('autofocus', r'Autofocus', r'Autofocus (?P<autofocus_result>complete|failed|aborted)(?:.*?HFR\s*(?P<autofocus_hfr>\d+(?:\.\d+)?))?'),
+    ('flip', r'eridian flip', r'[Mm]eridian flip (?P<flip_result>completed|complete|failed|started)'),
+    ('target', r'Slewing to target', r'Slewing to target(?: coordinates)?(?: (?P<target_coordinates>RA .+?))?"?$'),
+    ('capture_failed', r'failed|aborted', r'(?:[Cc]apture|[Ee]xposure)\s+(?:failed|aborted)'),
+]
+
+# Transitions de jobs du scheduler conservées par période
+MAX_JOB_TRANSITIONS = 10
+
+# Poids d'une nouvelle mesure dans la moyenne glissante du RMS de guidage
+RMS_SMOOTHING = 0.05
+
+class SessionTracker:
+    """État d'une session EKOS, mis à jour ligne par ligne, résumé périodiquement
+
+    Les mots-clés de tous les événements sont compilés en une seule expression:
+    une recherche par ligne, qui écarte la plupart des lignes et désigne sinon
+    l'événement dont l'expression complète extrait les valeurs. L'état est fait
+    de compteurs et de files bornées: la mémoire reste constante toute la nuit.
+    """
+
+    def __init__(self):
+        # Alternance de littéraux sans groupe: le moteur la recherche bien plus vite,
+        # l'événement est retrouvé à partir du mot-clé trouvé
+        self.events = {keyword: name for name, keywords, _ in SESSION_EVENTS for keyword in keywords.split('|')}
+        self.keywords = re.compile('|'.join(re.escape(keyword) for keyword in self.events))
+        self.patterns = {name: re.compile(pattern) for name, _, pattern in SESSION_EVENTS}
+        self.lock = threading.Lock()
+        self.lines_seen = 0
+
+        # État de la session
+        self.target: Optional[str] = None
+        self.job_states: dict = {}
+        self.frames = 0
+        self.exposure_total = 0.0
+        self.last_exposure: Optional[float] = None
+        self.last_frame: Optional[str] = None
+        self.autofocus_runs = 0
+        self.autofocus_failures = 0
+        self.last_hfr: Optional[float] = None
+        self.meridian_flips = 0
+        self.meridian_flip_failures = 0
+        self.capture_failures = 0
+        self.rms_average: Optional[float] = None
+
+        # Période en cours (remise à zéro par chaque résumé)
+        self._reset_period()
+        self.previous_rms_mean: Optional[float] = None
+
+    def _reset_period(self):
+        self.period_start = time.time()
+        self.period_lines = 0
+        self.period_events = 0
+        self.period_frames = 0
+        self.period_rms_sum = 0.0
+        self.period_rms_count = 0
+        self.period_rms_min: Optional[float] = None
+        self.period_rms_max: Optional[float] = None
+        self.period_autofocus = 0
+        self.period_flips = 0
+        self.period_jobs: deque = deque(maxlen=MAX_JOB_TRANSITIONS)
+
+    def observe(self, line: str):
+        """Mettre à jour l'état à partir d'une ligne de log"""
+        match = None
+        keyword = self.keywords.search(line)
+        while keyword is not None:
+            event = self.events[keyword.group()]
+            match = self.patterns[event].search(line)
+            if match is not None:
+                break
+            # Mot-clé dans un autre contexte: chercher le suivant
+            keyword = self.keywords.search(line, keyword.end())
+        with self.lock:
+            self.lines_seen += 1
+            self.period_lines += 1
+            if match is None:
+                return
+            self.period_events += 1
+            getattr(self, f'_on_{event}')(match)
+
+    def _on_exposure(self, match):
+        self.last_exposure = float(match.group('exposure_seconds'))
+
+    def _on_frame(self, match):
+        self.frames += 1
+        self.period_frames += 1
+        self.last_frame = f"{match.group('frame_index')}/{match.group('frame_total')}"
+        if self.last_exposure is not None:
+            self.exposure_total += self.last_exposure
+
+    def _on_capture_failed(self, match):
+        self.capture_failures += 1
+
+    def _on_job(self, match):
+        name, state = match.group('job_name'), match.group('job_state')
+        if state == 'completed':
+            state = 'complete'
+        previous = self.job_states.get(name)
+        if previous == state:
+            return
+        if name not in self.job_states and len(self.job_states) >= MAX_JOB_TRANSITIONS:
+            # Jobs bornés: oublier le plus ancien
+            del self.job_states[next(iter(self.job_states))]
+        self.job_states[name] = state
+        self.period_jobs.append(f"{name}: {previous or '-'} → {state}")
+        if state not in TERMINAL_JOB_STATES:
+            self.target = name
+
+    def _record_rms(self, value: float):
+        self.rms_average = value if self.rms_average is None else self.rms_average + RMS_SMOOTHING * (value - self.rms_average)
+        self.period_rms_sum += value
+        self.period_rms_count += 1
+        if self.period_rms_min is None or value < self.period_rms_min:
+            self.period_rms_min = value
+        if self.period_rms_max is None or value > self.period_rms_max:
+            self.period_rms_max = value
+
+    def _on_rms(self, match):
+        self._record_rms(float(match.group('rms_value')))
+
+    def _on_deviation(self, match):
+        ra, de = float(match.group('deviation_ra')), float(match.group('deviation_de'))
+        self._record_rms(math.hypot(ra, de))
+
+    def _on_autofocus(self, match):
+        self.autofocus_runs += 1
+        self.period_autofocus += 1
+        if match.group('autofocus_result') != 'complete':
+            self.autofocus_failures += 1
+        hfr = match.group('autofocus_hfr')
+        if hfr is not None:
+            self.last_hfr = float(hfr)
+
+    def _on_flip(self, match):
+        result = match.group('flip_result')
+        if result.startswith('complete'):
+            self.meridian_flips += 1
+            self.period_flips += 1
+        elif result == 'failed':
+            self.meridian_flip_failures += 1
+
+    def _on_target(self, match):
+        coordinates = match.group('target_coordinates')
+        if coordinates and self.target is None:
+            self.target = coordinates.strip().rstrip('."')
+
+    def digest(self, force: bool = False) -> Optional[List[str]]:
+        """Résumé de la période écoulée (None si aucun événement, sauf `force`)"""
+        with self.lock:
+            if not self.period_events and not force:
+                self.period_start = time.time()
+                self.period_lines = 0
+                return None
+
+            minutes = max(1, round((time.time() - self.period_start) / 60))
+            lines = [f"🎯 Cible: {self.target or 'inconnue'}"]
+            exposure = f", {self.last_exposure:g}s par pose" if self.last_exposure is not None else ""
+            lines.append(f"📷 Poses: {self.frames} (+{self.period_frames} en {minutes} min{exposure}), "
+                         f"{format_duration(self.exposure_total)} d'intégration"
+                         + (f", dernière {self.last_frame}" if self.last_frame else ""))
+
+            if self.period_rms_count:
+                mean = self.period_rms_sum / self.period_rms_count
+                trend = ""
+                if self.previous_rms_mean is not None:
+                    change = mean - self.previous_rms_mean
+                    trend = " ↗" if change > 0.1 * self.previous_rms_mean else " ↘" if change < -0.1 * self.previous_rms_mean else " →"
+                lines.append(f"🔭 Guidage RMS: {mean:.2f}\" (min {self.period_rms_min:.2f}, max {self.period_rms_max:.2f}){trend}")
+                self.previous_rms_mean = mean
+            elif self.rms_average is not None:
+                lines.append(f"🔭 Guidage RMS: aucune mesure sur la période (moyenne {self.rms_average:.2f}\")")
+
+            if self.autofocus_runs:
+                failures = f", {self.autofocus_failures} échec(s)" if self.autofocus_failures else ""
+                hfr = f", HFR {self.last_hfr:.2f}" if self.last_hfr is not None else ""
+                lines.append(f"🔍 Autofocus: {self.autofocus_runs} (+{self.period_autofocus}){failures}{hfr}")
+            if self.meridian_flips or self.meridian_flip_failures:
+                failures = f", {self.meridian_flip_failures} échec(s)" if self.meridian_flip_failures else ""
+                lines.append(f"🔄 Flips méridien: {self.meridian_flips} (+{self.period_flips}){failures}")
+            if self.capture_failures:
+                lines.append(f"⚠️ Échecs de capture: {self.capture_failures}")
+            if self.period_jobs:
+                lines.append("🗓️ Scheduler: " + "; ".join(self.period_jobs))
+            lines.append(f"📄 {self.period_lines} lignes de log sur la période")
+
+            self._reset_period()
+            return lines
+
+def format_duration(seconds: float) -> str:
+    """Durée lisible: 1h05, 12min, 45s"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}"
+    if seconds >= 60:
+        return f"{seconds // 60}min"
+    return f"{seconds}s"
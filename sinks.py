@@ -0,0 +1,600 @@
+import re
+import json
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime
+from batcher import Batcher
+from log_parser import LEVEL_NAMES, LogFilter, parse_line
+from metrics import REGISTRY
+from tracing import Trace
+
+logger = logging.getLogger(__name__)
+
+DROP_POLICIES = ('drop_oldest', 'drop_newest')
+
+# Hôtes HTTP distincts dont la session partagée garde les connexions ouvertes
+POOL_HOSTS = 8
+
+# Préfixe ajouté par le moniteur quand un batch mélange plusieurs fichiers
+SOURCE_TAG_PATTERN = re.compile(r'^`([^`]+)` ')
+
+class RetryLater(Exception):
+    """Levée par `_deliver`: reprendre `message` (ce qui reste à livrer) dans `delay` secondes
+
+    Sur les threads partagés du DeliveryPool, une erreur passagère ne doit pas
+    endormir un thread qui sert aussi les autres sinks.
+    """
+
+    def __init__(self, message: Any, delay: float):
+        super().__init__(f"nouvel essai dans {delay:g}s")
+        self.message = message
+        self.delay = delay
+
+class Sink:
+    """Destination des lignes de log, avec sa propre file bornée et son thread d'envoi
+
+    Les producteurs ne bloquent jamais: quand la file est pleine, la politique de
+    rejet s'applique à ce sink seulement. Un filtre et un batching propres au sink
+    sont optionnels. Les sous-classes implémentent `_prepare` et `_deliver`.
+    """
+
+    def __init__(self, name: str, queue_size: int = 100, drop_policy: str = 'drop_oldest',
+                 log_filter: Optional[LogFilter] = None, batch_size: int = 0, batch_timeout: float = 0.0,
+                 pool: Optional["DeliveryPool"] = None):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Politique de rejet inconnue: {drop_policy}")
+
+        self.name = name
+        self.drop_policy = drop_policy
+        self.log_filter = log_filter
+        self.dropped_messages = 0
+
+        labels = {"sink": name}
+        self.lines_received = REGISTRY.counter('ekos_sink_lines_received_total', "Lignes acceptées par le filtre du sink", labels)
+        self.lines_delivered = REGISTRY.counter('ekos_sink_lines_delivered_total', "Lignes livrées par le sink", labels)
+        self.messages_dropped = REGISTRY.counter('ekos_sink_dropped_messages_total', "Messages rejetés par la politique de la file du sink", labels)
+        self.delivery_failures = REGISTRY.counter('ekos_sink_failures_total', "Messages dont la livraison a échoué", labels)
+        REGISTRY.gauge('ekos_sink_queue_depth', "Messages en attente dans la file du sink", self.queue_depth, labels)
+
+        # Files d'envoi bornées (normale et prioritaire) et thread d'envoi dédié,
+        # ou threads partagés avec les sinks des autres profils
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.priority_queue = queue.Queue(maxsize=queue_size)
+        self.pending = threading.Semaphore(0)  # Messages déposés, toutes files confondues
+        self.priority_arrived = threading.Event()  # Réveille une attente en cours du thread d'envoi
+        self.delivering_priority = False
+        self.trace: Optional[Trace] = None  # Trace du message en cours de livraison
+        # Message à reprendre après une erreur passagère, par file (True: prioritaire), et fin du délai
+        self.deferred: Dict[bool, tuple] = {}
+        self.retry_at = 0.0
+        self.running = True
+        self.pool = pool
+        if pool is not None:
+            self.worker_thread = None
+            pool.register(self)
+        else:
+            self.worker_thread = threading.Thread(target=self._delivery_worker, name=f"{name}-sink", daemon=True)
+            self.worker_thread.start()
+
+        # Batching propre au sink (sinon les batchs du moniteur sont transmis tels quels)
+        self.batcher = Batcher(self._flush_batch, batch_size, batch_timeout, name=f"{name}-batcher") if batch_size > 0 else None
+
+    def _prepare(self, lines: List[str]) -> Any:
+        """Construire le message à livrer à partir des lignes (dans le thread producteur)"""
+        return lines
+
+    def _prepare_priority(self, lines: List[str]) -> Any:
+        """Construire un message prioritaire (alerte); identique à un message normal par défaut"""
+        return self._prepare(lines)
+
+    def _deliver(self, message: Any) -> bool:
+        """Livrer un message (dans le thread d'envoi du sink)"""
+        raise NotImplementedError
+
+    def ready_in(self) -> float:
+        """Délai avant que le sink puisse livrer un message normal (rate limiting)"""
+        return self.retry_in()
+
+    def retry_in(self) -> float:
+        """Délai avant la reprise d'un message reporté (RetryLater)"""
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def has_pending(self, source: queue.Queue) -> bool:
+        """Un message attend-il dans cette file (ou reporté depuis celle-ci)?"""
+        return (source is self.priority_queue) in self.deferred or not source.empty()
+
+    def _next_item(self, source: queue.Queue) -> Optional[tuple]:
+        """Prochain message d'une file: le message reporté d'abord (None: file vide)"""
+        item = self.deferred.pop(source is self.priority_queue, None)
+        if item is not None:
+            return item
+        try:
+            return source.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _handle(self, item: tuple, source: queue.Queue):
+        """Livrer un message dépilé et notifier le producteur"""
+        # Une alerte livrée au milieu d'un message normal a sa propre trace
+        outer_trace = self.trace
+        deferred = False
+        try:
+            message, line_count, on_delivered, trace = item
+            self.trace = trace
+            if trace is not None:
+                trace.mark('dequeue')
+            try:
+                success = self._deliver(message)
+            except RetryLater as retry:
+                # Repris en tête de sa file après le délai; il reste compté dans la file (stop)
+                self.deferred[source is self.priority_queue] = (retry.message, line_count, on_delivered, trace)
+                self.retry_at = time.monotonic() + retry.delay
+                deferred = True
+                return
+            if success:
+                self.lines_delivered.inc(line_count)
+            else:
+                self.delivery_failures.inc()
+            if on_delivered:
+                on_delivered(success)
+            if trace is not None:
+                trace.finish(success)
+        except Exception as e:
+            logger.error(f"Erreur dans le thread d'envoi du sink {self.name}: {e}")
+        finally:
+            self.trace = outer_trace
+            if not deferred:
+                source.task_done()
+
+    def _process_priority(self):
+        """Livrer tous les messages prioritaires en attente (premier accès au budget d'envoi)"""
+        if self.delivering_priority:
+            return
+        self.priority_arrived.clear()
+        self.delivering_priority = True
+        try:
+            while self.retry_in() <= 0:
+                item = self._next_item(self.priority_queue)
+                if item is None:
+                    return
+                self._handle(item, self.priority_queue)
+        finally:
+            self.delivering_priority = False
+
+    def _delivery_worker(self):
+        """Thread d'envoi: dépile les messages, la file prioritaire d'abord"""
+        while True:
+            self.pending.acquire()
+            self._process_priority()
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                continue  # Déjà livré par anticipation, ou rejeté par la politique de la file
+            if item is None:
+                self.queue.task_done()
+                return
+            self._handle(item, self.queue)
+            item = None  # Ne pas garder le dernier message en mémoire pendant l'attente
+
+    def _enqueue(self, message: Any, line_count: int = 0, on_delivered: Optional[Callable[[bool], None]] = None,
+                 priority: bool = False, trace: Optional[Trace] = None) -> bool:
+        """Déposer un message dans la file d'envoi sans jamais bloquer"""
+        if not self.running:
+            logger.warning(f"Sink {self.name} arrêté, message ignoré")
+            return False
+
+        target = self.priority_queue if priority else self.queue
+        while True:
+            try:
+                target.put_nowait((message, line_count, on_delivered, trace))
+                self.pending.release()
+                if priority:
+                    self.priority_arrived.set()
+                if self.pool is not None:
+                    self.pool.notify()
+                return True
+            except queue.Full:
+                self.dropped_messages += 1
+                self.messages_dropped.inc()
+                if self.drop_policy == 'drop_newest':
+                    logger.warning(f"File du sink {self.name} pleine, nouveau message rejeté")
+                    return False
+
+                # drop_oldest: libérer une place en retirant le message le plus ancien
+                try:
+                    dropped = target.get_nowait()
+                    target.task_done()
+                    logger.warning(f"File du sink {self.name} pleine, message le plus ancien rejeté")
+                except queue.Empty:
+                    continue
+                if dropped is not None and dropped[2] is not None:
+                    # Son producteur le traite comme un échec (nouvel essai, spool)
+                    dropped[2](False)
+
+    def _accepts(self, line: str) -> bool:
+        """Appliquer le filtre du sink (sans tenir compte de l'étiquette de source)"""
+        return self.log_filter.accepts(SOURCE_TAG_PATTERN.sub('', line, count=1))
+
+    def _flush_batch(self, lines: List[str]):
+        """Appelé par le batcher du sink"""
+        self._enqueue(self._prepare(lines), len(lines))
+
+    def queue_depth(self) -> int:
+        """Nombre de messages en attente d'envoi"""
+        return self.queue.qsize() + self.priority_queue.qsize() + len(self.deferred)
+
+    def saturated(self) -> bool:
+        """File d'envoi pleine: le producteur doit garder ses lignes (contre-pression)"""
+        return self.queue.full()
+
+    @property
+    def primary(self) -> "Sink":
+        """Sink dont la livraison fait foi (lui-même pour un sink seul)"""
+        return self
+
+    def send_logs(self, logs: List[str], on_delivered: Optional[Callable[[bool], None]] = None,
+                  priority: bool = False, trace: Optional[Trace] = None) -> bool:
+        """Transmettre des lignes au sink
+
+        Retourne True si les lignes ont été acceptées. `on_delivered` est appelé depuis
+        le thread d'envoi avec le résultat de la livraison (avec False pour un message
+        plus ancien rejeté par la politique de la file; jamais pour un sink qui regroupe
+        lui-même ses lignes).
+        Les lignes prioritaires contournent le batching et passent avant la file normale.
+        `trace` suit le message jusqu'à sa livraison (ignorée par un sink qui regroupe
+        lui-même ses lignes).
+        """
+        if self.log_filter is not None and not self.log_filter.passthrough:
+            logs = [line for line in logs if self._accepts(line)]
+        if not logs:
+            if on_delivered:
+                on_delivered(True)
+            return True
+        self.lines_received.inc(len(logs))
+
+        if priority:
+            return self._enqueue(self._prepare_priority(logs), len(logs), on_delivered, priority=True, trace=trace)
+        if self.batcher is not None:
+            for line in logs:
+                self.batcher.add(line)
+            return True
+        return self._enqueue(self._prepare(logs), len(logs), on_delivered, trace=trace)
+
+    def send_digest(self, lines: List[str]) -> bool:
+        """Transmettre un résumé de session (ni filtre ni batching: un message à part entière)"""
+        return self._enqueue(self._prepare(lines), len(lines))
+
+    def send_startup_message(self) -> bool:
+        """Annoncer le démarrage (sans effet par défaut)"""
+        return True
+
+    def send_error_message(self, error: str) -> bool:
+        """Signaler une erreur (sans effet par défaut)"""
+        return True
+
+    def _close(self):
+        """Libérer les ressources du sink après l'arrêt du thread d'envoi"""
+
+    def stop(self, timeout: float = 10.0):
+        """Arrêter le thread d'envoi après avoir vidé la file (dans la limite du timeout)"""
+        if not self.running:
+            return
+        if self.batcher is not None:
+            self.batcher.stop(timeout)
+        self.running = False
+
+        deadline = time.time() + timeout
+        while (self.queue.unfinished_tasks or self.priority_queue.unfinished_tasks) and time.time() < deadline:
+            time.sleep(0.1)
+        if self.queue.unfinished_tasks or self.priority_queue.unfinished_tasks:
+            logger.warning(f"Arrêt du sink {self.name}: {self.queue_depth()} message(s) non envoyé(s)")
+
+        if self.pool is not None:
+            self.pool.unregister(self)
+        else:
+            try:
+                self.queue.put_nowait(None)
+                self.pending.release()
+            except queue.Full:
+                pass
+            self.worker_thread.join(timeout=1)
+        self._close()
+
+    def _session(self):
+        """Session HTTP du sink: celle du pool partagé, sinon une session propre"""
+        return self.pool.session() if self.pool is not None else http_session()
+
+    def _close_session(self, session):
+        """Fermer une session propre au sink (celle du pool est fermée par le pool)"""
+        if session is not None and self.pool is None:
+            session.close()
+
+class DeliveryPool:
+    """Threads d'envoi et session HTTP partagés entre les sinks de tous les profils
+
+    Un thread par sink et par observatoire ne passe pas à l'échelle: vingt
+    observatoires, c'est quarante threads endormis sur leur file et autant de
+    pools de connexions. Ici quelques threads servent tous les sinks à tour de
+    rôle (files prioritaires d'abord): un profil bavard ne passe pas devant les
+    autres, un sink n'est servi que par un thread à la fois (l'ordre de ses
+    messages est conservé) et un sink dont le bucket de rate limit est épuisé,
+    ou qui attend de reprendre un message après une erreur réseau, est sauté
+    jusqu'à la fin du délai au lieu de bloquer un thread.
+    """
+
+    def __init__(self, workers: int = 4):
+        self.workers = workers
+        self.sinks: List[Sink] = []
+        self.busy = set()  # Sinks en cours de livraison
+        self.next_index = 0  # Tourniquet entre les sinks
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.http = None
+        self.http_lock = threading.Lock()
+        self.threads = [self._thread(index) for index in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def _thread(self, index: int) -> threading.Thread:
+        return threading.Thread(target=self._run, name=f"delivery-{index}", daemon=True)
+
+    def restart(self, index: int):
+        """Remplacer un thread d'envoi arrêté (superviseur)"""
+        self.threads[index] = self._thread(index)
+        self.threads[index].start()
+
+    def register(self, sink: Sink):
+        with self.condition:
+            self.sinks.append(sink)
+
+    def unregister(self, sink: Sink):
+        """Retirer un sink (après que sa file a été vidée ou abandonnée)"""
+        with self.condition:
+            while sink in self.busy:
+                self.condition.wait(1)
+            if sink in self.sinks:
+                self.sinks.remove(sink)
+            self.next_index = 0
+            self.condition.notify_all()
+
+    def notify(self):
+        """Un message a été déposé dans la file d'un sink"""
+        with self.condition:
+            self.condition.notify()
+
+    def session(self):
+        """Session HTTP partagée, dimensionnée pour tous les threads d'envoi"""
+        with self.http_lock:
+            if self.http is None:
+                self.http = http_session(pool_maxsize=self.workers, pool_connections=POOL_HOSTS)
+            return self.http
+
+    def _next(self):
+        """Prochain message à livrer: (sink, message, file), ou le délai d'attente avant d'en avoir un"""
+        wait = None
+        count = len(self.sinks)
+        for urgent in (True, False):
+            for offset in range(count):
+                index = (self.next_index + offset) % count
+                sink = self.sinks[index]
+                if sink in self.busy:
+                    continue
+                source = sink.priority_queue if urgent else sink.queue
+                if not sink.has_pending(source):
+                    continue
+                delay = sink.retry_in() if urgent else sink.ready_in()
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                if urgent:
+                    item = None  # Toute la file prioritaire, livrée par le sink lui-même
+                else:
+                    item = sink._next_item(source)
+                    if item is None:
+                        continue
+                self.next_index = (index + 1) % count
+                self.busy.add(sink)
+                return (sink, item, source), None
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.stopped:
+                        return
+                    task, wait = self._next()
+                    if task is not None:
+                        break
+                    self.condition.wait(wait)
+
+            sink, item, source = task
+            try:
+                if item is None:
+                    sink._process_priority()
+                else:
+                    sink._handle(item, source)
+            finally:
+                with self.condition:
+                    self.busy.discard(sink)
+                    self.condition.notify_all()
+            task = sink = item = None  # Ne pas garder le dernier message en mémoire pendant l'attente
+
+    def stop(self):
+        """Arrêter les threads (après l'arrêt de tous les sinks)"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=1)
+        if self.http is not None:
+            self.http.close()
+
+def http_session(pool_maxsize: int = 2, pool_connections: int = 1):
+    """Session HTTP persistante (keep-alive)
+
+    requests n'est importé qu'ici, au premier envoi et dans le thread du sink:
+    son import, le plus lourd du programme, ne retarde pas le démarrage du suivi.
+    `pool_connections` hôtes distincts gardent leurs connexions ouvertes.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize))
+    session.mount('http://', HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize))
+    return session
+
+def line_record(line: str, received: str) -> dict:
+    """Représentation structurée d'une ligne pour les sinks machine (fichier, webhook, MQTT)"""
+    source = None
+    match = SOURCE_TAG_PATTERN.match(line)
+    if match:
+        source = match.group(1)
+        line = line[match.end():]
+    parsed = parse_line(line)
+    return {
+        "received": received,
+        "source": source,
+        "timestamp": parsed.timestamp,
+        "level": LEVEL_NAMES.get(parsed.level, parsed.level),
+        "module": parsed.module,
+        "message": parsed.message,
+        "line": line,
+    }
+
+class JsonLinesFileSink(Sink):
+    """Archivage des lignes dans un fichier JSON Lines (un objet par ligne)"""
+
+    def __init__(self, file_path: str, name: str = "file", **kwargs):
+        self.file_path = file_path
+        self.file = open(file_path, 'a', encoding='utf-8')
+        super().__init__(name, **kwargs)
+
+    def _prepare(self, lines: List[str]) -> str:
+        received = datetime.now().isoformat(timespec='milliseconds')
+        return "".join(json.dumps(line_record(line, received), ensure_ascii=False) + "\n" for line in lines)
+
+    def _deliver(self, message: str) -> bool:
+        try:
+            self.file.write(message)
+            self.file.flush()
+            return True
+        except OSError as e:
+            logger.error(f"Erreur d'écriture dans {self.file_path}: {e}")
+            return False
+
+    def _close(self):
+        self.file.close()
+
+class WebhookSink(Sink):
+    """Envoi des lignes en JSON vers un endpoint HTTP générique (automatisation de l'observatoire)"""
+
+    def __init__(self, url: str, timeout: float = 10.0, name: str = "webhook", **kwargs):
+        self.url = url
+        self.timeout = timeout
+        self.session = None  # Créée au premier envoi
+        super().__init__(name, **kwargs)
+
+    def _prepare(self, lines: List[str]) -> dict:
+        received = datetime.now().isoformat(timespec='milliseconds')
+        return {"lines": [line_record(line, received) for line in lines]}
+
+    def _deliver(self, message: dict) -> bool:
+        if self.session is None:
+            self.session = self._session()
+        from requests.exceptions import RequestException
+        try:
+            response = self.session.post(self.url, json=message, timeout=self.timeout)
+        except RequestException as e:
+            logger.error(f"Erreur réseau vers {self.url}: {e}")
+            return False
+        if response.status_code >= 300:
+            logger.error(f"Erreur du webhook générique: {response.status_code}")
+            return False
+        return True
+
+    def _close(self):
+        self._close_session(self.session)
+
+class MqttSink(Sink):
+    """Publication des lignes sur un broker MQTT (nécessite paho-mqtt)"""
+
+    def __init__(self, host: str, port: int = 1883, topic: str = "ekos/logs", name: str = "mqtt", **kwargs):
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError:
+            raise RuntimeError("Le sink MQTT nécessite le paquet paho-mqtt (pip install paho-mqtt)")
+        self.topic = topic
+        self.client = mqtt.Client()
+        self.client.connect_async(host, port)
+        self.client.loop_start()
+        super().__init__(name, **kwargs)
+
+    def _prepare(self, lines: List[str]) -> str:
+        received = datetime.now().isoformat(timespec='milliseconds')
+        return json.dumps({"lines": [line_record(line, received) for line in lines]}, ensure_ascii=False)
+
+    def _deliver(self, message: str) -> bool:
+        info = self.client.publish(self.topic, message, qos=1)
+        if info.rc != 0:
+            logger.error(f"Publication MQTT impossible (code {info.rc})")
+            return False
+        return True
+
+    def _close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+class SinkDispatcher:
+    """Diffusion du flux de lignes vers plusieurs sinks
+
+    Le sink principal (Discord) pilote les accusés de livraison: checkpoints et
+    spool suivent sa livraison. Les sinks secondaires reçoivent une copie des
+    lignes dans leur propre file: un sink lent ne retarde jamais les autres.
+    """
+
+    def __init__(self, primary: Sink, secondary: Optional[List[Sink]] = None):
+        self.primary = primary
+        self.secondary = list(secondary or [])
+
+    @property
+    def sinks(self) -> List[Sink]:
+        return [self.primary] + self.secondary
+
+    @property
+    def running(self) -> bool:
+        return self.primary.running
+
+    def queue_depth(self) -> int:
+        return self.primary.queue_depth()
+
+    def saturated(self) -> bool:
+        return self.primary.saturated()
+
+    def send_logs(self, logs: List[str], on_delivered: Optional[Callable[[bool], None]] = None,
+                  priority: bool = False, trace: Optional[Trace] = None) -> bool:
+        for sink in self.secondary:
+            sink.send_logs(logs, priority=priority)
+        return self.primary.send_logs(logs, on_delivered, priority, trace)
+
+    def send_digest(self, lines: List[str]) -> bool:
+        for sink in self.secondary:
+            sink.send_digest(lines)
+        return self.primary.send_digest(lines)
+
+    def send_startup_message(self) -> bool:
+        for sink in self.secondary:
+            sink.send_startup_message()
+        return self.primary.send_startup_message()
+
+    def send_error_message(self, error: str) -> bool:
+        for sink in self.secondary:
+            sink.send_error_message(error)
+        return self.primary.send_error_message(error)
+
+    def stop(self, timeout: float = 10.0):
+        for sink in self.sinks:
+            sink.stop(timeout)
@@ -0,0 +1,211 @@
+import os
+import json
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".spool"
+CURSOR_FILE = "cursor.json"
+
+SPOOL_DROPPED = REGISTRY.counter('ekos_spool_dropped_lines_total', "Lignes perdues par dépassement de la taille max du spool")
+
+class DiskSpool:
+    """File de lignes sur disque, en segments ajoutés séquentiellement
+
+    Chaque ligne est écrite à la fin du segment courant (une ligne de texte par
+    ligne de log). Un curseur (segment, offset) mémorise ce qui a été livré; les
+    segments entièrement livrés sont supprimés. Au-delà de `max_size`, les segments
+    les plus anciens sont abandonnés: la mémoire et le disque restent bornés.
+    """
+
+    def __init__(self, directory: str, segment_size: int = 1024 * 1024, max_size: int = 64 * 1024 * 1024,
+                 labels: Optional[Dict[str, str]] = None):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self.segments: Deque[int] = deque()
+        self.sizes: Dict[int, int] = {}
+        self.read_segment = 1
+        self.read_offset = 0
+        self.writer = None
+        self.dropped_lines = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        REGISTRY.gauge('ekos_spool_pending_bytes', "Octets en attente de livraison dans le spool", self.pending_bytes, labels)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:08d}{SEGMENT_SUFFIX}")
+
+    def _load(self):
+        """Retrouver les segments et le curseur laissés par l'exécution précédente"""
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit():
+                segment = int(name[:-len(SEGMENT_SUFFIX)])
+                self.segments.append(segment)
+                self.sizes[segment] = os.path.getsize(self._segment_path(segment))
+
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE), 'r', encoding='utf-8') as f:
+                cursor = json.load(f)
+            self.read_segment, self.read_offset = int(cursor["segment"]), int(cursor["offset"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Curseur du spool illisible, relecture depuis le début: {e}")
+
+        # Segments déjà livrés (arrêt avant leur suppression)
+        while self.segments and self.segments[0] < self.read_segment:
+            self._delete_segment(self.segments.popleft())
+        if self.segments and self.segments[0] > self.read_segment:
+            self.read_segment, self.read_offset = self.segments[0], 0
+
+        if self.segments:
+            # Une écriture interrompue peut laisser une ligne incomplète en fin de segment
+            last = self.segments[-1]
+            path = self._segment_path(last)
+            with open(path, 'rb+') as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    logger.warning(f"Ligne incomplète supprimée en fin de segment {path}")
+                    f.truncate(end)
+                    self.sizes[last] = end
+            pending = self.pending_bytes()
+            if pending:
+                logger.info(f"Spool: {pending} octets en attente de livraison ({len(self.segments)} segment(s))")
+        else:
+            self.read_offset = 0
+
+    def _delete_segment(self, segment: int):
+        self.sizes.pop(segment, None)
+        try:
+            os.remove(self._segment_path(segment))
+        except FileNotFoundError:
+            pass
+
+    def _save_cursor(self):
+        """Écrire le curseur de manière atomique"""
+        cursor_file = os.path.join(self.directory, CURSOR_FILE)
+        tmp_file = f"{cursor_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"segment": self.read_segment, "offset": self.read_offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, cursor_file)
+
+    def _open_writer(self):
+        """Ouvrir le segment courant en ajout, ou en créer un nouveau s'il est plein"""
+        if self.writer is not None and self.sizes[self.segments[-1]] < self.segment_size:
+            return
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if not self.segments or self.sizes[self.segments[-1]] >= self.segment_size:
+            segment = self.segments[-1] + 1 if self.segments else self.read_segment
+            self.segments.append(segment)
+            self.sizes[segment] = 0
+        self.writer = open(self._segment_path(self.segments[-1]), 'ab')
+
+    def _enforce_max_size(self):
+        """Abandonner les segments les plus anciens au-delà de la taille max"""
+        while len(self.segments) > 1 and sum(self.sizes.values()) > self.max_size:
+            segment = self.segments.popleft()
+            lost = 0
+            if segment == self.read_segment:
+                with open(self._segment_path(segment), 'rb') as f:
+                    f.seek(self.read_offset)
+                    lost = f.read().count(b"\n")
+            self._delete_segment(segment)
+            self.read_segment, self.read_offset = self.segments[0], 0
+            self._save_cursor()
+            if lost:
+                self.dropped_lines += lost
+                SPOOL_DROPPED.inc(lost)
+                logger.warning(f"Spool plein ({self.max_size} octets): {lost} ligne(s) les plus anciennes abandonnées")
+
+    def append(self, lines: List[str]) -> bool:
+        """Ajouter des lignes à la fin du spool (écriture synchronisée sur disque)"""
+        if not lines:
+            return True
+        data = "".join(line.replace("\n", " ") + "\n" for line in lines).encode('utf-8')
+        with self.lock:
+            try:
+                self._open_writer()
+                self.writer.write(data)
+                self.writer.flush()
+                os.fsync(self.writer.fileno())
+                self.sizes[self.segments[-1]] += len(data)
+                self._enforce_max_size()
+                return True
+            except OSError as e:
+                logger.error(f"Erreur d'écriture dans le spool: {e}")
+                return False
+
+    def peek(self, max_lines: int, max_bytes: Optional[int] = None) -> Tuple[List[str], Optional[Tuple[int, int]]]:
+        """Lire jusqu'à `max_lines` lignes non livrées (et environ `max_bytes` octets), sans avancer le curseur
+
+        Retourne les lignes et le curseur à passer à `ack` une fois livrées.
+        """
+        with self.lock:
+            lines: List[str] = []
+            size = 0
+            segment, offset = self.read_segment, self.read_offset
+            for current in list(self.segments):
+                if current < segment:
+                    continue
+                if current > segment:
+                    segment, offset = current, 0
+                with open(self._segment_path(current), 'rb') as f:
+                    f.seek(offset)
+                    while len(lines) < max_lines and (max_bytes is None or size < max_bytes):
+                        raw = f.readline()
+                        if not raw.endswith(b"\n"):
+                            break
+                        offset += len(raw)
+                        size += len(raw)
+                        lines.append(raw[:-1].decode('utf-8', errors='ignore'))
+                if len(lines) >= max_lines or (max_bytes is not None and size >= max_bytes):
+                    break
+            return lines, ((segment, offset) if lines else None)
+
+    def ack(self, cursor: Tuple[int, int]):
+        """Marquer comme livrées les lignes lues jusqu'au curseur donné"""
+        segment, offset = cursor
+        with self.lock:
+            if (segment, offset) < (self.read_segment, self.read_offset):
+                return  # Lignes déjà abandonnées par dépassement de taille
+            # Supprimer les segments entièrement livrés (sauf celui en cours d'écriture)
+            while self.segments and self.segments[0] < segment:
+                self._delete_segment(self.segments.popleft())
+            self.read_segment, self.read_offset = segment, offset
+            if (len(self.segments) == 1 and offset >= self.sizes.get(segment, 0)
+                    and self.sizes.get(segment, 0) >= self.segment_size):
+                # Segment plein et livré: repartir sur un segment neuf
+                if self.writer is not None:
+                    self.writer.close()
+                    self.writer = None
+                self._delete_segment(self.segments.popleft())
+                self.read_segment, self.read_offset = segment + 1, 0
+            try:
+                self._save_cursor()
+            except OSError as e:
+                logger.error(f"Erreur d'écriture du curseur du spool: {e}")
+
+    def pending_bytes(self) -> int:
+        """Octets écrits et pas encore livrés"""
+        with self.lock:
+            return sum(self.sizes.values()) - (self.read_offset if self.read_segment in self.sizes else 0)
+
+    def empty(self) -> bool:
+        return self.pending_bytes() <= 0
+
+    def close(self):
+        with self.lock:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
@@ -0,0 +1,98 @@
+import time
+import logging
+import threading
+from typing import Callable, Dict
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Délai avant le redémarrage d'un composant arrêté, doublé à chaque nouvelle panne (secondes)
+RESTART_BACKOFF_MIN = 1.0
+RESTART_BACKOFF_MAX = 300.0
+# Un composant resté en vie aussi longtemps retrouve le délai minimal
+RESTART_BACKOFF_RESET = 600.0
+
+class Supervisor:
+    """Surveillance des threads de travail, redémarrés s'ils meurent
+
+    Tout tourne dans un seul processus: un thread tué par une exception non
+    rattrapée (observer, batcher, thread d'envoi...) arrêterait silencieusement
+    une partie du pipeline. `check()` est appelé par la boucle principale (aucun
+    thread de plus): chaque composant arrêté est redémarré après un délai qui
+    double à chaque panne, pour ne pas boucler sur une erreur permanente.
+    """
+
+    def __init__(self):
+        self.components: Dict[str, dict] = {}
+        self.stopped = False
+
+    def install(self):
+        """Journaliser les exceptions qui tuent un thread (au lieu de stderr seul)"""
+        threading.excepthook = self._excepthook
+        return self
+
+    @staticmethod
+    def _excepthook(args):
+        if args.exc_type is SystemExit:
+            return
+        name = args.thread.name if args.thread is not None else "?"
+        logger.error(f"Exception non rattrapée dans le thread {name}: {args.exc_value!r}",
+                     exc_info=(args.exc_type, args.exc_value, args.exc_traceback))
+
+    def watch(self, name: str, is_alive: Callable[[], bool], restart: Callable[[], None]):
+        """Surveiller un composant: `restart` est appelé quand `is_alive` devient faux"""
+        self.components[name] = {
+            "is_alive": is_alive,
+            "restart": restart,
+            "backoff": RESTART_BACKOFF_MIN,
+            "restart_at": None,
+            "started": time.monotonic(),
+            "restarts": REGISTRY.counter('ekos_thread_restarts_total', "Threads redémarrés par le superviseur",
+                                         {"thread": name}),
+        }
+
+    def watch_thread(self, name: str, owner: object, attribute: str, target: Callable[[], None]):
+        """Surveiller le thread `owner.attribute`, remplacé par un nouveau thread sur `target`"""
+        def restart():
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            setattr(owner, attribute, thread)
+            thread.start()
+
+        self.watch(name, lambda: getattr(owner, attribute).is_alive(), restart)
+
+    def check(self) -> int:
+        """Redémarrer les composants arrêtés dont le délai est écoulé; retourne leur nombre"""
+        restarted = 0
+        now = time.monotonic()
+        for name, component in self.components.items():
+            if self.stopped:
+                break
+            if component["is_alive"]():
+                if component["restart_at"] is None and now - component["started"] >= RESTART_BACKOFF_RESET:
+                    component["backoff"] = RESTART_BACKOFF_MIN
+                continue
+
+            if component["restart_at"] is None:
+                component["restart_at"] = now + component["backoff"]
+                logger.error(f"❌ Thread {name} arrêté, redémarrage dans {component['backoff']:g}s")
+                continue
+            if now < component["restart_at"]:
+                continue
+
+            component["started"] = now
+            component["restart_at"] = None
+            delay = component["backoff"]
+            component["backoff"] = min(delay * 2, RESTART_BACKOFF_MAX)
+            try:
+                component["restart"]()
+            except Exception as e:
+                logger.error(f"❌ Impossible de redémarrer le thread {name}: {e}")
+                continue
+            component["restarts"].inc()
+            restarted += 1
+            logger.warning(f"⚠️ Thread {name} redémarré")
+        return restarted
+
+    def stop(self):
+        """Ne plus rien redémarrer (appelé avant l'arrêt des composants)"""
+        self.stopped = True
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests du batcher: envoi par taille, par échéance et à l'arrêt
+"""
+
+import time
+import threading
+from batcher import Batcher
+from scheduler import Scheduler
+
+class Collector:
+    """Callback qui garde les batchs reçus et signale chaque envoi"""
+
+    def __init__(self):
+        self.batches = []
+        self.sent = threading.Event()
+
+    def __call__(self, batch):
+        self.batches.append(list(batch))
+        self.sent.set()
+
+def test_envoi_des_que_la_taille_est_atteinte():
+    collector = Collector()
+    batcher = Batcher(collector, batch_size=3, batch_timeout=60.0)
+    for i in range(3):
+        batcher.add(i)
+    assert collector.sent.wait(2)
+    assert collector.batches == [[0, 1, 2]]
+    batcher.stop()
+
+def test_envoi_a_l_echeance():
+    collector = Collector()
+    batcher = Batcher(collector, batch_size=100, batch_timeout=0.2)
+    start = time.monotonic()
+    batcher.add("a")
+    assert collector.sent.wait(2)
+    assert time.monotonic() - start >= 0.15
+    assert collector.batches == [["a"]]
+    batcher.stop()
+
+def test_flush_immediat():
+    collector = Collector()
+    batcher = Batcher(collector, batch_size=100, batch_timeout=60.0)
+    batcher.add("a")
+    batcher.flush()
+    assert collector.sent.wait(2)
+    assert collector.batches == [["a"]]
+    batcher.stop()
+
+def test_dernier_envoi_a_l_arret():
+    collector = Collector()
+    batcher = Batcher(collector, batch_size=100, batch_timeout=60.0)
+    batcher.add("a")
+    batcher.add("b")
+    batcher.stop()
+    assert collector.batches == [["a", "b"]]
+    assert not batcher.thread.is_alive()
+
+def test_arret_sans_boucler_si_le_callback_remet_en_tete():
+    """Envoi en échec à l'arrêt: un seul essai, les éléments restent disponibles"""
+    calls = []
+
+    def failing(batch):
+        calls.append(list(batch))
+        batcher.requeue(batch)
+
+    batcher = Batcher(failing, batch_size=100, batch_timeout=60.0)
+    batcher.add("a")
+    start = time.monotonic()
+    batcher.stop(timeout=2)
+    assert time.monotonic() - start < 1
+    assert not batcher.thread.is_alive()
+    assert calls == [["a"]]
+    assert batcher.take_remaining() == ["a"]
+    assert len(batcher) == 0
+
+def test_envoi_en_echec_retente_a_l_echeance():
+    calls = []
+
+    def flaky(batch):
+        calls.append(list(batch))
+        if len(calls) == 1:
+            batcher.requeue(batch)
+
+    batcher = Batcher(flaky, batch_size=1, batch_timeout=0.1)
+    batcher.add("a")
+    deadline = time.monotonic() + 2
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert calls == [["a"], ["a"]]
+    batcher.stop()
+
+def test_configure_raccourcit_l_echeance():
+    collector = Collector()
+    batcher = Batcher(collector, batch_size=100, batch_timeout=60.0)
+    batcher.add("a")
+    batcher.configure(batch_size=100, batch_timeout=0.05)
+    assert collector.sent.wait(2)
+    batcher.stop()
+
+def test_tache_de_l_echeancier():
+    scheduler = Scheduler().start()
+    collector = Collector()
+    batcher = Batcher(collector, batch_size=2, batch_timeout=60.0, scheduler=scheduler)
+    assert batcher.thread is None
+    try:
+        batcher.add("a")
+        batcher.add("b")
+        assert collector.sent.wait(2)
+        batcher.add("c")
+        batcher.stop()
+        assert collector.batches == [["a", "b"], ["c"]]
+    finally:
+        scheduler.stop()
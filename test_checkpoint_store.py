@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests du stockage des checkpoints: recul refusé, reprise après redémarrage, écriture différée
+"""
+
+import os
+from checkpoint_store import CheckpointStore, line_hash
+
+def test_checkpoint_ne_recule_pas_pour_un_meme_inode(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoint.json"))
+    assert store.update("/logs/log.txt", 1, 500, "ligne b")
+    assert not store.update("/logs/log.txt", 1, 200, "ligne a")
+    assert store.get("/logs/log.txt")["offset"] == 500
+    assert store.get("/logs/log.txt")["last_line_hash"] == line_hash("ligne b")
+
+def test_nouvel_inode_ou_retour_au_debut_acceptes(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoint.json"))
+    store.update("/logs/log.txt", 1, 500)
+    assert store.update("/logs/log.txt", 2, 10)  # Rotation: autre fichier
+    assert store.get("/logs/log.txt")["offset"] == 10
+    store.update("/logs/log.txt", 2, 300)
+    assert store.update("/logs/log.txt", 2, 0, rewind=True)  # Troncature
+    assert store.get("/logs/log.txt")["offset"] == 0
+
+def test_checkpoints_relus_apres_redemarrage(tmp_path):
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+    store = CheckpointStore(checkpoint_file)
+    store.update("/logs/log.txt", 7, 1234, "dernière ligne")
+    store.flush(force=True)
+    assert not os.path.exists(checkpoint_file + ".tmp")
+
+    reopened = CheckpointStore(checkpoint_file)
+    assert reopened.paths() == ["/logs/log.txt"]
+    assert reopened.get("/logs/log.txt") == {"path": "/logs/log.txt", "inode": 7, "offset": 1234,
+                                             "last_line_hash": line_hash("dernière ligne")}
+
+def test_ecriture_differee_regroupee(tmp_path):
+    """Au plus une écriture par intervalle: pas de fsync à chaque ligne livrée"""
+    checkpoint_file = str(tmp_path / "checkpoint.json")
+    store = CheckpointStore(checkpoint_file, flush_interval=60.0)
+    store.update("/logs/log.txt", 1, 10)  # Première écriture immédiate
+    store.update("/logs/log.txt", 1, 20)
+    store.update("/logs/log.txt", 1, 30)
+    assert CheckpointStore(checkpoint_file).get("/logs/log.txt")["offset"] == 10
+    store.close()
+    assert CheckpointStore(checkpoint_file).get("/logs/log.txt")["offset"] == 30
+
+def test_fichier_illisible_ignore(tmp_path):
+    checkpoint_file = tmp_path / "checkpoint.json"
+    checkpoint_file.write_text("{pas du json", encoding='utf-8')
+    assert CheckpointStore(str(checkpoint_file)).paths() == []
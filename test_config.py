@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests du rechargement de la configuration: détection des modifications, valeurs invalides refusées, environnement rétabli
+"""
+
+import os
+import time
+import pytest
+import config as config_module
+from config import RELOADABLE, Config, ConfigWatcher
+
+@pytest.fixture
+def env_file(tmp_path):
+    """Fichier .env temporaire; l'environnement du processus est rétabli après le test"""
+    saved_environ = dict(os.environ)
+    saved_keys = set(config_module.ENV_FILE_KEYS)
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    path = tmp_path / ".env"
+
+    def write(**values):
+        base = {"DISCORD_WEBHOOK_URL": "http://127.0.0.1:9/webhook", "EKOS_LOGS_DIRECTORY": str(logs),
+                "CHECKPOINT_FILE": str(tmp_path / "checkpoint.json"), "SPOOL_DIRECTORY": str(tmp_path / "spool")}
+        base.update(values)
+        path.write_text("".join(f"{key}={value}\n" for key, value in base.items()), encoding='utf-8')
+        return str(path)
+
+    yield write
+    os.environ.clear()
+    os.environ.update(saved_environ)
+    config_module.ENV_FILE_KEYS.clear()
+    config_module.ENV_FILE_KEYS.update(saved_keys)
+
+def test_configuration_valide_chargee(env_file):
+    watcher = ConfigWatcher(env_file(BATCH_SIZE="25"))
+    config = watcher.load()
+    assert config is not None
+    assert config.batch_size == 25
+
+@pytest.mark.parametrize('values', [
+    {"BATCH_SIZE": "abc"},                       # Valeur illisible
+    {"BATCH_SIZE": "0"},                         # Valeur hors limites
+    {"FILTER_DROP_PATTERN": "("},                # Expression invalide
+    {"BUFFER_OVERFLOW_POLICY": "tout_garder"},
+])
+def test_valeur_invalide_refusee_et_environnement_retabli(env_file, values):
+    watcher = ConfigWatcher(env_file(BATCH_SIZE="25"))
+    assert watcher.load() is not None
+
+    env_file(**values)
+    assert watcher.load() is None
+    assert os.environ["BATCH_SIZE"] == "25"
+    for key in values:
+        if key != "BATCH_SIZE":
+            assert key not in os.environ
+
+def test_variable_retiree_puis_configuration_refusee(env_file):
+    """Une variable retirée du fichier revient si la nouvelle configuration est refusée"""
+    watcher = ConfigWatcher(env_file(DEDUP_WINDOW="30"))
+    assert watcher.load().dedup_window == 30
+    env_file(BATCH_SIZE="-1")
+    assert watcher.load() is None
+    assert os.environ["DEDUP_WINDOW"] == "30"
+    assert "DEDUP_WINDOW" in config_module.ENV_FILE_KEYS
+
+def test_profil_invalide_refuse_sans_exception(env_file):
+    """PROFILE_<NOM>_* illisible: load() retourne None au lieu de lever ValueError"""
+    watcher = ConfigWatcher(env_file(PROFILES="a"))
+    config = watcher.load()
+    assert config is not None
+    assert [profile.batch_size for profile in config.profile_configs()] == [10]
+
+    env_file(PROFILES="a", PROFILE_A_BATCH_SIZE="abc")
+    assert watcher.load() is None
+    assert "PROFILE_A_BATCH_SIZE" not in os.environ
+
+    env_file(PROFILES="a", PROFILE_A_BATCH_SIZE="0")
+    assert watcher.load() is None
+
+    env_file(PROFILES="a", PROFILE_A_BATCH_SIZE="50")
+    assert watcher.load().profile_configs()[0].batch_size == 50
+
+def test_profils_avec_meme_spool_refuses(env_file):
+    watcher = ConfigWatcher(env_file(PROFILES="a,b", PROFILE_B_SPOOL_DIRECTORY="ekos_monitor_spool_a",
+                                     SPOOL_DIRECTORY="ekos_monitor_spool"))
+    assert watcher.load() is None
+
+def test_modification_du_fichier_detectee(env_file):
+    path = env_file(BATCH_SIZE="25")
+    watcher = ConfigWatcher(path, interval=0.01)
+    time.sleep(0.02)
+    assert not watcher.changed()
+    env_file(BATCH_SIZE="50", BATCH_TIMEOUT="5")
+    time.sleep(0.02)
+    assert watcher.changed()
+    config = watcher.load()
+    assert (config.batch_size, config.batch_timeout) == (50, 5.0)
+    time.sleep(0.02)
+    assert not watcher.changed()
+
+def test_verification_espacee_par_l_intervalle(env_file):
+    """Un seul stat par intervalle, depuis la boucle principale"""
+    path = env_file()
+    watcher = ConfigWatcher(path, interval=60)
+    env_file(BATCH_SIZE="50")
+    assert not watcher.changed()
+    assert not ConfigWatcher(path, interval=0).changed()  # Surveillance désactivée
+
+def test_parametres_rechargeables_existent(env_file):
+    ConfigWatcher(env_file()).load()
+    config = Config()
+    assert all(hasattr(config, name) for name in RELOADABLE)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests de la suppression des répétitions et des résumés comptabilisés
+"""
+
+from deduplicator import Deduplicator, fingerprint
+from log_monitor import tag_sources
+
+LINE = "[2024-01-15T21:00:{:02d}.000 CET INFO ][ org.kde.kstars.ekos.guide] - Guiding deviation {:.2f} exceeded"
+
+def lines_of(emitted):
+    return [line for _, line in emitted]
+
+def test_empreinte_sans_horodatage_ni_valeurs():
+    assert fingerprint(LINE.format(1, 1.25)) == fingerprint(LINE.format(59, 3.5))
+    assert fingerprint("capture failed") != fingerprint("capture aborted")
+
+def test_repetitions_dans_un_meme_batch_regroupees():
+    dedup = Deduplicator(window=60)
+    output = lines_of(dedup.process([LINE.format(i, i / 10) for i in range(5)], now=0.0))
+    assert output == [LINE.format(0, 0.0) + " (×5)"]
+
+def test_repetitions_suivantes_resumees_a_l_expiration():
+    dedup = Deduplicator(window=60)
+    assert lines_of(dedup.process([LINE.format(0, 1.0)], now=0.0)) == [LINE.format(0, 1.0)]
+    assert dedup.process([LINE.format(1, 2.0), LINE.format(2, 3.0)], now=10.0) == []
+    assert dedup.next_expiry(now=10.0) == 50.0
+    assert dedup.expire(now=30.0) == []
+    # Rafale suivie de silence: le résumé part à la fin de la fenêtre
+    assert lines_of(dedup.expire(now=60.0)) == [LINE.format(2, 3.0) + " (×2 en 10s)"]
+    assert dedup.next_expiry(now=60.0) is None
+
+def test_fenetre_expiree_rouverte_par_une_nouvelle_occurrence():
+    dedup = Deduplicator(window=60)
+    dedup.process([LINE.format(0, 1.0)], now=0.0)
+    dedup.process([LINE.format(1, 1.0)], now=5.0)
+    output = lines_of(dedup.process([LINE.format(2, 1.0)], now=70.0))
+    assert output == [LINE.format(1, 1.0) + " (×1 en 5s)", LINE.format(2, 1.0)]
+
+def test_lru_borne_resume_les_empreintes_evincees():
+    dedup = Deduplicator(window=60, max_fingerprints=2)
+    dedup.process(["alpha", "alpha"], now=0.0)
+    dedup.process(["alpha"], now=1.0)
+    output = lines_of(dedup.process(["beta", "gamma"], now=2.0))
+    assert output == ["beta", "gamma", "alpha (×1 en 1s)"]
+    assert len(dedup.windows) == 2
+
+def test_repetitions_comptees_par_fichier():
+    """Une même ligne dans deux fichiers n'est pas une répétition"""
+    dedup = Deduplicator(window=60)
+    emitted = dedup.process(["capture failed", "capture failed", "capture failed"], now=0.0,
+                            sources=["/logs/a.txt", "/logs/b.txt", "/logs/a.txt"])
+    assert emitted == [("/logs/a.txt", "capture failed (×2)"), ("/logs/b.txt", "capture failed")]
+    assert tag_sources(lines_of(emitted), [path for path, _ in emitted]) == \
+        ["`a` capture failed (×2)", "`b` capture failed"]
+
+def test_etiquette_ajoutee_apres_la_deduplication():
+    """L'étiquette d'un batch multi-fichiers ne change pas l'empreinte: la rafale continue"""
+    dedup = Deduplicator(window=60)
+    dedup.process(["capture failed"], now=0.0, sources=["/logs/a.txt"])
+    emitted = dedup.process(["capture failed", "guiding aborted"], now=1.0,
+                            sources=["/logs/a.txt", "/logs/b.txt"])
+    assert emitted == [("/logs/b.txt", "guiding aborted")]
+    assert tag_sources(["ligne"], ["/logs/a.txt"]) == ["ligne"]
+
+def test_drain_resume_tout():
+    dedup = Deduplicator(window=60)
+    dedup.process(["alpha", "beta"], now=0.0, sources=["/logs/a.txt", "/logs/a.txt"])
+    dedup.process(["alpha", "alpha"], now=3.0, sources=["/logs/a.txt", "/logs/a.txt"])
+    assert dedup.drain() == [("/logs/a.txt", "alpha (×2 en 3s)")]
+    assert not dedup.windows
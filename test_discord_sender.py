@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests du sink Discord sur les threads d'envoi partagés: backoff réseau sans bloquer les autres sinks
+"""
+
+import time
+import threading
+import pytest
+from discord_sender import DiscordSender
+from sinks import DeliveryPool, Sink
+
+requests = pytest.importorskip("requests")
+
+class FakeResponse:
+    status_code = 204
+    headers = {}
+    text = ""
+
+class FlakySession:
+    """Session HTTP de test: les `failures` premières requêtes échouent (réseau coupé)"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.posted = []
+
+    def post(self, url, json=None, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise requests.ConnectionError("réseau coupé")
+        self.posted.append(json["content"] if "content" in json else json)
+        return FakeResponse()
+
+class RecordingSink(Sink):
+    """Sink de test qui note l'heure de chaque livraison"""
+
+    def __init__(self, **kwargs):
+        self.delivered = []
+        super().__init__("enregistrement", **kwargs)
+
+    def _deliver(self, message) -> bool:
+        self.delivered.append((time.monotonic(), message))
+        return True
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+@pytest.fixture
+def pool():
+    pool = DeliveryPool(workers=1)
+    yield pool
+    pool.stop()
+
+def test_backoff_reseau_sans_bloquer_le_thread_partage(pool):
+    """Un seul thread partagé: l'autre sink est servi pendant le backoff du sink Discord"""
+    sender = DiscordSender("http://127.0.0.1:9/webhook", pool=pool, max_retries=3)
+    sender.session = FlakySession(failures=1)
+    other = RecordingSink(pool=pool)
+    done = threading.Event()
+    results = []
+
+    def on_delivered(success):
+        results.append(success)
+        done.set()
+
+    start = time.monotonic()
+    assert sender.send_logs(["ligne 1"], on_delivered)
+    assert wait_until(lambda: sender.deferred)
+    assert other.send_logs(["autre"])
+    assert wait_until(lambda: other.delivered)
+    assert other.delivered[0][0] - start < 0.5  # Pas d'attente derrière le backoff d'une seconde
+
+    assert done.wait(5)
+    assert results == [True]
+    assert time.monotonic() - start >= 0.9
+    assert len(sender.session.posted) == 1
+    assert sender.network_retries == 0
+    sender.stop(timeout=1)
+    other.stop(timeout=1)
+
+def test_payloads_deja_livres_non_renvoyes(pool):
+    sender = DiscordSender("http://127.0.0.1:9/webhook", pool=pool, max_retries=3, use_embeds=False)
+    session = FlakySession(failures=0)
+    sender.session = session
+    original_post = session.post
+
+    def post(url, json=None, **kwargs):
+        # Coupure après le premier payload du message
+        if len(session.posted) == 1 and not hasattr(session, "cut"):
+            session.cut = True
+            raise requests.ConnectionError("réseau coupé")
+        return original_post(url, json=json, **kwargs)
+
+    session.post = post
+    done = threading.Event()
+    assert sender.send_logs(["x" * 1500, "y" * 1500], lambda success: done.set())
+    assert done.wait(5)
+    assert len(session.posted) == 2
+    assert "x" * 1500 in session.posted[0] and "y" * 1500 in session.posted[1]
+    sender.stop(timeout=1)
+
+def test_abandon_apres_max_retries(pool):
+    sender = DiscordSender("http://127.0.0.1:9/webhook", pool=pool, max_retries=1)
+    sender.session = FlakySession(failures=5)
+    done = threading.Event()
+    results = []
+
+    def on_delivered(success):
+        results.append(success)
+        done.set()
+
+    assert sender.send_logs(["ligne"], on_delivered)
+    assert done.wait(5)
+    assert results == [False]
+    assert not sender.deferred and sender.network_retries == 0
+    sender.stop(timeout=1)
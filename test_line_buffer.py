@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Tests du buffer compact des lignes en attente et de sa limite de mémoire
+"""
+
+import pytest
+from line_buffer import BLOCK_BYTES, LINE_OVERHEAD, LineBufferPool, decoded_size
+
+def item(index, severity='info', length=40, file_path='/logs/log.txt'):
+    """Élément du batch: (ligne, (fichier, inode, fin de ligne), heure de lecture, sévérité)"""
+    line = f"{index:06d} " + "é" * (length - 7)
+    return (line, (file_path, 1, index), float(index), severity)
+
+def filled(pool, count, **kwargs):
+    buffer = pool.buffer()
+    for index in range(count):
+        assert buffer.append(item(index, **kwargs))
+    return buffer
+
+def indexes(buffer):
+    return [position[2] for _, position, _, _ in buffer]
+
+def test_elements_relus_a_l_identique():
+    pool = LineBufferPool(10 * 1024 * 1024)
+    buffer = pool.buffer()
+    items = [item(0, 'info', file_path='/a'), item(1, 'warning', file_path='/b'), item(2, 'critical', file_path='/a')]
+    for entry in items:
+        buffer.append(entry)
+    assert list(buffer) == items
+    assert len(buffer) == 3
+    assert buffer.oldest() == (0.0, '/a')
+
+def test_memoire_comptee_dans_le_pool():
+    pool = LineBufferPool(10 * 1024 * 1024)
+    buffer = filled(pool, 100)
+    size = sum(len(line.encode('utf-8')) for line, _, _, _ in buffer)
+    assert buffer.nbytes == pool.used == size + LINE_OVERHEAD * 100
+    buffer.release()
+    assert pool.used == 0 and len(buffer) == 0
+
+def test_blocs_scelles_une_fois_pleins():
+    pool = LineBufferPool(10 * 1024 * 1024)
+    buffer = filled(pool, 3000, length=100)
+    assert len(buffer.blocks) > 1
+    for block in list(buffer.blocks)[:-1]:
+        assert block.sealed
+        assert len(block.data) >= BLOCK_BYTES
+    assert not buffer.blocks[-1].sealed
+
+def test_take_puis_prepend_conserve_l_ordre():
+    pool = LineBufferPool(10 * 1024 * 1024)
+    buffer = filled(pool, 3000, length=100)
+    used = pool.used
+    head = buffer.take(1234)  # Coupe un bloc en deux
+    assert indexes(head) == list(range(1234))
+    assert indexes(buffer) == list(range(1234, 3000))
+    assert head.nbytes + buffer.nbytes == pool.used == used
+
+    buffer.prepend(head)
+    assert len(head) == 0
+    assert indexes(buffer) == list(range(3000))
+    assert pool.used == used
+
+def test_prepend_scelle_le_dernier_bloc():
+    """Le buffer remis en tête ne sera plus complété: sa marge de croissance est rendue"""
+    pool = LineBufferPool(10 * 1024 * 1024)
+    pending = filled(pool, 10)
+    buffer = pool.buffer()
+    buffer.append(item(10))
+    buffer.prepend(pending)
+    assert buffer.blocks[0].sealed
+    assert indexes(buffer) == list(range(11))
+
+def test_copie_decodee_comptee_jusqu_a_la_livraison():
+    pool = LineBufferPool(10 * 1024 * 1024)
+    buffer = filled(pool, 50)
+    used = pool.used
+    lines = [line for line, _, _, _ in buffer]
+    buffer.hold_decoded(lines)
+    assert pool.held == decoded_size(lines)
+    assert pool.used == used + decoded_size(lines)
+    assert buffer.decoded_estimate >= decoded_size(lines)
+
+    # Échec d'envoi: la copie est abandonnée, les lignes restent en attente
+    pending = pool.buffer()
+    pending.prepend(buffer)
+    assert pool.held == 0 and pool.used == used
+
+    # Livraison: tout est rendu
+    lines = [line for line, _, _, _ in pending]
+    pending.hold_decoded(lines)
+    pending.release()
+    assert pool.held == 0 and pool.used == 0
+
+def test_can_hold_laisse_toujours_passer_un_message():
+    pool = LineBufferPool(1000)
+    assert pool.can_hold(5000)  # Rien en cours d'envoi: l'arriéré avance quand même
+    buffer = filled(pool, 5)
+    buffer.hold_decoded(["x" * 100])
+    assert not pool.can_hold(5000)
+    assert pool.can_hold(pool.limit - pool.used)
+
+def test_reserve_et_release():
+    pool = LineBufferPool(1000)
+    pool.reserve(600)
+    assert pool.available() == 400
+    pool.release(600)
+    assert pool.used == 0
+
+@pytest.mark.parametrize('policy', ['drop_oldest', 'drop_severity'])
+def test_limite_respectee_avec_rejet(policy):
+    pool = LineBufferPool(20_000, policy)
+    buffer = pool.buffer()
+    for index in range(2000):
+        buffer.append(item(index, severity=('info', 'warning', 'critical')[index % 3]))
+        assert pool.used <= pool.limit
+    assert pool.dropped > 0
+    assert len(buffer) + pool.dropped == 2000
+    assert buffer.nbytes == pool.used
+
+def test_drop_oldest_rejette_les_plus_anciennes():
+    pool = LineBufferPool(20_000, 'drop_oldest')
+    buffer = filled(pool, 1000)
+    assert pool.dropped > 0
+    remaining = indexes(buffer)
+    assert remaining == list(range(1000 - len(remaining), 1000))
+
+def test_drop_severity_rejette_info_puis_warning():
+    pool = LineBufferPool(20_000, 'drop_severity')
+    buffer = pool.buffer()
+    for index in range(300):
+        buffer.append(item(index, severity='critical' if index % 10 == 0 else 'info'))
+    assert pool.dropped > 0
+    severities = [severity for _, _, _, severity in buffer]
+    # Toutes les alertes sont gardées, les infos restantes sont les plus récentes
+    assert severities.count('critical') == 30
+    infos = [position[2] for _, position, _, severity in buffer if severity == 'info']
+    assert infos == sorted(infos) and infos[-1] == 299
+
+def test_drop_severity_ne_rejette_pas_pour_moins_important():
+    """Buffer plein d'alertes: une ligne info est rejetée plutôt qu'une alerte"""
+    pool = LineBufferPool(20_000, 'drop_severity')
+    buffer = pool.buffer()
+    index = 0
+    while pool.used + 200 < pool.limit:
+        buffer.append(item(index, severity='critical'))
+        index += 1
+    before = indexes(buffer)
+    assert not buffer.append(item(index, severity='info', length=400))
+    assert indexes(buffer) == before
+    assert pool.dropped == 1
+
+def test_pause_n_ejecte_rien():
+    """Politique pause: la lecture s'arrête avant la limite, le buffer ne rejette jamais"""
+    pool = LineBufferPool(1000, 'pause')
+    buffer = filled(pool, 100)
+    assert pool.used > pool.limit
+    assert pool.dropped == 0 and len(buffer) == 100
+
+def test_count_within():
+    pool = LineBufferPool(10 * 1024 * 1024)
+    buffer = filled(pool, 10)
+    size = len(item(0)[0].encode('utf-8'))
+    assert buffer.count_within(size * 3) == 3
+    assert buffer.count_within(size * 3 - 1) == 2
+    assert buffer.count_within(1) == 1  # Au moins une ligne
+    assert buffer.count_within(size * 100) == 10
+
+def test_sources_liberees_et_reutilisees():
+    """Plus de 65535 fichiers suivis tour à tour: les numéros de source sont réutilisés"""
+    pool = LineBufferPool(10 * 1024 * 1024)
+    for index in range(70000):
+        buffer = pool.buffer()
+        buffer.append(item(index, file_path=f'/logs/log_{index}.txt'))
+        buffer.append(item(index, file_path=f'/logs/log_{index}.txt'))
+        assert list(buffer)[0][1][0] == f'/logs/log_{index}.txt'
+        buffer.release()
+    assert len(pool.sources) == 1
+    assert pool.source_ids == {}
+
+def test_source_gardee_tant_qu_une_ligne_y_fait_reference():
+    pool = LineBufferPool(10 * 1024 * 1024)
+    buffer = pool.buffer()
+    buffer.append(item(0, file_path='/a'))
+    buffer.append(item(1, file_path='/b'))
+    buffer.append(item(2, file_path='/a'))
+    head = buffer.take(2)
+    head.release()
+    assert [position[0] for _, position, _, _ in buffer] == ['/a']
+    assert set(pool.source_ids) == {('/a', 1)}
+    buffer.release()
+    assert pool.source_ids == {}
+
+@pytest.mark.parametrize('policy', ['drop_oldest', 'drop_severity'])
+def test_sources_des_lignes_rejetees_liberees(policy):
+    pool = LineBufferPool(20_000, policy)
+    buffer = pool.buffer()
+    for index in range(2000):
+        buffer.append(item(index, file_path=f'/logs/log_{index}.txt'))
+    assert pool.dropped > 0
+    assert len(pool.source_ids) == len(buffer)
+    buffer.release()
+    assert pool.source_ids == {}
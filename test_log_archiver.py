@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests de l'archivage compressé: lecture transparente des archives par le suivi et la recherche
+"""
+
+import os
+import pytest
+from log_archiver import LogArchiver, open_log, original_path, read_summary, uncompressed_size
+from log_search import LogSearchIndex
+from log_tailer import FileTailer
+
+LINES = [f"[2024-01-15T21:{i // 60:02d}:{i % 60:02d}.000 CET INFO ][ org.kde.kstars.ekos.capture] - "
+         f"Capture {i} terminée" for i in range(200)]
+
+@pytest.fixture
+def log_file(tmp_path):
+    night = tmp_path / "logs" / "2024-01-15"
+    night.mkdir(parents=True)
+    path = night / "log_21-00-00.txt"
+    path.write_text("".join(line + "\n" for line in LINES), encoding='utf-8')
+    return str(path)
+
+def archive(log_file, compression='gzip'):
+    archiver = LogArchiver(os.path.dirname(log_file), compression=compression, min_age=0)
+    return archiver.archive_file(log_file)
+
+@pytest.mark.parametrize('compression', ['gzip', 'zstd'])
+def test_archive_identique_au_log(log_file, compression):
+    if compression == 'zstd':
+        pytest.importorskip("zstandard")
+    size = os.path.getsize(log_file)
+    archive_path = archive(log_file, compression)
+    assert archive_path == log_file + ('.gz' if compression == 'gzip' else '.zst')
+    assert not os.path.exists(log_file)
+    assert original_path(archive_path) == log_file
+    with open_log(archive_path, 'rt') as f:
+        assert f.read().splitlines() == LINES
+    summary = read_summary(archive_path)
+    assert summary["lines"] == len(LINES)
+    assert summary["original_size"] == size
+    assert summary["first_timestamp"].startswith("2024-01-15T21:00:00")
+
+def test_taille_decompressee_sans_resume(log_file):
+    size = os.path.getsize(log_file)
+    archive_path = archive(log_file)
+    assert uncompressed_size(archive_path) == size
+    os.remove(log_file + ".summary.json")
+    assert uncompressed_size(archive_path) == size  # Par lecture complète de l'archive
+
+def test_suivi_d_une_archive_lue_jusqu_au_bout(log_file):
+    """Offsets en octets décompressés: reprise d'une archive au checkpoint du log d'origine"""
+    offset = len("".join(line + "\n" for line in LINES[:50]).encode('utf-8'))
+    archive_path = archive(log_file)
+    tailer = FileTailer(archive_path)
+    tailer.resume_from(os.stat(archive_path).st_ino, offset)
+    lines = tailer.read_lines(max_bytes=1000)
+    lines += tailer.read_lines()
+    assert [line for line, _ in lines] == LINES[50:]
+    assert lines[-1][1] == uncompressed_size(archive_path)
+    assert tailer.exhausted
+    assert tailer.read_lines() == []
+
+def test_archive_positionnee_en_fin(log_file):
+    archive_path = archive(log_file)
+    tailer = FileTailer(archive_path)
+    tailer.seek_to_end()
+    assert tailer.offset == uncompressed_size(archive_path)
+    assert tailer.line_before(tailer.offset) == LINES[-1]
+
+def test_recherche_dans_les_archives(log_file, tmp_path):
+    root = os.path.dirname(os.path.dirname(log_file))
+    index = LogSearchIndex(str(tmp_path / "index.db"))
+    try:
+        index.update(root, workers=1)
+        assert index.stats()["lines"] == len(LINES)
+        # Le log déjà indexé garde ses lignes une fois compressé
+        archive_path = archive(log_file)
+        index.update(root, workers=1)
+        results = index.search('"Capture 42"')
+        assert [(result.path, result.line_no) for result in results] == [(archive_path, 43)]
+        assert index.stats()["lines"] == len(LINES)
+    finally:
+        index.close()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Tests du gestionnaire de logs: voie prioritaire, avancée du checkpoint et reprise après redémarrage
+"""
+
+import os
+import time
+import pytest
+from alert_rules import AlertClassifier
+from checkpoint_store import CheckpointStore
+from log_monitor import LogFileHandler
+
+class ManualSink:
+    """Sink de test: chaque message attend que le test décide de sa livraison"""
+
+    name = "manuel"
+    running = True
+
+    def __init__(self):
+        self.messages = []  # [lignes, callback, prioritaire]
+
+    @property
+    def primary(self):
+        return self
+
+    def saturated(self) -> bool:
+        return False
+
+    def send_logs(self, logs, on_delivered=None, priority=False, trace=None) -> bool:
+        self.messages.append((list(logs), on_delivered, priority))
+        return True
+
+    def send_digest(self, lines) -> bool:
+        return True
+
+    def wait(self, count: int, timeout: float = 2.0):
+        """Attendre le `count`-ième message et le retourner"""
+        deadline = time.monotonic() + timeout
+        while len(self.messages) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(self.messages) >= count
+        return self.messages[count - 1]
+
+ALERT = "Guiding aborted"
+
+@pytest.fixture
+def setup(tmp_path):
+    """Fichier de log (info, alerte, info) suivi depuis le début par un gestionnaire avec voie prioritaire"""
+    log_file = tmp_path / "log.txt"
+    log_file.write_text(f"ligne 1\n{ALERT}\nligne 3\n", encoding='utf-8')
+    sink = ManualSink()
+    store = CheckpointStore(str(tmp_path / "checkpoint.json"))
+    handler = LogFileHandler(sink, batch_size=100, batch_timeout=60.0, checkpoint_store=store,
+                             classifier=AlertClassifier())
+    handler._track_file(str(log_file), from_start=True)
+    yield handler, sink, store, str(log_file)
+    handler.stop()
+
+def offset(store, path):
+    return store.get(path)["offset"]
+
+def test_alerte_envoyee_par_la_voie_prioritaire(setup):
+    handler, sink, store, path = setup
+    lines, _, priority = sink.wait(1)
+    assert lines == [ALERT] and priority
+    handler.batcher.flush()
+    lines, _, priority = sink.wait(2)
+    assert lines == ["ligne 1", "ligne 3"] and not priority
+
+def test_checkpoint_retenu_avant_l_alerte_non_livree(setup):
+    """La voie normale livrée ne fait pas dépasser une alerte en cours d'envoi"""
+    handler, sink, store, path = setup
+    _, deliver_alert, _ = sink.wait(1)
+    handler.batcher.flush()
+    _, deliver_normal, _ = sink.wait(2)
+    deliver_normal(True)
+    assert offset(store, path) == len("ligne 1\n")
+
+    deliver_alert(True)
+    assert offset(store, path) == len(f"ligne 1\n{ALERT}\nligne 3\n")
+
+def test_alerte_livree_avant_la_voie_normale(setup):
+    """Une alerte livrée seule ne fait pas avancer le checkpoint au-delà des lignes normales en attente"""
+    handler, sink, store, path = setup
+    _, deliver_alert, _ = sink.wait(1)
+    deliver_alert(True)
+    assert store.get(path) is None
+    handler.batcher.flush()
+    _, deliver_normal, _ = sink.wait(2)
+    deliver_normal(True)
+    assert offset(store, path) == len(f"ligne 1\n{ALERT}\nligne 3\n")
+
+def test_echec_prioritaire_sans_recul_du_checkpoint(setup):
+    """Alerte en échec: remise dans la voie normale, livrée plus tard sans faire reculer le checkpoint"""
+    handler, sink, store, path = setup
+    end = len(f"ligne 1\n{ALERT}\nligne 3\n")
+    _, deliver_alert, _ = sink.wait(1)
+    handler.batcher.flush()
+    _, deliver_normal, _ = sink.wait(2)
+    deliver_normal(True)
+    deliver_alert(False)
+    assert offset(store, path) == len("ligne 1\n")
+
+    handler.batcher.flush()
+    lines, deliver_retry, priority = sink.wait(3)
+    assert lines == [ALERT] and not priority
+    deliver_retry(True)
+    assert offset(store, path) == end
+
+def test_troncature_remet_le_checkpoint_au_debut(setup):
+    handler, sink, store, path = setup
+    sink.wait(1)[1](True)
+    handler.batcher.flush()
+    sink.wait(2)[1](True)
+    assert offset(store, path) > 0
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("nouveau\n")
+    handler._read_new_lines(path)
+    assert offset(store, path) == 0
+    handler.batcher.flush()
+    lines, deliver, _ = sink.wait(3)
+    assert lines == ["nouveau"]
+    deliver(True)
+    assert offset(store, path) == len("nouveau\n")
+
+def restarted(tmp_path, path):
+    """Nouveau gestionnaire (redémarrage) qui reprend le fichier depuis son checkpoint"""
+    sink = ManualSink()
+    store = CheckpointStore(str(tmp_path / "checkpoint.json"))
+    handler = LogFileHandler(sink, batch_size=100, batch_timeout=60.0, checkpoint_store=store)
+    handler._track_file(path, resume=True)
+    handler.batcher.flush()
+    return handler, sink
+
+def delivered_everything(handler, sink, count):
+    for index in range(count):
+        sink.wait(index + 1)[1](True)
+    handler.stop()
+
+def test_reprise_depuis_le_checkpoint_apres_redemarrage(setup, tmp_path):
+    """Les lignes écrites pendant l'arrêt sont rattrapées, les lignes livrées ne sont pas renvoyées"""
+    handler, sink, store, path = setup
+    sink.wait(1)[1](True)
+    handler.batcher.flush()
+    delivered_everything(handler, sink, 2)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("pendant l'arrêt 1\npendant l'arrêt 2\n")
+
+    handler, sink = restarted(tmp_path, path)
+    try:
+        assert sink.wait(1)[0] == ["pendant l'arrêt 1", "pendant l'arrêt 2"]
+    finally:
+        handler.stop()
+
+def test_lignes_non_livrees_relues_apres_redemarrage(tmp_path):
+    """Arrêt avant la livraison: le checkpoint n'a pas avancé, les lignes sont relues"""
+    path = str(tmp_path / "log.txt")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("historique\n")
+    sink = ManualSink()
+    store = CheckpointStore(str(tmp_path / "checkpoint.json"))
+    handler = LogFileHandler(sink, batch_size=100, batch_timeout=60.0, checkpoint_store=store)
+    handler._track_file(path)  # Positionné en fin de fichier, checkpoint écrit
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write("non livrée 1\nnon livrée 2\n")
+    handler._read_new_lines(path)
+    handler.stop()  # Dernier envoi jamais acquitté
+    assert sink.messages[0][0] == ["non livrée 1", "non livrée 2"]
+    assert store.get(path)["offset"] == len("historique\n")
+
+    handler, sink = restarted(tmp_path, path)
+    try:
+        assert sink.wait(1)[0] == ["non livrée 1", "non livrée 2"]
+    finally:
+        handler.stop()
+
+def test_checkpoint_d_un_autre_inode_ignore(setup, tmp_path):
+    """Fichier remplacé pendant l'arrêt: le checkpoint obsolète n'est pas appliqué"""
+    handler, sink, store, path = setup
+    sink.wait(1)[1](True)
+    handler.batcher.flush()
+    delivered_everything(handler, sink, 2)
+    os.rename(path, path + ".old")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("nouveau fichier, nouvelle première ligne assez longue\n")
+
+    handler, sink = restarted(tmp_path, path)
+    try:
+        tailer = handler.tailers[path]
+        assert tailer.inode == os.stat(path).st_ino
+        assert tailer.offset == os.path.getsize(path)  # Pas de reprise à l'offset de l'ancien fichier
+    finally:
+        handler.stop()
+
+def test_checkpoint_avec_derniere_ligne_differente_ignore(setup, tmp_path):
+    handler, sink, store, path = setup
+    sink.wait(1)[1](True)
+    handler.batcher.flush()
+    delivered_everything(handler, sink, 2)
+    checkpoint = CheckpointStore(str(tmp_path / "checkpoint.json")).get(path)
+    with open(path, 'r+', encoding='utf-8') as f:
+        f.seek(checkpoint["offset"] - len("ligne 3\n"))
+        f.write("LIGNE X\n")
+
+    handler, sink = restarted(tmp_path, path)
+    try:
+        assert handler.tailers[path].offset == os.path.getsize(path)
+        assert sink.messages == []
+    finally:
+        handler.stop()
+
+def test_reconfiguration_sans_perte_des_lignes_en_attente(setup):
+    """Rechargement à chaud: les lignes en attente partent avec les nouveaux réglages"""
+    handler, sink, store, path = setup
+    sink.wait(1)
+    assert len(handler.batcher) == 2
+    handler.reconfigure(batch_size=100, batch_timeout=0.05, log_filter=None, deduplicator=None,
+                        classifier=AlertClassifier(), critical_latency_target=2.0, normal_latency_target=None,
+                        max_tailed_files=32, digest_interval=900.0, digest_only=False,
+                        buffer_max_bytes=16 * 1024 * 1024, overflow_policy='pause')
+    lines, _, priority = sink.wait(2)
+    assert lines == ["ligne 1", "ligne 3"] and not priority
+    assert handler.latency_targets['normal'] == pytest.approx(5.05)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests de la lecture incrémentale par offset: ligne partielle, troncature, rotation
+"""
+
+import os
+from log_tailer import FileTailer
+
+def append(path, text):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(text)
+
+def test_seules_les_lignes_ajoutees_sont_lues(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, "historique\n")
+    tailer = FileTailer(path)
+    tailer.seek_to_end()
+    assert tailer.read_lines() == []
+
+    append(path, "ligne 1\nligne 2\n")
+    assert tailer.read_lines() == [("ligne 1", 19), ("ligne 2", 27)]
+    assert tailer.read_lines() == []
+    assert tailer.offset == os.path.getsize(path)
+
+def test_ligne_partielle_gardee_jusqu_au_retour_a_la_ligne(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, "")
+    tailer = FileTailer(path)
+    tailer.seek_to_end()
+    append(path, "début de li")
+    assert tailer.read_lines() == []
+    assert tailer.line_offset == 0
+    append(path, "gne\nsuite")
+    assert tailer.read_lines() == [("début de ligne", len("début de ligne\n".encode('utf-8')))]
+    assert tailer.line_offset == len("début de ligne\n".encode('utf-8'))
+
+def test_lecture_bornee_par_max_bytes(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, "".join(f"ligne {i:03d}\n" for i in range(100)))
+    tailer = FileTailer(path)
+    tailer.resume_from(os.stat(path).st_ino, 0)
+    first = tailer.read_lines(max_bytes=50)
+    assert tailer.offset == 50
+    rest = tailer.read_lines()
+    assert [line for line, _ in first + rest] == [f"ligne {i:03d}" for i in range(100)]
+
+def test_troncature_relue_depuis_le_debut(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, "ancienne ligne assez longue\n")
+    tailer = FileTailer(path)
+    tailer.seek_to_end()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("nouvelle\n")
+    assert tailer.read_lines() == [("nouvelle", 9)]
+    assert tailer.resets == 1
+
+def test_rotation_detectee_par_l_inode(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, "avant rotation\n")
+    tailer = FileTailer(path)
+    tailer.seek_to_end()
+    os.rename(path, str(tmp_path / "log.1.txt"))
+    append(path, "après rotation, fichier plus long que le précédent\n")
+    lines = tailer.read_lines()
+    assert [line for line, _ in lines] == ["après rotation, fichier plus long que le précédent"]
+    assert tailer.resets == 1
+
+def test_remplacement_sur_place_detecte(tmp_path):
+    """Fichier réécrit sur place (même inode, plus long): ses premiers octets ont changé"""
+    path = str(tmp_path / "log.txt")
+    append(path, "contenu d'origine\n")
+    tailer = FileTailer(path)
+    tailer.seek_to_end()
+    with open(path, 'r+', encoding='utf-8') as f:
+        f.write("CONTENU REMPLACÉ, plus long\n")
+    assert [line for line, _ in tailer.read_lines()] == ["CONTENU REMPLACÉ, plus long"]
+
+def test_line_before(tmp_path):
+    path = str(tmp_path / "log.txt")
+    append(path, "première\nseconde\n")
+    tailer = FileTailer(path)
+    end = len("première\n".encode('utf-8'))
+    assert tailer.line_before(end) == "première"
+    assert tailer.line_before(os.path.getsize(path)) == "seconde"
+    assert tailer.line_before(0) is None
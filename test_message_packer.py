@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests de la répartition des lignes en payloads webhook Discord
+"""
+
+from message_packer import CONTENT_LIMIT, EMBED_DESCRIPTION_LIMIT, EMBED_TOTAL_LIMIT, MAX_EMBEDS, MessagePacker
+
+def texts(payloads):
+    """Textes de tous les emplacements, dans l'ordre de remplissage"""
+    result = []
+    for payload in payloads:
+        if "content" in payload:
+            result.append(payload["content"])
+        result += [embed["description"] for embed in payload.get("embeds", [])]
+    return result
+
+def unpack(payloads):
+    """Lignes reconstituées (les morceaux d'une ligne découpée se suivent)"""
+    return [line for text in texts(payloads) for line in text.split("\n")]
+
+def assert_within_limits(payloads, header=""):
+    for index, payload in enumerate(payloads):
+        content = payload.get("content", "")
+        assert len(content) <= CONTENT_LIMIT
+        embeds = payload.get("embeds", [])
+        assert len(embeds) <= MAX_EMBEDS
+        assert all(len(embed["description"]) <= EMBED_DESCRIPTION_LIMIT for embed in embeds)
+        assert sum(len(embed["description"]) for embed in embeds) <= EMBED_TOTAL_LIMIT
+        if index == 0 and header:
+            assert content.startswith(header)
+
+def test_lignes_courtes_dans_un_seul_message():
+    payloads = MessagePacker().pack(["ligne 1", "ligne 2"], header="**EKOS**\n")
+    assert payloads == [{"content": "**EKOS**\nligne 1\nligne 2"}]
+
+def test_rien_a_envoyer():
+    assert MessagePacker().pack([]) == []
+
+def test_ligne_de_plus_de_2000_caracteres_decoupee_sans_perte():
+    """Une ligne trop longue pour le contenu est découpée, jamais tronquée"""
+    line = "".join(chr(ord('a') + i % 26) for i in range(2500))
+    payloads = MessagePacker(use_embeds=False).pack([line])
+    assert len(payloads) == 2
+    assert_within_limits(payloads)
+    assert "".join(texts(payloads)) == line
+
+def test_ligne_plus_longue_qu_un_embed():
+    """Une ligne plus longue qu'une description d'embed s'étale sur plusieurs emplacements"""
+    line = "x" * (EMBED_DESCRIPTION_LIMIT + 3000)
+    payloads = MessagePacker().pack(["avant", line, "après"])
+    assert_within_limits(payloads)
+    pieces = unpack(payloads)
+    assert pieces[0] == "avant" and pieces[-1] == "après"
+    assert "".join(pieces[1:-1]) == line
+
+def test_embeds_remplis_jusqu_a_la_limite_totale():
+    """Un payload ne dépasse jamais 6000 caractères d'embeds, puis un nouveau message commence"""
+    lines = [f"{i:05d} " + "y" * 93 for i in range(400)]  # 100 caractères par ligne
+    payloads = MessagePacker().pack(lines, header="**EKOS**\n")
+    assert len(payloads) > 1
+    assert_within_limits(payloads, header="**EKOS**\n")
+    # Le premier message est plein: contenu puis embeds jusqu'à la limite totale
+    # (au plus une ligne de marge par emplacement)
+    first = payloads[0]
+    assert len(first["content"]) > CONTENT_LIMIT - 101
+    assert sum(len(embed["description"]) for embed in first["embeds"]) > EMBED_TOTAL_LIMIT - 101 * len(first["embeds"])
+    assert [line for line in unpack(payloads) if not line.startswith("**")] == lines
+
+def test_sans_embeds():
+    lines = [f"ligne {i} " + "z" * 190 for i in range(30)]
+    payloads = MessagePacker(use_embeds=False).pack(lines)
+    assert all(set(payload) == {"content"} for payload in payloads)
+    assert_within_limits(payloads)
+    assert unpack(payloads) == lines
+
+def test_limites_personnalisees():
+    packer = MessagePacker(content_limit=50, embed_limit=40, embed_total_limit=100, max_embeds=2)
+    lines = [f"ligne {i:02d} " + "w" * 20 for i in range(20)]
+    payloads = packer.pack(lines)
+    for payload in payloads:
+        assert len(payload.get("content", "")) <= 50
+        embeds = payload.get("embeds", [])
+        assert len(embeds) <= 2
+        assert all(len(embed["description"]) <= 40 for embed in embeds)
+    assert unpack(payloads) == lines
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests du rate limiting piloté par les en-têtes X-RateLimit-* de Discord
+"""
+
+from rate_limiter import BucketRateLimiter
+
+def headers(remaining, reset_after, bucket='bucket-a'):
+    return {'X-RateLimit-Limit': '5', 'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset-After': str(reset_after), 'X-RateLimit-Bucket': bucket}
+
+def test_pas_d_attente_sans_information():
+    limiter = BucketRateLimiter()
+    assert limiter.delay() == 0.0
+    assert limiter.acquire() == 0.0
+    assert limiter.remaining is None
+
+def test_budget_restant_sans_attente():
+    limiter = BucketRateLimiter()
+    limiter.update(headers(3, 2.0), 204)
+    assert limiter.bucket == 'bucket-a'
+    assert limiter.remaining == 3
+    assert limiter.delay() == 0.0
+    limiter.acquire()
+    assert limiter.remaining == 2
+
+def test_bucket_epuise_attend_la_reinitialisation():
+    limiter = BucketRateLimiter()
+    limiter.update(headers(0, 1.5), 204)
+    assert 1.4 < limiter.delay() <= 1.5
+
+def test_reserve_pour_les_envois_prioritaires():
+    """Les derniers envois du bucket sont gardés pour la voie prioritaire"""
+    limiter = BucketRateLimiter()
+    limiter.update(headers(1, 2.0), 204)
+    assert limiter.delay() == 0.0
+    assert limiter.delay(reserve=1) > 1.9
+
+def test_429_du_bucket():
+    limiter = BucketRateLimiter()
+    limiter.update({'Retry-After': '3'}, 429)
+    assert limiter.remaining == 0
+    assert 2.9 < limiter.delay() <= 3.0
+
+def test_429_retry_after_du_corps_prioritaire():
+    limiter = BucketRateLimiter()
+    limiter.update({'Retry-After': '3'}, 429, retry_after=0.5)
+    assert 0.4 < limiter.delay() <= 0.5
+
+def test_429_global():
+    """Une limite globale bloque tous les envois, sans toucher au budget du bucket"""
+    limiter = BucketRateLimiter()
+    limiter.update(dict(headers(4, 2.0), **{'X-RateLimit-Global': 'true', 'Retry-After': '2'}), 429)
+    assert limiter.remaining == 4
+    assert 1.9 < limiter.delay() <= 2.0
+    assert limiter.global_reset_at > 0
+
+def test_en_tetes_invalides_ignores():
+    limiter = BucketRateLimiter()
+    limiter.update(headers(2, 1.0), 204)
+    limiter.update({'X-RateLimit-Remaining': 'beaucoup', 'X-RateLimit-Reset-After': '1.0'}, 204)
+    assert limiter.remaining == 2
+    limiter.update({'Retry-After': 'bientôt'}, 429)
+    assert 4.9 < limiter.delay() <= 5.0  # Retry-After illisible: 5s par défaut
+
+def test_changement_de_bucket():
+    limiter = BucketRateLimiter()
+    limiter.update(headers(0, 1.0), 204)
+    limiter.update(headers(4, 2.0, bucket='bucket-b'), 204)
+    assert limiter.bucket == 'bucket-b'
+    assert limiter.delay() == 0.0
+
+def test_bucket_reinitialise_sans_reponse():
+    """Budget épuisé puis réinitialisé: la limite est de nouveau inconnue"""
+    limiter = BucketRateLimiter()
+    limiter.update(headers(0, 0.0), 204)
+    assert limiter.acquire() == 0.0
+    assert limiter.remaining is None
+
+def test_delai_minimal_entre_deux_envois():
+    limiter = BucketRateLimiter(min_delay=0.5)
+    limiter.acquire()
+    assert 0.4 < limiter.delay() <= 0.5
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests du spool sur disque: curseur et segments retrouvés après un arrêt brutal
+"""
+
+import os
+import json
+from spool import CURSOR_FILE, DiskSpool
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.spool'))
+
+def test_lignes_relues_dans_l_ordre_puis_acquittees(tmp_path):
+    """peek ne fait pas avancer le curseur, ack si"""
+    spool = DiskSpool(str(tmp_path))
+    assert spool.empty()
+    assert spool.append(["ligne 1", "ligne 2", "ligne 3"])
+
+    lines, cursor = spool.peek(2)
+    assert lines == ["ligne 1", "ligne 2"]
+    assert spool.peek(2)[0] == ["ligne 1", "ligne 2"]
+
+    spool.ack(cursor)
+    lines, cursor = spool.peek(10)
+    assert lines == ["ligne 3"]
+    spool.ack(cursor)
+    assert spool.empty()
+    assert spool.peek(10) == ([], None)
+
+def test_retours_a_la_ligne_remplaces(tmp_path):
+    """Une ligne contenant un retour à la ligne reste une seule ligne du spool"""
+    spool = DiskSpool(str(tmp_path))
+    spool.append(["début\nsuite"])
+    assert spool.peek(10)[0] == ["début suite"]
+
+def test_curseur_retrouve_apres_redemarrage(tmp_path):
+    """Seules les lignes non acquittées sont relues par l'exécution suivante"""
+    spool = DiskSpool(str(tmp_path))
+    spool.append([f"ligne {i}" for i in range(5)])
+    _, cursor = spool.peek(3)
+    spool.ack(cursor)
+    # Arrêt brutal: pas de close()
+
+    reopened = DiskSpool(str(tmp_path))
+    assert reopened.peek(10)[0] == ["ligne 3", "ligne 4"]
+    reopened.append(["ligne 5"])
+    assert reopened.peek(10)[0] == ["ligne 3", "ligne 4", "ligne 5"]
+
+def test_ligne_incomplete_supprimee_au_redemarrage(tmp_path):
+    """Une écriture interrompue ne laisse pas de ligne tronquée dans le spool"""
+    spool = DiskSpool(str(tmp_path))
+    spool.append(["ligne complète"])
+    spool.close()
+    segment = os.path.join(str(tmp_path), segment_files(str(tmp_path))[-1])
+    with open(segment, 'ab') as f:
+        f.write("ligne interr".encode('utf-8'))
+
+    reopened = DiskSpool(str(tmp_path))
+    assert reopened.peek(10)[0] == ["ligne complète"]
+    assert reopened.pending_bytes() == len("ligne complète\n".encode("utf-8"))
+    reopened.append(["ligne suivante"])
+    assert reopened.peek(10)[0] == ["ligne complète", "ligne suivante"]
+
+def test_segments_livres_supprimes(tmp_path):
+    """Un segment entièrement acquitté est supprimé, y compris après un arrêt avant sa suppression"""
+    directory = str(tmp_path)
+    spool = DiskSpool(directory, segment_size=32)
+    for i in range(6):
+        spool.append([f"ligne numéro {i}"])  # Un segment plein toutes les deux lignes
+    assert len(segment_files(directory)) == 3
+
+    lines, cursor = spool.peek(3)
+    assert lines == ["ligne numéro 0", "ligne numéro 1", "ligne numéro 2"]
+    spool.ack(cursor)
+    assert len(segment_files(directory)) == 2
+
+    # Arrêt après l'écriture du curseur mais avant la suppression des segments livrés
+    with open(os.path.join(directory, CURSOR_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"segment": 3, "offset": 0}, f)
+    reopened = DiskSpool(directory, segment_size=32)
+    assert len(segment_files(directory)) == 1
+    assert reopened.peek(10)[0] == ["ligne numéro 4", "ligne numéro 5"]
+
+def test_curseur_illisible_relecture_depuis_le_debut(tmp_path):
+    """Mieux vaut renvoyer des lignes en double que d'en perdre"""
+    directory = str(tmp_path)
+    spool = DiskSpool(directory)
+    spool.append(["ligne 1", "ligne 2"])
+    spool.ack(spool.peek(1)[1])
+    with open(os.path.join(directory, CURSOR_FILE), 'w', encoding='utf-8') as f:
+        f.write("{pas du json")
+
+    reopened = DiskSpool(directory)
+    assert reopened.peek(10)[0] == ["ligne 1", "ligne 2"]
+
+def test_taille_max_abandonne_les_plus_anciens(tmp_path):
+    """Au-delà de la taille max, les segments les plus anciens sont abandonnés et comptés"""
+    spool = DiskSpool(str(tmp_path), segment_size=32, max_size=64)
+    for i in range(8):
+        spool.append([f"ligne numéro {i}"])
+    lines, _ = spool.peek(10)
+    assert lines[-1] == "ligne numéro 7"
+    assert spool.dropped_lines == 8 - len(lines)
+    assert spool.dropped_lines > 0
+
+def test_acquittement_de_lignes_abandonnees_ignore(tmp_path):
+    """Un curseur antérieur aux segments abandonnés ne fait pas reculer la lecture"""
+    spool = DiskSpool(str(tmp_path), segment_size=32, max_size=64)
+    spool.append(["ligne numéro 0"])
+    _, stale = spool.peek(1)
+    for i in range(1, 8):
+        spool.append([f"ligne numéro {i}"])
+    before = spool.peek(10)[0]
+    spool.ack(stale)
+    assert spool.peek(10)[0] == before
+
+def test_peek_borne_en_octets(tmp_path):
+    """La reprise du spool lit au plus environ `max_bytes` octets par message"""
+    spool = DiskSpool(str(tmp_path))
+    spool.append(["x" * 99] * 10)
+    lines, cursor = spool.peek(100, max_bytes=250)
+    assert len(lines) == 3  # La ligne qui franchit la limite est incluse
+    spool.ack(cursor)
+    assert len(spool.peek(100)[0]) == 7
@@ -0,0 +1,330 @@
+import os
+import re
+import time
+import zlib
+import mmap
+import signal
+import struct
+import logging
+import threading
+import importlib.util
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Fichier enregistré cité par une ligne EKOS: "... saved to /home/astro/Light_M31_300s_0042.fits"
+CAPTURE_PATTERN = re.compile(r'(?P<path>/[^"\'\s]+\.(?:fits?|fts|png|jpe?g))(?![\w.])', re.IGNORECASE)
+FITS_SUFFIXES = ('.fits', '.fit', '.fts')
+IMAGE_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg'}
+
+# Limite d'une pièce jointe de webhook Discord (octets)
+ATTACHMENT_MAX_BYTES = 8 * 1024 * 1024
+
+# Format FITS: blocs de 2880 octets, cartes de 80 caractères
+FITS_BLOCK = 2880
+FITS_CARD = 80
+BITPIX_TYPES = {8: 'u1', 16: '>i2', 32: '>i4', 64: '>i8', -32: '>f4', -64: '>f8'}
+
+# Étirement automatique (type STF): fond de ciel ramené à 25%, ombres coupées à 2,8 MAD sous la médiane
+STRETCH_BACKGROUND = 0.25
+STRETCH_SHADOWS_CLIP = -2.8
+MAD_TO_SIGMA = 1.4826
+
+# Fichiers plus anciens ignorés (lignes relues lors d'un rattrapage, secondes)
+THUMBNAIL_MAX_AGE = 600.0
+# Fichiers dont le résultat est gardé (une seule génération, un seul envoi par fichier)
+THUMBNAIL_CACHE_SIZE = 16
+
+THUMBNAILS = {result: REGISTRY.counter('ekos_thumbnails_total', "Aperçus de poses par résultat", {"result": result})
+              for result in ('sent', 'rate_limited', 'duplicate', 'stale', 'failed')}
+RENDER_TIME = REGISTRY.histogram('ekos_thumbnail_render_seconds', "Durée de génération d'un aperçu (processus de travail)")
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("Les aperçus des poses nécessitent le paquet numpy (pip install numpy)")
+    return numpy
+
+def read_fits_header(buffer) -> Tuple[dict, int]:
+    """Lire l'en-tête primaire d'un FITS; retourne (mots-clés, offset des données)"""
+    header = {}
+    offset = 0
+    while offset + FITS_BLOCK <= len(buffer):
+        block = bytes(buffer[offset:offset + FITS_BLOCK]).decode('ascii', errors='replace')
+        offset += FITS_BLOCK
+        for start in range(0, FITS_BLOCK, FITS_CARD):
+            card = block[start:start + FITS_CARD]
+            keyword = card[:8].strip()
+            if keyword == 'END':
+                return header, offset
+            if card[8:10] != '= ':
+                continue
+            value = card[10:]
+            if value.lstrip().startswith("'"):
+                # Chaîne: jusqu'à l'apostrophe fermante ('' = apostrophe échappée)
+                text = value.lstrip()[1:]
+                end = re.search(r"'(?!')", text)
+                header[keyword] = (text[:end.start()] if end else text).replace("''", "'").rstrip()
+                continue
+            value = value.split('/', 1)[0].strip()
+            if value in ('T', 'F'):
+                header[keyword] = value == 'T'
+                continue
+            try:
+                header[keyword] = int(value)
+            except ValueError:
+                try:
+                    header[keyword] = float(value.replace('D', 'E'))
+                except ValueError:
+                    header[keyword] = value
+    raise ValueError("En-tête FITS incomplet (carte END absente)")
+
+def open_fits(path: str):
+    """Ouvrir l'image primaire d'un FITS en mémoire mappée; retourne (en-tête, données (plans, lignes, colonnes))
+
+    Rien n'est lu à l'ouverture: seules les pages effectivement parcourues sont
+    chargées depuis le disque.
+    """
+    np = _numpy()
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header, data_offset = read_fits_header(mm)
+    if header.get('SIMPLE') is not True:
+        raise ValueError("Fichier FITS invalide (SIMPLE absent)")
+    naxis = header.get('NAXIS', 0)
+    if naxis not in (2, 3):
+        raise ValueError(f"Image FITS à {naxis} axe(s) non prise en charge")
+    dtype = BITPIX_TYPES.get(header.get('BITPIX'))
+    if dtype is None:
+        raise ValueError(f"BITPIX non pris en charge: {header.get('BITPIX')}")
+    shape = (header.get('NAXIS3', 1) if naxis == 3 else 1, header['NAXIS2'], header['NAXIS1'])
+    data = np.memmap(path, dtype=np.dtype(dtype), mode='r', offset=data_offset, shape=shape)
+    return header, data
+
+def downsample(data, max_size: int, bayer: bool = False):
+    """Réduire l'image par moyenne de blocs (vectorisée) pour tenir dans `max_size` pixels
+
+    Pour une image brute en matrice de Bayer, les blocs ont une taille paire:
+    chaque bloc couvre le motif entier et donne une luminance sans damier.
+    """
+    np = _numpy()
+    planes = data[:3] if data.shape[0] >= 3 else data[:1]
+    height, width = planes.shape[1:]
+    step = max(1, -(-max(height, width) // max_size))
+    if bayer:
+        step = max(2, step + step % 2)
+    rows, columns = height // step, width // step
+    blocks = planes[:, :rows * step, :columns * step].reshape(len(planes), rows, step, columns, step)
+    image = blocks.mean(axis=(2, 4), dtype=np.float32)
+    return np.nan_to_num(image, copy=False)
+
+def _mtf(midtones, x):
+    """Fonction de transfert des tons moyens: mtf(m, m) = 0.5"""
+    return ((midtones - 1) * x) / ((2 * midtones - 1) * x - midtones)
+
+def stretch(image):
+    """Étirement automatique de chaque plan (ombres, tons moyens) vers des pixels 8 bits"""
+    np = _numpy()
+    pixels = np.empty(image.shape, dtype=np.uint8)
+    for plane, target in zip(image, pixels):
+        low, high = float(plane.min()), float(plane.max())
+        if high <= low:
+            target[...] = 0
+            continue
+        x = (plane - low) / (high - low)
+        median = float(np.median(x))
+        mad = float(np.median(np.abs(x - median))) * MAD_TO_SIGMA
+        shadows = min(max(median + STRETCH_SHADOWS_CLIP * mad, 0.0), median)
+        x = np.clip((x - shadows) / (1.0 - shadows), 0.0, 1.0)
+        background = min(max((median - shadows) / (1.0 - shadows), 1e-6), 1.0 - 1e-6)
+        x = _mtf(_mtf(STRETCH_BACKGROUND, background), x)
+        target[...] = np.round(x * 255.0)
+    return pixels
+
+def encode_png(pixels) -> bytes:
+    """Encoder des pixels 8 bits (plans, lignes, colonnes) en PNG, gris ou RGB, sans dépendance"""
+    np = _numpy()
+    channels, height, width = pixels.shape
+    rows = np.ascontiguousarray(pixels.transpose(1, 2, 0)).reshape(height, width * channels)
+    # Filtre Sub sur chaque ligne: différence avec le pixel de gauche, bien mieux compressée
+    filtered = np.empty((height, width * channels + 1), dtype=np.uint8)
+    filtered[:, 0] = 1
+    filtered[:, 1:channels + 1] = rows[:, :channels]
+    filtered[:, channels + 1:] = rows[:, channels:] - rows[:, :-channels]
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    color_type = 2 if channels == 3 else 0
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(filtered.tobytes(), 6))
+            + chunk(b'IEND', b''))
+
+def render_preview(path: str, max_size: int, max_age: float = THUMBNAIL_MAX_AGE) -> Optional[dict]:
+    """Aperçu d'une pose (exécuté dans un processus de travail)
+
+    Retourne None pour un fichier absent ou trop ancien. Un FITS est réduit,
+    étiré et encodé en PNG; une image PNG/JPEG est jointe telle quelle.
+    """
+    start = time.perf_counter()
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if time.time() - st.st_mtime > max_age:
+        return None
+
+    name = os.path.basename(path)
+    suffix = os.path.splitext(name)[1].lower()
+    if suffix in IMAGE_TYPES:
+        if st.st_size > ATTACHMENT_MAX_BYTES:
+            raise ValueError(f"Image trop volumineuse pour Discord ({st.st_size / 1024 / 1024:.1f} Mo)")
+        with open(path, 'rb') as f:
+            data = f.read()
+        return {"name": name, "data": data, "mime": IMAGE_TYPES[suffix], "header": {},
+                "render_s": time.perf_counter() - start}
+
+    header, image = open_fits(path)
+    size = (image.shape[2], image.shape[1])
+    image = downsample(image, max_size, bayer='BAYERPAT' in header and image.shape[0] == 1)
+    image = image * float(header.get('BSCALE', 1.0)) + float(header.get('BZERO', 0.0))
+    # Origine FITS en bas à gauche: retourner pour l'affichage
+    png = encode_png(stretch(image)[:, ::-1])
+    return {
+        "name": os.path.splitext(name)[0] + '.png',
+        "data": png,
+        "mime": 'image/png',
+        "header": {key: header[key] for key in ('OBJECT', 'FILTER', 'EXPTIME', 'FRAME', 'IMAGETYP') if key in header},
+        "size": size,
+        "render_s": time.perf_counter() - start,
+    }
+
+def _init_worker():
+    """Processus de travail: basse priorité, Ctrl+C laissé au processus principal"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+class ThumbnailService:
+    """Aperçus des poses citées par les logs, joints aux messages Discord
+
+    `observe()` est appelé pour chaque ligne lue: une recherche d'expression et,
+    pour une ligne qui cite un fichier enregistré, le dépôt d'une tâche dans un
+    pool de processus. Lecture du FITS, réduction, étirement et encodage PNG se
+    font dans ces processus; le résultat est déposé dans la file d'envoi de
+    Discord. Chaque fichier n'est traité qu'une fois, au plus un aperçu part
+    toutes les `min_interval` secondes et une pose arrivée pendant un calcul en
+    cours est ignorée: le flux de lignes n'attend jamais.
+    """
+
+    def __init__(self, send: Callable[[str, bytes, str, str], bool], max_size: int = 800, min_interval: float = 60.0,
+                 workers: int = 1, path_map: Optional[List[str]] = None, max_age: float = THUMBNAIL_MAX_AGE):
+        # numpy n'est importé que par les processus de travail
+        if importlib.util.find_spec('numpy') is None:
+            raise RuntimeError("Les aperçus des poses nécessitent le paquet numpy (pip install numpy)")
+        self.send = send
+        self.workers = workers
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.executor = None
+        self.cache: "OrderedDict[str, object]" = OrderedDict()  # Fichier -> Future du rendu
+        self.in_flight = 0
+        self.last_sent = float('-inf')
+        self.configure(max_size, min_interval, path_map)
+
+    def configure(self, max_size: int, min_interval: float, path_map: Optional[List[str]] = None):
+        """Appliquer de nouveaux réglages (rechargement de la configuration)"""
+        self.max_size = max_size
+        self.min_interval = min_interval
+        # "chemin/sur/la/machine/d'acquisition=chemin/local" (logs lus à travers le réseau)
+        self.path_map = [tuple(entry.split('=', 1)) for entry in path_map or [] if '=' in entry]
+
+    def _local_path(self, path: str) -> str:
+        for remote, local in self.path_map:
+            if path.startswith(remote):
+                return local + path[len(remote):]
+        return path
+
+    def _executor(self):
+        if self.executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn: un fork du processus multi-thread pourrait hériter d'un verrou tenu
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def observe(self, line: str) -> bool:
+        """Lancer l'aperçu du fichier cité par la ligne; retourne True si un calcul est lancé"""
+        match = CAPTURE_PATTERN.search(line)
+        if match is None:
+            return False
+        path = self._local_path(match.group('path'))
+        with self.lock:
+            if path in self.cache:
+                THUMBNAILS['duplicate'].inc()
+                return False
+            if self.in_flight >= self.workers or time.monotonic() - self.last_sent < self.min_interval:
+                THUMBNAILS['rate_limited'].inc()
+                return False
+            try:
+                future = self._executor().submit(render_preview, path, self.max_size, self.max_age)
+            except RuntimeError as e:
+                # Pool cassé (processus tué) ou arrêté: recréé au prochain aperçu
+                logger.warning(f"⚠️ Pool des aperçus indisponible: {e}")
+                self.executor = None
+                THUMBNAILS['failed'].inc()
+                return False
+            self.in_flight += 1
+            self.cache[path] = future
+            while len(self.cache) > THUMBNAIL_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        future.add_done_callback(lambda done: self._on_rendered(path, done))
+        return True
+
+    def _on_rendered(self, path: str, future):
+        """Déposer l'aperçu calculé dans la file d'envoi (thread du pool)"""
+        with self.lock:
+            self.in_flight -= 1
+        if future.cancelled():
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.warning(f"⚠️ Aperçu impossible pour {path}: {e}")
+            THUMBNAILS['failed'].inc()
+            return
+        if result is None:
+            THUMBNAILS['stale'].inc()
+            return
+        RENDER_TIME.observe(result["render_s"])
+        if not self.send(result["name"], result["data"], result["mime"], self._caption(path, result)):
+            THUMBNAILS['failed'].inc()
+            return
+        with self.lock:
+            self.last_sent = time.monotonic()
+        THUMBNAILS['sent'].inc()
+        logger.debug(f"Aperçu envoyé: {path} ({len(result['data']) / 1024:.0f} Ko en {result['render_s']:.2f}s)")
+
+    @staticmethod
+    def _caption(path: str, result: dict) -> str:
+        header = result["header"]
+        details = [str(header[key]) for key in ('IMAGETYP', 'OBJECT', 'FILTER') if header.get(key)]
+        if 'EXPTIME' in header:
+            details.append(f"{header['EXPTIME']:g}s" if isinstance(header['EXPTIME'], (int, float)) else str(header['EXPTIME']))
+        if "size" in result:
+            details.append(f"{result['size'][0]}×{result['size'][1]}")
+        return f"🖼️ **{os.path.basename(path)}**" + (f" - {', '.join(details)}" if details else "")
+
+    def stop(self):
+        """Abandonner les calculs en attente et arrêter les processus de travail"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,269 @@
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Étapes d'une trace, dans l'ordre du pipeline:
+# écriture du fichier -> détection (événement, polling) -> lecture -> batch -> flush
+# -> sortie de la file d'envoi -> requête HTTP -> réponse -> accusé de livraison
+STAGES = ('write', 'event', 'read', 'queued', 'flush', 'dequeue', 'request', 'response', 'done')
+
+# Lectures mémorisées pour retrouver la détection et la lecture d'une ligne au moment du flush,
+# et lectures examinées autour de l'heure de la ligne (lectures simultanées de plusieurs profils)
+READ_RING = 4096
+READ_SCAN = 16
+
+# Traces les plus lentes détaillées dans un rapport
+DUMP_SLOWEST = 20
+
+# Intervalle minimal entre deux rapports déclenchés par le seuil de latence (secondes)
+DUMP_COOLDOWN = 300.0
+
+# Profil des threads: durée d'échantillonnage, intervalle entre deux échantillons,
+# profondeur des piles et piles affichées par thread
+SAMPLE_DURATION = 2.0
+SAMPLE_INTERVAL = 0.01
+STACK_DEPTH = 12
+STACKS_PER_THREAD = 3
+
+class Trace:
+    """Passage d'un batch dans le pipeline, vu par sa ligne la plus ancienne
+
+    Les lignes d'un batch partagent le flush, la file d'envoi et la requête HTTP:
+    seules leurs détection et lecture diffèrent, et la plus ancienne est celle
+    dont la latence de bout en bout est la plus grande.
+    """
+    __slots__ = ('tracer', 'lane', 'sink', 'lines', 'file_path', 'trigger', 'stamps', 'attempts', 'success')
+
+    def __init__(self, tracer: "Tracer", lane: str, sink: str, lines: int):
+        self.tracer = tracer
+        self.lane = lane
+        self.sink = sink
+        self.lines = lines
+        self.file_path: Optional[str] = None
+        self.trigger: Optional[str] = None  # event, poll ou check
+        self.stamps: Dict[str, float] = {}  # Étape -> time.monotonic()
+        self.attempts = 0  # Requêtes HTTP (payloads et nouveaux essais)
+        self.success: Optional[bool] = None
+
+    def mark(self, stage: str):
+        """Horodater une étape (la dernière occurrence l'emporte: dernier payload, dernier essai)"""
+        self.stamps[stage] = time.monotonic()
+        if stage == 'request':
+            self.attempts += 1
+
+    def finish(self, success: bool):
+        """Livraison terminée (appelé par le thread d'envoi)"""
+        self.tracer._finish(self, success)
+
+    @property
+    def latency(self) -> float:
+        """Délai entre la première et la dernière étape horodatées"""
+        stamps = self.stamps
+        return stamps.get('done', 0.0) - min(stamps.values()) if stamps else 0.0
+
+    def intervals(self) -> List[Tuple[str, float]]:
+        """Durée de chaque étape depuis la précédente horodatée: [("write→event", secondes), ...]"""
+        result = []
+        previous = None
+        for stage in STAGES:
+            stamp = self.stamps.get(stage)
+            if stamp is None:
+                continue
+            if previous is not None:
+                result.append((f"{previous[0]}→{stage}", stamp - previous[1]))
+            previous = (stage, stamp)
+        return result
+
+class Tracer:
+    """Traçage optionnel de la latence de bout en bout des lignes
+
+    Le moniteur horodate chaque lecture (détection, lecture) et chaque batch
+    (flush), le sink le passage dans sa file et les requêtes HTTP. Les traces
+    terminées sont gardées dans un anneau borné. Un rapport (traces les plus
+    lentes et profil échantillonné des piles de tous les threads) est écrit sur
+    demande (SIGUSR1) ou quand une trace dépasse le seuil de latence.
+
+    Désactivé, le moniteur et les sinks ne reçoivent pas de traceur: le coût se
+    limite à un test par lecture et par batch.
+    """
+
+    def __init__(self, buffer_size: int = 1000, slow_threshold: float = 0.0, dump_directory: str = 'ekos_monitor_traces'):
+        self.enabled = False
+        self.slow_threshold = slow_threshold
+        self.dump_directory = dump_directory
+        self.lock = threading.Lock()
+        self.traces = deque(maxlen=buffer_size)
+        # Lectures récentes: (fin, début, détection, écriture, déclencheur, fichier)
+        self.reads = deque(maxlen=READ_RING)
+        self.last_auto_dump = float('-inf')
+        self.dump_thread = None
+
+    def configure(self, enabled: bool, buffer_size: int, slow_threshold: float, dump_directory: str):
+        """Appliquer de nouveaux réglages (rechargement de la configuration)"""
+        with self.lock:
+            self.enabled = enabled
+            if buffer_size != self.traces.maxlen:
+                self.traces = deque(self.traces, maxlen=buffer_size)
+            self.slow_threshold = slow_threshold
+            self.dump_directory = dump_directory
+
+    def record_read(self, file_path: str, trigger: str, detected: float, written: Optional[float], start: float):
+        """Mémoriser une lecture terminée: lignes ajoutées au batch entre `start` et maintenant
+
+        `written` est la date de modification du fichier (time.time()), convertie
+        ici en temps monotone.
+        """
+        if written is not None:
+            written = min(detected, time.monotonic() - max(0.0, time.time() - written))
+        with self.lock:
+            # Horodatée sous le verrou: l'anneau reste trié par fin de lecture
+            self.reads.append((time.monotonic(), start, detected, written, trigger, file_path))
+
+    def begin(self, lane: str, sink: str, lines: int, read_time: float, file_path: str) -> Trace:
+        """Nouvelle trace au flush d'un batch, d'après sa ligne la plus ancienne (heure d'ajout et fichier)"""
+        trace = Trace(self, lane, sink, lines)
+        trace.file_path = file_path
+        stamps = trace.stamps
+        with self.lock:
+            read = self._find_read(read_time, file_path)
+        if read is not None:
+            _, start, detected, written, trace.trigger, _ = read
+            if written is not None:
+                stamps['write'] = written
+            stamps['event'] = detected
+            stamps['read'] = start
+        stamps['queued'] = read_time
+        trace.mark('flush')
+        return trace
+
+    def _find_read(self, read_time: float, file_path: str) -> Optional[tuple]:
+        """Lecture du fichier pendant laquelle la ligne a été ajoutée (verrou tenu)"""
+        reads = self.reads
+        # Première lecture terminée après l'ajout de la ligne (anneau trié par fin)
+        low, high = 0, len(reads)
+        while low < high:
+            middle = (low + high) // 2
+            if reads[middle][0] < read_time:
+                low = middle + 1
+            else:
+                high = middle
+        for index in range(low, min(low + READ_SCAN, len(reads))):
+            read = reads[index]
+            if read[1] <= read_time and read[5] == file_path:
+                return read
+        return None
+
+    def _finish(self, trace: Trace, success: bool):
+        trace.mark('done')
+        trace.success = success
+        with self.lock:
+            self.traces.append(trace)
+        threshold = self.slow_threshold
+        if threshold > 0 and trace.latency > threshold:
+            now = time.monotonic()
+            if now - self.last_auto_dump >= DUMP_COOLDOWN:
+                self.last_auto_dump = now
+                self.dump_async(f"latence de {trace.latency:.2f}s > {threshold:g}s ({trace.sink})")
+
+    def dump_async(self, reason: str):
+        """Écrire un rapport dans un thread dédié (l'échantillonnage des piles prend SAMPLE_DURATION)"""
+        with self.lock:
+            if self.dump_thread is not None and self.dump_thread.is_alive():
+                logger.info("Rapport de traçage déjà en cours, demande ignorée")
+                return
+            self.dump_thread = threading.Thread(target=self.dump, args=(reason,), name="trace-dump", daemon=True)
+            self.dump_thread.start()
+
+    def dump(self, reason: str) -> Optional[str]:
+        """Écrire les traces les plus lentes et le profil des threads; retourne le chemin du rapport"""
+        with self.lock:
+            traces = list(self.traces)
+        samples, stacks = sample_stacks(SAMPLE_DURATION, SAMPLE_INTERVAL)
+        now = datetime.now()
+        lines = [f"EKOS Log Monitor - rapport de traçage du {now:%Y-%m-%d %H:%M:%S} ({reason})"]
+        if self.enabled:
+            lines.append(f"Traces en mémoire: {len(traces)} ({self.traces.maxlen} max)"
+                         f"{f', seuil de latence {self.slow_threshold:g}s' if self.slow_threshold > 0 else ''}")
+        else:
+            lines.append("Traçage désactivé (TRACING=false): profil des threads uniquement")
+        lines += format_traces(traces)
+        lines += format_profile(samples, stacks)
+
+        try:
+            os.makedirs(self.dump_directory, exist_ok=True)
+            path = os.path.join(self.dump_directory, f"trace-{now:%Y%m%d-%H%M%S}.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logger.error(f"Impossible d'écrire le rapport de traçage: {e}")
+            return None
+        logger.info(f"🔬 Rapport de traçage écrit dans {path} ({reason})")
+        return path
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def format_traces(traces: List[Trace]) -> List[str]:
+    """Latence par étape (toutes les traces) puis détail des plus lentes"""
+    if not traces:
+        return []
+    durations = defaultdict(list)
+    for trace in traces:
+        for step, duration in trace.intervals():
+            durations[step].append(duration)
+    # Étapes dans l'ordre du pipeline, puis le total
+    durations = dict(sorted(durations.items(), key=lambda item: [STAGES.index(stage) for stage in item[0].split('→')]))
+    durations['total'] = [trace.latency for trace in traces]
+
+    lines = ["", "Durée des étapes (p50 / p99 / max, secondes):"]
+    for step, values in durations.items():
+        lines.append(f"  {step:<17} {percentile(values, 0.50):8.3f} {percentile(values, 0.99):8.3f} {max(values):8.3f}  ({len(values)} traces)")
+
+    slowest = sorted(traces, key=lambda trace: trace.latency, reverse=True)[:DUMP_SLOWEST]
+    lines += ["", f"Traces les plus lentes ({len(slowest)}):"]
+    for rank, trace in enumerate(slowest, 1):
+        source = os.path.basename(trace.file_path) if trace.file_path else '?'
+        status = 'livré' if trace.success else 'échec'
+        lines.append(f"  #{rank} {trace.latency:.3f}s  {trace.sink}  voie {trace.lane}  {trace.lines} ligne(s)  "
+                     f"{source} ({trace.trigger or '?'})  {trace.attempts} requête(s)  {status}")
+        lines.append("     " + "  ".join(f"{step} {duration:.3f}" for step, duration in trace.intervals()))
+    return lines
+
+def sample_stacks(duration: float, interval: float) -> Tuple[int, Dict[str, Counter]]:
+    """Échantillonner les piles de tous les threads; retourne (échantillons, piles comptées par thread)"""
+    own = threading.get_ident()
+    stacks: Dict[str, Counter] = defaultdict(Counter)
+    samples = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None and len(stack) < STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            stacks[names.get(ident, f"thread-{ident}")][tuple(stack)] += 1
+        samples += 1
+        time.sleep(interval)
+    return samples, stacks
+
+def format_profile(samples: int, stacks: Dict[str, Counter]) -> List[str]:
+    """Piles les plus fréquentes de chaque thread (la plus interne en premier)"""
+    lines = ["", f"Profil des threads ({samples} échantillons toutes les {SAMPLE_INTERVAL * 1000:g} ms):"]
+    for name in sorted(stacks):
+        counter = stacks[name]
+        lines.append(f"  [{name}]")
+        for stack, count in counter.most_common(STACKS_PER_THREAD):
+            lines.append(f"    {count * 100 / samples:5.1f}%  " + " < ".join(stack))
+    return lines